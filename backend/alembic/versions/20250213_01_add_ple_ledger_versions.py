@@ -0,0 +1,39 @@
+"""add ple_ledger_versions (caché de libros PLE)
+
+Revision ID: 20250213_01
+Revises: 20250212_01
+Create Date: 2026-02-13
+
+Versión por empresa/período de los datos que alimentan los libros PLE.
+Se usa como clave de la caché en disco de los TXT generados.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250213_01'
+down_revision = '20250212_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'ple_ledger_versions' not in inspector.get_table_names():
+        op.create_table(
+            'ple_ledger_versions',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('company_id', sa.Integer(), nullable=False),
+            sa.Column('year', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+            sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.PrimaryKeyConstraint('id'),
+            sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+            sa.UniqueConstraint('company_id', 'year', 'month', name='uq_ple_ledger_version_period'),
+        )
+        op.create_index('ix_ple_ledger_versions_company_id', 'ple_ledger_versions', ['company_id'])
+
+
+def downgrade():
+    op.drop_table('ple_ledger_versions')
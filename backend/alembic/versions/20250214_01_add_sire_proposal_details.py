@@ -0,0 +1,61 @@
+"""add sire_proposal_details (comprobantes de propuestas SIRE)
+
+Revision ID: 20250214_01
+Revises: 20250213_01
+Create Date: 2026-02-14
+
+Detalle por comprobante de las propuestas RVIE/RCE, cargado en bloque
+por el parser incremental de archivos de propuesta.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '20250214_01'
+down_revision = '20250213_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'sire_proposal_details' not in inspector.get_table_names():
+        op.create_table(
+            'sire_proposal_details',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('company_id', sa.Integer(), nullable=False),
+            sa.Column(
+                'proposal_type',
+                # El tipo sireproposaltype ya existe (20250205_01): no recrearlo
+                sa.Enum('RVIE', 'RCE', name='sireproposaltype').with_variant(
+                    postgresql.ENUM('RVIE', 'RCE', name='sireproposaltype', create_type=False), 'postgresql'
+                ),
+                nullable=False,
+            ),
+            sa.Column('period', sa.String(6), nullable=False),
+            sa.Column('line_no', sa.Integer(), nullable=False),
+            sa.Column('car_sunat', sa.String(40), nullable=True),
+            sa.Column('doc_type', sa.String(2), nullable=True),
+            sa.Column('series', sa.String(20), nullable=True),
+            sa.Column('number', sa.String(20), nullable=True),
+            sa.Column('issue_date', sa.Date(), nullable=True),
+            sa.Column('counterparty_doc_type', sa.String(2), nullable=True),
+            sa.Column('counterparty_tax_id', sa.String(20), nullable=True),
+            sa.Column('counterparty_name', sa.String(255), nullable=True),
+            sa.Column('base_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('igv_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('total_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('currency', sa.String(3), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.PrimaryKeyConstraint('id'),
+            sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        )
+        op.create_index('idx_sire_detail_company_type_period', 'sire_proposal_details',
+                        ['company_id', 'proposal_type', 'period'])
+        op.create_index('idx_sire_detail_document', 'sire_proposal_details',
+                        ['company_id', 'proposal_type', 'doc_type', 'series', 'number'])
+
+
+def downgrade():
+    op.drop_table('sire_proposal_details')
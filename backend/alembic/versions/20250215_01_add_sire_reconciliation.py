@@ -0,0 +1,85 @@
+"""add sire_reconciliation_runs / sire_reconciliation_items
+
+Revision ID: 20250215_01
+Revises: 20250214_01
+Create Date: 2026-02-15
+
+Resultados persistidos de la conciliación propuesta SIRE (RVIE/RCE)
+vs. ventas/compras registradas, para consultarlos paginados.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '20250215_01'
+down_revision = '20250214_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing_tables = inspector.get_table_names()
+
+    if 'sire_reconciliation_runs' not in existing_tables:
+        op.create_table(
+            'sire_reconciliation_runs',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('company_id', sa.Integer(), nullable=False),
+            sa.Column(
+                'proposal_type',
+                # El tipo sireproposaltype ya existe (20250205_01): no recrearlo
+                sa.Enum('RVIE', 'RCE', name='sireproposaltype').with_variant(
+                    postgresql.ENUM('RVIE', 'RCE', name='sireproposaltype', create_type=False), 'postgresql'
+                ),
+                nullable=False,
+            ),
+            sa.Column('period', sa.String(6), nullable=False),
+            sa.Column('sunat_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('books_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('matched_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('missing_in_books_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('extra_in_books_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('amount_mismatch_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('date_mismatch_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('duration_ms', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.Column('created_by', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+        )
+        op.create_index('idx_sire_recon_run_company_type_period', 'sire_reconciliation_runs',
+                        ['company_id', 'proposal_type', 'period'])
+
+    if 'sire_reconciliation_items' not in existing_tables:
+        op.create_table(
+            'sire_reconciliation_items',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('run_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(20), nullable=False),
+            sa.Column('mismatch_fields', sa.String(100), nullable=True),
+            sa.Column('counterparty_tax_id', sa.String(20), nullable=True),
+            sa.Column('doc_type', sa.String(2), nullable=True),
+            sa.Column('series', sa.String(20), nullable=True),
+            sa.Column('number', sa.String(20), nullable=True),
+            sa.Column('sunat_detail_id', sa.Integer(), nullable=True),
+            sa.Column('book_id', sa.Integer(), nullable=True),
+            sa.Column('sunat_issue_date', sa.Date(), nullable=True),
+            sa.Column('book_issue_date', sa.Date(), nullable=True),
+            sa.Column('sunat_base_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('sunat_igv_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('sunat_total_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('book_base_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('book_igv_amount', sa.Numeric(14, 2), nullable=True),
+            sa.Column('book_total_amount', sa.Numeric(14, 2), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.ForeignKeyConstraint(['run_id'], ['sire_reconciliation_runs.id'], ondelete='CASCADE'),
+        )
+        op.create_index('idx_sire_recon_item_run_status', 'sire_reconciliation_items', ['run_id', 'status', 'id'])
+
+
+def downgrade():
+    op.drop_table('sire_reconciliation_items')
+    op.drop_table('sire_reconciliation_runs')
@@ -0,0 +1,60 @@
+"""add sire_tickets
+
+Revision ID: 20250216_01
+Revises: 20250215_01
+Create Date: 2026-02-16
+
+Tickets de operaciones asíncronas SIRE (reemplazo de propuesta, carga de
+preliminares) consultados en segundo plano por el poller.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '20250216_01'
+down_revision = '20250215_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'sire_tickets' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'sire_tickets',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('ticket_number', sa.String(50), nullable=False),
+        sa.Column('operation', sa.String(30), nullable=False),
+        sa.Column(
+            'proposal_type',
+            # El tipo sireproposaltype ya existe (20250205_01): no recrearlo
+            sa.Enum('RVIE', 'RCE', name='sireproposaltype').with_variant(
+                postgresql.ENUM('RVIE', 'RCE', name='sireproposaltype', create_type=False), 'postgresql'
+            ),
+            nullable=True,
+        ),
+        sa.Column('period', sa.String(6), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_poll_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('last_polled_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_response', sa.JSON(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+        sa.UniqueConstraint('company_id', 'ticket_number', name='uq_sire_ticket_company_number'),
+    )
+    op.create_index('idx_sire_ticket_status_next_poll', 'sire_tickets', ['status', 'next_poll_at'])
+
+
+def downgrade():
+    op.drop_table('sire_tickets')
@@ -0,0 +1,39 @@
+"""add bank_transaction_lines
+
+Revision ID: 20250217_01
+Revises: 20250216_01
+Create Date: 2026-02-17
+
+Matches de conciliación bancaria de un movimiento contra varias líneas
+contables (bank_transactions.entry_line_id guarda la primera).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250217_01'
+down_revision = '20250216_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'bank_transaction_lines' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'bank_transaction_lines',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('bank_transaction_id', sa.Integer(), nullable=False),
+        sa.Column('entry_line_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['bank_transaction_id'], ['bank_transactions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['entry_line_id'], ['entry_lines.id']),
+        sa.UniqueConstraint('entry_line_id', name='uq_bank_transaction_lines_entry_line'),
+    )
+    op.create_index('ix_bank_transaction_lines_bank_transaction_id', 'bank_transaction_lines', ['bank_transaction_id'])
+
+
+def downgrade():
+    op.drop_table('bank_transaction_lines')
@@ -0,0 +1,32 @@
+"""add bank_transactions.fingerprint
+
+Revision ID: 20250218_01
+Revises: 20250217_01
+Create Date: 2026-02-18
+
+Huella de cada movimiento bancario para omitir duplicados al importar
+extractos. Los movimientos cargados antes de esta migración quedan sin huella.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250218_01'
+down_revision = '20250217_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = {c['name'] for c in inspector.get_columns('bank_transactions')}
+    if 'fingerprint' not in columns:
+        op.add_column('bank_transactions', sa.Column('fingerprint', sa.String(length=40), nullable=True))
+    indexes = {i['name'] for i in inspector.get_indexes('bank_transactions')}
+    if 'ix_bank_transactions_fingerprint' not in indexes:
+        op.create_index('ix_bank_transactions_fingerprint', 'bank_transactions', ['fingerprint'])
+
+
+def downgrade():
+    op.drop_index('ix_bank_transactions_fingerprint', table_name='bank_transactions')
+    op.drop_column('bank_transactions', 'fingerprint')
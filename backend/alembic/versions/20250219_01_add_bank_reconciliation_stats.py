@@ -0,0 +1,50 @@
+"""add bank_reconciliation_stats
+
+Revision ID: 20250219_01
+Revises: 20250218_01
+Create Date: 2026-02-19
+
+Resumen incremental de conciliación bancaria por (cuenta bancaria, período):
+saldo contable acumulado y conteos de partidas conciliadas/pendientes. La
+tabla nace vacía; cada cuenta se construye en su primera consulta.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250219_01'
+down_revision = '20250218_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'bank_reconciliation_stats' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'bank_reconciliation_stats',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('bank_account_id', sa.Integer(), nullable=False),
+        sa.Column('period_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('book_movement', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('book_balance', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('book_lines', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('book_lines_reconciled', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('bank_transactions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('bank_transactions_reconciled', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('stale', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['bank_account_id'], ['bank_accounts.id']),
+        sa.ForeignKeyConstraint(['period_id'], ['periods.id']),
+        sa.UniqueConstraint('bank_account_id', 'period_id', name='uq_bank_reconciliation_stats'),
+    )
+    op.create_index('ix_bank_reconciliation_stats_bank_account_id', 'bank_reconciliation_stats', ['bank_account_id'])
+
+
+def downgrade():
+    op.drop_table('bank_reconciliation_stats')
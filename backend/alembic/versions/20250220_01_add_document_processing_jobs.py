@@ -0,0 +1,70 @@
+"""add document_processing_jobs and processing progress on documents
+
+Revision ID: 20250220_01
+Revises: 20250219_01
+Create Date: 2026-02-20
+
+Cola persistente de extracción/OCR (reemplaza el hilo por upload) y el
+resumen de su avance en documents.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250220_01'
+down_revision = '20250219_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'documents' in tables:
+        columns = {c['name'] for c in inspector.get_columns('documents')}
+        if 'processing_status' not in columns:
+            op.add_column('documents', sa.Column('processing_status', sa.String(20), nullable=True))
+        if 'processing_progress' not in columns:
+            op.add_column('documents', sa.Column('processing_progress', sa.Integer(), nullable=True, server_default='0'))
+        if 'processing_error' not in columns:
+            op.add_column('documents', sa.Column('processing_error', sa.Text(), nullable=True))
+
+    if 'document_processing_jobs' in tables:
+        return
+
+    op.create_table(
+        'document_processing_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('job_type', sa.String(20), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('next_run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('worker_id', sa.String(100), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+    )
+    op.create_index('ix_document_processing_jobs_document_id', 'document_processing_jobs', ['document_id'])
+    op.create_index('idx_document_job_status_priority', 'document_processing_jobs', ['status', 'priority', 'next_run_at'])
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'document_processing_jobs' in inspector.get_table_names():
+        op.drop_table('document_processing_jobs')
+    if 'documents' in inspector.get_table_names():
+        columns = {c['name'] for c in inspector.get_columns('documents')}
+        for column in ('processing_error', 'processing_progress', 'processing_status'):
+            if column in columns:
+                op.drop_column('documents', column)
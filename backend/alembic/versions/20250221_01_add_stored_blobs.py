@@ -0,0 +1,67 @@
+"""add stored_blobs (content-addressed storage) and blob_id references
+
+Revision ID: 20250221_01
+Revises: 20250220_01
+Create Date: 2026-02-21
+
+Contenido de documentos y adjuntos de la casilla guardado una vez por
+SHA-256 con conteo de referencias. Las filas existentes quedan con blob_id
+NULL y siguen usando su archivo propio.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250221_01'
+down_revision = '20250220_01'
+branch_labels = None
+depends_on = None
+
+TABLAS_CON_BLOB = ('documents', 'mailbox_attachments', 'mailbox_response_attachments', 'company_to_admin_attachments')
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'stored_blobs' not in tables:
+        op.create_table(
+            'stored_blobs',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('sha256', sa.String(64), nullable=False),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('blob_path', sa.String(255), nullable=False),
+            sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('released_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('sha256', name='uq_stored_blobs_sha256'),
+        )
+
+    # SQLite no agrega FKs con ALTER TABLE: la columna se crea sin restricción
+    con_fk = conn.dialect.name != 'sqlite'
+    for table in TABLAS_CON_BLOB:
+        if table not in tables:
+            continue
+        if 'blob_id' in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        op.add_column(table, sa.Column('blob_id', sa.Integer(), nullable=True))
+        if con_fk:
+            op.create_foreign_key(f'fk_{table}_blob_id', table, 'stored_blobs', ['blob_id'], ['id'])
+        if table == 'documents':
+            op.create_index('ix_documents_blob_id', 'documents', ['blob_id'])
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    for table in TABLAS_CON_BLOB:
+        if table in tables and 'blob_id' in {c['name'] for c in inspector.get_columns(table)}:
+            if table == 'documents':
+                op.drop_index('ix_documents_blob_id', table_name='documents')
+            if conn.dialect.name != 'sqlite':
+                op.drop_constraint(f'fk_{table}_blob_id', table, type_='foreignkey')
+            op.drop_column(table, 'blob_id')
+    if 'stored_blobs' in tables:
+        op.drop_table('stored_blobs')
@@ -0,0 +1,76 @@
+"""add documents.search_text with full-text index (GIN on PostgreSQL, FTS5 on SQLite)
+
+Revision ID: 20250222_01
+Revises: 20250221_01
+Create Date: 2026-02-22
+
+search_text concentra título, descripción, archivo, OCR y RUC/serie/número
+extraídos. Aquí se completa con título, descripción, archivo y OCR; los datos
+extraídos se agregan con scripts/reindex_documents.py (o al reprocesar).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250222_01'
+down_revision = '20250221_01'
+branch_labels = None
+depends_on = None
+
+POSTGRES_DDL = (
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(search_text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING GIN (search_vector)",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    "search_text, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN "
+    "INSERT INTO documents_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN "
+    "INSERT INTO documents_fts(documents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE OF search_text ON documents BEGIN "
+    "INSERT INTO documents_fts(documents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+    "INSERT INTO documents_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+)
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if 'documents' not in tables:
+        return
+
+    if 'search_text' not in {c['name'] for c in inspector.get_columns('documents')}:
+        op.add_column('documents', sa.Column('search_text', sa.Text(), nullable=True))
+        ocr = (
+            "coalesce((SELECT o.ocr_text FROM document_ocr_data o WHERE o.document_id = documents.id), '')"
+            if 'document_ocr_data' in tables else "''"
+        )
+        op.execute(
+            "UPDATE documents SET search_text = coalesce(title, '') || ' ' || coalesce(description, '') "
+            f"|| ' ' || original_filename || ' ' || {ocr}"
+        )
+
+    if conn.dialect.name == 'postgresql':
+        for sentencia in POSTGRES_DDL:
+            op.execute(sentencia)
+    elif conn.dialect.name == 'sqlite':
+        for sentencia in SQLITE_DDL:
+            op.execute(sentencia)
+        op.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_documents_search_vector")
+        op.execute("ALTER TABLE documents DROP COLUMN IF EXISTS search_vector")
+    elif conn.dialect.name == 'sqlite':
+        for trigger in ('documents_fts_ai', 'documents_fts_ad', 'documents_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS documents_fts")
+    inspector = sa.inspect(conn)
+    if 'search_text' in {c['name'] for c in inspector.get_columns('documents')}:
+        op.drop_column('documents', 'search_text')
@@ -0,0 +1,57 @@
+"""add composite indexes for keyset mailbox listing
+
+Revision ID: 20250223_01
+Revises: 20250222_01
+Create Date: 2026-02-23
+
+Los listados de la casilla se paginan por (created_at, id) con filtros por
+leído, prioridad y estado; due_date sirve al barrido de vencidos.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250223_01'
+down_revision = '20250222_01'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'mailbox_messages': (
+        ('idx_mailbox_msg_mailbox_created', ['mailbox_id', 'created_at', 'id']),
+        ('idx_mailbox_msg_mailbox_read', ['mailbox_id', 'is_read', 'created_at', 'id']),
+        ('idx_mailbox_msg_mailbox_priority', ['mailbox_id', 'priority', 'created_at', 'id']),
+        ('idx_mailbox_msg_mailbox_status', ['mailbox_id', 'message_status', 'created_at', 'id']),
+        ('idx_mailbox_msg_created', ['created_at', 'id']),
+        ('idx_mailbox_msg_due_date', ['due_date']),
+    ),
+    'company_to_admin_messages': (
+        ('idx_company_admin_msg_company_created', ['company_id', 'created_at', 'id']),
+        ('idx_company_admin_msg_read_created', ['is_read', 'created_at', 'id']),
+    ),
+}
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    for table, indexes in INDEXES.items():
+        if table not in tables:
+            continue
+        existing = {i['name'] for i in inspector.get_indexes(table)}
+        for name, columns in indexes:
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    for table, indexes in INDEXES.items():
+        if table not in tables:
+            continue
+        existing = {i['name'] for i in inspector.get_indexes(table)}
+        for name, _ in indexes:
+            if name in existing:
+                op.drop_index(name, table_name=table)
@@ -0,0 +1,43 @@
+"""make bank_transactions.fingerprint unique
+
+Revision ID: 20250224_01
+Revises: 20250223_01
+Create Date: 2026-02-24
+
+La huella incluye la cuenta bancaria, así que un índice único sobre
+fingerprint equivale a (cuenta bancaria, huella) y evita que dos importaciones
+en paralelo carguen el mismo movimiento. Los duplicados existentes conservan
+la huella solo en el movimiento más antiguo; los demás quedan sin huella.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20250224_01'
+down_revision = '20250223_01'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_bank_transactions_fingerprint'
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'bank_transactions' not in inspector.get_table_names():
+        return
+    op.execute(
+        "UPDATE bank_transactions SET fingerprint = NULL "
+        "WHERE fingerprint IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM bank_transactions WHERE fingerprint IS NOT NULL GROUP BY fingerprint)"
+    )
+    indexes = {i['name']: i for i in inspector.get_indexes('bank_transactions')}
+    if INDEX in indexes:
+        if indexes[INDEX].get('unique'):
+            return
+        op.drop_index(INDEX, table_name='bank_transactions')
+    op.create_index(INDEX, 'bank_transactions', ['fingerprint'], unique=True)
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name='bank_transactions')
+    op.create_index(INDEX, 'bank_transactions', ['fingerprint'])
@@ -29,6 +29,19 @@ class AplicarPagoIn(BaseModel):
     aplicaciones: List[AplicacionIn]
 
 
+class AplicacionMasivaItem(BaseModel):
+    """Documento de una aplicación masiva (sin monto se aplica su saldo pendiente)"""
+    documento_id: int
+    monto_aplicado: Optional[Decimal] = None
+
+
+class AplicarPagoMasivoIn(BaseModel):
+    """DTO para aplicar un cobro/pago a muchas facturas (lista explícita o FIFO)"""
+    movimiento_tesoreria_id: int
+    documentos: Optional[List[AplicacionMasivaItem]] = None  # None = FIFO por antigüedad
+    tercero_id: Optional[int] = None  # Cliente/proveedor para FIFO (por defecto el del movimiento)
+
+
 class AplicacionOut(BaseModel):
     """DTO para respuesta de aplicación"""
     id: int
@@ -107,6 +120,65 @@ async def aplicar_pago(
         uow.close()
 
 
+class AplicacionMasivaOut(BaseModel):
+    """Resultado de una aplicación masiva"""
+    aplicaciones: List[AplicacionOut]
+    total_aplicado: Decimal
+
+
+@router.post("/masiva", response_model=AplicacionMasivaOut)
+async def aplicar_pago_masivo(
+    payload: AplicarPagoMasivoIn,
+    company_id: int = Query(..., description="ID de la empresa"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Aplica un cobro/pago a muchas facturas en una sola operación.
+    
+    Modos:
+    - documentos: lista explícita (con o sin monto por documento)
+    - sin documentos: FIFO sobre las facturas abiertas del cliente/proveedor,
+      de la más antigua a la más reciente, hasta agotar el movimiento
+    """
+    uow = UnitOfWork(db)
+    try:
+        service = AplicacionPagosService(uow)
+        
+        aplicaciones_creadas = service.aplicar_pago_masivo(
+            movimiento_tesoreria_id=payload.movimiento_tesoreria_id,
+            company_id=company_id,
+            documentos=[d.model_dump() for d in payload.documentos] if payload.documentos is not None else None,
+            tercero_id=payload.tercero_id,
+            usuario_id=current_user.id if current_user else None
+        )
+        
+        uow.commit()
+        
+        return AplicacionMasivaOut(
+            aplicaciones=[
+                AplicacionOut(
+                    id=a.id,
+                    movimiento_tesoreria_id=a.movimiento_tesoreria_id,
+                    tipo_documento=a.tipo_documento,
+                    documento_id=a.documento_id,
+                    monto_aplicado=a.monto_aplicado,
+                    fecha=a.fecha.isoformat()
+                )
+                for a in aplicaciones_creadas
+            ],
+            total_aplicado=sum((Decimal(str(a.monto_aplicado)) for a in aplicaciones_creadas), Decimal("0"))
+        )
+    except AplicacionPagosError as e:
+        uow.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        uow.rollback()
+        raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
+    finally:
+        uow.close()
+
+
 @router.delete("/{aplicacion_id}")
 async def desaplicar_pago(
     aplicacion_id: int,
@@ -1,8 +1,8 @@
 """
 Router para conciliación bancaria
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
@@ -11,9 +11,26 @@ from decimal import Decimal
 import random
 
 from ...dependencies import get_db
-from ...domain.models import BankAccount, BankStatement, BankTransaction, BankReconciliation, Account, Period, User, JournalEntry, EntryLine
+from ...domain.models import BankAccount, BankStatement, BankTransaction, BankTransactionLine, BankReconciliation, Account, Period, User, JournalEntry, EntryLine
 from ...security.auth import get_current_user
 from ...domain.enums import UserRole
+from ...application.bank_matching import reconciled_entry_lines, suggest_bank_matches
+from ...application.bank_statement_import import import_bank_statement, insert_bank_transactions
+from ...infrastructure.excel_export import (
+    ESTILO_ENCABEZADO,
+    ESTILO_NEGRITA,
+    ESTILO_TITULO,
+    StreamingXlsx,
+    xlsx_file_response,
+)
+from ...application.bank_reconciliation_stats import (
+    apply_match_delta,
+    count_reconciled_lines,
+    mark_stale,
+    refresh_stats,
+    summary_stats,
+    verify_stats,
+)
 
 router = APIRouter(prefix="/bank-reconciliation", tags=["bank-reconciliation"])
 
@@ -62,6 +79,10 @@ class ReconciliationSummary(BaseModel):
     pending_debits: Decimal  # Cheques pendientes
     pending_credits: Decimal  # Depósitos en tránsito
     reconciled_balance: Decimal  # Saldo conciliado
+    book_lines: int = 0  # Líneas contables del período
+    unreconciled_lines: int = 0  # Líneas contables pendientes de conciliar
+    bank_transactions: int = 0  # Movimientos bancarios del período
+    unreconciled_transactions: int = 0  # Movimientos bancarios pendientes de conciliar
 
 class BankTransactionOut(BaseModel):
     id: int
@@ -98,13 +119,15 @@ class EntryLineOut(BaseModel):
 
 class MatchSuggestion(BaseModel):
     bank_transaction_id: int
-    entry_line_id: int
+    entry_line_id: int  # Primera línea (compatibilidad)
+    entry_line_ids: List[int] = []  # Todas las líneas del match (varias si es una suma)
     confidence: float  # 0.0 a 1.0
     reason: str  # Razón del match (monto, fecha, descripción)
 
 class MatchRequest(BaseModel):
     bank_transaction_id: int
     entry_line_id: int
+    entry_line_ids: Optional[List[int]] = None  # Match de un movimiento contra varias líneas
 
 class BulkMatchRequest(BaseModel):
     matches: List[MatchRequest]
@@ -220,19 +243,9 @@ async def upload_statement(
     db.add(statement)
     db.flush()
     
-    # Agregar transacciones
-    for tx in payload.transactions:
-        bank_tx = BankTransaction(
-            statement_id=statement.id,
-            transaction_date=tx.transaction_date,
-            description=tx.description,
-            reference=tx.reference,
-            debit=tx.debit,
-            credit=tx.credit,
-            balance=tx.balance,
-            reconciled=False
-        )
-        db.add(bank_tx)
+    # Agregar transacciones (INSERT por lotes, omitiendo las ya cargadas en la cuenta)
+    resultado = insert_bank_transactions(db, statement, (tx.model_dump() for tx in payload.transactions))
+    refresh_stats(db, bank_account, period)
     
     db.commit()
     db.refresh(statement)
@@ -240,7 +253,61 @@ async def upload_statement(
     return {
         "id": statement.id,
         "status": statement.status,
-        "transaction_count": len(payload.transactions)
+        "transaction_count": resultado["imported"],
+        "duplicates": resultado["duplicates"]
+    }
+
+@router.post("/import-statement", response_model=dict)
+def import_statement_file(
+    bank_account_id: int = Form(...),
+    period_id: int = Form(...),
+    statement_date: Optional[date] = Form(None),
+    opening_balance: Optional[Decimal] = Form(None),
+    closing_balance: Optional[Decimal] = Form(None),
+    file_format: Optional[str] = Form(None, description="CSV, XLSX, MT940 u OFX (por defecto se detecta)"),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Importa un extracto bancario desde archivo (CSV/TXT, XLSX, MT940 u OFX).
+    
+    El archivo se recorre en streaming, los movimientos se insertan por lotes
+    y los que ya existen en la cuenta se omiten. Saldos y fecha no indicados
+    se toman del archivo (MT940/OFX) o del último movimiento.
+    """
+    if current_user.role not in (UserRole.ADMINISTRADOR, UserRole.CONTADOR):
+        raise HTTPException(403, "No autorizado")
+    
+    bank_account = db.query(BankAccount).filter(BankAccount.id == bank_account_id).first()
+    if not bank_account:
+        raise HTTPException(404, "Cuenta bancaria no encontrada")
+    period = db.query(Period).filter(Period.id == period_id).first()
+    if not period:
+        raise HTTPException(404, "Período no encontrado")
+    
+    try:
+        resultado = import_bank_statement(
+            db, bank_account_id, period_id, current_user.id,
+            file.file, file.filename or "",
+            statement_date=statement_date,
+            opening_balance=opening_balance,
+            closing_balance=closing_balance,
+            fmt=file_format,
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(400, str(e))
+    refresh_stats(db, bank_account, period)
+    db.commit()
+    
+    return {
+        "id": resultado["statement_id"],
+        "status": "PENDIENTE" if resultado["statement_id"] else "SIN_CAMBIOS",
+        "format": resultado["format"],
+        "transaction_count": resultado["imported"],
+        "duplicates": resultado["duplicates"],
+        "skipped_rows": resultado["skipped"]
     }
 
 @router.get("/reconciliation-summary/{bank_account_id}")
@@ -255,32 +322,13 @@ def get_reconciliation_summary(
     if not bank_account:
         raise HTTPException(404, "Cuenta bancaria no encontrada")
     
-    # Calcular saldo contable (acumulado hasta el período)
-    from sqlalchemy import func
-    
     period = db.query(Period).filter(Period.id == period_id).first()
     if not period:
         raise HTTPException(404, "Período no encontrado")
     
-    # Obtener todos los períodos hasta el actual
-    all_periods = db.query(Period).filter(
-        Period.company_id == period.company_id
-    ).order_by(Period.year, Period.month).all()
-    
-    period_ids_list = [
-        p.id for p in all_periods
-        if (p.year < period.year) or (p.year == period.year and p.month <= period.month)
-    ]
-    
-    # Saldo contable = debe - haber para cuenta bancaria
-    book_balance_query = (
-        db.query(func.coalesce(func.sum(EntryLine.debit) - func.sum(EntryLine.credit), Decimal('0')))
-        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
-        .filter(EntryLine.account_id == bank_account.account_id)
-        .filter(JournalEntry.period_id.in_(period_ids_list))
-        .filter(JournalEntry.status == "POSTED")
-    )
-    book_balance = float(book_balance_query.scalar() or Decimal('0'))
+    # Saldo contable acumulado hasta el período y conteos (resumen incremental, sin escribir)
+    stats = summary_stats(db, bank_account, period)
+    book_balance = float(stats["book_balance"])
     
     # Obtener extracto bancario más reciente
     statement = db.query(BankStatement).filter(
@@ -310,7 +358,11 @@ def get_reconciliation_summary(
         bank_balance=Decimal(str(bank_balance)),
         pending_debits=Decimal(str(pending_debits)),
         pending_credits=Decimal(str(pending_credits)),
-        reconciled_balance=Decimal(str(reconciled_balance))
+        reconciled_balance=Decimal(str(reconciled_balance)),
+        book_lines=stats["book_lines"],
+        unreconciled_lines=stats["book_lines"] - stats["book_lines_reconciled"],
+        bank_transactions=stats["bank_transactions"],
+        unreconciled_transactions=stats["bank_transactions"] - stats["bank_transactions_reconciled"]
     )
 
 @router.get("/transactions/{bank_account_id}")
@@ -397,18 +449,11 @@ def get_unreconciled_entry_lines(
         .all()
     )
     
-    # Obtener IDs de líneas ya conciliadas
-    reconciled_line_ids = set(
-        db.query(BankTransaction.entry_line_id)
-        .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
-        .filter(BankStatement.bank_account_id == bank_account_id)
-        .filter(BankStatement.period_id == period_id)
-        .filter(BankTransaction.entry_line_id.isnot(None))
-        .filter(BankTransaction.reconciled == True)
-        .distinct()
-        .all()
-    )
-    reconciled_line_ids = {x[0] for x in reconciled_line_ids if x[0] is not None}
+    # Obtener IDs de líneas ya conciliadas (incluye matches de varias líneas)
+    reconciled_line_ids = {
+        x[0] for x in db.execute(reconciled_entry_lines(bank_account_id, period_id)).all()
+        if x[0] is not None
+    }
     
     result = []
     for line in entry_lines:
@@ -442,71 +487,27 @@ def get_auto_match_suggestions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Genera sugerencias automáticas de matching entre transacciones bancarias y líneas contables"""
-    
-    # Obtener transacciones no conciliadas
-    transactions = get_unreconciled_transactions(bank_account_id, period_id, db, current_user)
-    
-    # Obtener líneas contables no conciliadas
-    entry_lines = get_unreconciled_entry_lines(bank_account_id, period_id, db, current_user)
+    """
+    Genera sugerencias automáticas de matching entre transacciones bancarias y líneas contables
     
-    suggestions = []
+    Monto exacto por índice hash, monto cercano por búsqueda ordenada y un
+    movimiento contra varias líneas (suma exacta acotada). Ver application/bank_matching.py.
+    """
+    bank_account = db.query(BankAccount).filter(BankAccount.id == bank_account_id).first()
+    if not bank_account:
+        raise HTTPException(404, "Cuenta bancaria no encontrada")
     
-    for tx in transactions:
-        if tx.reconciled or tx.entry_line_id:
-            continue
-        
-        tx_amount = float(tx.debit) if tx.debit > 0 else float(tx.credit)
-        tx_date = tx.transaction_date
-        
-        best_match = None
-        best_confidence = 0.0
-        best_reason = ""
-        
-        for line in entry_lines:
-            if line.reconciled:
-                continue
-            
-            line_amount = float(line.debit) if line.debit > 0 else float(line.credit)
-            line_date = line.entry_date
-            
-            # Calcular confianza basada en monto y fecha
-            confidence = 0.0
-            reasons = []
-            
-            # Match por monto exacto (peso: 0.7)
-            if abs(tx_amount - line_amount) < 0.01:
-                confidence += 0.7
-                reasons.append("monto exacto")
-            
-            # Match por monto cercano (peso: 0.3)
-            elif abs(tx_amount - line_amount) / max(abs(tx_amount), 0.01) < 0.05:  # 5% de diferencia
-                confidence += 0.3
-                reasons.append("monto cercano")
-            
-            # Match por fecha cercana (peso: 0.2)
-            date_diff = abs((tx_date - line_date).days)
-            if date_diff <= 3:
-                confidence += 0.2
-                reasons.append(f"fecha cercana ({date_diff} días)")
-            elif date_diff <= 7:
-                confidence += 0.1
-                reasons.append(f"fecha similar ({date_diff} días)")
-            
-            if confidence > best_confidence:
-                best_match = line
-                best_confidence = confidence
-                best_reason = ", ".join(reasons) if reasons else "coincidencia débil"
-        
-        if best_match and best_confidence >= 0.5:  # Solo sugerir si confianza >= 50%
-            suggestions.append(MatchSuggestion(
-                bank_transaction_id=tx.id,
-                entry_line_id=best_match.id,
-                confidence=best_confidence,
-                reason=best_reason
-            ))
-    
-    return suggestions
+    proposals = suggest_bank_matches(db, bank_account_id, bank_account.account_id, period_id)
+    return [
+        MatchSuggestion(
+            bank_transaction_id=p.bank_transaction_id,
+            entry_line_id=p.entry_line_ids[0],
+            entry_line_ids=p.entry_line_ids,
+            confidence=p.confidence,
+            reason=p.reason
+        )
+        for p in proposals
+    ]
 
 @router.post("/match")
 def create_match(
@@ -526,14 +527,25 @@ def create_match(
     if bank_tx.reconciled:
         raise HTTPException(400, "La transacción ya está conciliada")
     
-    # Verificar línea contable
-    entry_line = db.query(EntryLine).filter(EntryLine.id == payload.entry_line_id).first()
-    if not entry_line:
+    # Verificar líneas contables (una, o varias si el movimiento agrupa varios asientos)
+    line_ids = list(dict.fromkeys(payload.entry_line_ids or [payload.entry_line_id]))
+    entry_lines = db.query(EntryLine).filter(EntryLine.id.in_(line_ids)).all()
+    if len(entry_lines) != len(line_ids):
         raise HTTPException(404, "Línea contable no encontrada")
+    # Conciliadas 1:1 (BankTransaction.entry_line_id) o dentro de un match de varias líneas
+    statement = bank_tx.statement
+    ya_conciliada = db.execute(
+        select(EntryLine.id).where(
+            EntryLine.id.in_(line_ids),
+            EntryLine.id.in_(reconciled_entry_lines(statement.bank_account_id, statement.period_id)),
+        ).limit(1)
+    ).first()
+    if ya_conciliada:
+        raise HTTPException(400, "La línea ya está conciliada" if len(line_ids) == 1 else "Alguna de las líneas ya está conciliada")
     
     # Verificar que el monto coincida (aproximadamente)
     tx_amount = float(bank_tx.debit) if bank_tx.debit > 0 else float(bank_tx.credit)
-    line_amount = float(entry_line.debit) if entry_line.debit > 0 else float(entry_line.credit)
+    line_amount = sum(float(l.debit) if l.debit > 0 else float(l.credit) for l in entry_lines)
     amount_diff = abs(tx_amount - line_amount)
     
     # Permitir conciliación aunque los montos no coincidan exactamente (puede haber diferencias por redondeo o ajustes)
@@ -544,14 +556,25 @@ def create_match(
         logger = logging.getLogger(__name__)
         logger.warning(
             f"Conciliación con diferencia de montos: "
-            f"Transacción {bank_tx.id} (${tx_amount:.2f}) vs Línea {entry_line.id} (${line_amount:.2f}), "
+            f"Transacción {bank_tx.id} (${tx_amount:.2f}) vs Línea(s) {line_ids} (${line_amount:.2f}), "
             f"Diferencia: ${amount_diff:.2f}"
         )
     
     # Actualizar transacción
-    bank_tx.entry_line_id = payload.entry_line_id
+    conciliadas_antes = count_reconciled_lines(db, statement.bank_account_id, statement.period_id, line_ids)
+    bank_tx.entry_line_id = line_ids[0]
     bank_tx.reconciled = True
+    if len(line_ids) > 1:
+        db.add_all([BankTransactionLine(bank_transaction_id=bank_tx.id, entry_line_id=i) for i in line_ids])
+    db.flush()
     
+    # Resumen de conciliación: +1 movimiento y las líneas que pasan a conciliadas
+    apply_match_delta(
+        db, statement.bank_account_id, statement.period_id, 1,
+        count_reconciled_lines(db, statement.bank_account_id, statement.period_id, line_ids) - conciliadas_antes
+    )
+    # Los períodos marcados se recuentan aquí: el GET del resumen no escribe
+    refresh_stats(db, statement.bank_account, statement.period)
     db.commit()
     
     return {"success": True, "message": "Match creado exitosamente"}
@@ -601,9 +624,23 @@ def remove_match(
         raise HTTPException(400, "La transacción no está conciliada")
     
     # Deshacer conciliación
+    statement = bank_tx.statement
+    line_ids = [
+        x[0] for x in db.query(BankTransactionLine.entry_line_id)
+        .filter(BankTransactionLine.bank_transaction_id == bank_tx.id).all()
+    ] or ([bank_tx.entry_line_id] if bank_tx.entry_line_id else [])
+    conciliadas_antes = count_reconciled_lines(db, statement.bank_account_id, statement.period_id, line_ids)
+    db.query(BankTransactionLine).filter(BankTransactionLine.bank_transaction_id == bank_tx.id).delete()
     bank_tx.entry_line_id = None
     bank_tx.reconciled = False
+    db.flush()
     
+    # Resumen de conciliación: -1 movimiento y las líneas que dejan de estar conciliadas
+    apply_match_delta(
+        db, statement.bank_account_id, statement.period_id, -1,
+        count_reconciled_lines(db, statement.bank_account_id, statement.period_id, line_ids) - conciliadas_antes
+    )
+    refresh_stats(db, statement.bank_account, statement.period)
     db.commit()
     
     return {"success": True, "message": "Conciliación revertida exitosamente"}
@@ -626,6 +663,7 @@ class ReconciledMatchOut(BaseModel):
     entry_type: str  # "debit" o "credit"
     amount_difference: float
     entry_number: str | None = None
+    entry_line_ids: List[int] = []  # Todas las líneas si el match es de varias líneas
     
     class Config:
         from_attributes = True
@@ -661,10 +699,26 @@ def list_reconciled_matches(
     
     results = query.order_by(BankTransaction.transaction_date.desc()).all()
     
+    # Matches de varias líneas: ids y monto total por transacción (una consulta)
+    multi_lines = {}
+    if results:
+        rows = (
+            db.query(BankTransactionLine.bank_transaction_id, EntryLine.id, EntryLine.debit, EntryLine.credit)
+            .join(EntryLine, EntryLine.id == BankTransactionLine.entry_line_id)
+            .filter(BankTransactionLine.bank_transaction_id.in_([r[0].id for r in results]))
+            .all()
+        )
+        for tx_id, line_id, debit, credit in rows:
+            ids, total = multi_lines.get(tx_id, ([], 0.0))
+            ids.append(line_id)
+            multi_lines[tx_id] = (ids, total + (float(debit) if debit > 0 else float(credit)))
+    
     matches = []
     for bank_tx, entry_line, journal_entry in results:
         tx_amount = float(bank_tx.debit) if bank_tx.debit > 0 else float(bank_tx.credit)
-        line_amount = float(entry_line.debit) if entry_line.debit > 0 else float(entry_line.credit)
+        line_ids, line_amount = multi_lines.get(bank_tx.id) or (
+            [entry_line.id], float(entry_line.debit) if entry_line.debit > 0 else float(entry_line.credit)
+        )
         amount_diff = abs(tx_amount - line_amount)
         
         matches.append(ReconciledMatchOut(
@@ -681,7 +735,8 @@ def list_reconciled_matches(
             entry_amount=line_amount,
             entry_type="debit" if entry_line.debit > 0 else "credit",
             amount_difference=amount_diff,
-            entry_number=f"{journal_entry.id:06d}" if journal_entry else None
+            entry_number=f"{journal_entry.id:06d}" if journal_entry else None,
+            entry_line_ids=line_ids
         ))
     
     return matches
@@ -792,47 +847,14 @@ def finalize_reconciliation(
         BankStatement.period_id == period_id
     ).order_by(BankStatement.statement_date.desc()).first()
     
-    # Calcular saldo contable
-    from sqlalchemy import func
-    
-    all_periods = db.query(Period).filter(
-        Period.company_id == period.company_id
-    ).order_by(Period.year, Period.month).all()
-    
-    period_ids_list = [
-        p.id for p in all_periods
-        if (p.year < period.year) or (p.year == period.year and p.month <= period.month)
-    ]
-    
-    book_balance_query = (
-        db.query(func.coalesce(func.sum(EntryLine.debit) - func.sum(EntryLine.credit), Decimal('0')))
-        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
-        .filter(EntryLine.account_id == bank_account.account_id)
-        .filter(JournalEntry.period_id.in_(period_ids_list))
-        .filter(JournalEntry.status == "POSTED")
-    )
-    book_balance = float(book_balance_query.scalar() or Decimal('0'))
+    # Saldo contable y líneas pendientes: el resumen incremental, verificado
+    # contra un recuento del propio período
+    stats = verify_stats(db, bank_account, period)
+    book_balance = float(stats.book_balance)
     
     bank_balance = float(statement.closing_balance) if statement else 0.0
     
-    # Validar que no haya líneas contables sin conciliar (opcional pero recomendado)
-    # Obtener líneas contables del período que no están conciliadas
-    unreconciled_lines = (
-        db.query(EntryLine)
-        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
-        .filter(EntryLine.account_id == bank_account.account_id)
-        .filter(JournalEntry.period_id == period_id)
-        .filter(JournalEntry.status == "POSTED")
-        .filter(~EntryLine.id.in_(
-            db.query(BankTransaction.entry_line_id)
-            .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
-            .filter(BankStatement.bank_account_id == bank_account_id)
-            .filter(BankStatement.period_id == period_id)
-            .filter(BankTransaction.entry_line_id.isnot(None))
-            .filter(BankTransaction.reconciled == True)
-        ))
-        .count()
-    )
+    unreconciled_lines = stats.book_lines - stats.book_lines_reconciled
     
     # Advertencia si hay líneas sin conciliar (pero permitir finalizar)
     if unreconciled_lines > 0:
@@ -1089,6 +1111,7 @@ def generate_test_data(
             )
         db.add(bank_tx)
     
+    mark_stale(db, [(bank_account_id, period_id)])
     db.commit()
     db.refresh(statement)
     
@@ -1128,108 +1151,99 @@ def export_reconciliation_excel(
     account = db.query(Account).filter(Account.id == bank_account.account_id).first()
     summary = get_reconciliation_summary(bank_account_id, period_id, db, current_user)
 
-    # Obtener matches conciliados
-    matches = list_reconciled_matches(bank_account_id, period_id, db, current_user)
+    # Matches de varias líneas: monto total por transacción, unido en la misma consulta
+    multi = (
+        select(
+            BankTransactionLine.bank_transaction_id.label("tx_id"),
+            func.sum(case((EntryLine.debit > 0, EntryLine.debit), else_=EntryLine.credit)).label("total"),
+        )
+        .join(EntryLine, EntryLine.id == BankTransactionLine.entry_line_id)
+        .group_by(BankTransactionLine.bank_transaction_id)
+        .subquery()
+    )
+    conciliadas = (
+        select(
+            BankTransaction.transaction_date, BankTransaction.description, BankTransaction.debit, BankTransaction.credit,
+            JournalEntry.date, JournalEntry.glosa, EntryLine.debit, EntryLine.credit, multi.c.total,
+        )
+        .join(EntryLine, BankTransaction.entry_line_id == EntryLine.id)
+        .join(JournalEntry, EntryLine.entry_id == JournalEntry.id)
+        .join(BankStatement, BankTransaction.statement_id == BankStatement.id)
+        .outerjoin(multi, multi.c.tx_id == BankTransaction.id)
+        .where(
+            BankStatement.bank_account_id == bank_account_id,
+            BankStatement.period_id == period_id,
+            BankTransaction.reconciled == True,
+        )
+        .order_by(BankTransaction.transaction_date.desc(), BankTransaction.id)
+        .execution_options(yield_per=5000)
+    )
 
-    # Obtener transacciones no conciliadas
-    transactions = get_unreconciled_transactions(bank_account_id, period_id, db, current_user)
+    # Transacciones no conciliadas del extracto más reciente del período
+    statement_id = db.execute(
+        select(BankStatement.id)
+        .where(BankStatement.bank_account_id == bank_account_id, BankStatement.period_id == period_id)
+        .order_by(BankStatement.statement_date.desc())
+        .limit(1)
+    ).scalar()
+    pendientes = (
+        select(
+            BankTransaction.transaction_date, BankTransaction.description, BankTransaction.reference,
+            BankTransaction.debit, BankTransaction.credit, BankTransaction.balance,
+        )
+        .where(BankTransaction.statement_id == statement_id, BankTransaction.reconciled == False)
+        .order_by(BankTransaction.transaction_date, BankTransaction.id)
+        .execution_options(yield_per=5000)
+    )
 
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from io import BytesIO
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Conciliación"
-
-        header_font = Font(bold=True)
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font_white = Font(bold=True, color="FFFFFF")
+        xlsx = StreamingXlsx(header_color="4472C4")
+        xlsx.add_sheet("Conciliación")
 
         # Título
-        ws.merge_cells("A1:F1")
-        ws["A1"] = f"Reporte de Conciliación Bancaria - {bank_account.bank_name} {bank_account.account_number}"
-        ws["A1"].font = Font(bold=True, size=14)
-        ws["A2"] = f"Período: {period.year}-{period.month:02d}"
-        ws["A3"] = f"Cuenta contable: {account.code if account else '-'} {account.name if account else ''}"
+        xlsx.append([f"Reporte de Conciliación Bancaria - {bank_account.bank_name} {bank_account.account_number}"],
+                    style=ESTILO_TITULO, merge_to=6)
+        xlsx.append([f"Período: {period.year}-{period.month:02d}"])
+        xlsx.append([f"Cuenta contable: {account.code if account else '-'} {account.name if account else ''}"])
+        xlsx.append([])
 
         # Resumen
-        row = 5
-        ws[f"A{row}"] = "RESUMEN"
-        ws[f"A{row}"].font = header_font
-        row += 1
-        ws[f"A{row}"] = "Saldo según contabilidad"
-        ws[f"B{row}"] = float(summary.book_balance)
-        row += 1
-        ws[f"A{row}"] = "Saldo según banco"
-        ws[f"B{row}"] = float(summary.bank_balance)
-        row += 1
-        ws[f"A{row}"] = "Cheques pendientes"
-        ws[f"B{row}"] = float(summary.pending_debits)
-        row += 1
-        ws[f"A{row}"] = "Depósitos en tránsito"
-        ws[f"B{row}"] = float(summary.pending_credits)
-        row += 1
-        ws[f"A{row}"] = "Saldo conciliado"
-        ws[f"B{row}"] = float(summary.reconciled_balance)
-        row += 2
+        xlsx.append(["RESUMEN"], style=ESTILO_NEGRITA)
+        for etiqueta, valor in (
+            ("Saldo según contabilidad", summary.book_balance),
+            ("Saldo según banco", summary.bank_balance),
+            ("Cheques pendientes", summary.pending_debits),
+            ("Depósitos en tránsito", summary.pending_credits),
+            ("Saldo conciliado", summary.reconciled_balance),
+        ):
+            xlsx.append([etiqueta, float(valor)])
+        xlsx.append([])
 
         # Transacciones conciliadas
-        ws[f"A{row}"] = "TRANSACCIONES CONCILIADAS"
-        ws[f"A{row}"].font = header_font
-        row += 1
-        headers = ["Fecha TX", "Descripción", "Monto TX", "Fecha Asiento", "Glosa", "Monto Asiento", "Diferencia"]
-        for col, h in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=h)
-            cell.font = header_font_white
-            cell.fill = header_fill
-        row += 1
-        for m in matches:
-            ws.cell(row=row, column=1, value=m.transaction_date.isoformat())
-            ws.cell(row=row, column=2, value=m.transaction_description or "")
-            ws.cell(row=row, column=3, value=m.transaction_amount)
-            ws.cell(row=row, column=4, value=m.entry_date.isoformat())
-            ws.cell(row=row, column=5, value=m.entry_glosa or "")
-            ws.cell(row=row, column=6, value=m.entry_amount)
-            ws.cell(row=row, column=7, value=m.amount_difference)
-            row += 1
-        row += 1
+        xlsx.append(["TRANSACCIONES CONCILIADAS"], style=ESTILO_NEGRITA)
+        xlsx.append(["Fecha TX", "Descripción", "Monto TX", "Fecha Asiento", "Glosa", "Monto Asiento", "Diferencia"],
+                    style=ESTILO_ENCABEZADO)
+        for tx_fecha, descripcion, tx_debe, tx_haber, fecha, glosa, debe, haber, total in db.execute(conciliadas):
+            tx_amount = float(tx_debe) if tx_debe > 0 else float(tx_haber)
+            line_amount = float(total) if total is not None else (float(debe) if debe > 0 else float(haber))
+            xlsx.append([
+                tx_fecha.isoformat(), descripcion or "", tx_amount,
+                fecha.isoformat(), glosa or "", line_amount, abs(tx_amount - line_amount),
+            ])
+        xlsx.append([])
 
         # Transacciones pendientes
-        if transactions:
-            ws[f"A{row}"] = "TRANSACCIONES PENDIENTES DE CONCILIAR"
-            ws[f"A{row}"].font = header_font
-            row += 1
-            headers2 = ["Fecha", "Descripción", "Referencia", "Débito", "Crédito", "Saldo"]
-            for col, h in enumerate(headers2, 1):
-                cell = ws.cell(row=row, column=col, value=h)
-                cell.font = header_font_white
-                cell.fill = header_fill
-            row += 1
-            for tx in transactions:
-                ws.cell(row=row, column=1, value=tx.transaction_date.isoformat())
-                ws.cell(row=row, column=2, value=tx.description or "")
-                ws.cell(row=row, column=3, value=tx.reference or "")
-                ws.cell(row=row, column=4, value=float(tx.debit))
-                ws.cell(row=row, column=5, value=float(tx.credit))
-                ws.cell(row=row, column=6, value=float(tx.balance))
-                row += 1
+        encabezado = False
+        for tx_fecha, descripcion, referencia, debe, haber, saldo in (db.execute(pendientes) if statement_id else ()):
+            if not encabezado:
+                xlsx.append(["TRANSACCIONES PENDIENTES DE CONCILIAR"], style=ESTILO_NEGRITA)
+                xlsx.append(["Fecha", "Descripción", "Referencia", "Débito", "Crédito", "Saldo"], style=ESTILO_ENCABEZADO)
+                encabezado = True
+            xlsx.append([tx_fecha.isoformat(), descripcion or "", referencia or "", float(debe), float(haber), float(saldo)])
 
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        buffer_content = buffer.getvalue()
+        path = xlsx.save(prefix="conciliacion_")
         filename = f"conciliacion_{bank_account.bank_name.replace(' ', '_')}_{period.year}{period.month:02d}.xlsx"
-
-        return Response(
-            content=buffer_content,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "Content-Length": str(len(buffer_content))
-            }
-        )
+        return xlsx_file_response(path, filename)
     except Exception as e:
         import logging
         logging.getLogger(__name__).error(f"Error exportando conciliación: {e}", exc_info=True)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from datetime import date
 from decimal import Decimal
@@ -14,6 +15,9 @@ from ...application.services_payments import registrar_pago_compra, obtener_sald
 from ...domain.models_ext import Purchase
 from ...domain.models import JournalEntry, EntryLine
 from ...application.dtos import JournalEntryIn, EntryLineIn
+from ...application.cpe_ingestion import import_cpe_zip
+from ...infrastructure.uploads import UploadTooLarge, stage_upload, staging_dir
+from ...config import settings
 
 router = APIRouter(prefix="/compras", tags=["compras"])
 
@@ -131,6 +135,43 @@ def post_compra(
         uow.close()
 
 
+@router.post("/importar-xml")
+async def importar_compras_xml(
+    company_id: int = Query(..., description="ID de la empresa"),
+    create_suppliers: bool = Query(True, description="Crear los proveedores que no existan"),
+    file: UploadFile = File(..., description="ZIP con comprobantes XML UBL 2.1"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Importa un ZIP de facturas/boletas electrónicas de proveedores (XML UBL 2.1).
+
+    Por cada XML crea la compra con sus líneas, su asiento (motor, por lotes)
+    y guarda el XML como documento vinculado. Omite los ya registrados y
+    reporta por archivo los que no se pudieron leer o registrar.
+    """
+    from .documents import get_documents_storage_service
+
+    staged = None
+    try:
+        staged = await stage_upload(
+            file, max_bytes=settings.cpe_import_max_zip_mb * 1024 * 1024, tmp_dir=staging_dir()
+        )
+        # Miles de XML: fuera del event loop
+        result = await run_in_threadpool(
+            import_cpe_zip, db, get_documents_storage_service(), staged.path,
+            company_id, current_user.id, create_suppliers=create_suppliers,
+        )
+        return result.to_dict()
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if staged:
+            staged.discard()
+
+
 @router.get("", response_model=List[CompraOut])
 def list_compras(
     company_id: int = Query(..., description="ID de la empresa"),
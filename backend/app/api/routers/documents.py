@@ -2,8 +2,8 @@
 API de Gestión de Documentos
 Endpoints para upload, download, búsqueda y gestión de documentos
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, Header
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime
@@ -13,8 +13,14 @@ from pathlib import Path
 from ...dependencies import get_db
 from ...security.auth import get_current_user
 from ...domain.models import User
-from ...application.services_documents_v2 import DocumentService
+from ...application.services_documents_v2 import DocumentService, MAX_DOCUMENT_SIZE
+from ...application.document_jobs import FAILED, JOB_RENDITIONS
+from ...domain.models_documents_v2 import DocumentProcessingJob
 from ...infrastructure.storage import get_storage_service
+from ...infrastructure.uploads import UploadTooLarge, stage_upload, staging_dir
+from ...infrastructure.renditions import (
+    RENDITION_MEDIA_TYPE, RENDITION_MIME_TYPES, RENDITION_SIZES, rendition_etag, rendition_path,
+)
 from ...config import settings
 
 router = APIRouter(prefix="/documents", tags=["documents"])
@@ -52,11 +58,18 @@ def search_documents(
     date_to: Optional[str] = Query(None, description="Fecha hasta (YYYY-MM-DD)"),
     tags: Optional[str] = Query(None, description="Tags separados por coma"),
     limit: int = Query(50, le=100, description="Límite de resultados"),
-    offset: int = Query(0, ge=0, description="Offset para paginación"),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Búsqueda avanzada de documentos"""
+    """
+    Búsqueda full-text de documentos (título, descripción, archivo, OCR y
+    RUC/serie/número extraídos), ordenada por relevancia.
+    
+    Paginación por keyset: pasar next_cursor para la página siguiente. Si
+    total_is_estimate es true, total es una estimación.
+    """
     try:
         storage_service = get_documents_storage_service()
         document_service = DocumentService(db, storage_service)
@@ -85,8 +98,8 @@ def search_documents(
                 except ValueError:
                     pass
         
-        documents, total = document_service.search_documents(
-            company_id=company_id,
+        page = document_service.search_documents_page(
+            company_id,
             query=query,
             document_type=document_type,
             related_entity_type=related_entity_type,
@@ -95,6 +108,7 @@ def search_documents(
             date_to=date_to_parsed,
             tags=tag_list,
             limit=limit,
+            cursor=cursor,
             offset=offset
         )
         
@@ -114,12 +128,16 @@ def search_documents(
                 "related_entity_id": doc.related_entity_id,
                 "is_duplicate": doc.is_duplicate,
                 "duplicate_of": doc.duplicate_of
-            } for doc in documents],
-            "total": total,
+            } for doc in page.items],
+            "total": page.total,
+            "total_is_estimate": page.total_is_estimate,
+            "next_cursor": page.next_cursor,
             "limit": limit,
             "offset": offset
         }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -147,8 +165,10 @@ async def upload_document(
     ⚡ Upload rápido: El archivo se guarda inmediatamente.
     📊 Extracción/OCR: Se ejecutan en background si se habilitan.
     """
+    staged = None
     try:
-        content = await file.read()
+        # Copia por bloques a un temporal (hash y límite de tamaño sobre la marcha)
+        staged = await stage_upload(file, max_bytes=MAX_DOCUMENT_SIZE, tmp_dir=staging_dir())
         
         storage_service = get_documents_storage_service()
         
@@ -157,9 +177,9 @@ async def upload_document(
         document, duplicate_warning = document_service.upload_document(
             company_id=company_id,
             user_id=current_user.id,
-            file_content=content,
-            filename=file.filename or "sin_nombre",
-            mime_type=file.content_type or "application/octet-stream",
+            file_content=staged,
+            filename=staged.filename,
+            mime_type=staged.content_type,
             document_type=document_type,
             related_entity_type=related_entity_type,
             related_entity_id=related_entity_id,
@@ -190,10 +210,15 @@ async def upload_document(
         
         return response
     
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al subir documento: {str(e)}")
+    finally:
+        if staged:
+            staged.discard()
 
 
 @router.get("/{document_id}")
@@ -296,16 +321,30 @@ def download_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Contenido direccionado por hash: el archivo de un documento y sus rendiciones no cambian
+CACHE_CONTROL_INMUTABLE = "private, max-age=31536000, immutable"
+
+
+def _etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match del navegador contra el ETag (admite lista y comodín)"""
+    if not if_none_match:
+        return False
+    candidatos = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    return "*" in candidatos or etag in candidatos
+
+
 @router.get("/{document_id}/preview")
 def preview_document(
     document_id: int,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Vista previa de un documento (para PDFs) - STREAMING OPTIMIZADO.
     
-    Usa FileResponse para streaming real desde disco.
+    Usa FileResponse para streaming real desde disco. Con ETag (hash del
+    contenido): una vista repetida responde 304 sin leer el archivo.
     """
     try:
         storage_service = get_documents_storage_service()
@@ -316,6 +355,11 @@ def preview_document(
         if document.mime_type != 'application/pdf':
             raise HTTPException(status_code=400, detail="Solo se pueden previsualizar PDFs")
         
+        etag = f'"{document.file_hash}"'
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL_INMUTABLE}
+        if _etag_coincide(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        
         # Obtener ruta completa del archivo
         file_path = storage_service.get_full_path(document.file_path)
         
@@ -332,7 +376,8 @@ def preview_document(
             media_type='application/pdf',
             filename=document.original_filename,
             headers={
-                "Content-Disposition": f'inline; filename="{document.original_filename}"'
+                "Content-Disposition": f'inline; filename="{document.original_filename}"',
+                **headers
             }
         )
     
@@ -344,6 +389,61 @@ def preview_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/{document_id}/thumbnail")
+def document_thumbnail(
+    document_id: int,
+    size: str = Query("thumbnail", description="thumbnail (256px) o preview (1200px)"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Miniatura o vista previa (JPEG de la primera página) de un documento.
+    
+    Se generan una vez en la cola de documentos y se sirven como archivo
+    estático con ETag y Cache-Control immutable. Si aún no existe, se encola
+    su generación y responde 202 (reintentar tras Retry-After).
+    """
+    if size not in RENDITION_SIZES:
+        raise HTTPException(status_code=400, detail=f"Tamaño no válido. Opciones: {', '.join(RENDITION_SIZES)}")
+    try:
+        storage_service = get_documents_storage_service()
+        document_service = DocumentService(db, storage_service)
+        document = document_service.get_document(document_id, current_user.id, log_access=False)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    if document.mime_type not in RENDITION_MIME_TYPES:
+        raise HTTPException(status_code=404, detail="Sin vista previa para este tipo de archivo")
+    
+    ancho = RENDITION_SIZES[size]
+    etag = rendition_etag(document.file_hash, ancho)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL_INMUTABLE}
+    if _etag_coincide(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    path = storage_service.get_full_path(rendition_path(document.file_hash, ancho))
+    if path.exists():
+        return FileResponse(path=str(path), media_type=RENDITION_MEDIA_TYPE, headers=headers)
+    
+    fallido = db.query(DocumentProcessingJob).filter(
+        DocumentProcessingJob.document_id == document.id,
+        DocumentProcessingJob.job_type == JOB_RENDITIONS,
+        DocumentProcessingJob.status == FAILED,
+    ).first()
+    if fallido:
+        # PDF dañado: no se vuelve a encolar en cada vista
+        raise HTTPException(status_code=404, detail=f"No se pudo generar la vista previa: {fallido.error_message}")
+    
+    jobs = document_service.schedule_processing(document, False, False, enable_renditions=True)
+    db.commit()
+    return JSONResponse(
+        status_code=202,
+        content={"status": jobs[0].status if jobs else "PENDING"},
+        headers={"Retry-After": "5", "Cache-Control": "no-store"},
+    )
+
+
 @router.delete("/{document_id}")
 def delete_document(
     document_id: int,
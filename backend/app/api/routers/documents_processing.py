@@ -2,18 +2,43 @@
 Endpoints para procesamiento asíncrono de documentos
 OCR y extracción de metadatos on-demand
 """
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from ...dependencies import get_db
 from ...security.auth import get_current_user
 from ...domain.models import User
+from ...application.document_jobs import queue_stats
 from ...application.services_documents_v2 import DocumentService
 from ...infrastructure.storage import get_storage_service
 
 router = APIRouter(prefix="/documents", tags=["documents-processing"])
 
 
+@router.get("/processing/queue")
+def get_processing_queue(
+    company_id: Optional[int] = Query(None, description="Filtrar por empresa (todas si se omite; solo admin)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Métricas de la cola de procesamiento: trabajos pendientes/en proceso por
+    tipo, antigüedad del pendiente más viejo y rendimiento reciente.
+
+    La vista global (sin company_id) es solo para administradores; el resto
+    debe indicar una empresa a la que pertenece.
+    """
+    es_admin = current_user.is_admin or getattr(current_user, "role", None) == "ADMINISTRADOR"
+    if not es_admin:
+        if company_id is None:
+            raise HTTPException(status_code=403, detail="Indique company_id: la cola global es solo para administradores")
+        if company_id not in [c.id for c in current_user.companies]:
+            raise HTTPException(status_code=403, detail="No autorizado para esta empresa")
+    return queue_stats(db, company_id)
+
+
 @router.post("/{document_id}/extract")
 def extract_document_data(
     document_id: int,
@@ -23,8 +48,8 @@ def extract_document_data(
     """
     Extrae metadatos de un documento de forma asíncrona.
     
-    Este endpoint inicia el proceso de extracción en background.
-    Retorna inmediatamente con el estado del proceso.
+    Este endpoint encola la extracción (la ejecuta el worker de documentos).
+    Retorna inmediatamente con el estado del trabajo.
     """
     try:
         storage_service = get_storage_service()
@@ -33,13 +58,15 @@ def extract_document_data(
         # Verificar permisos
         document = document_service.get_document(document_id, current_user.id)
         
-        # Iniciar extracción en background
-        document_service._schedule_async_processing(document_id, enable_extraction=True, enable_ocr=False)
+        # Encolar extracción
+        jobs = document_service.schedule_processing(document, enable_extraction=True, enable_ocr=False)
+        db.commit()
         
         return {
-            "message": "Extracción iniciada en background",
+            "message": "Extracción encolada",
             "document_id": document_id,
-            "status": "PROCESSING"
+            "job_id": jobs[0].id,
+            "status": jobs[0].status
         }
     
     except ValueError as e:
@@ -58,7 +85,7 @@ def run_ocr(
     Ejecuta OCR en un documento PDF de forma asíncrona.
     
     ⚠️ OCR es costoso en CPU/RAM. Solo ejecutar cuando sea necesario.
-    Este endpoint inicia el proceso en background.
+    Este endpoint encola el OCR (la cola lo atiende después de las extracciones).
     """
     try:
         storage_service = get_storage_service()
@@ -70,13 +97,15 @@ def run_ocr(
         if document.mime_type != 'application/pdf':
             raise HTTPException(status_code=400, detail="OCR solo disponible para PDFs")
         
-        # Iniciar OCR en background
-        document_service._schedule_async_processing(document_id, enable_extraction=False, enable_ocr=True)
+        # Encolar OCR
+        jobs = document_service.schedule_processing(document, enable_extraction=False, enable_ocr=True)
+        db.commit()
         
         return {
-            "message": "OCR iniciado en background",
+            "message": "OCR encolado",
             "document_id": document_id,
-            "status": "PROCESSING",
+            "job_id": jobs[0].id,
+            "status": jobs[0].status,
             "warning": "El proceso puede tardar varios minutos dependiendo del tamaño del PDF"
         }
     
@@ -107,6 +136,20 @@ def get_processing_status(
         
         status = {
             "document_id": document_id,
+            "processing_status": document.processing_status,
+            "processing_progress": document.processing_progress or 0,
+            "processing_error": document.processing_error,
+            "jobs": [
+                {
+                    "id": job.id,
+                    "type": job.job_type,
+                    "status": job.status,
+                    "attempts": job.attempts,
+                    "next_run_at": job.next_run_at.isoformat() if job.status == "PENDING" else None,
+                    "error": job.error_message
+                }
+                for job in sorted(document.processing_jobs, key=lambda j: j.id)
+            ],
             "extraction": None,
             "ocr": None
         }
@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import Response
 from sqlalchemy.orm import Session, joinedload
 from datetime import date
-from io import BytesIO
 import csv
+import os
 from ...dependencies import get_db
 from ...application.dtos import JournalEntryIn, JournalEntryOut, JournalEntryDetailOut, EntryLineOut
 from ...domain.models import JournalEntry, EntryLine, Account, Period, User
@@ -838,65 +838,40 @@ def export_entries_excel(
     
     try:
         logger.info(f"Exportando Excel - company_id={company_id}, period_id={period_id}, account_code={account_code}")
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
+        from sqlalchemy import select
+        from ...infrastructure.excel_export import (
+            ESTILO_ENCABEZADO, ESTILO_MONTO, ESTILO_NEGRITA, ESTILO_TITULO_CENTRADO, ESTILO_TOTAL, ESTILO_TOTAL_MONTO,
+            StreamingXlsx, xlsx_file_response,
+        )
         
-        # Obtener entradas (misma lógica que list_entries) con relaciones cargadas
-        # Primero filtrar por account_code si es necesario para obtener los IDs
-        entry_ids = None
+        # Líneas a exportar (misma lógica que list_entries): una sola consulta con
+        # columnas planas leída por bloques (yield_per), sin cargar asientos en memoria
+        stmt = (
+            select(
+                JournalEntry.date, JournalEntry.glosa, JournalEntry.status,
+                Account.code, Account.name, EntryLine.debit, EntryLine.credit,
+            )
+            .join(EntryLine, EntryLine.entry_id == JournalEntry.id)
+            .join(Account, Account.id == EntryLine.account_id)
+            .where(JournalEntry.company_id == company_id)
+        )
         if account_code:
-            subquery = db.query(JournalEntry.id).join(EntryLine).join(Account).filter(
-                JournalEntry.company_id == company_id,
-                Account.code == account_code
-            ).distinct()
-            entry_ids = [row[0] for row in subquery.all()]
-            if not entry_ids:
-                raise HTTPException(status_code=404, detail="No hay asientos para exportar con los filtros seleccionados")
-        
-        # Construir query principal con joinedload
-        query = db.query(JournalEntry).options(
-            joinedload(JournalEntry.lines)
-        ).filter(JournalEntry.company_id == company_id)
-        
-        if entry_ids:
-            query = query.filter(JournalEntry.id.in_(entry_ids))
+            stmt = stmt.where(JournalEntry.id.in_(
+                select(EntryLine.entry_id).join(Account, Account.id == EntryLine.account_id)
+                .where(Account.code == account_code)
+            ))
         if period_id:
-            query = query.filter(JournalEntry.period_id == period_id)
+            stmt = stmt.where(JournalEntry.period_id == period_id)
         if date_from:
-            query = query.filter(JournalEntry.date >= date_from)
+            stmt = stmt.where(JournalEntry.date >= date_from)
         if date_to:
-            query = query.filter(JournalEntry.date <= date_to)
+            stmt = stmt.where(JournalEntry.date <= date_to)
         if status:
-            query = query.filter(JournalEntry.status == status)
-        
-        entries = query.order_by(JournalEntry.date, JournalEntry.id).all()
+            stmt = stmt.where(JournalEntry.status == status)
         
-        if not entries:
+        if db.execute(stmt.limit(1)).first() is None:
             raise HTTPException(status_code=404, detail="No hay asientos para exportar con los filtros seleccionados")
         
-        # Verificar que hay datos para exportar
-        has_data = False
-        for entry in entries:
-            if entry.lines:
-                has_data = True
-                break
-        
-        if not has_data:
-            raise HTTPException(status_code=404, detail="No hay datos para exportar. Los asientos no tienen líneas.")
-        
-        # Pre-cargar todas las cuentas necesarias en una sola query
-        account_ids = set()
-        for entry in entries:
-            if entry.lines:
-                for line in entry.lines:
-                    if line.account_id:
-                        account_ids.add(line.account_id)
-        
-        accounts_dict = {}
-        if account_ids:
-            accounts = db.query(Account).filter(Account.id.in_(list(account_ids))).all()
-            accounts_dict = {acc.id: acc for acc in accounts}
-        
         # Obtener información de la empresa
         from ...domain.models import Company
         company = db.query(Company).filter(Company.id == company_id).first()
@@ -912,141 +887,61 @@ def export_entries_excel(
         elif date_from and date_to:
             period_info = f"{date_from} al {date_to}"
         
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Libro Diario"
+        # Libro en modo write_only con estilos con nombre
+        xlsx = StreamingXlsx(header_color="366092")
+        xlsx.add_sheet("Libro Diario", widths=[12, 12, 50, 15, 40, 15, 15])
         
         # Encabezado formato SUNAT
-        title_font = Font(bold=True, size=14)
-        header_font = Font(bold=True, size=11)
-        
-        ws.append(["LIBRO DIARIO - FORMATO SUNAT"])
-        ws.merge_cells('A1:G1')
-        ws['A1'].font = title_font
-        ws['A1'].alignment = Alignment(horizontal="center")
-        ws.append([])
-        
-        ws.append(["Empresa:", company.name])
-        ws.merge_cells('A3:G3')
-        ws['A3'].font = header_font
-        
+        xlsx.append(["LIBRO DIARIO - FORMATO SUNAT"], style=ESTILO_TITULO_CENTRADO, merge_to=7)
+        xlsx.append([])
+        # Etiqueta y valor en columnas separadas, sin combinar (combinar ocultaba el valor)
+        xlsx.append(["Empresa:", company.name], style=ESTILO_NEGRITA)
         if company.ruc:
-            ws.append(["RUC:", company.ruc])
-            ws.merge_cells('A4:G4')
-            ws['A4'].font = Font(size=11)
-        
-        ws.append(["Período:", period_info])
-        ws.merge_cells('A5:G5')
-        ws['A5'].font = Font(size=11)
-        
-        ws.append([])
-        
-        # Headers de columnas
-        headers = ["Nro.", "Fecha", "Glosa", "Cuenta", "Nombre Cuenta", "Debe", "Haber"]
-        ws.append(headers)
-        
-        # Estilo de headers (la fila de headers depende de si hay RUC)
-        header_row = 7 if company.ruc else 6
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        for cell in ws[header_row]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
+            xlsx.append(["RUC:", company.ruc])
+        xlsx.append(["Período:", period_info])
+        xlsx.append([])
+        xlsx.append(["Nro.", "Fecha", "Glosa", "Cuenta", "Nombre Cuenta", "Debe", "Haber"], style=ESTILO_ENCABEZADO)
         
         # Datos con formato SUNAT
+        montos = {5: ESTILO_MONTO, 6: ESTILO_MONTO}
         row_count = 0
-        correlativo = 1
         total_debe = 0.0
         total_haber = 0.0
         
-        for entry in entries:
-            if not entry.lines or entry.status == "VOIDED":
-                continue  # Saltar entradas sin líneas o anuladas
+        filas = db.execute(
+            stmt.order_by(JournalEntry.date, JournalEntry.id, EntryLine.id).execution_options(yield_per=5000)
+        )
+        for fecha, glosa, estado, cuenta, nombre, debe, haber in filas:
+            if estado == "VOIDED":
+                continue  # Saltar entradas anuladas
             
-            for line in entry.lines:
-                acc = accounts_dict.get(line.account_id) if line.account_id else None
-                if not acc:
-                    continue
-                
-                debit_val = float(line.debit) if line.debit else 0.0
-                credit_val = float(line.credit) if line.credit else 0.0
-                total_debe += debit_val
-                total_haber += credit_val
-                
-                glosa_text = (entry.glosa or "")[:100]  # Limitar glosa a 100 caracteres
-                
-                ws.append([
-                    correlativo,
-                    entry.date.strftime('%d/%m/%Y') if entry.date else "",
-                    glosa_text,
-                    acc.code,
-                    acc.name[:50],  # Limitar nombre a 50 caracteres
-                    debit_val,
-                    credit_val,
-                ])
-                correlativo += 1
-                row_count += 1
+            debit_val = float(debe) if debe else 0.0
+            credit_val = float(haber) if haber else 0.0
+            total_debe += debit_val
+            total_haber += credit_val
+            row_count += 1
+            
+            xlsx.append([
+                row_count,
+                fecha.strftime('%d/%m/%Y') if fecha else "",
+                (glosa or "")[:100],  # Limitar glosa a 100 caracteres
+                cuenta,
+                (nombre or "")[:50],  # Limitar nombre a 50 caracteres
+                debit_val,
+                credit_val,
+            ], styles=montos)
         
         # Fila de totales
-        ws.append([])
-        ws.append(["TOTALES", "", "", "", "", total_debe, total_haber])
-        
-        # Estilo de totales
-        total_row = ws.max_row
-        for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G']:
-            cell = ws[f'{col}{total_row}']
-            if col == 'A':
-                cell.font = Font(bold=True, size=11)
-            elif col in ['F', 'G']:
-                cell.font = Font(bold=True, size=11)
-                cell.number_format = '#,##0.00'
-            cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        
-        # Auto-ajustar columnas
-        column_widths = {'A': 12, 'B': 12, 'C': 50, 'D': 15, 'E': 40, 'F': 15, 'G': 15}
-        for col, width in column_widths.items():
-            ws.column_dimensions[col].width = width
+        xlsx.append([])
+        xlsx.append(["TOTALES", "", "", "", "", total_debe, total_haber], style=ESTILO_TOTAL, styles={5: ESTILO_TOTAL_MONTO, 6: ESTILO_TOTAL_MONTO})
         
-        # Formato numérico para columnas Debe y Haber
-        data_start_row = header_row + 1
-        for row in range(data_start_row, ws.max_row):  # Desde la fila de datos hasta antes de totales
-            ws[f'F{row}'].number_format = '#,##0.00'
-            ws[f'G{row}'].number_format = '#,##0.00'
-        
-        # Guardar a BytesIO
-        buffer = BytesIO()
-        try:
-            wb.save(buffer)
-            # IMPORTANTE: flush y obtener posición antes de leer
-            buffer.flush()
-            buffer.seek(0)  # Ir al inicio
-            buffer_content = buffer.read()  # Leer todo el contenido
-            buffer.close()  # Cerrar el buffer
-        except Exception as e:
-            logger.error(f"Error al guardar Excel al buffer: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error al guardar Excel: {str(e)}")
+        # Guardar a un temporal que se envía con FileResponse
+        path = xlsx.save(prefix="libro_diario_")
+        logger.info(f"Excel generado - tamaño: {os.path.getsize(path)} bytes, filas: {row_count}")
         
-        # Verificar que el buffer tiene contenido
-        buffer_size = len(buffer_content)
-        logger.info(f"Excel generado - tamaño: {buffer_size} bytes, filas: {row_count}")
-        
-        if buffer_size == 0:
-            logger.error(f"Excel vacío - row_count={row_count}")
-            raise HTTPException(status_code=500, detail=f"Error: El archivo Excel generado está vacío. Se agregaron {row_count} filas de datos.")
-        
-        if buffer_size < 500:
-            logger.warning(f"Excel muy pequeño - {buffer_size} bytes")
-        
-        return Response(
-            content=buffer_content,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f'attachment; filename="libro_diario_{date.today().isoformat()}.xlsx"',
-                "Content-Length": str(buffer_size)
-            }
-        )
+        return xlsx_file_response(path, f"libro_diario_{date.today().isoformat()}.xlsx")
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         logger.error(f"Error al exportar a Excel: {str(e)}\n{traceback.format_exc()}")
@@ -11,7 +11,6 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 import os
-import uuid
 
 from ...dependencies import get_db
 from ...security.auth import get_current_user
@@ -20,6 +19,8 @@ from ...domain.models_mailbox import ElectronicMailbox, MailboxMessage
 from sqlalchemy.orm import joinedload
 from ...domain.models_mailbox import MailboxResponse, MailboxResponseAttachment
 from ...domain.models_mailbox import CompanyToAdminMessage, CompanyToAdminAttachment
+from ...application.blob_store import BlobStore, get_blob_storage
+from ...infrastructure.uploads import StagedUpload, UploadTooLarge, stage_upload, staging_dir
 from ...application.services_mailbox import (
     get_or_create_mailbox,
     can_user_access_mailbox,
@@ -32,7 +33,7 @@ from ...application.services_mailbox import (
     create_response,
     add_response_attachment,
     validate_file_upload,
-    compute_file_hash,
+    MAX_FILE_SIZE_MB,
     log_attachment_download,
     acknowledge_mailbox_message,
     get_mailbox_stats_erp,
@@ -51,8 +52,28 @@ router = APIRouter(prefix="/mailbox", tags=["mailbox"])
 MAILBOX_UPLOAD_DIR = os.getenv("MAILBOX_UPLOAD_DIR", "./data/mailbox")
 
 
-def _ensure_mailbox_dir():
-    Path(MAILBOX_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+def _attachment_full_path(att) -> Path:
+    """Ruta en disco de un adjunto: blob compartido o archivo propio (adjuntos anteriores al blob store)."""
+    if att.blob_id:
+        return get_blob_storage().get_full_path(att.file_path)
+    return Path(MAILBOX_UPLOAD_DIR) / att.file_path
+
+
+async def _stage_attachment(file: UploadFile) -> StagedUpload:
+    """Recibe un adjunto por bloques a un temporal, validando extensión, tamaño y contenido."""
+    try:
+        validate_file_upload(file.filename or "")
+        staged = await stage_upload(file, max_bytes=MAX_FILE_SIZE_MB * 1024 * 1024, tmp_dir=staging_dir())
+    except UploadTooLarge:
+        raise HTTPException(413, detail=f"El archivo excede el tamaño máximo de {MAX_FILE_SIZE_MB} MB")
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+    try:
+        validate_file_upload(staged.filename, staged.size, staged.head)
+    except ValueError as e:
+        staged.discard()
+        raise HTTPException(400, detail=str(e))
+    return staged
 
 
 def _get_mailbox_storage_path(company_id: int, subpath: str) -> str:
@@ -89,6 +110,21 @@ def _user_display_name(user: User | None) -> str:
     return full if full else (getattr(user, "username", None) or "")
 
 
+def _attachments_meta(attachments) -> list:
+    return [
+        {"id": a.id, "file_name": a.file_name, "file_type": a.file_type, "file_size_bytes": a.file_size_bytes}
+        for a in attachments
+    ]
+
+
+def _list_with_cursor(fn, *args, **kwargs):
+    """Ejecuta un listado paginado; un cursor inválido es 400."""
+    try:
+        return fn(*args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+
+
 # --- Empresa: Ver bandeja ---
 
 @router.get("/messages")
@@ -96,15 +132,25 @@ def list_mailbox_messages(
     company_id: int = Query(..., description="ID de la empresa"),
     message_type: Optional[str] = Query(None),
     is_read: Optional[bool] = Query(None),
+    priority: Optional[str] = Query(None),
+    message_status: Optional[str] = Query(None),
     limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista mensajes de la casilla de la empresa. Solo usuarios asociados a la empresa."""
+    """
+    Lista mensajes de la casilla de la empresa. Solo usuarios asociados a la empresa.
+
+    Paginación por keyset: pasar next_cursor para la página siguiente.
+    """
     if not can_user_access_mailbox(current_user, company_id, as_admin=False):
         raise HTTPException(403, detail="No tiene acceso a esta casilla")
-    items, total = list_messages(db, company_id, message_type, is_read, limit, offset)
+    page = _list_with_cursor(
+        list_messages, db, company_id, message_type, is_read, limit, offset,
+        priority=priority, message_status=message_status, cursor=cursor,
+    )
     return {
         "items": [
             {
@@ -118,11 +164,14 @@ def list_mailbox_messages(
                 "created_by_name": _user_display_name(m.creator),
                 "is_read": m.is_read,
                 "read_at": m.read_at.isoformat() if m.read_at else None,
-                "has_response": len(m.responses) > 0,
+                "message_status": m.message_status,
+                "has_response": m.id in page.responded_ids,
+                "attachments": _attachments_meta(m.attachments),
             }
-            for m in items
+            for m in page.items
         ],
-        "total": total,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
         "limit": limit,
         "offset": offset,
     }
@@ -236,8 +285,6 @@ async def upload_response_attachment(
     """Sube un adjunto a una respuesta."""
     if not can_user_access_mailbox(current_user, company_id, as_admin=False):
         raise HTTPException(403, detail="No tiene acceso")
-    content = await file.read()
-    validate_file_upload(file.filename or "", content)
     # Verificar que la respuesta existe y pertenece a la empresa
     from ...domain.models_mailbox import MailboxResponse
     resp = db.query(MailboxResponse).filter(
@@ -246,19 +293,16 @@ async def upload_response_attachment(
     ).first()
     if not resp:
         raise HTTPException(404, detail="Respuesta no encontrada")
-    _ensure_mailbox_dir()
-    safe_name = f"{uuid.uuid4().hex}_{(file.filename or 'file')[:100]}"
-    subpath = f"responses/{response_id}"
-    full_dir = Path(MAILBOX_UPLOAD_DIR) / str(company_id) / subpath
-    full_dir.mkdir(parents=True, exist_ok=True)
-    file_path = str(full_dir / safe_name)
-    with open(file_path, "wb") as f:
-        f.write(content)
-    rel_path = f"{company_id}/responses/{response_id}/{safe_name}"
-    add_response_attachment(
-        db, response_id, file.filename or "file", rel_path, file.content_type or "application/octet-stream",
-        file_hash=compute_file_hash(content), file_size_bytes=len(content),
-    )
+    staged = await _stage_attachment(file)
+    try:
+        # Contenido en el blob store compartido con documentos (una copia por hash)
+        blob = BlobStore(db).put(staged)
+        add_response_attachment(
+            db, response_id, file.filename or "file", blob.blob_path, staged.content_type,
+            file_hash=blob.sha256, file_size_bytes=staged.size, blob_id=blob.id,
+        )
+    finally:
+        staged.discard()
     return {"ok": True, "file_name": file.filename}
 
 
@@ -282,7 +326,7 @@ def download_response_attachment(
         raise HTTPException(404, detail="Adjunto no encontrado")
     if not can_user_access_mailbox(current_user, company_id, as_admin=True):
         raise HTTPException(403, detail="No tiene acceso")
-    full_path = Path(MAILBOX_UPLOAD_DIR) / att.file_path
+    full_path = _attachment_full_path(att)
     if not full_path.exists():
         raise HTTPException(404, detail="Archivo no encontrado")
     message_id = att.response.message_id if att.response else None
@@ -340,21 +384,16 @@ async def company_upload_outgoing_attachment(
     ).first()
     if not msg:
         raise HTTPException(404, detail="Mensaje no encontrado")
-    content = await file.read()
-    validate_file_upload(file.filename or "", content)
-    _ensure_mailbox_dir()
-    safe_name = f"{uuid.uuid4().hex}_{(file.filename or 'file')[:100]}"
-    subpath = f"company_outgoing/{message_id}"
-    full_dir = Path(MAILBOX_UPLOAD_DIR) / str(company_id) / subpath
-    full_dir.mkdir(parents=True, exist_ok=True)
-    file_path = full_dir / safe_name
-    with open(file_path, "wb") as f:
-        f.write(content)
-    rel_path = f"{company_id}/company_outgoing/{message_id}/{safe_name}"
-    add_company_to_admin_attachment(
-        db, message_id, file.filename or "file", rel_path, file.content_type or "application/octet-stream",
-        file_hash=compute_file_hash(content), file_size_bytes=len(content),
-    )
+    staged = await _stage_attachment(file)
+    try:
+        # Contenido en el blob store compartido con documentos (una copia por hash)
+        blob = BlobStore(db).put(staged)
+        add_company_to_admin_attachment(
+            db, message_id, file.filename or "file", blob.blob_path, staged.content_type,
+            file_hash=blob.sha256, file_size_bytes=staged.size, blob_id=blob.id,
+        )
+    finally:
+        staged.discard()
     return {"ok": True, "file_name": file.filename}
 
 
@@ -362,14 +401,17 @@ async def company_upload_outgoing_attachment(
 def company_list_outgoing(
     company_id: int = Query(..., description="ID de la empresa"),
     limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista mensajes enviados por la empresa a SISCONT."""
+    """Lista mensajes enviados por la empresa a SISCONT (paginación por keyset)."""
     if not can_user_access_mailbox(current_user, company_id, as_admin=False):
         raise HTTPException(403, detail="No tiene acceso")
-    items, total = list_company_to_admin_messages(db, company_id=company_id, limit=limit, offset=offset)
+    page = _list_with_cursor(
+        list_company_to_admin_messages, db, company_id=company_id, limit=limit, offset=offset, cursor=cursor,
+    )
     return {
         "items": [
             {
@@ -377,10 +419,12 @@ def company_list_outgoing(
                 "subject": m.subject,
                 "created_at": m.created_at.isoformat(),
                 "created_by_name": _user_display_name(m.creator),
+                "attachments": _attachments_meta(m.attachments),
             }
-            for m in items
+            for m in page.items
         ],
-        "total": total,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
     }
 
 
@@ -434,7 +478,7 @@ def company_download_outgoing_attachment(
     att = next((a for a in msg.attachments if a.id == attachment_id), None)
     if not att:
         raise HTTPException(404, detail="Adjunto no encontrado")
-    full_path = Path(MAILBOX_UPLOAD_DIR) / att.file_path
+    full_path = _attachment_full_path(att)
     if not full_path.exists():
         raise HTTPException(404, detail="Archivo no encontrado en almacenamiento")
     log_attachment_download(
@@ -465,7 +509,7 @@ def download_message_attachment(
         raise HTTPException(404, detail="Adjunto no encontrado")
     if not can_user_access_mailbox(current_user, company_id, as_admin=True):
         raise HTTPException(403, detail="No tiene acceso")
-    full_path = Path(MAILBOX_UPLOAD_DIR) / att.file_path
+    full_path = _attachment_full_path(att)
     if not full_path.exists():
         raise HTTPException(404, detail="Archivo no encontrado en almacenamiento")
     log_attachment_download(
@@ -505,13 +549,17 @@ def admin_list_incoming(
     company_id: Optional[int] = Query(None, description="Filtrar por empresa"),
     is_read: Optional[bool] = Query(None),
     limit: int = Query(100, le=200),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista mensajes enviados por empresas a SISCONT. Solo admin."""
+    """Lista mensajes enviados por empresas a SISCONT (paginación por keyset). Solo admin."""
     _require_admin(current_user)
-    items, total = list_company_to_admin_messages(db, company_id=company_id, is_read=is_read, limit=limit, offset=offset)
+    page = _list_with_cursor(
+        list_company_to_admin_messages, db, company_id=company_id, is_read=is_read,
+        limit=limit, offset=offset, cursor=cursor,
+    )
     return {
         "items": [
             {
@@ -522,10 +570,12 @@ def admin_list_incoming(
                 "created_at": m.created_at.isoformat(),
                 "created_by_name": _user_display_name(m.creator),
                 "is_read": m.is_read,
+                "attachments": _attachments_meta(m.attachments),
             }
-            for m in items
+            for m in page.items
         ],
-        "total": total,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
     }
 
 
@@ -594,7 +644,7 @@ def admin_download_incoming_attachment(
     ).filter(CompanyToAdminAttachment.id == attachment_id).first()
     if not att:
         raise HTTPException(404, detail="Adjunto no encontrado")
-    full_path = Path(MAILBOX_UPLOAD_DIR) / att.file_path
+    full_path = _attachment_full_path(att)
     if not full_path.exists():
         raise HTTPException(404, detail="Archivo no encontrado")
     company_id = att.message.company_id if att.message else None
@@ -653,21 +703,16 @@ async def admin_upload_message_attachment(
     if not mailbox:
         raise HTTPException(404, detail="Casilla no encontrada")
     company_id = mailbox.company_id
-    content = await file.read()
-    validate_file_upload(file.filename or "", content)
-    _ensure_mailbox_dir()
-    safe_name = f"{uuid.uuid4().hex}_{(file.filename or 'file')[:100]}"
-    subpath = f"messages/{message_id}"
-    full_dir = Path(MAILBOX_UPLOAD_DIR) / str(company_id) / subpath
-    full_dir.mkdir(parents=True, exist_ok=True)
-    file_path = full_dir / safe_name
-    with open(file_path, "wb") as f:
-        f.write(content)
-    rel_path = f"{company_id}/messages/{message_id}/{safe_name}"
-    add_message_attachment(
-        db, message_id, file.filename or "file", rel_path, file.content_type or "application/octet-stream",
-        file_hash=compute_file_hash(content), file_size_bytes=len(content),
-    )
+    staged = await _stage_attachment(file)
+    try:
+        # Contenido en el blob store compartido con documentos (una copia por hash)
+        blob = BlobStore(db).put(staged)
+        add_message_attachment(
+            db, message_id, file.filename or "file", blob.blob_path, staged.content_type,
+            file_hash=blob.sha256, file_size_bytes=staged.size, blob_id=blob.id,
+        )
+    finally:
+        staged.discard()
     return {"ok": True, "file_name": file.filename}
 
 
@@ -676,14 +721,20 @@ def admin_list_all_messages(
     company_id: Optional[int] = Query(None, description="Filtrar por empresa"),
     message_type: Optional[str] = Query(None),
     is_read: Optional[bool] = Query(None),
+    priority: Optional[str] = Query(None),
+    message_status: Optional[str] = Query(None),
     limit: int = Query(100, le=200),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista todos los mensajes enviados por SISCONT a empresas. Solo admin."""
+    """Lista todos los mensajes enviados por SISCONT a empresas (paginación por keyset). Solo admin."""
     _require_admin(current_user)
-    items, total = list_all_messages(db, company_id, message_type, is_read, limit, offset)
+    page = _list_with_cursor(
+        list_all_messages, db, company_id, message_type, is_read, limit, offset,
+        priority=priority, message_status=message_status, cursor=cursor,
+    )
     return {
         "items": [
             {
@@ -696,13 +747,16 @@ def admin_list_all_messages(
                 "created_by_name": _user_display_name(m.creator),
                 "is_read": m.is_read,
                 "read_at": m.read_at.isoformat() if m.read_at else None,
-                "has_response": len(m.responses) > 0,
+                "message_status": m.message_status,
+                "has_response": m.id in page.responded_ids,
+                "attachments": _attachments_meta(m.attachments),
                 "company_id": m.mailbox.company_id if m.mailbox else None,
                 "company_name": m.mailbox.company.name if m.mailbox and m.mailbox.company else None,
             }
-            for m in items
+            for m in page.items
         ],
-        "total": total,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
     }
 
 
@@ -710,13 +764,14 @@ def admin_list_all_messages(
 def admin_list_company_messages(
     company_id: int,
     limit: int = Query(100, le=200),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Offset para paginación (preferir cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista mensajes de una empresa (para admin)."""
+    """Lista mensajes de una empresa (para admin, paginación por keyset)."""
     _require_admin(current_user)
-    items, total = list_messages(db, company_id, None, None, limit, offset)
+    page = _list_with_cursor(list_messages, db, company_id, None, None, limit, offset, cursor=cursor)
     return {
         "items": [
             {
@@ -729,11 +784,14 @@ def admin_list_company_messages(
                 "created_by_name": _user_display_name(m.creator),
                 "is_read": m.is_read,
                 "read_at": m.read_at.isoformat() if m.read_at else None,
-                "has_response": len(m.responses) > 0,
+                "message_status": m.message_status,
+                "has_response": m.id in page.responded_ids,
+                "attachments": _attachments_meta(m.attachments),
             }
-            for m in items
+            for m in page.items
         ],
-        "total": total,
+        "total": page.total,
+        "next_cursor": page.next_cursor,
     }
 
 
@@ -8,10 +8,12 @@ Módulo independiente que se acopla con datos contables.
 Sigue la metodología de "ensamblaje de carro".
 """
 from fastapi import APIRouter, Depends, Response, HTTPException, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 import csv
 import io
+from functools import partial
 from ...dependencies import get_db
 from ...application.ple import ple_compras, ple_ventas
 from ...application.ple_completo import (
@@ -21,11 +23,26 @@ from ...application.ple_completo import (
     ple_registro_compras,
     ple_registro_ventas,
     ple_caja_bancos,
+    ple_caja_bancos_libros,
     ple_inventarios_balances
 )
+from ...application.ple_cache import get_or_build_ple_txt
+from ...application.ple_validator import validar_libro_ple, ESTRUCTURAS_PLE, MAX_ERRORES_POR_COLUMNA
 
 router = APIRouter(prefix="/ple", tags=["ple"])
 
+
+def _ple_txt_cacheado(db: Session, company_id: int, period: str, libro: str, codigo: str, generador) -> FileResponse:
+    """
+    Sirve el TXT desde la caché de libros PLE; solo regenera si cambió la versión del período.
+    """
+    resultado = get_or_build_ple_txt(db, company_id, libro, period, generador)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
+    path, registros = resultado
+    filename = f"LE{company_id}{period.replace('-', '')}{codigo}{registros:08d}.txt"
+    return FileResponse(path, media_type='text/plain; charset=utf-8', filename=filename)
+
 # ===== LIBRO DIARIO (5.1) =====
 
 @router.get("/libro-diario")
@@ -55,23 +72,9 @@ def get_ple_libro_diario_txt(
 ):
     """
     Descarga Libro Diario Electrónico (PLE 5.1) en formato TXT según SUNAT.
+    Se sirve desde la caché en disco mientras no cambien los datos del período.
     """
-    data = ple_libro_diario(db, company_id, period)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
-    
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter='|', lineterminator='\n')
-    for row in data:
-        writer.writerow(row)
-    
-    filename = f"LE{company_id}{period.replace('-', '')}0501000000000{len(data):08d}.txt"
-    
-    return Response(
-        content=buf.getvalue().encode('utf-8'),
-        media_type='text/plain; charset=utf-8',
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return _ple_txt_cacheado(db, company_id, period, "5.1", "0501000000000", ple_libro_diario)
 
 # ===== LIBRO MAYOR (5.2) =====
 
@@ -102,23 +105,9 @@ def get_ple_libro_mayor_txt(
 ):
     """
     Descarga Libro Mayor Electrónico (PLE 5.2) en formato TXT según SUNAT.
+    Se sirve desde la caché en disco mientras no cambien los datos del período.
     """
-    data = ple_libro_mayor(db, company_id, period)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
-    
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter='|', lineterminator='\n')
-    for row in data:
-        writer.writerow(row)
-    
-    filename = f"LE{company_id}{period.replace('-', '')}0502000000000{len(data):08d}.txt"
-    
-    return Response(
-        content=buf.getvalue().encode('utf-8'),
-        media_type='text/plain; charset=utf-8',
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return _ple_txt_cacheado(db, company_id, period, "5.2", "0502000000000", ple_libro_mayor)
 
 # ===== PLAN DE CUENTAS (5.3) =====
 
@@ -196,23 +185,9 @@ def get_ple_compras_txt(
 ):
     """
     Descarga Registro de Compras Electrónico (PLE 8.1) en formato TXT según SUNAT.
+    Se sirve desde la caché en disco mientras no cambien los datos del período.
     """
-    data = ple_registro_compras(db, company_id, period)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
-    
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter='|', lineterminator='\n')
-    for row in data:
-        writer.writerow(row)
-    
-    filename = f"LE{company_id}{period.replace('-', '')}0801000000000{len(data):08d}.txt"
-    
-    return Response(
-        content=buf.getvalue().encode('utf-8'),
-        media_type='text/plain; charset=utf-8',
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return _ple_txt_cacheado(db, company_id, period, "8.1", "0801000000000", ple_registro_compras)
 
 # ===== REGISTRO DE VENTAS (14.1) =====
 
@@ -243,55 +218,76 @@ def get_ple_ventas_txt(
 ):
     """
     Descarga Registro de Ventas e Ingresos Electrónico (PLE 14.1) en formato TXT según SUNAT.
+    Se sirve desde la caché en disco mientras no cambien los datos del período.
     """
-    data = ple_registro_ventas(db, company_id, period)
-    if not data:
-        raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
-    
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter='|', lineterminator='\n')
-    for row in data:
-        writer.writerow(row)
-    
-    filename = f"LE{company_id}{period.replace('-', '')}1401000000000{len(data):08d}.txt"
-    
-    return Response(
-        content=buf.getvalue().encode('utf-8'),
-        media_type='text/plain; charset=utf-8',
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    return _ple_txt_cacheado(db, company_id, period, "14.1", "1401000000000", ple_registro_ventas)
+
+# ===== LIBRO CAJA Y BANCOS (1.1 / 1.2) =====
 
-# ===== LIBRO CAJA Y BANCOS (1.1) =====
+_LIBROS_CAJA_BANCOS = {
+    "1.1": ("Libro Caja y Bancos - Movimientos del Efectivo", "0101000000000"),
+    "1.2": ("Libro Caja y Bancos - Movimientos de la Cuenta Corriente", "0102000000000"),
+}
 
 @router.get("/caja-bancos")
 def get_ple_caja_bancos(
     company_id: int = Query(..., description="ID de la empresa"),
     period: str = Query(..., description="Periodo YYYY-MM"),
+    libro: Optional[str] = Query(None, description="1.1 (efectivo), 1.2 (cuenta corriente) o vacío para todas las cuentas"),
     db: Session = Depends(get_db)
 ):
     """
-    Obtiene Libro Caja y Bancos Electrónico (PLE 1.1) en formato JSON.
+    Obtiene Libro Caja y Bancos Electrónico (PLE 1.1 / 1.2) en formato JSON.
     """
-    data = ple_caja_bancos(db, company_id, period)
+    if libro is not None and libro not in _LIBROS_CAJA_BANCOS:
+        raise HTTPException(status_code=400, detail="libro debe ser 1.1 o 1.2")
+    data = ple_caja_bancos(db, company_id, period, libro=libro)
     return {
-        "libro": "1.1",
-        "nombre": "Libro Caja y Bancos",
+        "libro": libro or "1.1",
+        "nombre": _LIBROS_CAJA_BANCOS[libro][0] if libro else "Libro Caja y Bancos",
         "periodo": period,
         "company_id": company_id,
         "registros": len(data),
         "rows": data
     }
 
+@router.get("/caja-bancos/libros")
+def get_ple_caja_bancos_libros(
+    company_id: int = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Periodo YYYY-MM"),
+    db: Session = Depends(get_db)
+):
+    """
+    Obtiene los libros 1.1 y 1.2 generados desde un único recorrido de las cuentas bancarias.
+    """
+    libros = ple_caja_bancos_libros(db, company_id, period)
+    return {
+        "periodo": period,
+        "company_id": company_id,
+        "libros": [
+            {
+                "libro": codigo,
+                "nombre": _LIBROS_CAJA_BANCOS[codigo][0],
+                "registros": len(rows),
+                "rows": rows,
+            }
+            for codigo, rows in libros.items()
+        ],
+    }
+
 @router.get("/caja-bancos.txt")
 def get_ple_caja_bancos_txt(
     company_id: int = Query(..., description="ID de la empresa"),
     period: str = Query(..., description="Periodo YYYY-MM"),
+    libro: Optional[str] = Query(None, description="1.1 (efectivo), 1.2 (cuenta corriente) o vacío para todas las cuentas"),
     db: Session = Depends(get_db)
 ):
     """
-    Descarga Libro Caja y Bancos Electrónico (PLE 1.1) en formato TXT según SUNAT.
+    Descarga Libro Caja y Bancos Electrónico (PLE 1.1 / 1.2) en formato TXT según SUNAT.
     """
-    data = ple_caja_bancos(db, company_id, period)
+    if libro is not None and libro not in _LIBROS_CAJA_BANCOS:
+        raise HTTPException(status_code=400, detail="libro debe ser 1.1 o 1.2")
+    data = ple_caja_bancos(db, company_id, period, libro=libro)
     if not data:
         raise HTTPException(status_code=404, detail="No hay datos para el período especificado")
     
@@ -300,7 +296,8 @@ def get_ple_caja_bancos_txt(
     for row in data:
         writer.writerow(row)
     
-    filename = f"LE{company_id}{period.replace('-', '')}0101000000000{len(data):08d}.txt"
+    codigo = _LIBROS_CAJA_BANCOS[libro or "1.1"][1]
+    filename = f"LE{company_id}{period.replace('-', '')}{codigo}{len(data):08d}.txt"
     
     return Response(
         content=buf.getvalue().encode('utf-8'),
@@ -354,3 +351,37 @@ def get_ple_inventarios_balances_txt(
         media_type='text/plain; charset=utf-8',
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
+
+# ===== VALIDACIÓN DE ESTRUCTURA =====
+
+_GENERADORES_PLE = {
+    "5.1": ple_libro_diario,
+    "5.2": ple_libro_mayor,
+    "5.3": ple_plan_cuentas,
+    "8.1": ple_registro_compras,
+    "14.1": ple_registro_ventas,
+    "1.1": partial(ple_caja_bancos, libro="1.1"),
+    "1.2": partial(ple_caja_bancos, libro="1.2"),
+    "3.1": ple_inventarios_balances,
+}
+
+@router.get("/validar")
+def validar_ple(
+    company_id: int = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Periodo YYYY-MM"),
+    libro: str = Query(..., description="Código de libro: 5.1, 5.2, 5.3, 8.1, 14.1, 1.1, 1.2, 3.1"),
+    max_errores: int = Query(MAX_ERRORES_POR_COLUMNA, ge=1, le=500, description="Máximo de errores reportados por columna"),
+    db: Session = Depends(get_db)
+):
+    """
+    Valida la estructura SUNAT de un libro PLE generado antes de subirlo.
+
+    Reporta filas con cantidad de campos incorrecta y los primeros errores de cada columna
+    (fechas, precisión numérica, catálogos, dígito verificador de RUC).
+    """
+    if libro not in _GENERADORES_PLE or libro not in ESTRUCTURAS_PLE:
+        raise HTTPException(status_code=400, detail=f"Libro no soportado: {libro}")
+    data = _GENERADORES_PLE[libro](db, company_id, period)
+    resultado = validar_libro_ple(data, libro, max_errores=max_errores)
+    resultado.update({"periodo": period, "company_id": company_id})
+    return resultado
@@ -188,7 +188,7 @@ def _update_env_file(database_url: str, admin_user: str, admin_pass: str):
 
 from ...domain.models import (
     Account, JournalEntry, EntryLine, Period, Company, ThirdParty,
-    BankAccount, BankStatement, BankTransaction, BankReconciliation
+    BankAccount, BankStatement, BankTransaction, BankReconciliation, BankReconciliationStats
 )
 from ...domain.models_ext import Purchase, Sale, Product, InventoryMovement, PurchaseLine, SaleLine
 from ...domain.models_tesoreria import MovimientoTesoreria
@@ -200,6 +200,7 @@ from ...infrastructure.unit_of_work import UnitOfWork
 from ...application.services import ensure_accounts_for_demo, post_journal_entry, load_plan_base_csv
 from ...application.services_integration import registrar_compra_con_asiento, registrar_venta_con_asiento
 from ...application.dtos import JournalEntryIn, EntryLineIn
+from ...application.ple_cache import invalidate_company_ple_cache
 
 @router.post("/seed-pcge")
 def seed_pcge(
@@ -440,6 +441,9 @@ def cleanup_accounting_data(
             counts["bank_reconciliations"] = db.execute(
                 delete(BankReconciliation).where(BankReconciliation.bank_account_id.in_(bank_account_ids))
             ).rowcount
+            db.execute(
+                delete(BankReconciliationStats).where(BankReconciliationStats.bank_account_id.in_(bank_account_ids))
+            )
             
             # Eliminar extractos bancarios (después de reconciliaciones)
             counts["bank_statements"] = db.execute(
@@ -474,6 +478,9 @@ def cleanup_accounting_data(
                 delete(ThirdParty).where(ThirdParty.company_id == company_id)
             ).rowcount
         
+        # 15. Los delete masivos no pasan por los listeners: invalidar los libros PLE cacheados
+        invalidate_company_ple_cache(db, company_id)
+        
         db.commit()
         
         return {
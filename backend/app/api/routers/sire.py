@@ -21,9 +21,13 @@ from ...application.services_sire import (
     sync_sire_proposals,
     accept_sire_proposal,
     complement_sire_proposal,
-    replace_sire_proposal
+    replace_sire_proposal,
+    import_sire_proposal_details,
+    build_sire_client
 )
-from ...infrastructure.sire_client import SIREClient
+from ...application.sire_reconciliation import reconcile_sire_period, list_reconciliation_items
+from ...application.sire_tickets import register_sire_ticket
+from ...infrastructure.sire_resilience import transport_status
 
 router = APIRouter(prefix="/sire", tags=["sire"])
 
@@ -235,6 +239,43 @@ async def sync_proposals(
     finally:
         uow.close()
 
+@router.post("/details/import")
+async def import_proposal_details(
+    company_id: int = Query(..., description="ID de la empresa"),
+    proposal_type: str = Query(..., description="Tipo de propuesta (RVIE/RCE)"),
+    period: str = Query(..., pattern=r"^\d{6}$", description="Período tributario YYYYMM"),
+    proposal_number: Optional[str] = Query(None, description="Número de propuesta"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Descarga la propuesta del período (en streaming) y carga el detalle de comprobantes
+    """
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado para esta empresa")
+    
+    try:
+        proposal_type_enum = SireProposalType(proposal_type.upper())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Tipo de propuesta inválido: {proposal_type}")
+    
+    uow = UnitOfWork()
+    uow.db = db
+    try:
+        result = await import_sire_proposal_details(
+            uow, company_id, proposal_type_enum, period, proposal_number
+        )
+        uow.commit()
+        return result
+    except ValueError as e:
+        uow.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        uow.rollback()
+        raise HTTPException(status_code=500, detail=f"Error importando detalle de propuesta: {str(e)}")
+    finally:
+        uow.close()
+
 # ===== PROPUESTAS RVIE =====
 
 @router.get("/rvie/proposals", response_model=List[SireProposalOut])
@@ -695,18 +736,7 @@ async def get_sire_periods(
             raise HTTPException(status_code=400, detail="Error al desencriptar password del generador")
         
         # Crear cliente SIRE
-        client = SIREClient(
-            company_id=company_id,
-            oauth_client_id=config.oauth_client_id,
-            oauth_client_secret=config.oauth_client_secret,
-            access_token=config.oauth_token,
-            refresh_token=config.oauth_refresh_token,
-            token_expires_at=config.oauth_token_expires_at,
-            use_preliminary_mode=config.use_test_env,
-            ruc=config.ruc,
-            usuario_generador=config.usuario_generador,
-            password_generador=decrypted_password
-        )
+        client = build_sire_client(config)
         
         # Obtener períodos (requiere tipo de propuesta para usar el código de libro correcto)
         periods = await client.get_periods(proposal_type=proposal_type_enum)
@@ -762,3 +792,208 @@ def list_sync_logs(
         for log in logs
     ]
 
+
+@router.get("/transport/status")
+def get_transport_status(
+    company_id: int = Query(..., description="ID de la empresa"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Métricas del transporte hacia SUNAT (reintentos, latencias, estado del circuito) del RUC de la empresa"""
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    uow = UnitOfWork()
+    uow.db = db
+    try:
+        config = get_sire_configuration(uow, company_id)
+        if not config:
+            raise HTTPException(status_code=404, detail="Configuración SIRE no encontrada")
+        return transport_status(config.ruc or f"empresa-{company_id}")
+    finally:
+        uow.close()
+
+
+# ===== TICKETS (operaciones asíncronas en SUNAT) =====
+
+class SireTicketIn(BaseModel):
+    ticket_number: str
+    operation: str = "PRELIMINARY_UPLOAD"
+    proposal_type: Optional[str] = None  # "RVIE" o "RCE"
+    period: Optional[str] = None  # YYYYMM
+
+def _ticket_out(ticket) -> Dict[str, Any]:
+    return {
+        "id": ticket.id,
+        "ticket_number": ticket.ticket_number,
+        "operation": ticket.operation,
+        "proposal_type": ticket.proposal_type.value if ticket.proposal_type else None,
+        "period": ticket.period,
+        "status": ticket.status,
+        "attempts": ticket.attempts,
+        "next_poll_at": ticket.next_poll_at.isoformat() if ticket.next_poll_at else None,
+        "last_polled_at": ticket.last_polled_at.isoformat() if ticket.last_polled_at else None,
+        "completed_at": ticket.completed_at.isoformat() if ticket.completed_at else None,
+        "last_response": ticket.last_response,
+        "error_message": ticket.error_message,
+        "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
+    }
+
+@router.post("/tickets")
+def register_ticket(
+    payload: SireTicketIn,
+    company_id: int = Query(..., description="ID de la empresa"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Registra un ticket SUNAT para que se consulte en segundo plano"""
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    proposal_type_enum = None
+    if payload.proposal_type:
+        try:
+            proposal_type_enum = SireProposalType(payload.proposal_type.upper())
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Tipo de propuesta inválido: {payload.proposal_type}")
+    
+    ticket = register_sire_ticket(
+        db, company_id, payload.ticket_number.strip(), payload.operation,
+        proposal_type=proposal_type_enum, period=payload.period, created_by=current_user.id
+    )
+    db.commit()
+    return _ticket_out(ticket)
+
+@router.get("/tickets")
+def list_tickets(
+    company_id: int = Query(..., description="ID de la empresa"),
+    status: Optional[str] = Query(None, description="PENDING, PROCESSING, COMPLETED, FAILED o EXPIRED"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Lista los tickets de la empresa con su último estado (sin consultar a SUNAT)"""
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    from ...domain.models_sire import SireTicket
+    
+    query = db.query(SireTicket).filter(SireTicket.company_id == company_id)
+    if status:
+        query = query.filter(SireTicket.status == status.upper())
+    return [_ticket_out(t) for t in query.order_by(SireTicket.id.desc()).limit(limit).all()]
+
+@router.get("/tickets/{ticket_id}")
+def get_ticket(
+    ticket_id: int,
+    company_id: int = Query(..., description="ID de la empresa"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Estado de un ticket según la última consulta del poller"""
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    from ...domain.models_sire import SireTicket
+    
+    ticket = db.query(SireTicket).filter(
+        SireTicket.id == ticket_id,
+        SireTicket.company_id == company_id
+    ).first()
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    return _ticket_out(ticket)
+
+
+# ===== CONCILIACIÓN PROPUESTA vs. LIBROS =====
+
+def _reconciliation_run_out(run) -> Dict[str, Any]:
+    return {
+        "id": run.id,
+        "proposal_type": run.proposal_type.value,
+        "period": run.period,
+        "sunat_count": run.sunat_count,
+        "books_count": run.books_count,
+        "matched_count": run.matched_count,
+        "missing_in_books_count": run.missing_in_books_count,
+        "extra_in_books_count": run.extra_in_books_count,
+        "amount_mismatch_count": run.amount_mismatch_count,
+        "date_mismatch_count": run.date_mismatch_count,
+        "duration_ms": run.duration_ms,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+    }
+
+@router.post("/reconciliation")
+def run_reconciliation(
+    company_id: int = Query(..., description="ID de la empresa"),
+    proposal_type: str = Query(..., description="Tipo de propuesta (RVIE/RCE)"),
+    period: str = Query(..., pattern=r"^\d{6}$", description="Período tributario YYYYMM"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Concilia la propuesta SIRE del período (detalle importado) con ventas o compras registradas
+    """
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado para esta empresa")
+    
+    try:
+        proposal_type_enum = SireProposalType(proposal_type.upper())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Tipo de propuesta inválido: {proposal_type}")
+    
+    run = reconcile_sire_period(db, company_id, proposal_type_enum, period, created_by=current_user.id)
+    db.commit()
+    return _reconciliation_run_out(run)
+
+@router.get("/reconciliation/{run_id}")
+def get_reconciliation(
+    run_id: int,
+    company_id: int = Query(..., description="ID de la empresa"),
+    status: Optional[str] = Query(None, description="MISSING_IN_BOOKS, EXTRA_IN_BOOKS, AMOUNT_MISMATCH o DATE_MISMATCH"),
+    after_id: Optional[int] = Query(None, description="Último id de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Resumen de una conciliación y sus diferencias (paginadas por id)"""
+    if company_id not in [c.id for c in current_user.companies]:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    from ...domain.models_sire import SireReconciliationRun
+    
+    run = db.get(SireReconciliationRun, run_id)
+    if not run or run.company_id != company_id:
+        raise HTTPException(status_code=404, detail="Conciliación no encontrada")
+    
+    items = list_reconciliation_items(db, run_id, status=status, after_id=after_id, limit=limit)
+    return {
+        **_reconciliation_run_out(run),
+        "items": [
+            {
+                "id": item.id,
+                "status": item.status,
+                "mismatch_fields": item.mismatch_fields.split(",") if item.mismatch_fields else [],
+                "counterparty_tax_id": item.counterparty_tax_id,
+                "doc_type": item.doc_type,
+                "series": item.series,
+                "number": item.number,
+                "sunat_detail_id": item.sunat_detail_id,
+                "book_id": item.book_id,
+                "sunat_issue_date": item.sunat_issue_date.isoformat() if item.sunat_issue_date else None,
+                "book_issue_date": item.book_issue_date.isoformat() if item.book_issue_date else None,
+                "sunat": {
+                    "base_amount": float(item.sunat_base_amount) if item.sunat_base_amount is not None else None,
+                    "igv_amount": float(item.sunat_igv_amount) if item.sunat_igv_amount is not None else None,
+                    "total_amount": float(item.sunat_total_amount) if item.sunat_total_amount is not None else None,
+                },
+                "books": {
+                    "base_amount": float(item.book_base_amount) if item.book_base_amount is not None else None,
+                    "igv_amount": float(item.book_igv_amount) if item.book_igv_amount is not None else None,
+                    "total_amount": float(item.book_total_amount) if item.book_total_amount is not None else None,
+                },
+            }
+            for item in items
+        ],
+        "next_after_id": items[-1].id if len(items) == limit else None,
+    }
@@ -1,3 +1,4 @@
+import os
 import uuid
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
@@ -11,6 +12,7 @@ from ...security.auth import get_current_user, get_password_hash
 from ...domain.models import User, Company, Role, user_companies
 from ...domain.enums import UserRole
 from ...config import settings
+from ...infrastructure.uploads import UploadTooLarge, stage_upload
 from sqlalchemy import insert, delete
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -307,24 +309,23 @@ async def upload_user_photo(
 	if file.content_type not in allowed_types:
 		raise HTTPException(400, f"Tipo de archivo no permitido. Permitidos: {', '.join(allowed_types)}")
 	
-	# Validar tamaño (max_upload_size_mb en MB)
-	max_size_bytes = settings.max_upload_size_mb * 1024 * 1024
-	file_content = await file.read()
-	if len(file_content) > max_size_bytes:
-		raise HTTPException(400, f"Archivo demasiado grande. Máximo: {settings.max_upload_size_mb}MB")
-	
 	# Crear directorio si no existe
 	upload_dir = Path(settings.uploads_dir) / "profiles"
 	upload_dir.mkdir(parents=True, exist_ok=True)
 	
+	# Recibir por bloques a un temporal en el mismo directorio (max_upload_size_mb en MB)
+	try:
+		staged = await stage_upload(file, tmp_dir=upload_dir)
+	except UploadTooLarge:
+		raise HTTPException(400, f"Archivo demasiado grande. Máximo: {settings.max_upload_size_mb}MB")
+	
 	# Generar nombre único para el archivo
 	file_ext = Path(file.filename).suffix.lower() or ".jpg"
 	filename = f"{user_id}_{uuid.uuid4().hex}{file_ext}"
 	file_path = upload_dir / filename
 	
-	# Guardar archivo temporalmente para validar que es una imagen válida
-	with open(file_path, "wb") as f:
-		f.write(file_content)
+	# Mover el temporal a su nombre final para validar que es una imagen válida
+	os.replace(staged.path, file_path)
 	
 	# Validar que es una imagen válida usando PIL
 	try:
@@ -0,0 +1,531 @@
+"""
+Motor de emparejamiento automático para conciliación bancaria
+=============================================================
+
+Empareja movimientos del extracto con líneas contables de la cuenta 10.x:
+
+0. Referencia: índice invertido de tokens normalizados (serie-número de
+   comprobante, RUC, número de operación, códigos alfanuméricos) sobre la
+   descripción/referencia bancaria y sobre memo, glosa y comprobantes
+   vinculados de cada línea. Los candidatos con tokens en común se evalúan
+   por monto (exacto, suma de varias líneas o cercano) antes que el resto.
+1. Monto exacto: índice hash por monto con signo en céntimos; dentro de cada
+   monto las líneas se ordenan por fecha y se toma la más cercana dentro de
+   la ventana (bisect). O(n + m) salvo montos muy repetidos.
+2. Varias líneas contra un movimiento: suma exacta de 2..N líneas del mismo
+   signo dentro de una ventana corta: pares por hash de complementos y
+   combinaciones de 3-4 líneas por hash de sumas de pares sobre los
+   candidatos más cercanos en fecha.
+3. Monto cercano: las líneas sobrantes se ordenan por monto y cada movimiento
+   busca con bisect solo a sus vecinos dentro de la tolerancia relativa.
+
+El signo se normaliza a "entrada de dinero positiva": abono del banco
+(credit) ↔ cargo en libros (debit) de la cuenta de bancos, y viceversa.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Integer, cast, func, null, select, union
+from sqlalchemy.orm import Session
+
+from ..domain.models import BankStatement, BankTransaction, BankTransactionLine, EntryLine, JournalEntry, ThirdParty
+from ..domain.models_ext import Purchase, Sale
+from ..domain.models_payments import PaymentTransaction
+
+# (id, fecha como ordinal, monto con signo en céntimos)
+Movimiento = Tuple[int, int, int]
+
+
+@dataclass
+class MatchProposal:
+    bank_transaction_id: int
+    entry_line_ids: List[int]
+    confidence: float
+    reason: str
+
+
+@dataclass
+class MatchingOptions:
+    date_window_days: int = 7
+    near_amount_pct: float = 0.05  # Diferencia relativa máxima para "monto cercano"
+    near_max_candidates: int = 32  # Vecinos revisados por movimiento en el paso 2
+    max_lines_per_match: int = 4  # Tamaño máximo de combinación en el paso 2 (hasta 4)
+    subset_window_days: int = 3  # Ventana de fechas para sumar varias líneas
+    subset_max_candidates: int = 16  # Candidatas para combinaciones de 3+ líneas
+    min_confidence: float = 0.5
+    use_references: bool = True  # Paso 0 por tokens de referencia (solo suggest_bank_matches)
+    max_token_lines: int = 5  # Tokens presentes en más líneas no discriminan (RUC propio, fechas...)
+
+
+def to_cents(value) -> int:
+    """Monto (Decimal/float/str) a céntimos enteros, redondeando al céntimo"""
+    if value is None:
+        return 0
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def bank_movement(tx_id: int, tx_date: date, debit, credit) -> Movimiento:
+    """Movimiento bancario: abono (credit) positivo, cargo (debit) negativo"""
+    return tx_id, tx_date.toordinal(), to_cents(credit) - to_cents(debit)
+
+
+def book_movement(line_id: int, entry_date: date, debit, credit) -> Movimiento:
+    """Línea contable de la cuenta de bancos: debe positivo, haber negativo"""
+    return line_id, entry_date.toordinal(), to_cents(debit) - to_cents(credit)
+
+
+_DOCUMENTO = re.compile(r"\b([FBE](?:\d{3}|[A-Z]\d{2}))\s*[-/]?\s*0*(\d{1,8})\b")
+_CODIGO = re.compile(r"[A-Z0-9]+")
+
+
+def reference_tokens(*textos: Optional[str]) -> Set[str]:
+    """
+    Tokens de referencia de uno o más textos libres.
+
+    - Comprobantes: "F001-00001234", "F001 1234" → "F001-1234"
+    - Números (operación, RUC, cheque) de 5+ dígitos, sin ceros a la izquierda
+    - Códigos alfanuméricos con letras y dígitos de 6+ caracteres
+
+    Las palabras sin dígitos ("PAGO", "TRANSF") no son tokens.
+    """
+    tokens: Set[str] = set()
+    for texto in textos:
+        if not texto:
+            continue
+        texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii").upper()
+        for serie, numero in _DOCUMENTO.findall(texto):
+            tokens.add(f"{serie}-{numero}")
+        for parte in _CODIGO.findall(_DOCUMENTO.sub(" ", texto)):
+            if parte.isdigit():
+                parte = parte.lstrip("0")
+                if len(parte) >= 5:
+                    tokens.add(parte)
+            elif len(parte) >= 6 and not parte.isalpha():
+                tokens.add(parte)
+    return tokens
+
+
+def _puntaje_fecha(dias: int) -> Tuple[float, str]:
+    if dias == 0:
+        return 0.3, "misma fecha"
+    if dias <= 3:
+        return 0.2, f"fecha cercana ({dias} días)"
+    if dias <= 7:
+        return 0.1, f"fecha similar ({dias} días)"
+    return 0.0, f"fecha distante ({dias} días)"
+
+
+def _mas_cercana(fechas: List[Tuple[int, int]], fecha: int, ventana: int) -> Optional[int]:
+    """Índice del (fecha, id) más cercano a `fecha` dentro de la ventana, en una lista ordenada"""
+    i = bisect_left(fechas, (fecha, -1))
+    mejor, mejor_dif = None, ventana + 1
+    for j in (i - 1, i):
+        if 0 <= j < len(fechas):
+            dif = abs(fechas[j][0] - fecha)
+            if dif < mejor_dif:
+                mejor, mejor_dif = j, dif
+    return mejor
+
+
+def _combinacion_exacta(
+    objetivo: int, candidatos: Sequence[Movimiento], max_lineas: int
+) -> Optional[List[Movimiento]]:
+    """
+    Busca 2..max_lineas (hasta 4) candidatos que sumen exactamente `objetivo`.
+
+    Indexa las sumas de pares en un hash y resuelve 3 líneas como
+    línea + par y 4 líneas como par + par (O(n²) en vez de explorar todas
+    las combinaciones). Prefiere la combinación con menos líneas.
+    """
+    meta = abs(objetivo)
+    montos = [abs(c[2]) for c in candidatos]
+    n = len(montos)
+    pares: Dict[int, List[Tuple[int, int]]] = {}
+    for i in range(n):
+        for j in range(i + 1, n):
+            suma = montos[i] + montos[j]
+            if suma <= meta:
+                pares.setdefault(suma, []).append((i, j))
+
+    elegidos: Optional[Tuple[int, ...]] = None
+    if meta in pares:
+        elegidos = pares[meta][0]
+    elif max_lineas >= 3:
+        for k in range(n):
+            for i, j in pares.get(meta - montos[k], ()):
+                if k != i and k != j:
+                    elegidos = (i, j, k)
+                    break
+            if elegidos:
+                break
+        if elegidos is None and max_lineas >= 4:
+            for suma, lista in pares.items():
+                for i, j in lista:
+                    for k, m in pares.get(meta - suma, ()):
+                        if len({i, j, k, m}) == 4:
+                            elegidos = (i, j, k, m)
+                            break
+                    if elegidos:
+                        break
+                if elegidos:
+                    break
+    if elegidos is None:
+        return None
+    return [candidatos[k] for k in elegidos]
+
+
+def _par_o_combinacion(
+    por_dia: Dict[Tuple[bool, int], Tuple[List[int], List[Movimiento]]],
+    claves: Sequence[Tuple[bool, int]],
+    objetivo: int,
+    usadas: set,
+    opts: MatchingOptions,
+) -> Optional[List[Movimiento]]:
+    """
+    Líneas del mismo signo que suman `objetivo`, recorriendo los días de la
+    ventana del más cercano al más lejano.
+
+    Los pares salen de un hash por complemento en una sola pasada; las
+    combinaciones de 3-4 líneas, de _combinacion_exacta sobre los candidatos
+    más cercanos en fecha.
+    """
+    meta = abs(objetivo)
+    vistos: Dict[int, Movimiento] = {}
+    candidatos: List[Movimiento] = []
+    for clave in claves:
+        dia = por_dia.get(clave)
+        if dia is None:
+            continue
+        montos_dia, lineas_dia = dia
+        hasta = bisect_left(montos_dia, meta)
+        for monto, linea in zip(montos_dia[:hasta], lineas_dia[:hasta]):
+            if linea[0] in usadas:
+                continue
+            pareja = vistos.get(meta - monto)
+            if pareja is not None:
+                return [pareja, linea]
+            vistos.setdefault(monto, linea)
+            candidatos.append(linea)
+    del candidatos[opts.subset_max_candidates:]
+    if opts.max_lines_per_match < 3 or len(candidatos) < 3:
+        return None
+    return _combinacion_exacta(objetivo, candidatos, opts.max_lines_per_match)
+
+
+def _emparejar_por_referencia(
+    bank: List[Movimiento],
+    books: List[Movimiento],
+    bank_refs: Mapping[int, Set[str]],
+    book_refs: Mapping[int, Set[str]],
+    opts: MatchingOptions,
+) -> Tuple[List[MatchProposal], List[Movimiento], List[Movimiento]]:
+    """Paso 0: candidatos por tokens en común; devuelve propuestas y lo que queda de cada lado"""
+    lineas = {linea[0]: linea for linea in books}
+    indice: Dict[str, List[int]] = {}
+    for line_id, tokens in book_refs.items():
+        if line_id in lineas:
+            for token in tokens:
+                indice.setdefault(token, []).append(line_id)
+
+    propuestas: List[MatchProposal] = []
+    restantes: List[Movimiento] = []
+    usadas: Set[int] = set()
+    for tx in bank:
+        tx_id, fecha, centimos = tx
+        aciertos: Dict[int, List[str]] = {}
+        for token in bank_refs.get(tx_id, ()):
+            ids = indice.get(token)
+            if not ids or len(ids) > opts.max_token_lines:
+                continue
+            for line_id in ids:
+                if line_id not in usadas:
+                    aciertos.setdefault(line_id, []).append(token)
+        candidatos = sorted(
+            (lineas[i] for i in aciertos if centimos and (lineas[i][2] > 0) == (centimos > 0)),
+            key=lambda linea: (-len(aciertos[linea[0]]), abs(linea[1] - fecha)),
+        )
+        if not candidatos:
+            restantes.append(tx)
+            continue
+
+        elegidas: Optional[List[Movimiento]] = None
+        exactas = [linea for linea in candidatos if linea[2] == centimos]
+        if exactas:
+            elegidas, confianza, motivo = exactas[:1], 0.95, "monto exacto"
+        elif len(candidatos) >= 2 and opts.max_lines_per_match >= 2:
+            elegidas = _combinacion_exacta(centimos, candidatos[:opts.subset_max_candidates], opts.max_lines_per_match)
+            confianza, motivo = 0.9, f"suma exacta de {len(elegidas or ())} líneas"
+        if not elegidas and abs(candidatos[0][2] - centimos) <= abs(centimos) * opts.near_amount_pct:
+            elegidas, confianza, motivo = candidatos[:1], 0.75, "monto cercano"
+        if not elegidas:
+            restantes.append(tx)
+            continue
+
+        usadas.update(linea[0] for linea in elegidas)
+        tokens = sorted({t for linea in elegidas for t in aciertos[linea[0]]})
+        propuestas.append(MatchProposal(
+            tx_id, [linea[0] for linea in elegidas], confianza, f"referencia {', '.join(tokens[:3])}, {motivo}"
+        ))
+    return propuestas, restantes, [linea for linea in books if linea[0] not in usadas]
+
+
+def match_movements(
+    bank: Iterable[Movimiento],
+    books: Iterable[Movimiento],
+    options: Optional[MatchingOptions] = None,
+    bank_refs: Optional[Mapping[int, Set[str]]] = None,
+    book_refs: Optional[Mapping[int, Set[str]]] = None,
+) -> List[MatchProposal]:
+    """
+    Propone emparejamientos entre movimientos bancarios y líneas contables.
+
+    Args:
+        bank: Movimientos del extracto (bank_movement)
+        books: Líneas contables pendientes (book_movement)
+        options: Ventana de fechas, tolerancias y límites de búsqueda
+        bank_refs: Tokens de referencia por movimiento bancario (reference_tokens)
+        book_refs: Tokens de referencia por línea contable
+
+    Returns:
+        Propuestas con confianza >= min_confidence; cada línea contable se
+        usa a lo sumo una vez
+    """
+    opts = options or MatchingOptions()
+    ventana = opts.date_window_days
+    propuestas: List[MatchProposal] = []
+
+    if bank_refs and book_refs:
+        propuestas, bank, books = _emparejar_por_referencia(list(bank), list(books), bank_refs, book_refs, opts)
+
+    # Paso 1: monto exacto (hash por céntimos, fecha más cercana por bisect)
+    por_monto: Dict[int, List[Tuple[int, int]]] = {}
+    for line_id, fecha, centimos in books:
+        if centimos:
+            por_monto.setdefault(centimos, []).append((fecha, line_id))
+    for fechas in por_monto.values():
+        fechas.sort()
+
+    pendientes: List[Movimiento] = []
+    for tx in sorted(bank, key=lambda t: t[1]):
+        tx_id, fecha, centimos = tx
+        fechas = por_monto.get(centimos)
+        j = _mas_cercana(fechas, fecha, ventana) if fechas else None
+        if j is None:
+            if centimos:
+                pendientes.append(tx)
+            continue
+        fecha_linea, line_id = fechas.pop(j)
+        puntaje, motivo = _puntaje_fecha(abs(fecha_linea - fecha))
+        propuestas.append(MatchProposal(tx_id, [line_id], round(0.7 + puntaje, 2), f"monto exacto, {motivo}"))
+
+    if not pendientes:
+        return propuestas
+
+    # Líneas sobrantes, ordenadas por monto para la búsqueda de vecinos
+    sobrantes = sorted(
+        (centimos, fecha, line_id)
+        for centimos, fechas in por_monto.items()
+        for fecha, line_id in fechas
+    )
+    usadas = set()
+
+    # Paso 2: un movimiento contra varias líneas (suma exacta, acotada). Va antes
+    # del monto cercano: una suma exacta pesa más que una diferencia de céntimos
+    sin_match: List[Movimiento] = []
+    por_dia: Dict[Tuple[bool, int], Tuple[List[int], List[Movimiento]]] = {}
+    if opts.max_lines_per_match >= 2:
+        # (signo, fecha) -> montos absolutos ascendentes y sus líneas, para cortar con bisect
+        for monto, fecha_linea, line_id in sorted(sobrantes, key=lambda s: abs(s[0])):
+            montos_dia, lineas_dia = por_dia.setdefault((monto > 0, fecha_linea), ([], []))
+            montos_dia.append(abs(monto))
+            lineas_dia.append((line_id, fecha_linea, monto))
+    dias_suma = sorted(range(-opts.subset_window_days, opts.subset_window_days + 1), key=abs)
+    for tx in pendientes:
+        tx_id, fecha, centimos = tx
+        combinacion = _par_o_combinacion(
+            por_dia, [(centimos > 0, fecha + d) for d in dias_suma], centimos, usadas, opts
+        ) if por_dia else None
+        if combinacion:
+            dias = max(abs(linea[1] - fecha) for linea in combinacion)
+            puntaje = 0.6 + (0.1 if dias <= 3 else 0.0) - 0.05 * (len(combinacion) - 2)
+            if puntaje >= opts.min_confidence:
+                usadas.update(linea[0] for linea in combinacion)
+                propuestas.append(MatchProposal(
+                    tx_id, [linea[0] for linea in combinacion], round(puntaje, 2),
+                    f"suma exacta de {len(combinacion)} líneas (hasta {dias} días)"
+                ))
+                continue
+        sin_match.append(tx)
+
+    # Paso 3: monto cercano (misma dirección, dentro de la tolerancia relativa)
+    montos = [s[0] for s in sobrantes]
+    for tx in sin_match:
+        tx_id, fecha, centimos = tx
+        tolerancia = int(abs(centimos) * opts.near_amount_pct)
+        mejor, mejor_puntaje, mejor_motivo = None, 0.0, ""
+        revisados = 0
+        k = bisect_left(montos, centimos - tolerancia)
+        while k < len(sobrantes) and montos[k] <= centimos + tolerancia and revisados < opts.near_max_candidates:
+            monto, fecha_linea, line_id = sobrantes[k]
+            k += 1
+            if line_id in usadas or (monto > 0) != (centimos > 0):
+                continue
+            revisados += 1
+            dias = abs(fecha_linea - fecha)
+            if dias > ventana:
+                continue
+            puntaje, motivo = _puntaje_fecha(dias)
+            if 0.3 + puntaje > mejor_puntaje:
+                mejor, mejor_puntaje, mejor_motivo = line_id, 0.3 + puntaje, motivo
+        if mejor is not None and mejor_puntaje >= opts.min_confidence:
+            usadas.add(mejor)
+            propuestas.append(MatchProposal(tx_id, [mejor], round(mejor_puntaje, 2), f"monto cercano, {mejor_motivo}"))
+    return propuestas
+
+
+# ===== CARGA DESDE LA BD =====
+
+def reconciled_entry_lines(bank_account_id: int, period_id: int):
+    """
+    Subconsulta con los ids de líneas contables ya conciliadas en el período:
+    la línea principal de cada movimiento y las de matches de varias líneas.
+    """
+    principales = (
+        select(BankTransaction.entry_line_id)
+        .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
+        .where(
+            BankStatement.bank_account_id == bank_account_id,
+            BankStatement.period_id == period_id,
+            BankTransaction.entry_line_id.isnot(None),
+            BankTransaction.reconciled == True,
+        )
+    )
+    adicionales = (
+        select(BankTransactionLine.entry_line_id)
+        .join(BankTransaction, BankTransaction.id == BankTransactionLine.bank_transaction_id)
+        .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
+        .where(
+            BankStatement.bank_account_id == bank_account_id,
+            BankStatement.period_id == period_id,
+            BankTransaction.reconciled == True,
+        )
+    )
+    return union(principales, adicionales)
+
+
+def suggest_bank_matches(
+    db: Session,
+    bank_account_id: int,
+    account_id: int,
+    period_id: int,
+    options: Optional[MatchingOptions] = None,
+) -> List[MatchProposal]:
+    """
+    Sugerencias de match para el último extracto del período.
+
+    Lee ambos lados con una consulta cada uno (montos ya en céntimos con signo),
+    arma los tokens de referencia (ver _referencias_libros) y delega en
+    match_movements.
+    """
+    statement_id = db.execute(
+        select(BankStatement.id)
+        .where(BankStatement.bank_account_id == bank_account_id, BankStatement.period_id == period_id)
+        .order_by(BankStatement.statement_date.desc())
+        .limit(1)
+    ).scalar()
+    if statement_id is None:
+        return []
+
+    def centimos(positivo, negativo):
+        return cast(func.round((func.coalesce(positivo, 0) - func.coalesce(negativo, 0)) * 100), Integer)
+
+    banco = db.execute(
+        select(
+            BankTransaction.id, BankTransaction.transaction_date,
+            centimos(BankTransaction.credit, BankTransaction.debit),
+            BankTransaction.description, BankTransaction.reference,
+        )
+        .where(
+            BankTransaction.statement_id == statement_id,
+            BankTransaction.reconciled == False,
+            BankTransaction.entry_line_id.is_(None),
+        )
+    ).all()
+    libros = db.execute(
+        select(
+            EntryLine.id, JournalEntry.date, centimos(EntryLine.debit, EntryLine.credit),
+            EntryLine.entry_id, EntryLine.memo, JournalEntry.glosa, ThirdParty.tax_id,
+        )
+        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
+        .outerjoin(ThirdParty, ThirdParty.id == EntryLine.third_party_id)
+        .where(
+            EntryLine.account_id == account_id,
+            JournalEntry.period_id == period_id,
+            JournalEntry.status == "POSTED",
+            EntryLine.id.not_in(reconciled_entry_lines(bank_account_id, period_id)),
+        )
+    ).all()
+
+    opts = options or MatchingOptions()
+    bank_refs = book_refs = None
+    if opts.use_references:
+        bank_refs = {tx_id: reference_tokens(descripcion, referencia) for tx_id, _, _, descripcion, referencia in banco}
+        book_refs = _referencias_libros(db, period_id, libros)
+    return match_movements(
+        [(tx_id, fecha.toordinal(), monto) for tx_id, fecha, monto, *_ in banco],
+        [(line_id, fecha.toordinal(), monto) for line_id, fecha, monto, *_ in libros],
+        opts,
+        bank_refs,
+        book_refs,
+    )
+
+
+def _referencias_libros(db: Session, period_id: int, libros: Sequence) -> Dict[int, Set[str]]:
+    """
+    Tokens de referencia de cada línea contable: memo, RUC del tercero, glosa
+    del asiento y comprobantes vinculados al asiento (venta/compra que lo
+    generó o cobrada/pagada por él, con la referencia del pago).
+    """
+    asientos = select(JournalEntry.id).where(JournalEntry.period_id == period_id)
+    cliente = ThirdParty.__table__.alias("cliente")
+    proveedor = ThirdParty.__table__.alias("proveedor")
+    documentos = union(
+        select(Sale.journal_entry_id, Sale.series, Sale.number, cliente.c.tax_id, null())
+        .outerjoin(cliente, cliente.c.id == Sale.customer_id)
+        .where(Sale.journal_entry_id.in_(asientos)),
+        select(Purchase.journal_entry_id, Purchase.series, Purchase.number, proveedor.c.tax_id, null())
+        .outerjoin(proveedor, proveedor.c.id == Purchase.supplier_id)
+        .where(Purchase.journal_entry_id.in_(asientos)),
+        select(
+            PaymentTransaction.journal_entry_id,
+            func.coalesce(Sale.series, Purchase.series),
+            func.coalesce(Sale.number, Purchase.number),
+            func.coalesce(cliente.c.tax_id, proveedor.c.tax_id),
+            PaymentTransaction.payment_reference,
+        )
+        .outerjoin(Sale, Sale.id == PaymentTransaction.sale_id)
+        .outerjoin(cliente, cliente.c.id == Sale.customer_id)
+        .outerjoin(Purchase, Purchase.id == PaymentTransaction.purchase_id)
+        .outerjoin(proveedor, proveedor.c.id == Purchase.supplier_id)
+        .where(PaymentTransaction.journal_entry_id.in_(asientos)),
+    )
+    por_asiento: Dict[int, Set[str]] = {}
+    for entry_id, serie, numero, ruc, referencia in db.execute(documentos):
+        comprobante = f"{serie}-{numero}" if serie and numero else None
+        por_asiento.setdefault(entry_id, set()).update(reference_tokens(comprobante, ruc, referencia))
+
+    # La glosa se tokeniza una vez por asiento
+    tokens_glosa: Dict[int, Set[str]] = {}
+    resultado: Dict[int, Set[str]] = {}
+    for line_id, _, _, entry_id, memo, glosa, ruc in libros:
+        asiento = tokens_glosa.get(entry_id)
+        if asiento is None:
+            asiento = tokens_glosa[entry_id] = reference_tokens(glosa) | por_asiento.get(entry_id, set())
+        tokens = reference_tokens(memo, ruc)
+        resultado[line_id] = tokens | asiento if tokens else asiento
+    return resultado
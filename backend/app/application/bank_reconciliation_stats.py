@@ -0,0 +1,418 @@
+"""
+Resumen incremental de conciliación bancaria
+============================================
+
+Por cada (cuenta bancaria, período) bank_reconciliation_stats guarda el
+movimiento contable del período, el saldo contable acumulado hasta el período
+y los conteos de líneas contables y movimientos bancarios (totales y
+conciliados). El resumen de conciliación lee una fila y el cierre solo
+recuenta su propio período en lugar de recorrer todos los asientos de la
+cuenta desde el primer período:
+
+- Match y desconciliación ajustan los conteos con un UPDATE de diferencias
+- Crear, postear, anular o editar asientos marca, en el flush de la sesión,
+  la fila del período como desactualizada (stale); al consultarla se recuenta
+  solo ese período y la diferencia de movimiento se suma al saldo acumulado
+  de ese período y los siguientes
+- Los extractos importados marcan la fila de su período de la misma forma
+- Una cuenta sin filas (datos anteriores a la tabla) se construye completa la
+  primera vez que se refresca
+- Las rutas que modifican (importación, match, cierre) refrescan y guardan
+  las filas; la consulta del resumen (GET) no escribe: recuenta en memoria
+  los períodos marcados
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, case, event, func, insert, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..domain.models import (
+    BankAccount,
+    BankReconciliationStats,
+    BankStatement,
+    BankTransaction,
+    EntryLine,
+    JournalEntry,
+    Period,
+)
+from .bank_matching import reconciled_entry_lines
+
+logger = logging.getLogger(__name__)
+
+# (account_id contable, period_id) con asientos modificados en el flush
+ClavePeriodo = Tuple[int, int]
+
+_SESSION_INFO_KEY = "conciliacion_periodos_pendientes"
+
+_CONTEOS = ("book_movement", "book_lines", "book_lines_reconciled", "bank_transactions", "bank_transactions_reconciled")
+
+
+def _desde(table, year: int, month: int):
+    """Filas de (year, month) en adelante."""
+    return or_(table.c.year > year, and_(table.c.year == year, table.c.month >= month))
+
+
+def _hasta(table, year: int, month: int):
+    """Filas hasta (year, month) inclusive."""
+    return or_(table.c.year < year, and_(table.c.year == year, table.c.month <= month))
+
+
+# ===== CONTEOS POR PERÍODO =====
+
+def _contar_periodo(db, bank_account_id: int, account_id: int, period_id: int) -> Dict[str, object]:
+    """Recuenta un (cuenta bancaria, período) con consultas acotadas al período."""
+    lineas = (
+        select(EntryLine.id, EntryLine.debit, EntryLine.credit)
+        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
+        .where(
+            EntryLine.account_id == account_id,
+            JournalEntry.period_id == period_id,
+            JournalEntry.status == "POSTED",
+        )
+        .subquery()
+    )
+    conciliadas = reconciled_entry_lines(bank_account_id, period_id)
+    movimiento, total_lineas, lineas_conciliadas = db.execute(
+        select(
+            func.coalesce(func.sum(lineas.c.debit - lineas.c.credit), 0),
+            func.count(lineas.c.id),
+            func.coalesce(func.sum(case((lineas.c.id.in_(conciliadas), 1), else_=0)), 0),
+        )
+    ).one()
+    movimientos, movimientos_conciliados = db.execute(
+        select(
+            func.count(BankTransaction.id),
+            func.coalesce(func.sum(case((BankTransaction.reconciled == True, 1), else_=0)), 0),
+        )
+        .join(BankStatement, BankStatement.id == BankTransaction.statement_id)
+        .where(BankStatement.bank_account_id == bank_account_id, BankStatement.period_id == period_id)
+    ).one()
+    return {
+        "book_movement": Decimal(movimiento or 0).quantize(Decimal("0.01")),
+        "book_lines": int(total_lineas or 0),
+        "book_lines_reconciled": int(lineas_conciliadas or 0),
+        "bank_transactions": int(movimientos or 0),
+        "bank_transactions_reconciled": int(movimientos_conciliados or 0),
+    }
+
+
+def _guardar_conteos(db, fila, conteos: Dict[str, object]) -> None:
+    """Escribe los conteos de una fila y propaga la diferencia de movimiento al saldo acumulado."""
+    table = BankReconciliationStats.__table__
+    delta = Decimal(conteos["book_movement"]) - Decimal(fila.book_movement or 0)
+    db.execute(
+        update(table).where(table.c.id == fila.id)
+        .values(stale=False, updated_at=datetime.now(), **conteos)
+    )
+    if delta:
+        db.execute(
+            update(table)
+            .where(table.c.bank_account_id == fila.bank_account_id, _desde(table, fila.year, fila.month))
+            .values(book_balance=table.c.book_balance + delta)
+        )
+
+
+def _construir(db, bank_account: BankAccount, period: Period) -> None:
+    """Crea las filas de una cuenta bancaria que aún no tiene resumen (una sola vez)."""
+    periodos = {period.id: (period.year, period.month)}
+    con_asientos = (
+        select(Period.id, Period.year, Period.month)
+        .join(JournalEntry, JournalEntry.period_id == Period.id)
+        .join(EntryLine, EntryLine.entry_id == JournalEntry.id)
+        .where(EntryLine.account_id == bank_account.account_id, JournalEntry.status == "POSTED")
+    )
+    con_extractos = (
+        select(Period.id, Period.year, Period.month)
+        .join(BankStatement, BankStatement.period_id == Period.id)
+        .where(BankStatement.bank_account_id == bank_account.id)
+    )
+    for period_id, year, month in db.execute(con_asientos.union(con_extractos)):
+        periodos[period_id] = (year, month)
+
+    saldo = Decimal("0")
+    filas = []
+    now = datetime.now()
+    for period_id, (year, month) in sorted(periodos.items(), key=lambda p: p[1]):
+        conteos = _contar_periodo(db, bank_account.id, bank_account.account_id, period_id)
+        saldo += conteos["book_movement"]
+        filas.append({
+            "bank_account_id": bank_account.id, "period_id": period_id, "year": year, "month": month,
+            "book_balance": saldo, "stale": False, "updated_at": now, **conteos,
+        })
+    try:
+        with db.begin_nested():
+            db.execute(insert(BankReconciliationStats.__table__), filas)
+    except IntegrityError:
+        # Otra transacción construyó el resumen en paralelo
+        pass
+
+
+# ===== MARCAS DE DESACTUALIZACIÓN =====
+
+def mark_stale(db, pairs: Iterable[Tuple[int, int]]) -> None:
+    """
+    Marca como desactualizados los (cuenta bancaria, período) indicados.
+
+    Si la cuenta ya tiene resumen y el período aún no tiene fila, la crea con
+    el saldo acumulado del período anterior. No hace commit; acepta la sesión
+    o su conexión (para usarlo dentro de un flush).
+
+    Args:
+        pairs: Pares (bank_account_id, period_id)
+    """
+    table = BankReconciliationStats.__table__
+    now = datetime.now()
+    for bank_account_id, period_id in sorted(set(pairs)):
+        where = (table.c.bank_account_id == bank_account_id) & (table.c.period_id == period_id)
+        stmt = update(table).where(where).values(stale=True, updated_at=now)
+        if db.execute(stmt).rowcount:
+            continue
+        if db.execute(select(table.c.id).where(table.c.bank_account_id == bank_account_id).limit(1)).first() is None:
+            continue  # Sin resumen todavía: se construye completo en la primera consulta
+        periodo = db.execute(select(Period.year, Period.month).where(Period.id == period_id)).first()
+        if periodo is None:
+            continue
+        anterior = db.execute(
+            select(table.c.book_balance)
+            .where(
+                table.c.bank_account_id == bank_account_id,
+                or_(table.c.year < periodo.year, and_(table.c.year == periodo.year, table.c.month < periodo.month)),
+            )
+            .order_by(table.c.year.desc(), table.c.month.desc())
+            .limit(1)
+        ).scalar()
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(
+                    bank_account_id=bank_account_id, period_id=period_id, year=periodo.year, month=periodo.month,
+                    book_balance=anterior or 0, stale=True, updated_at=now,
+                ))
+        except IntegrityError:
+            db.execute(stmt)
+
+
+def _valores(obj, attr: str) -> Set:
+    """Valores actual y anterior (si cambió) de un atributo."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in (getattr(obj, attr), *history.deleted) if v is not None}
+
+
+def _cambio(obj, attrs: Sequence[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _claves_de_objeto(session: Session, obj) -> Iterable[ClavePeriodo]:
+    if isinstance(obj, JournalEntry):
+        if obj not in session.new and obj not in session.deleted and not _cambio(obj, ("status", "period_id")):
+            return
+        periodos = _valores(obj, "period_id")
+        for line in obj.lines:
+            for account_id in _valores(line, "account_id"):
+                for period_id in periodos:
+                    yield (account_id, period_id)
+    elif isinstance(obj, EntryLine):
+        if obj not in session.new and obj not in session.deleted and not _cambio(
+            obj, ("account_id", "debit", "credit", "entry_id")
+        ):
+            return
+        entry = obj.entry
+        if entry is None and obj.entry_id is not None:
+            entry = session.get(JournalEntry, obj.entry_id)
+        if entry is None:
+            return
+        for account_id in _valores(obj, "account_id"):
+            for period_id in _valores(entry, "period_id"):
+                yield (account_id, period_id)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """Registra las cuentas contables y períodos afectados por los cambios pendientes."""
+    pendientes: Set[ClavePeriodo] = session.info.setdefault(_SESSION_INFO_KEY, set())
+    with session.no_autoflush:
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            pendientes.update(_claves_de_objeto(session, obj))
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """Marca, en la misma transacción, los períodos de las cuentas bancarias afectadas."""
+    pendientes = session.info.pop(_SESSION_INFO_KEY, None)
+    if not pendientes:
+        return
+    conn = session.connection()
+    bancos: Dict[int, list] = {}
+    for bank_account_id, account_id in conn.execute(
+        select(BankAccount.id, BankAccount.account_id)
+        .where(BankAccount.account_id.in_({account_id for account_id, _ in pendientes}))
+    ):
+        bancos.setdefault(account_id, []).append(bank_account_id)
+    pares = {
+        (bank_account_id, period_id)
+        for account_id, period_id in pendientes
+        for bank_account_id in bancos.get(account_id, ())
+    }
+    if pares:
+        mark_stale(conn, pares)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def register_bank_reconciliation_listeners(session_factory=Session) -> None:
+    """Instala los listeners que marcan el resumen al cambiar asientos (idempotente)."""
+    for nombre, fn in (("before_flush", _before_flush), ("after_flush", _after_flush), ("after_rollback", _after_rollback)):
+        if not event.contains(session_factory, nombre, fn):
+            event.listen(session_factory, nombre, fn)
+
+
+# ===== CONSULTA =====
+
+def _fila(db: Session, bank_account_id: int, period_id: int) -> Optional[BankReconciliationStats]:
+    return db.execute(
+        select(BankReconciliationStats)
+        .where(BankReconciliationStats.bank_account_id == bank_account_id, BankReconciliationStats.period_id == period_id)
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
+def refresh_stats(db: Session, bank_account: BankAccount, period: Period) -> BankReconciliationStats:
+    """
+    Resumen al día de una cuenta bancaria en un período.
+
+    Recuenta solo los períodos marcados hasta el indicado (normalmente
+    ninguno o uno). No hace commit.
+    """
+    table = BankReconciliationStats.__table__
+    if db.execute(select(table.c.id).where(table.c.bank_account_id == bank_account.id).limit(1)).first() is None:
+        _construir(db, bank_account, period)
+    if _fila(db, bank_account.id, period.id) is None:
+        mark_stale(db, [(bank_account.id, period.id)])
+
+    desactualizadas = db.execute(
+        select(table)
+        .where(table.c.bank_account_id == bank_account.id, table.c.stale == True, _hasta(table, period.year, period.month))
+        .order_by(table.c.year, table.c.month)
+    ).all()
+    for fila in desactualizadas:
+        _guardar_conteos(db, fila, _contar_periodo(db, bank_account.id, bank_account.account_id, fila.period_id))
+    return _fila(db, bank_account.id, period.id)
+
+
+def _saldo_hasta(db: Session, account_id: int, period: Period) -> Decimal:
+    """Saldo contable (POSTED) de la cuenta hasta el período inclusive, en una consulta agregada."""
+    saldo = db.execute(
+        select(func.coalesce(func.sum(EntryLine.debit - EntryLine.credit), 0))
+        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
+        .join(Period, Period.id == JournalEntry.period_id)
+        .where(
+            EntryLine.account_id == account_id,
+            JournalEntry.status == "POSTED",
+            or_(Period.year < period.year, and_(Period.year == period.year, Period.month <= period.month)),
+        )
+    ).scalar()
+    return Decimal(saldo or 0).quantize(Decimal("0.01"))
+
+
+def summary_stats(db: Session, bank_account: BankAccount, period: Period) -> Dict[str, object]:
+    """
+    Resumen al día de una cuenta bancaria en un período, sin escribir.
+
+    Para consultas de solo lectura: si hay períodos marcados hasta el indicado
+    los recuenta en memoria y suma la diferencia de movimiento al saldo
+    guardado; una cuenta sin resumen se calcula con una consulta agregada.
+    Las filas se actualizan con refresh_stats en las rutas que modifican.
+
+    Returns:
+        Dict con book_balance y los conteos de _CONTEOS
+    """
+    table = BankReconciliationStats.__table__
+    filas = db.execute(
+        select(table)
+        .where(table.c.bank_account_id == bank_account.id, _hasta(table, period.year, period.month))
+        .order_by(table.c.year, table.c.month)
+    ).all()
+    propia = next((f for f in filas if f.period_id == period.id), None)
+    if propia is not None and not propia.stale:
+        conteos = {c: getattr(propia, c) for c in _CONTEOS}
+    else:
+        conteos = _contar_periodo(db, bank_account.id, bank_account.account_id, period.id)
+
+    if not filas:
+        saldo = _saldo_hasta(db, bank_account.account_id, period)
+    elif propia is None:
+        # Sin fila propia: saldo del último período anterior más el movimiento del período
+        saldo = Decimal(filas[-1].book_balance or 0) + conteos["book_movement"]
+    else:
+        saldo = Decimal(propia.book_balance or 0)
+    for fila in filas:
+        if not fila.stale:
+            continue
+        # El saldo guardado incluye el movimiento anterior de cada período marcado
+        movimiento = (
+            conteos["book_movement"] if fila is propia
+            else _contar_periodo(db, bank_account.id, bank_account.account_id, fila.period_id)["book_movement"]
+        )
+        saldo += Decimal(movimiento) - Decimal(fila.book_movement or 0)
+    return {"book_balance": saldo, **conteos}
+
+
+def verify_stats(db: Session, bank_account: BankAccount, period: Period) -> BankReconciliationStats:
+    """
+    Verificación de consistencia para el cierre: recuenta el período y, si la
+    fila no coincide (p. ej. cambios hechos fuera de la sesión ORM), la corrige
+    y propaga la diferencia. No hace commit.
+    """
+    fila = refresh_stats(db, bank_account, period)
+    conteos = _contar_periodo(db, bank_account.id, bank_account.account_id, period.id)
+    if any(conteos[c] != getattr(fila, c) for c in _CONTEOS):
+        logger.warning(
+            "Resumen de conciliación inconsistente (cuenta bancaria %s, período %s): %s",
+            bank_account.id, period.id,
+            {c: (getattr(fila, c), conteos[c]) for c in _CONTEOS if conteos[c] != getattr(fila, c)},
+        )
+        _guardar_conteos(db, fila, conteos)
+        fila = _fila(db, bank_account.id, period.id)
+    return fila
+
+
+# ===== MATCHES =====
+
+def count_reconciled_lines(db: Session, bank_account_id: int, period_id: int, line_ids: Sequence[int]) -> int:
+    """Cuántas de las líneas (POSTED, de la cuenta y del período) figuran conciliadas en el período."""
+    if not line_ids:
+        return 0
+    return db.execute(
+        select(func.count(EntryLine.id))
+        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
+        .where(
+            EntryLine.id.in_(list(line_ids)),
+            EntryLine.account_id == select(BankAccount.account_id).where(BankAccount.id == bank_account_id).scalar_subquery(),
+            JournalEntry.period_id == period_id,
+            JournalEntry.status == "POSTED",
+            EntryLine.id.in_(reconciled_entry_lines(bank_account_id, period_id)),
+        )
+    ).scalar() or 0
+
+
+def apply_match_delta(db: Session, bank_account_id: int, period_id: int, transactions: int, lines: int) -> None:
+    """
+    Ajusta los conteos conciliados tras un match (+1) o una desconciliación (-1).
+
+    Las filas inexistentes o marcadas se ignoran: su recuento ya incluirá el
+    cambio. No hace commit.
+    """
+    table = BankReconciliationStats.__table__
+    db.execute(
+        update(table)
+        .where(table.c.bank_account_id == bank_account_id, table.c.period_id == period_id, table.c.stale == False)
+        .values(
+            bank_transactions_reconciled=table.c.bank_transactions_reconciled + transactions,
+            book_lines_reconciled=table.c.book_lines_reconciled + lines,
+            updated_at=datetime.now(),
+        )
+    )
@@ -0,0 +1,222 @@
+"""
+Importación masiva de extractos bancarios
+=========================================
+
+Carga los movimientos de un extracto (archivo CSV/XLSX/MT940/OFX o lista ya
+parseada) en bank_transactions:
+
+- Los movimientos se recorren en streaming y se insertan por lotes con un
+  único INSERT (executemany) por lote
+- Cada movimiento lleva una huella (sha1 de cuenta, fecha, monto, referencia y
+  descripción normalizada); los que ya existen en la cuenta se omiten
+  consultando el índice único de bank_transactions.fingerprint lote por lote;
+  si una importación paralela gana la carrera, el lote se vuelve a filtrar
+- Movimientos idénticos dentro del mismo archivo se distinguen por su número
+  de aparición, así que reimportar el mismo archivo no duplica nada pero dos
+  comisiones iguales del mismo día se cargan ambas
+"""
+import hashlib
+from datetime import date
+from decimal import Decimal
+from typing import IO, Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..domain.models import BankStatement, BankTransaction
+from ..infrastructure.bank_statement_parser import BankStatementReader
+from .bank_reconciliation_stats import mark_stale
+
+
+def transaction_fingerprint(bank_account_id: int, tx: Dict[str, Any], occurrence: int = 0) -> str:
+    """
+    Huella de un movimiento bancario (sha1 hex de 40 caracteres).
+
+    Args:
+        tx: Movimiento con transaction_date, debit, credit, reference y description
+        occurrence: Número de aparición de un movimiento idéntico en el mismo extracto
+    """
+    descripcion = " ".join(str(tx.get("description") or "").upper().split())
+    referencia = str(tx.get("reference") or "").strip().upper()
+    clave = "|".join((
+        str(bank_account_id),
+        tx["transaction_date"].isoformat(),
+        f"{Decimal(tx.get('debit') or 0):.2f}",
+        f"{Decimal(tx.get('credit') or 0):.2f}",
+        referencia,
+        descripcion,
+        str(occurrence),
+    ))
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()
+
+
+def insert_bank_transactions(
+    db: Session,
+    statement: BankStatement,
+    rows: Iterable[Dict[str, Any]],
+    opening_balance: Optional[Decimal] = None,
+    chunk_size: int = 1000,
+) -> Dict[str, int]:
+    """
+    Inserta movimientos en un extracto omitiendo los ya cargados en la cuenta.
+
+    No hace commit. Marca el período en el resumen de conciliación. Si un
+    movimiento no trae saldo (MT940, OFX) se calcula el saldo corrido desde
+    opening_balance (por defecto el del extracto).
+
+    Args:
+        statement: Extracto ya persistido (con id)
+        rows: Movimientos normalizados (ver BankStatementReader)
+        opening_balance: Saldo inicial para el saldo corrido
+        chunk_size: Movimientos por INSERT y por consulta de duplicados
+
+    Returns:
+        Dict con imported, duplicates y last_date (fecha del último movimiento)
+    """
+    stmt = insert(BankTransaction.__table__)  # INSERT de Core: sin la contabilidad del ORM por fila
+    bank_account_id = statement.bank_account_id
+    apariciones: Dict[str, int] = {}
+    saldo: Optional[Decimal] = None
+    importados = duplicados = 0
+    ultima_fecha: Optional[date] = None
+    lote: List[Dict[str, Any]] = []
+
+    def guardar(lote: List[Dict[str, Any]]) -> int:
+        while True:
+            existentes = set(db.execute(
+                select(BankTransaction.fingerprint)
+                .where(BankTransaction.fingerprint.in_([r["fingerprint"] for r in lote]))
+            ).scalars())
+            nuevos = [r for r in lote if r["fingerprint"] not in existentes]
+            if not nuevos:
+                return 0
+            try:
+                with db.begin_nested():
+                    db.execute(stmt, nuevos)
+                return len(nuevos)
+            except IntegrityError:
+                # Otra importación cargó parte del lote en paralelo (índice único): volver a filtrar
+                continue
+
+    for tx in rows:
+        base = transaction_fingerprint(bank_account_id, tx)
+        ocurrencia = apariciones.get(base, 0)
+        apariciones[base] = ocurrencia + 1
+        debe = Decimal(tx.get("debit") or 0)
+        haber = Decimal(tx.get("credit") or 0)
+        if tx.get("balance") is not None:
+            saldo = Decimal(tx["balance"])
+        else:
+            if saldo is None:
+                saldo = Decimal(opening_balance if opening_balance is not None else statement.opening_balance or 0)
+            saldo += haber - debe
+        lote.append({
+            "statement_id": statement.id,
+            "transaction_date": tx["transaction_date"],
+            "description": str(tx.get("description") or "")[:500],
+            "reference": (str(tx["reference"])[:100] if tx.get("reference") else None),
+            "debit": debe,
+            "credit": haber,
+            "balance": saldo,
+            "reconciled": False,
+            "fingerprint": base if ocurrencia == 0 else transaction_fingerprint(bank_account_id, tx, ocurrencia),
+        })
+        ultima_fecha = max(ultima_fecha, tx["transaction_date"]) if ultima_fecha else tx["transaction_date"]
+        if len(lote) >= chunk_size:
+            nuevos = guardar(lote)
+            importados += nuevos
+            duplicados += len(lote) - nuevos
+            lote = []
+    if lote:
+        nuevos = guardar(lote)
+        importados += nuevos
+        duplicados += len(lote) - nuevos
+    if importados:
+        # Los movimientos entran por Core, sin flush: marcar el resumen de conciliación
+        mark_stale(db, [(bank_account_id, statement.period_id)])
+    return {"imported": importados, "duplicates": duplicados, "last_date": ultima_fecha}
+
+
+def import_bank_statement(
+    db: Session,
+    bank_account_id: int,
+    period_id: int,
+    uploaded_by: int,
+    stream: IO[bytes],
+    filename: str = "",
+    statement_date: Optional[date] = None,
+    opening_balance: Optional[Decimal] = None,
+    closing_balance: Optional[Decimal] = None,
+    fmt: Optional[str] = None,
+    chunk_size: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Importa un archivo de extracto bancario (CSV, XLSX, MT940 u OFX).
+
+    Los saldos y la fecha que no se indiquen se toman del archivo si los trae
+    (MT940, OFX) o, en su defecto, del último movimiento. Si todos los
+    movimientos ya estaban cargados no se crea el extracto. No hace commit.
+
+    Args:
+        stream: Archivo binario con seek (p. ej. UploadFile.file)
+        filename: Nombre original, para detectar el formato
+        fmt: Forzar formato (CSV, XLSX, MT940, OFX)
+
+    Returns:
+        Dict con statement_id (None si no hubo movimientos nuevos), format,
+        imported, duplicates y skipped
+
+    Raises:
+        ValueError: formato no soportado o sin cabecera reconocible
+    """
+    reader = BankStatementReader(stream, filename, fmt)
+    statement = BankStatement(
+        bank_account_id=bank_account_id,
+        period_id=period_id,
+        statement_date=statement_date or date.today(),
+        opening_balance=opening_balance if opening_balance is not None else Decimal("0"),
+        closing_balance=closing_balance if closing_balance is not None else Decimal("0"),
+        uploaded_by=uploaded_by,
+        status="PENDIENTE",
+    )
+    db.add(statement)
+    db.flush()
+
+    def filas():
+        # El saldo inicial de MT940 (:60F:) se conoce antes del primer movimiento
+        for tx in reader:
+            if opening_balance is None and reader.opening_balance is not None:
+                statement.opening_balance = reader.opening_balance
+            yield tx
+
+    resultado = insert_bank_transactions(db, statement, filas(), opening_balance, chunk_size)
+
+    if resultado["imported"] == 0:
+        db.delete(statement)
+        db.flush()
+        statement_id = None
+    else:
+        if statement_date is None:
+            statement.statement_date = reader.statement_date or resultado["last_date"] or statement.statement_date
+        if closing_balance is None:
+            if reader.closing_balance is not None:
+                statement.closing_balance = reader.closing_balance
+            else:
+                ultimo = db.execute(
+                    select(BankTransaction.balance)
+                    .where(BankTransaction.statement_id == statement.id)
+                    .order_by(BankTransaction.id.desc())
+                    .limit(1)
+                ).scalar()
+                statement.closing_balance = ultimo if ultimo is not None else statement.opening_balance
+        db.flush()
+        statement_id = statement.id
+
+    return {
+        "statement_id": statement_id,
+        "format": reader.format,
+        "imported": resultado["imported"],
+        "duplicates": resultado["duplicates"],
+        "skipped": reader.skipped_rows,
+    }
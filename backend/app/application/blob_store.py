@@ -0,0 +1,212 @@
+"""
+Almacén de contenido direccionado por hash
+==========================================
+
+Los clientes suben una y otra vez el mismo XML/PDF del proveedor. En lugar de
+guardar una copia por upload con nombre UUID, el contenido se guarda una sola
+vez en blobs/{hash[0:2]}/{hash[2:4]}/{hash} dentro del storage de documentos:
+
+- stored_blobs lleva el conteo de referencias (documentos y adjuntos de la
+  casilla); el incremento es un UPDATE atómico y la alta concurrente del mismo
+  hash se resuelve con la restricción única
+- Al liberar la última referencia el archivo no se borra en la misma
+  transacción (un rollback dejaría la fila apuntando a nada): queda marcado y
+  purge_unreferenced_blobs lo elimina pasado un período de gracia
+- La purga borra la fila antes que el archivo y confirma después: el DELETE
+  bloquea la fila, así que un put concurrente del mismo hash espera y, al no
+  encontrarla, da de alta el blob y vuelve a escribir el archivo
+- Un archivo nuevo se escribe antes del commit; hasta entonces queda una marca
+  en blobs/pending/{hash}. El commit la quita (register_blob_store_listeners)
+  y, si la transacción no se confirma, la purga elimina el archivo huérfano
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional, Union
+
+from sqlalchemy import case, delete, event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_documents_v2 import StoredBlob
+from ..infrastructure.renditions import delete_renditions
+from ..infrastructure.storage import FileStorageService, LocalFileStorage, get_storage_service
+from ..infrastructure.uploads import StagedUpload
+
+PENDING_DIR = "blobs/pending"
+
+_SESSION_INFO_KEY = "blobs_pendientes"
+
+
+def get_blob_storage() -> FileStorageService:
+    """Storage donde viven los blobs (el mismo de los documentos)"""
+    return get_storage_service(storage_type="local", base_path=settings.uploads_path.parent / "documents")
+
+
+def blob_path(sha256: str) -> str:
+    """Ruta relativa del blob, repartida en dos niveles de directorios por hash"""
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def pending_marker_path(sha256: str) -> str:
+    """Marca de un blob escrito por una transacción aún no confirmada"""
+    return f"{PENDING_DIR}/{sha256}"
+
+
+class BlobStore:
+    """Alta y baja de referencias a blobs. No hace commit: lo hace el llamador."""
+
+    def __init__(self, db: Session, storage: Optional[FileStorageService] = None):
+        self.db = db
+        self.storage = storage or get_blob_storage()
+
+    def put(self, content: Union[bytes, StagedUpload], sha256: Optional[str] = None) -> StoredBlob:
+        """
+        Agrega una referencia al contenido, guardándolo solo si aún no existe.
+
+        Args:
+            content: Contenido del archivo, o upload en un temporal (se mueve
+                al storage sin cargarlo en memoria; si el blob ya existía el
+                temporal queda y lo descarta el llamador)
+            sha256: Hash ya calculado por el llamador (se calcula si falta)
+
+        Returns:
+            StoredBlob con la referencia ya contada
+        """
+        if isinstance(content, StagedUpload):
+            sha256, size = content.sha256, content.size
+        else:
+            sha256, size = sha256 or hashlib.sha256(content).hexdigest(), len(content)
+        if not self._incrementar(sha256):
+            try:
+                with self.db.begin_nested():
+                    self.db.add(StoredBlob(
+                        sha256=sha256, size=size, blob_path=blob_path(sha256),
+                        ref_count=1, created_at=datetime.now(),
+                    ))
+            except IntegrityError:
+                # Otra transacción dio de alta el mismo contenido en paralelo
+                self._incrementar(sha256)
+        blob = self.db.execute(
+            select(StoredBlob).where(StoredBlob.sha256 == sha256).execution_options(populate_existing=True)
+        ).scalar_one()
+        if not self.storage.exists(blob.blob_path):
+            self.storage.save(pending_marker_path(sha256), b"")
+            self.db.info.setdefault(_SESSION_INFO_KEY, []).append((self.storage, sha256))
+            if isinstance(content, StagedUpload):
+                self.storage.save_file(blob.blob_path, content.path)
+            else:
+                self.storage.save(blob.blob_path, content)
+        return blob
+
+    def _incrementar(self, sha256: str) -> bool:
+        result = self.db.execute(
+            update(StoredBlob)
+            .where(StoredBlob.sha256 == sha256)
+            .values(ref_count=StoredBlob.ref_count + 1, released_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def release(self, blob_id: int) -> None:
+        """Quita una referencia; al llegar a cero el blob queda pendiente de purga."""
+        self.db.execute(
+            update(StoredBlob)
+            .where(StoredBlob.id == blob_id, StoredBlob.ref_count > 0)
+            .values(
+                ref_count=StoredBlob.ref_count - 1,
+                released_at=case((StoredBlob.ref_count == 1, datetime.now()), else_=StoredBlob.released_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _after_commit(session: Session) -> None:
+    for storage, sha256 in session.info.pop(_SESSION_INFO_KEY, ()):
+        storage.delete(pending_marker_path(sha256))
+
+
+def _after_transaction_end(session: Session, transaction) -> None:
+    # Rollback o cierre sin commit: las marcas quedan para la purga
+    if transaction.parent is None:
+        session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def register_blob_store_listeners(session_factory=Session) -> None:
+    """Instala los listeners que quitan las marcas de pendiente al confirmar (idempotente)."""
+    for nombre, fn in (("after_commit", _after_commit), ("after_transaction_end", _after_transaction_end)):
+        if not event.contains(session_factory, nombre, fn):
+            event.listen(session_factory, nombre, fn)
+
+
+def purge_unreferenced_blobs(
+    db: Session,
+    storage: Optional[FileStorageService] = None,
+    grace_hours: Optional[float] = None,
+) -> int:
+    """
+    Elimina los blobs sin referencias liberados hace más del período de gracia
+    (con sus miniaturas y vistas previas), y los archivos pendientes cuya
+    transacción no se confirmó.
+
+    El borrado de la fila es condicional (ref_count sigue en cero), por lo que
+    un upload concurrente que lo volvió a referenciar lo conserva. La fila se
+    borra antes que el archivo y el commit va al final: mientras tanto un put
+    del mismo hash queda esperando el bloqueo de la fila.
+
+    Returns:
+        Cantidad de blobs eliminados
+    """
+    storage = storage or get_blob_storage()
+    if grace_hours is None:
+        grace_hours = settings.blob_gc_grace_hours
+    limite = datetime.now() - timedelta(hours=grace_hours)
+    candidatos = db.execute(
+        select(StoredBlob.id, StoredBlob.blob_path, StoredBlob.sha256)
+        .where(StoredBlob.ref_count == 0, StoredBlob.released_at <= limite)
+    ).all()
+    eliminados = 0
+    for blob_id, path, sha256 in candidatos:
+        result = db.execute(delete(StoredBlob).where(StoredBlob.id == blob_id, StoredBlob.ref_count == 0))
+        if result.rowcount == 1:
+            storage.delete(path)
+            delete_renditions(storage, sha256)
+            eliminados += 1
+        db.commit()
+    return eliminados + _purgar_pendientes(db, storage, limite)
+
+
+def _purgar_pendientes(db: Session, storage: FileStorageService, limite: datetime) -> int:
+    """
+    Elimina los archivos con marca de pendiente anterior a `limite` que no
+    tienen fila en stored_blobs (la transacción que los escribió no se confirmó).
+
+    Para excluir a un put concurrente del mismo hash la purga da de alta una
+    fila provisional: si ya existe, el blob es válido y solo se quita la marca.
+    """
+    if not isinstance(storage, LocalFileStorage):
+        return 0
+    carpeta = storage.get_full_path(PENDING_DIR)
+    if not carpeta.is_dir():
+        return 0
+    eliminados = 0
+    for marca in list(carpeta.iterdir()):
+        if datetime.fromtimestamp(marca.stat().st_mtime) > limite:
+            continue
+        sha256 = marca.name
+        try:
+            with db.begin_nested():
+                db.execute(insert(StoredBlob).values(
+                    sha256=sha256, size=0, blob_path=blob_path(sha256),
+                    ref_count=0, created_at=datetime.now(),
+                ))
+        except IntegrityError:
+            storage.delete(pending_marker_path(sha256))
+            continue
+        storage.delete(blob_path(sha256))
+        delete_renditions(storage, sha256)
+        storage.delete(pending_marker_path(sha256))
+        db.execute(delete(StoredBlob).where(StoredBlob.sha256 == sha256))
+        db.commit()
+        eliminados += 1
+    return eliminados
@@ -0,0 +1,600 @@
+"""
+Importación masiva de comprobantes de compra (ZIP de XML UBL 2.1)
+================================================================
+
+Los proveedores envían ZIPs mensuales con miles de facturas electrónicas. En
+lugar de subir y digitar cada una:
+
+- Los miembros del ZIP se leen de a uno (nunca se extrae el ZIP completo) y
+  cada XML se parsea con lxml `iterparse`, liberando los elementos ya leídos
+  (la firma digital y las extensiones no llegan a acumularse en memoria)
+- Los proveedores se resuelven por RUC con un mapa cargado una vez; los que no
+  existen se crean en bloque
+- Los comprobantes ya registrados (mismo proveedor, tipo, serie y número) se
+  omiten
+- Por lote: asientos con MotorAsientos.generar_asientos_lote, compras y líneas
+  en un flush, y el XML como Document vinculado a la compra; commit por lote
+- El XML se guarda en el blob store antes del commit del lote: si el lote
+  falla, el archivo queda marcado como pendiente y purge_unreferenced_blobs
+  lo elimina (no se mueve a un staging aparte porque upload_document lo lee
+  del storage dentro de la misma transacción)
+
+Montos: igv es la suma de los subtotales con tributo 1000 (IGV); total es el
+importe a pagar; base = total - igv (exonerado, inafecto e impuestos no
+acreditables como ISC o ICBPER quedan en el gasto), así el asiento cuadra.
+"""
+import io
+import logging
+import zipfile
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models import Company, ThirdParty
+from ..domain.models_ext import Purchase, PurchaseLine
+from ..infrastructure.storage import FileStorageService
+from ..infrastructure.unit_of_work import UnitOfWork
+from .services_journal_engine import MotorAsientos, MotorAsientosError
+from .validations_journal_engine import CuentaInactivaError, MapeoInvalidoError, PeriodoCerradoError
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Catálogo 01 SUNAT: tipos que se registran como compra
+TIPOS_COMPRA = {"01": "FACTURA", "03": "BOLETA"}
+TRIBUTO_IGV = "1000"
+MAX_XML_SIZE = 5 * 1024 * 1024  # Un XML mayor en el ZIP se rechaza sin leerlo
+
+_ERRORES_MOTOR = (MotorAsientosError, PeriodoCerradoError, CuentaInactivaError, MapeoInvalidoError)
+
+# Rutas (nombres locales, sin el elemento raíz) de los datos de cabecera
+_SERIE_NUMERO = ("ID",)
+_FECHA = ("IssueDate",)
+_TIPO = ("InvoiceTypeCode",)
+_MONEDA = ("DocumentCurrencyCode",)
+_RUC_PROVEEDOR = ("AccountingSupplierParty", "Party", "PartyIdentification", "ID")
+_NOMBRE_PROVEEDOR = ("AccountingSupplierParty", "Party", "PartyLegalEntity", "RegistrationName")
+_RUC_CLIENTE = ("AccountingCustomerParty", "Party", "PartyIdentification", "ID")
+_SUBTOTAL_MONTO = ("TaxTotal", "TaxSubtotal", "TaxAmount")
+_SUBTOTAL_TRIBUTO = ("TaxTotal", "TaxSubtotal", "TaxCategory", "TaxScheme", "ID")
+_SUBTOTAL = ("TaxTotal", "TaxSubtotal")
+_TOTAL = ("LegalMonetaryTotal", "PayableAmount")
+_LINEA = ("InvoiceLine",)
+
+
+class CpeParseError(ValueError):
+    """El XML no es un comprobante UBL válido para registrar como compra"""
+
+
+@dataclass
+class CpeLine:
+    description: str
+    quantity: Decimal
+    unit_price: Decimal
+    base_amount: Decimal
+    igv_amount: Decimal
+
+
+@dataclass
+class CpeComprobante:
+    """Datos de un comprobante leídos del XML"""
+    filename: str
+    doc_type: str
+    series: str
+    number: str
+    issue_date: date
+    currency: str
+    supplier_ruc: str
+    supplier_name: str
+    customer_ruc: Optional[str]
+    base_amount: Decimal
+    igv_amount: Decimal
+    total_amount: Decimal
+    lines: List[CpeLine] = field(default_factory=list)
+
+    @property
+    def clave(self) -> Tuple[str, str, str, str]:
+        return (self.supplier_ruc, self.doc_type, self.series, self.number)
+
+    def extracted_data(self) -> Dict[str, Any]:
+        """Datos en el formato de DocumentExtractedData (indexados en la búsqueda)"""
+        return {
+            "ruc_emisor": self.supplier_ruc,
+            "razon_social": self.supplier_name,
+            "tipo_documento": self.doc_type,
+            "serie": self.series,
+            "numero": self.number,
+            "fecha": self.issue_date.isoformat(),
+            "moneda": self.currency,
+            "total": float(self.total_amount),
+        }
+
+
+@dataclass
+class CpeImportResult:
+    """Resumen de una importación"""
+    total: int = 0
+    created: int = 0
+    duplicates: int = 0
+    suppliers_created: int = 0
+    purchase_ids: List[int] = field(default_factory=list)
+    errors: List[Dict[str, str]] = field(default_factory=list)
+
+    def error(self, filename: str, detalle: str) -> None:
+        self.errors.append({"file": filename, "error": detalle})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _local(tag) -> str:
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def _texto(elem) -> str:
+    return (elem.text or "").strip() if elem is not None else ""
+
+
+def _monto(valor: str, campo: str) -> Decimal:
+    try:
+        return Decimal(valor).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        raise CpeParseError(f"Monto inválido en {campo}: {valor!r}")
+
+
+def _hijo(elem, *ruta: str):
+    """Primer descendiente por nombres locales (independiente del prefijo de namespace)"""
+    for nombre in ruta:
+        elem = next((c for c in elem if _local(c.tag) == nombre), None)
+        if elem is None:
+            return None
+    return elem
+
+
+def _leer_linea(elem) -> CpeLine:
+    base = _monto(_texto(_hijo(elem, "LineExtensionAmount")) or "0", "LineExtensionAmount")
+    cantidad_txt = _texto(_hijo(elem, "InvoicedQuantity")) or "1"
+    try:
+        cantidad = Decimal(cantidad_txt).quantize(Decimal("0.0001"))
+    except InvalidOperation:
+        raise CpeParseError(f"Cantidad inválida: {cantidad_txt!r}")
+    precio_txt = _texto(_hijo(elem, "Price", "PriceAmount"))
+    if precio_txt:
+        try:
+            precio = Decimal(precio_txt).quantize(Decimal("0.0001"))
+        except InvalidOperation:
+            raise CpeParseError(f"Precio inválido: {precio_txt!r}")
+    else:
+        precio = (base / cantidad).quantize(Decimal("0.0001")) if cantidad else base
+    igv = Decimal("0.00")
+    tax_total = _hijo(elem, "TaxTotal")
+    if tax_total is not None:
+        for subtotal in tax_total:
+            if _local(subtotal.tag) == "TaxSubtotal" and \
+                    _texto(_hijo(subtotal, "TaxCategory", "TaxScheme", "ID")) == TRIBUTO_IGV:
+                igv += _monto(_texto(_hijo(subtotal, "TaxAmount")) or "0", "TaxAmount")
+    item = _hijo(elem, "Item")
+    descripciones = [_texto(c) for c in item if _local(c.tag) == "Description"] if item is not None else []
+    return CpeLine(
+        description=(" ".join(d for d in descripciones if d) or "Sin descripción")[:500],
+        quantity=cantidad,
+        unit_price=precio,
+        base_amount=base,
+        igv_amount=igv,
+    )
+
+
+def parse_ubl_invoice(source: Union[bytes, io.IOBase], filename: str = "") -> CpeComprobante:
+    """
+    Lee un comprobante UBL 2.1 (Invoice) en streaming, sin construir el DOM
+    completo: los datos de cabecera se toman al cerrar cada elemento y las
+    líneas al cerrar cada InvoiceLine; luego se liberan.
+
+    Args:
+        source: Contenido del XML o archivo abierto en modo binario
+        filename: Nombre para los mensajes de error
+
+    Returns:
+        CpeComprobante
+
+    Raises:
+        CpeParseError: Si el XML no es válido, no es una factura/boleta o le faltan datos
+        RuntimeError: Si lxml no está instalado
+    """
+    if not LXML_AVAILABLE:
+        raise RuntimeError("lxml no instalado: no se pueden importar comprobantes XML")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    datos: Dict[Tuple[str, ...], str] = {}
+    lineas: List[CpeLine] = []
+    igv = Decimal("0.00")
+    subtotal_monto, subtotal_tributo = None, None
+    ruta: List[str] = []
+    raiz = None
+
+    try:
+        for evento, elem in etree.iterparse(
+            source, events=("start", "end"),
+            resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False,
+        ):
+            if evento == "start":
+                if raiz is None:
+                    raiz = _local(elem.tag)
+                    if raiz != "Invoice":
+                        raise CpeParseError(f"Tipo de comprobante no soportado: {raiz}")
+                else:
+                    ruta.append(_local(elem.tag))
+                continue
+
+            if not ruta:
+                break  # Fin del elemento raíz
+            actual = tuple(ruta)
+            dentro_de_linea = len(actual) > 1 and actual[0] == _LINEA[0]
+            if actual == _LINEA:
+                lineas.append(_leer_linea(elem))
+            elif not dentro_de_linea:
+                if actual == _SUBTOTAL_MONTO:
+                    subtotal_monto = _texto(elem)
+                elif actual == _SUBTOTAL_TRIBUTO:
+                    subtotal_tributo = _texto(elem)
+                elif actual == _SUBTOTAL:
+                    if subtotal_tributo == TRIBUTO_IGV:
+                        igv += _monto(subtotal_monto or "0", "TaxAmount")
+                    subtotal_monto, subtotal_tributo = None, None
+                elif actual in (_SERIE_NUMERO, _FECHA, _TIPO, _MONEDA, _RUC_PROVEEDOR,
+                                _NOMBRE_PROVEEDOR, _RUC_CLIENTE, _TOTAL):
+                    datos.setdefault(actual, _texto(elem))
+
+            ruta.pop()
+            if not dentro_de_linea:
+                elem.clear()
+                if len(actual) == 1:
+                    # Hijos directos de la raíz ya leídos: se descartan
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise CpeParseError(f"XML inválido: {e}")
+
+    if raiz is None:
+        raise CpeParseError("XML vacío")
+    serie_numero = datos.get(_SERIE_NUMERO, "")
+    if "-" not in serie_numero:
+        raise CpeParseError(f"Serie-número inválido: {serie_numero!r}")
+    series, number = (p.strip() for p in serie_numero.split("-", 1))
+    doc_type = datos.get(_TIPO) or "01"
+    if doc_type not in TIPOS_COMPRA:
+        raise CpeParseError(f"Tipo de comprobante no soportado: {doc_type}")
+    try:
+        issue_date = date.fromisoformat(datos.get(_FECHA, ""))
+    except ValueError:
+        raise CpeParseError(f"Fecha de emisión inválida: {datos.get(_FECHA)!r}")
+    supplier_ruc = datos.get(_RUC_PROVEEDOR)
+    if not supplier_ruc:
+        raise CpeParseError("Falta el RUC del emisor")
+    if _TOTAL not in datos:
+        raise CpeParseError("Falta el importe total (PayableAmount)")
+    total = _monto(datos[_TOTAL], "PayableAmount")
+
+    return CpeComprobante(
+        filename=filename,
+        doc_type=doc_type,
+        series=series[:10],
+        number=number[:20],
+        issue_date=issue_date,
+        currency=(datos.get(_MONEDA) or "PEN")[:3],
+        supplier_ruc=supplier_ruc,
+        supplier_name=(datos.get(_NOMBRE_PROVEEDOR) or supplier_ruc)[:200],
+        customer_ruc=datos.get(_RUC_CLIENTE) or None,
+        base_amount=total - igv,
+        igv_amount=igv,
+        total_amount=total,
+        lines=lineas,
+    )
+
+
+def iter_zip_comprobantes(
+    zip_path: Union[str, Path],
+) -> Iterator[Tuple[str, Optional[bytes], Optional[CpeComprobante], Optional[str]]]:
+    """
+    Recorre los XML de un ZIP de a uno.
+
+    Yields:
+        (nombre, contenido, comprobante, error): comprobante None si error
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            nombre = PurePosixPath(info.filename)
+            if info.is_dir() or nombre.suffix.lower() != ".xml" or "__MACOSX" in nombre.parts:
+                continue
+            if info.file_size > MAX_XML_SIZE:
+                yield nombre.name, None, None, "XML demasiado grande"
+                continue
+            try:
+                contenido = zf.read(info)
+                yield nombre.name, contenido, parse_ubl_invoice(contenido, nombre.name), None
+            except CpeParseError as e:
+                yield nombre.name, None, None, str(e)
+            except (zipfile.BadZipFile, EOFError) as e:
+                yield nombre.name, None, None, f"Miembro dañado: {e}"
+
+
+def _lotes(items: Iterable, tamano: int) -> Iterator[list]:
+    lote = []
+    for item in items:
+        lote.append(item)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class CpeImporter:
+    """
+    Registra comprobantes de compra leídos de XML, por lotes.
+
+    El mapa de proveedores por RUC se carga una vez al crear el importador y se
+    completa con los proveedores que se van creando.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        storage: FileStorageService,
+        company_id: int,
+        user_id: int,
+        create_suppliers: bool = True,
+    ):
+        self.db = db
+        self.storage = storage
+        self.company_id = company_id
+        self.user_id = user_id
+        self.create_suppliers = create_suppliers
+        company = db.get(Company, company_id)
+        if not company:
+            raise ValueError("Empresa no encontrada")
+        self.company_ruc = (company.ruc or "").strip() or None
+        self.proveedores = self._cargar_proveedores()
+
+    def _cargar_proveedores(self) -> Dict[str, int]:
+        filas = self.db.execute(
+            select(ThirdParty.tax_id, ThirdParty.id, ThirdParty.type)
+            .where(ThirdParty.company_id == self.company_id, ThirdParty.active.is_(True))
+            .order_by(ThirdParty.id)
+        ).all()
+        mapa: Dict[str, int] = {}
+        for tax_id, tercero_id, tipo in filas:
+            ruc = (tax_id or "").strip()
+            # Si el RUC está como cliente y como proveedor, gana el proveedor
+            if ruc and (ruc not in mapa or tipo == "PROVEEDOR"):
+                mapa[ruc] = tercero_id
+        return mapa
+
+    def _resolver_proveedores(self, comprobantes: List[CpeComprobante]) -> int:
+        """Crea en bloque los proveedores que faltan; retorna cuántos creó"""
+        nuevos: Dict[str, ThirdParty] = {}
+        for cpe in comprobantes:
+            if cpe.supplier_ruc not in self.proveedores and cpe.supplier_ruc not in nuevos:
+                nuevos[cpe.supplier_ruc] = ThirdParty(
+                    company_id=self.company_id,
+                    tax_id=cpe.supplier_ruc,
+                    tax_id_type="6" if len(cpe.supplier_ruc) == 11 else "0",
+                    name=cpe.supplier_name,
+                    type="PROVEEDOR",
+                )
+        if nuevos:
+            self.db.add_all(nuevos.values())
+            self.db.flush()
+            self.proveedores.update({ruc: t.id for ruc, t in nuevos.items()})
+        return len(nuevos)
+
+    def _ya_registradas(self, comprobantes: List[CpeComprobante]) -> set:
+        """Claves (proveedor, tipo, serie, número) del lote que ya tienen compra"""
+        if not comprobantes:
+            return set()
+        filas = self.db.execute(
+            select(Purchase.supplier_id, Purchase.doc_type, Purchase.series, Purchase.number)
+            .where(
+                Purchase.company_id == self.company_id,
+                Purchase.series.in_({c.series for c in comprobantes}),
+                Purchase.number.in_({c.number for c in comprobantes}),
+            )
+        ).all()
+        return {tuple(f) for f in filas}
+
+    def _asientos(self, comprobantes: List[CpeComprobante], result: CpeImportResult) -> list:
+        """
+        Asientos del lote en una sola llamada al motor; si falla (p. ej. un
+        período cerrado), se reintenta uno por uno para aislar los que fallan.
+
+        Returns:
+            Pares (comprobante, asiento) registrados
+        """
+        motor = MotorAsientos(UnitOfWork(self.db))
+
+        def _operacion(cpe):
+            return {
+                "datos_operacion": {
+                    "base": float(cpe.base_amount),
+                    "igv": float(cpe.igv_amount),
+                    "total": float(cpe.total_amount),
+                },
+                "fecha": cpe.issue_date,
+                "glosa": f"Compra {cpe.doc_type}-{cpe.series}-{cpe.number}",
+                "currency": cpe.currency,
+            }
+
+        try:
+            with self.db.begin_nested():
+                entries = motor.generar_asientos_lote(
+                    "COMPRA", [_operacion(c) for c in comprobantes], self.company_id,
+                    origin="COMPRAS", user_id=self.user_id,
+                )
+            return list(zip(comprobantes, entries))
+        except _ERRORES_MOTOR as e:
+            if len(comprobantes) == 1:
+                result.error(comprobantes[0].filename, str(e))
+                return []
+            logger.info(f"Lote de {len(comprobantes)} comprobantes rechazado por el motor ({e}); uno por uno")
+
+        registrados = []
+        for cpe in comprobantes:
+            try:
+                with self.db.begin_nested():
+                    entry, = motor.generar_asientos_lote(
+                        "COMPRA", [_operacion(cpe)], self.company_id,
+                        origin="COMPRAS", user_id=self.user_id,
+                    )
+                registrados.append((cpe, entry))
+            except _ERRORES_MOTOR as e:
+                result.error(cpe.filename, str(e))
+        return registrados
+
+    def import_batch(
+        self,
+        items: List[Tuple[str, Optional[bytes], Optional[CpeComprobante], Optional[str]]],
+        result: CpeImportResult,
+    ) -> None:
+        """Registra un lote (ver iter_zip_comprobantes); no hace commit"""
+        from .services_documents_v2 import DocumentService
+
+        validos: List[Tuple[CpeComprobante, bytes]] = []
+        vistos = set()
+        for nombre, contenido, cpe, error in items:
+            result.total += 1
+            if error:
+                result.error(nombre, error)
+            elif self.company_ruc and cpe.customer_ruc and cpe.customer_ruc != self.company_ruc:
+                result.error(nombre, f"Emitido al RUC {cpe.customer_ruc}, no a la empresa")
+            elif not self.create_suppliers and cpe.supplier_ruc not in self.proveedores:
+                result.error(nombre, f"Proveedor {cpe.supplier_ruc} no registrado")
+            elif cpe.clave in vistos:
+                result.duplicates += 1
+            else:
+                vistos.add(cpe.clave)
+                validos.append((cpe, contenido))
+
+        if not validos:
+            return
+        result.suppliers_created += self._resolver_proveedores([c for c, _ in validos])
+        existentes = self._ya_registradas([c for c, _ in validos])
+        nuevos = []
+        for cpe, contenido in validos:
+            if (self.proveedores[cpe.supplier_ruc], cpe.doc_type, cpe.series, cpe.number) in existentes:
+                result.duplicates += 1
+            else:
+                nuevos.append((cpe, contenido))
+        if not nuevos:
+            return
+
+        # Correlativos en orden de fecha de emisión
+        nuevos.sort(key=lambda n: n[0].issue_date)
+        contenidos = {id(cpe): contenido for cpe, contenido in nuevos}
+        registrados = self._asientos([cpe for cpe, _ in nuevos], result)
+
+        compras = []
+        for cpe, entry in registrados:
+            compra = Purchase(
+                company_id=self.company_id,
+                doc_type=cpe.doc_type,
+                series=cpe.series,
+                number=cpe.number,
+                issue_date=cpe.issue_date,
+                supplier_id=self.proveedores[cpe.supplier_ruc],
+                currency=cpe.currency,
+                base_amount=cpe.base_amount,
+                igv_amount=cpe.igv_amount,
+                total_amount=cpe.total_amount,
+                glosa=entry.glosa,
+                journal_entry_id=entry.id,
+            )
+            compra.lines = [
+                PurchaseLine(
+                    line_number=i,
+                    description=l.description,
+                    quantity=l.quantity,
+                    unit_price=l.unit_price,
+                    base_amount=l.base_amount,
+                    igv_amount=l.igv_amount,
+                    total_amount=l.base_amount + l.igv_amount,
+                )
+                for i, l in enumerate(cpe.lines, start=1)
+            ]
+            compras.append(compra)
+        self.db.add_all(compras)
+        self.db.flush()
+
+        service = DocumentService(self.db, self.storage)
+        for (cpe, _), compra in zip(registrados, compras):
+            service.upload_document(
+                company_id=self.company_id,
+                user_id=self.user_id,
+                file_content=contenidos[id(cpe)],
+                filename=cpe.filename,
+                mime_type="application/xml",
+                document_type="COMPROBANTE_COMPRA",
+                related_entity_type="PURCHASE",
+                related_entity_id=compra.id,
+                title=f"{TIPOS_COMPRA[cpe.doc_type].title()} {cpe.series}-{cpe.number} {cpe.supplier_name}",
+                extracted_data=cpe.extracted_data(),
+            )
+            result.created += 1
+            result.purchase_ids.append(compra.id)
+
+
+def import_cpe_zip(
+    db: Session,
+    storage: FileStorageService,
+    zip_path: Union[str, Path],
+    company_id: int,
+    user_id: int,
+    batch_size: Optional[int] = None,
+    create_suppliers: bool = True,
+) -> CpeImportResult:
+    """
+    Importa un ZIP de comprobantes de compra XML (commit por lote).
+
+    Args:
+        db: Sesión de base de datos
+        storage: Storage de documentos (para guardar cada XML)
+        zip_path: Ruta del ZIP
+        company_id: Empresa que recibe los comprobantes
+        user_id: Usuario que importa
+        batch_size: Comprobantes por transacción (default settings.cpe_import_batch_size)
+        create_suppliers: Crear los proveedores que no existan (si no, el comprobante se rechaza)
+
+    Returns:
+        CpeImportResult con creados, duplicados y errores por archivo
+
+    Raises:
+        ValueError: Si el archivo no es un ZIP o la empresa no existe
+    """
+    if not zipfile.is_zipfile(zip_path):
+        raise ValueError("El archivo no es un ZIP válido")
+    importer = CpeImporter(db, storage, company_id, user_id, create_suppliers=create_suppliers)
+    result = CpeImportResult()
+    for lote in _lotes(iter_zip_comprobantes(zip_path), batch_size or settings.cpe_import_batch_size):
+        try:
+            importer.import_batch(lote, result)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        db.expunge_all()
+    logger.info(
+        f"CPE_IMPORT: company_id={company_id}, total={result.total}, creados={result.created}, "
+        f"duplicados={result.duplicates}, errores={len(result.errors)}"
+    )
+    return result
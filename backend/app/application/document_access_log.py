@@ -0,0 +1,165 @@
+"""
+Registro de accesos a documentos en segundo plano
+=================================================
+
+Cada vista de un documento (detalle, vista previa, descarga) deja una fila en
+document_access_log. Insertarla dentro de la transacción del request hace que
+una lectura pague una escritura; con el buffer activo:
+
+- Las vistas se encolan en memoria y un hilo de fondo las inserta en bloque
+  cada `document_access_log_flush_ms` o al juntar `document_access_log_batch`
+- La cola está acotada (`document_access_log_max_queue`): si se llena, el
+  request que la llenó vacía la cola él mismo
+- Si el INSERT falla los accesos vuelven a la cola hasta el tope; los más
+  antiguos que no caben se descartan, con un error en el log y la cuenta en
+  `dropped`
+- Al apagar la app se vacía lo pendiente
+
+Altas y bajas (UPLOAD, DELETE) siguen registrándose en su transacción. Sin el
+hilo en marcha (worker, scripts, tests) el registro es síncrono como antes.
+"""
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_documents_v2 import Document, DocumentAccessLog
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentAccessLogBuffer:
+    """Cola acotada de accesos con un hilo que los inserta por lotes"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        flush_ms: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self._session_factory = session_factory
+        self.flush_ms = flush_ms or settings.document_access_log_flush_ms
+        self.batch_size = batch_size or settings.document_access_log_batch
+        self.max_queue = max_queue or settings.document_access_log_max_queue
+        self._pendientes: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Un solo flush a la vez
+        self._despertar = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.dropped = 0  # Accesos descartados por no caber en la cola tras un error
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pendientes)
+
+    def start(self) -> None:
+        """Inicia el hilo de fondo (no hace nada si ya corre)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="document-access-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el hilo y vacía lo pendiente"""
+        if self._thread is not None:
+            self._stop.set()
+            self._despertar.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def record(self, document_id: int, user_id: int, action: str,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> None:
+        """Encola un acceso (no toca la BD salvo con la cola llena)"""
+        fila = {
+            "document_id": document_id, "user_id": user_id, "action": action,
+            "ip_address": ip_address, "user_agent": user_agent, "accessed_at": datetime.now(),
+        }
+        with self._lock:
+            self._pendientes.append(fila)
+            total = len(self._pendientes)
+        if total >= self.max_queue:
+            logger.warning(f"Cola de accesos a documentos llena ({total}): se vacía en el request")
+            self.flush()
+        elif total >= self.batch_size:
+            self._despertar.set()
+
+    def flush(self) -> int:
+        """
+        Inserta todo lo pendiente en un INSERT por lote.
+
+        Returns:
+            Filas insertadas
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pendientes:
+                    return 0
+                filas = list(self._pendientes)
+                self._pendientes.clear()
+            try:
+                insertadas = self._insertar(filas)
+            except Exception:
+                logger.exception(f"No se pudieron registrar {len(filas)} accesos a documentos; se reintentan")
+                with self._lock:
+                    # Se devuelven al frente sin pasar el tope (lo más antiguo se descarta)
+                    espacio = max(self.max_queue - len(self._pendientes), 0)
+                    descartadas = len(filas) - espacio
+                    if descartadas > 0:
+                        self.dropped += descartadas
+                        logger.error(
+                            f"Se descartan {descartadas} accesos a documentos (cola llena; {self.dropped} en total)"
+                        )
+                    self._pendientes.extendleft(reversed(filas[-espacio:] if espacio else []))
+                return 0
+            self.flushed += insertadas
+            return insertadas
+
+    def _insertar(self, filas: List[Dict]) -> int:
+        if self._session_factory is None:
+            from ..db import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            try:
+                db.execute(insert(DocumentAccessLog), filas)
+                db.commit()
+                return len(filas)
+            except IntegrityError:
+                # Un documento se eliminó mientras su acceso esperaba en la cola
+                db.rollback()
+                ids = {f["document_id"] for f in filas}
+                existentes = set(db.execute(select(Document.id).where(Document.id.in_(ids))).scalars())
+                filas = [f for f in filas if f["document_id"] in existentes]
+                if filas:
+                    db.execute(insert(DocumentAccessLog), filas)
+                db.commit()
+                return len(filas)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._despertar.wait(self.flush_ms / 1000)
+            self._despertar.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error registrando accesos a documentos")
+
+
+access_log_buffer = DocumentAccessLogBuffer()
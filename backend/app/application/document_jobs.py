@@ -0,0 +1,407 @@
+"""
+Cola persistente de procesamiento de documentos
+===============================================
+
+La extracción y el OCR ya no corren en un hilo por upload que reutiliza la
+sesión del request. Cada solicitud se registra en document_processing_jobs y
+un proceso worker aparte (scripts/document_worker.py) la ejecuta:
+
+- Pool acotado: document_worker_concurrency trabajos simultáneos por proceso,
+  cada uno con su propia sesión (el OCR corre en subprocesos de Tesseract, por
+  lo que los hilos no compiten por el GIL)
+- Prioridad: la extracción de XML va antes que las miniaturas/vistas previas,
+  estas antes que la extracción de otros formatos, y esta antes que el OCR
+- Reintentos con backoff exponencial; agotados los intentos queda FAILED
+- Reanudable: el estado vive en la BD. Cada worker reserva sus trabajos
+  (locked_until = ahora + lease); si el proceso muere, la reserva vence y
+  otro worker lo retoma
+- El avance se resume en Document.processing_status/processing_progress
+"""
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_documents_v2 import Document, DocumentProcessingJob
+from ..infrastructure.renditions import RENDITION_MIME_TYPES
+
+logger = logging.getLogger(__name__)
+
+JOB_EXTRACTION = "EXTRACTION"
+JOB_OCR = "OCR"
+JOB_RENDITIONS = "RENDITIONS"  # Miniatura y vista previa de la primera página
+JOB_TYPES = (JOB_EXTRACTION, JOB_RENDITIONS, JOB_OCR)
+
+PENDING = "PENDING"
+PROCESSING = "PROCESSING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+ACTIVE_STATUSES = (PENDING, PROCESSING)
+
+# Menor número = se atiende antes
+PRIORIDAD_XML = 0
+PRIORIDAD_RENDICIONES = 5
+PRIORIDAD_EXTRACCION = 10
+PRIORIDAD_OCR = 100
+
+XML_MIME_TYPES = ("text/xml", "application/xml")
+
+
+class JobPermanentError(Exception):
+    """Error que no se resuelve reintentando (documento inexistente, etc.)"""
+
+
+def job_priority(job_type: str, mime_type: str) -> int:
+    """Prioridad de un trabajo según su tipo y el formato del documento"""
+    if job_type == JOB_OCR:
+        return PRIORIDAD_OCR
+    if job_type == JOB_RENDITIONS:
+        return PRIORIDAD_RENDICIONES
+    return PRIORIDAD_XML if mime_type in XML_MIME_TYPES else PRIORIDAD_EXTRACCION
+
+
+def retry_delay(attempts: int) -> float:
+    """Segundos hasta el próximo intento tras `attempts` intentos fallidos (backoff exponencial acotado)"""
+    return min(
+        settings.document_job_retry_max_seconds,
+        settings.document_job_retry_initial_seconds * 2 ** max(attempts - 1, 0),
+    )
+
+
+def refresh_document_progress(db: Session, document_ids) -> None:
+    """
+    Recalcula processing_status/processing_progress de los documentos a partir
+    de sus trabajos (una consulta agrupada para todos).
+    """
+    ids = set(document_ids)
+    if not ids:
+        return
+    conteos: Dict[int, Dict[str, int]] = {i: {} for i in ids}
+    for document_id, status, total in db.execute(
+        select(DocumentProcessingJob.document_id, DocumentProcessingJob.status, func.count())
+        .where(DocumentProcessingJob.document_id.in_(ids))
+        .group_by(DocumentProcessingJob.document_id, DocumentProcessingJob.status)
+    ):
+        conteos[document_id][status] = total
+
+    errores = dict(db.execute(
+        select(DocumentProcessingJob.document_id, DocumentProcessingJob.error_message)
+        .where(DocumentProcessingJob.document_id.in_(ids), DocumentProcessingJob.status == FAILED)
+        .order_by(DocumentProcessingJob.id)
+    ).all())
+
+    for document_id, por_estado in conteos.items():
+        total = sum(por_estado.values())
+        if not total:
+            continue
+        terminados = por_estado.get(COMPLETED, 0) + por_estado.get(FAILED, 0)
+        if por_estado.get(PROCESSING) or (por_estado.get(PENDING) and terminados):
+            estado = PROCESSING
+        elif por_estado.get(PENDING):
+            estado = PENDING
+        elif por_estado.get(FAILED):
+            estado = FAILED
+        else:
+            estado = COMPLETED
+        db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(
+                processing_status=estado,
+                processing_progress=terminados * 100 // total,
+                processing_error=errores.get(document_id),
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+
+
+def enqueue_document_jobs(
+    db: Session,
+    document: Document,
+    enable_extraction: bool = True,
+    enable_ocr: bool = False,
+    enable_renditions: bool = False,
+) -> List[DocumentProcessingJob]:
+    """
+    Encola la extracción, el OCR y/o las rendiciones (miniatura y vista previa)
+    de un documento.
+
+    Idempotente: si ya hay un trabajo activo del mismo tipo no se duplica. El
+    OCR y las rendiciones solo aplican a PDFs. No hace commit: lo hace el
+    llamador junto con el upload o la solicitud.
+
+    Returns:
+        Trabajos activos del documento para los tipos solicitados
+    """
+    tipos = []
+    if enable_extraction:
+        tipos.append(JOB_EXTRACTION)
+    if enable_ocr and document.mime_type == "application/pdf":
+        tipos.append(JOB_OCR)
+    if enable_renditions and document.mime_type in RENDITION_MIME_TYPES:
+        tipos.append(JOB_RENDITIONS)
+    if not tipos:
+        return []
+
+    activos = {
+        job.job_type: job
+        for job in db.query(DocumentProcessingJob).filter(
+            DocumentProcessingJob.document_id == document.id,
+            DocumentProcessingJob.job_type.in_(tipos),
+            DocumentProcessingJob.status.in_(ACTIVE_STATUSES),
+        )
+    }
+    ahora = datetime.now()
+    nuevos = [
+        DocumentProcessingJob(
+            document_id=document.id,
+            company_id=document.company_id,
+            job_type=tipo,
+            priority=job_priority(tipo, document.mime_type),
+            status=PENDING,
+            max_attempts=settings.document_job_max_attempts,
+            next_run_at=ahora,
+            created_at=ahora,
+        )
+        for tipo in tipos if tipo not in activos
+    ]
+    if nuevos:
+        db.add_all(nuevos)
+        db.flush()
+        refresh_document_progress(db, [document.id])
+    return [activos.get(tipo) for tipo in tipos if tipo in activos] + nuevos
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int, ahora: Optional[datetime] = None) -> List[int]:
+    """
+    Reserva hasta `limit` trabajos listos por prioridad (update condicional:
+    otro worker no los toma). Incluye los PROCESSING cuya reserva venció.
+
+    Returns:
+        IDs de los trabajos reservados
+    """
+    ahora = ahora or datetime.now()
+    candidatos = db.execute(
+        select(DocumentProcessingJob.id, DocumentProcessingJob.document_id, DocumentProcessingJob.status,
+               DocumentProcessingJob.attempts, DocumentProcessingJob.max_attempts)
+        .where(or_(
+            and_(DocumentProcessingJob.status == PENDING, DocumentProcessingJob.next_run_at <= ahora),
+            and_(DocumentProcessingJob.status == PROCESSING, DocumentProcessingJob.locked_until < ahora),
+        ))
+        .order_by(DocumentProcessingJob.priority, DocumentProcessingJob.next_run_at, DocumentProcessingJob.id)
+        .limit(limit)
+    ).all()
+
+    lease = ahora + timedelta(seconds=settings.document_job_lease_seconds)
+    ids = []
+    documentos = set()
+    for job_id, document_id, status, attempts, max_attempts in candidatos:
+        condicion = (
+            DocumentProcessingJob.id == job_id,
+            DocumentProcessingJob.status == status,
+            DocumentProcessingJob.attempts == attempts,
+        )
+        if attempts >= max_attempts:
+            # Reserva vencida en el último intento: el worker murió procesándolo
+            valores = dict(status=FAILED, locked_until=None, completed_at=ahora,
+                           error_message="El worker se detuvo durante el procesamiento")
+        else:
+            valores = dict(status=PROCESSING, attempts=attempts + 1, locked_until=lease,
+                           worker_id=worker_id, started_at=ahora)
+        result = db.execute(update(DocumentProcessingJob).where(*condicion).values(**valores))
+        if result.rowcount == 1:
+            documentos.add(document_id)
+            if valores["status"] == PROCESSING:
+                ids.append(job_id)
+    refresh_document_progress(db, documentos)
+    db.commit()
+    return ids
+
+
+def _ejecutar(db: Session, job: DocumentProcessingJob, storage) -> None:
+    from .services_documents_v2 import DocumentService
+
+    if db.get(Document, job.document_id) is None:
+        raise JobPermanentError("Documento no encontrado")
+    if job.job_type == JOB_RENDITIONS:
+        try:
+            DocumentService(db, storage).generate_renditions(job.document_id)
+        except ValueError as e:
+            raise JobPermanentError(str(e))  # PDF dañado: reintentar no cambia nada
+        return
+    extraccion = job.job_type == JOB_EXTRACTION
+    results = DocumentService(db, storage).process_document_async(
+        job.document_id, enable_extraction=extraccion, enable_ocr=not extraccion
+    )
+    resultado = results.get("extraction" if extraccion else "ocr")
+    if resultado and not resultado.get("success"):
+        raise RuntimeError(resultado.get("error") or "Procesamiento fallido")
+
+
+def run_job(job_id: int, session_factory: Callable[[], Session], storage=None) -> str:
+    """
+    Ejecuta un trabajo reservado con su propia sesión y registra el resultado.
+
+    Returns:
+        Estado final del trabajo (COMPLETED, PENDING si se reintentará, FAILED)
+    """
+    db = session_factory()
+    try:
+        job = db.get(DocumentProcessingJob, job_id)
+        if job is None or job.status != PROCESSING:
+            return job.status if job else FAILED
+        error = None
+        permanente = False
+        try:
+            _ejecutar(db, job, storage)
+        except JobPermanentError as e:
+            error, permanente = str(e), True
+        except Exception as e:
+            error = str(e)[:1000] or e.__class__.__name__
+        if error is not None:
+            db.rollback()
+            job = db.get(DocumentProcessingJob, job_id)
+
+        ahora = datetime.now()
+        job.locked_until = None
+        if error is None:
+            job.status = COMPLETED
+            job.error_message = None
+            job.completed_at = ahora
+        elif permanente or job.attempts >= job.max_attempts:
+            logger.warning("Trabajo de documento %s fallido: %s", job_id, error)
+            job.status = FAILED
+            job.error_message = error
+            job.completed_at = ahora
+        else:
+            job.status = PENDING
+            job.error_message = error
+            job.next_run_at = ahora + timedelta(seconds=retry_delay(job.attempts))
+        db.flush()
+        refresh_document_progress(db, [job.document_id])
+        db.commit()
+        return job.status
+    finally:
+        db.close()
+
+
+def queue_stats(db: Session, company_id: Optional[int] = None, ahora: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Métricas de la cola: profundidad por estado/tipo, antigüedad del trabajo
+    pendiente más viejo y rendimiento en la ventana reciente.
+    """
+    ahora = ahora or datetime.now()
+    filtro = [DocumentProcessingJob.company_id == company_id] if company_id is not None else []
+
+    depth = {status: {tipo: 0 for tipo in JOB_TYPES} for status in ACTIVE_STATUSES}
+    for status, job_type, total in db.execute(
+        select(DocumentProcessingJob.status, DocumentProcessingJob.job_type, func.count())
+        .where(DocumentProcessingJob.status.in_(ACTIVE_STATUSES), *filtro)
+        .group_by(DocumentProcessingJob.status, DocumentProcessingJob.job_type)
+    ):
+        depth[status][job_type] = total
+
+    mas_antiguo = db.execute(
+        select(func.min(DocumentProcessingJob.created_at))
+        .where(DocumentProcessingJob.status == PENDING, *filtro)
+    ).scalar()
+
+    ventana = settings.document_queue_metrics_window_minutes
+    terminados = db.execute(
+        select(DocumentProcessingJob.status, DocumentProcessingJob.started_at, DocumentProcessingJob.completed_at)
+        .where(
+            DocumentProcessingJob.status.in_((COMPLETED, FAILED)),
+            DocumentProcessingJob.completed_at >= ahora - timedelta(minutes=ventana),
+            *filtro,
+        )
+    ).all()
+    completados = [(inicio, fin) for status, inicio, fin in terminados if status == COMPLETED]
+    duraciones = [(fin - inicio).total_seconds() for inicio, fin in completados if inicio and fin]
+
+    return {
+        "pending": sum(depth[PENDING].values()),
+        "processing": sum(depth[PROCESSING].values()),
+        "depth": depth,
+        "oldest_pending_seconds": round((ahora - mas_antiguo).total_seconds(), 1) if mas_antiguo else None,
+        "window_minutes": ventana,
+        "completed": len(completados),
+        "failed": len(terminados) - len(completados),
+        "throughput_per_minute": round(len(completados) / ventana, 2) if ventana else None,
+        "avg_duration_seconds": round(sum(duraciones) / len(duraciones), 2) if duraciones else None,
+    }
+
+
+class DocumentWorker:
+    """
+    Worker de la cola de documentos: mantiene hasta `concurrency` trabajos en
+    ejecución en un pool de hilos, cada uno con su propia sesión.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        storage=None,
+        worker_id: Optional[str] = None,
+    ):
+        if session_factory is None:
+            from ..db import SessionLocal
+            session_factory = SessionLocal
+        self.concurrency = max(1, concurrency or settings.document_worker_concurrency)
+        self.session_factory = session_factory
+        self.storage = storage
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def _reservar(self, limite: int) -> List[int]:
+        db = self.session_factory()
+        try:
+            return claim_jobs(db, self.worker_id, limite)
+        finally:
+            db.close()
+
+    def _run_job(self, job_id: int) -> str:
+        try:
+            return run_job(job_id, self.session_factory, self.storage)
+        except Exception:
+            # Error al registrar el resultado: la reserva vencerá y se reintentará
+            logger.exception("Error ejecutando el trabajo de documento %s", job_id)
+            return PROCESSING
+
+    def run_once(self) -> int:
+        """Reserva un lote (hasta concurrency trabajos), lo ejecuta y espera. Devuelve cuántos ejecutó."""
+        ids = self._reservar(self.concurrency)
+        if ids:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                list(pool.map(self._run_job, ids))
+        return len(ids)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        """Bucle principal: rellena el pool a medida que terminan trabajos hasta stop()."""
+        activos: Set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="document-worker") as pool:
+            while not self._stop.is_set():
+                libres = self.concurrency - len(activos)
+                ids = []
+                if libres > 0:
+                    try:
+                        ids = self._reservar(libres)
+                    except Exception:
+                        logger.exception("Error reservando trabajos de documentos")
+                activos.update(pool.submit(self._run_job, job_id) for job_id in ids)
+                if activos:
+                    _, activos = wait(activos, timeout=settings.document_worker_idle_seconds, return_when=FIRST_COMPLETED)
+                    activos = set(activos)
+                elif not ids:
+                    self._stop.wait(settings.document_worker_idle_seconds)
+            wait(activos)
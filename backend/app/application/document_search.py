@@ -0,0 +1,190 @@
+"""
+Búsqueda full-text de documentos
+================================
+
+El texto indexado (search_text) lo mantiene la aplicación al subir y al
+procesar un documento: título, descripción, nombre de archivo, RUC/serie/número
+extraídos y texto OCR. El índice depende del motor (ver models_documents_v2):
+
+- PostgreSQL: columna generada search_vector (tsvector 'spanish') con índice GIN
+- SQLite: tabla FTS5 documents_fts de contenido externo, sincronizada por triggers
+
+Los resultados se ordenan por relevancia (sin texto: por fecha de subida) y se
+paginan por keyset con un cursor opaco. El total se cuenta solo hasta
+document_search_count_cap; por encima se informa un estimado.
+"""
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, literal, literal_column, or_, select, table, column
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_documents_v2 import Document, DocumentExtractedData, DocumentOCRData, DocumentTag
+from .pagination import decode_cursor, encode_cursor
+
+MAX_SEARCH_TEXT = 200_000  # El OCR de documentos largos se indexa truncado
+MAX_TERMINOS = 16
+
+# Datos extraídos que se indexan (extractors.py: PDF/texto y XML UBL)
+_CAMPOS_EXTRAIDOS = ("ruc", "ruc_emisor", "dni", "tipo_comprobante", "serie", "numero", "numero_comprobante")
+
+_documents_fts = table("documents_fts", column("rowid"))
+
+
+@dataclass
+class DocumentSearchPage:
+    """Página de resultados de búsqueda"""
+    items: List[Document]
+    total: int
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+
+
+def build_search_text(
+    document: Document,
+    extracted_data: Optional[Dict[str, Any]] = None,
+    ocr_text: Optional[str] = None,
+) -> str:
+    """Texto a indexar de un documento"""
+    partes = [document.title, document.description, document.original_filename]
+    if extracted_data:
+        partes += [str(extracted_data[c]) for c in _CAMPOS_EXTRAIDOS if extracted_data.get(c)]
+        if extracted_data.get("serie") and extracted_data.get("numero"):
+            partes.append(f"{extracted_data['serie']}-{extracted_data['numero']}")
+    if ocr_text:
+        partes.append(ocr_text)
+    return "\n".join(p for p in partes if p)[:MAX_SEARCH_TEXT]
+
+
+def refresh_search_text(db: Session, document: Document) -> None:
+    """Recalcula search_text con los datos extraídos y el OCR ya guardados (no hace commit)"""
+    db.flush()
+    extracted = db.execute(
+        select(DocumentExtractedData.extracted_data).where(DocumentExtractedData.document_id == document.id)
+    ).scalar()
+    ocr_text = db.execute(
+        select(DocumentOCRData.ocr_text).where(DocumentOCRData.document_id == document.id)
+    ).scalar()
+    texto = build_search_text(document, extracted, ocr_text)
+    if document.search_text != texto:
+        document.search_text = texto
+        db.flush()
+
+
+def _terminos(query: Optional[str]) -> List[str]:
+    """Palabras de la consulta (letras y dígitos); la puntuación se descarta"""
+    return re.findall(r"[^\W_]+", (query or "").lower())[:MAX_TERMINOS]
+
+
+def search_documents(
+    db: Session,
+    company_id: int,
+    query: Optional[str] = None,
+    document_type: Optional[str] = None,
+    related_entity_type: Optional[str] = None,
+    related_entity_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+    exclude_duplicates: bool = False,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> DocumentSearchPage:
+    """
+    Busca documentos activos de la empresa, ordenados por relevancia.
+
+    Args:
+        query: Texto libre; cada palabra se busca como prefijo (todas deben estar)
+        cursor: next_cursor de la página anterior (keyset)
+        offset: Solo sin cursor (compatibilidad con la paginación anterior)
+
+    Returns:
+        DocumentSearchPage
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    stmt = select(Document).where(Document.company_id == company_id, Document.status == 'ACTIVE')
+    if exclude_duplicates:
+        stmt = stmt.where(Document.is_duplicate == False)  # noqa: E712
+    if document_type:
+        stmt = stmt.where(Document.document_type == document_type)
+    if related_entity_type and related_entity_id:
+        stmt = stmt.where(
+            Document.related_entity_type == related_entity_type,
+            Document.related_entity_id == related_entity_id,
+        )
+    if date_from:
+        stmt = stmt.where(Document.uploaded_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Document.uploaded_at <= date_to)
+    if tags:
+        stmt = stmt.where(Document.tags.any(DocumentTag.tag.in_(tags)))
+
+    terminos = _terminos(query)
+    dialect = db.get_bind().dialect.name
+    if not terminos:
+        orden = Document.uploaded_at
+    elif dialect == "postgresql":
+        vector = literal_column("documents.search_vector")
+        tsquery = func.to_tsquery("spanish", " & ".join(f"{t}:*" for t in terminos))
+        stmt = stmt.where(vector.op("@@")(tsquery))
+        orden = func.ts_rank_cd(vector, tsquery)
+    elif dialect == "sqlite":
+        match = " ".join(f'"{t}"*' for t in terminos)
+        stmt = stmt.join(_documents_fts, _documents_fts.c.rowid == Document.id).where(
+            literal_column("documents_fts").op("MATCH")(match)
+        )
+        orden = -func.bm25(literal_column("documents_fts"))  # bm25: menor es más relevante
+    else:
+        # Otros motores: sin índice, todas las palabras en search_text
+        stmt = stmt.where(*[Document.search_text.ilike(f"%{t}%") for t in terminos])
+        orden = literal(0.0)
+
+    filtrado = stmt
+    if cursor:
+        valor, ultimo_id = decode_cursor(cursor)
+        if not terminos:
+            valor = datetime.fromisoformat(valor)
+        stmt = stmt.where(or_(orden < valor, and_(orden == valor, Document.id < ultimo_id)))
+    elif offset:
+        stmt = stmt.offset(offset)
+
+    filas = db.execute(
+        stmt.add_columns(orden.label("orden")).order_by(orden.desc(), Document.id.desc()).limit(limit + 1)
+    ).all()
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    items = [fila[0] for fila in filas]
+    next_cursor = encode_cursor(filas[-1].orden, filas[-1][0].id) if hay_mas else None
+
+    if not cursor and not hay_mas:
+        # Primera (o única) página completa: el total es exacto sin contar
+        return DocumentSearchPage(items, offset + len(items), False, None)
+    total, estimado = _contar(db, filtrado, dialect)
+    return DocumentSearchPage(items, total, estimado, next_cursor)
+
+
+def _contar(db: Session, stmt, dialect: str) -> tuple:
+    """Cuenta hasta el tope configurado; por encima usa la estimación del planificador (PostgreSQL)"""
+    tope = settings.document_search_count_cap
+    ids = stmt.with_only_columns(Document.id).order_by(None).limit(tope + 1).subquery()
+    total = db.execute(select(func.count()).select_from(ids)).scalar_one()
+    if total <= tope:
+        return total, False
+    if dialect == "postgresql":
+        try:
+            compiled = stmt.with_only_columns(Document.id).compile(dialect=db.get_bind().dialect)
+            with db.begin_nested():  # Un error no debe abortar la transacción del llamador
+                plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return max(tope, int(plan[0]["Plan"]["Plan Rows"])), True
+        except Exception:
+            pass
+    return tope, True
@@ -0,0 +1,283 @@
+"""
+Estadísticas de la casilla electrónica
+======================================
+
+Los contadores de la casilla (no leídos, críticos, vencidos y pendientes de
+respuesta) alimentan el badge de la barra de navegación, que se consulta en
+cada pantalla. Para que esa consulta no recorra los mensajes:
+
+- Los cuatro conteos salen de una sola consulta de agregados; "sin respuesta"
+  es un NOT EXISTS sobre mailbox_responses (no se cargan mensajes ni respuestas)
+- El resultado se guarda en memoria por empresa (y uno global para admin)
+  durante `mailbox_stats_cache_seconds`; un commit que crea o modifica
+  mensajes, respuestas o mensajes empresa→admin invalida la empresa afectada
+  y el global. Al cambiar el día el valor guardado deja de servir
+- El paso a VENCIDO ya no ocurre al consultar: lo hace el barrido periódico
+  (`MailboxOverdueSweeper`) con un único UPDATE
+
+La caché es por proceso: con varios workers, un cambio hecho en otro proceso
+se ve al vencer el TTL.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import case, event, exists, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_mailbox import (
+    CompanyToAdminMessage,
+    ElectronicMailbox,
+    MailboxMessage,
+    MailboxResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+# Clave de la caché para las estadísticas globales de admin
+ADMIN = None
+
+_SESSION_INFO_KEY = "casilla_stats_pendientes"
+
+
+def _sin_respuesta():
+    return ~exists().where(MailboxResponse.message_id == MailboxMessage.id)
+
+
+def _conteos(today: date):
+    """Columnas de agregado sobre mailbox_messages."""
+    no_leido = MailboxMessage.is_read == False  # noqa: E712
+    sin_respuesta = _sin_respuesta()
+
+    def contar(cond):
+        return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+    return (
+        contar(no_leido),
+        contar(no_leido & (MailboxMessage.priority == "CRITICA")),
+        contar((MailboxMessage.due_date < today) & sin_respuesta),
+        contar((MailboxMessage.requires_response == True) & sin_respuesta),  # noqa: E712
+    )
+
+
+def _resultado(unread, critical, overdue, pending) -> dict:
+    return {
+        "unread_count": int(unread),
+        "critical_count": int(critical),
+        "overdue_count": int(overdue),
+        "pending_response_count": int(pending),
+    }
+
+
+def count_mailbox_stats(db: Session, company_id: int, today: Optional[date] = None) -> dict:
+    """Conteos de la casilla de una empresa en una consulta (sin caché)."""
+    today = today or date.today()
+    fila = db.execute(
+        select(*_conteos(today))
+        .select_from(MailboxMessage)
+        .join(ElectronicMailbox, ElectronicMailbox.id == MailboxMessage.mailbox_id)
+        .where(ElectronicMailbox.company_id == company_id)
+    ).one()
+    return _resultado(*fila)
+
+
+def count_admin_mailbox_stats(db: Session, today: Optional[date] = None) -> dict:
+    """
+    Conteos globales para admin en una consulta (sin caché).
+
+    unread_count son los mensajes empresa→admin no leídos; el resto se cuenta
+    sobre los mensajes SISCONT→empresa de todas las casillas.
+    """
+    today = today or date.today()
+    entrantes = (
+        select(func.count(CompanyToAdminMessage.id))
+        .where(CompanyToAdminMessage.is_read == False)  # noqa: E712
+        .scalar_subquery()
+    )
+    _, critical, overdue, pending = _conteos(today)
+    fila = db.execute(select(entrantes, critical, overdue, pending).select_from(MailboxMessage)).one()
+    return _resultado(*fila)
+
+
+# ===== CACHÉ =====
+
+class MailboxStatsCache:
+    """Contadores por empresa con TTL, invalidados al confirmar cambios"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self._valores: Dict[Optional[int], Tuple[float, date, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave: Optional[int], today: date) -> Optional[dict]:
+        ttl = self.ttl_seconds if self.ttl_seconds is not None else settings.mailbox_stats_cache_seconds
+        with self._lock:
+            guardado = self._valores.get(clave)
+        if guardado is None:
+            return None
+        creado, dia, valor = guardado
+        if dia != today or time.monotonic() - creado > ttl:
+            return None
+        return dict(valor)
+
+    def set(self, clave: Optional[int], today: date, valor: dict) -> None:
+        with self._lock:
+            self._valores[clave] = (time.monotonic(), today, dict(valor))
+
+    def invalidate(self, claves: Optional[Set[Optional[int]]] = None) -> None:
+        """Descarta las claves indicadas (todas si no se indica ninguna)."""
+        with self._lock:
+            if claves is None:
+                self._valores.clear()
+            else:
+                for clave in claves:
+                    self._valores.pop(clave, None)
+
+
+stats_cache = MailboxStatsCache()
+
+
+def get_mailbox_stats(db: Session, company_id: int) -> dict:
+    """Estadísticas de la casilla de una empresa (desde caché si están vigentes)."""
+    today = date.today()
+    valor = stats_cache.get(company_id, today)
+    if valor is None:
+        valor = count_mailbox_stats(db, company_id, today)
+        stats_cache.set(company_id, today, valor)
+    return valor
+
+
+def get_admin_mailbox_stats(db: Session) -> dict:
+    """Estadísticas globales de admin (desde caché si están vigentes)."""
+    today = date.today()
+    valor = stats_cache.get(ADMIN, today)
+    if valor is None:
+        valor = count_admin_mailbox_stats(db, today)
+        stats_cache.set(ADMIN, today, valor)
+    return valor
+
+
+def _empresas_de_objeto(session: Session, obj) -> Set[Optional[int]]:
+    if isinstance(obj, MailboxMessage):
+        mailbox = obj.mailbox
+        if mailbox is None and obj.mailbox_id is not None:
+            mailbox = session.get(ElectronicMailbox, obj.mailbox_id)
+        return {ADMIN, mailbox.company_id if mailbox is not None else None}
+    if isinstance(obj, MailboxResponse):
+        return {ADMIN, obj.company_id}
+    if isinstance(obj, CompanyToAdminMessage):
+        return {ADMIN}
+    return set()
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """Registra las casillas afectadas por los cambios pendientes."""
+    pendientes: Set[Optional[int]] = session.info.setdefault(_SESSION_INFO_KEY, set())
+    with session.no_autoflush:
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            pendientes |= _empresas_de_objeto(session, obj)
+
+
+def _after_commit(session: Session) -> None:
+    pendientes = session.info.pop(_SESSION_INFO_KEY, None)
+    if pendientes:
+        stats_cache.invalidate(pendientes)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def register_mailbox_stats_listeners(session_factory=Session) -> None:
+    """Instala los listeners de invalidación (idempotente)."""
+    for nombre, fn in (("before_flush", _before_flush), ("after_commit", _after_commit), ("after_rollback", _after_rollback)):
+        if not event.contains(session_factory, nombre, fn):
+            event.listen(session_factory, nombre, fn)
+
+
+# ===== BARRIDO DE VENCIDOS =====
+
+def mark_overdue_messages(db: Session, today: Optional[date] = None) -> int:
+    """
+    Marca como VENCIDO los mensajes con plazo pasado y sin respuesta.
+
+    Un solo UPDATE; no carga mensajes. No hace commit.
+
+    Returns:
+        Mensajes marcados
+    """
+    today = today or date.today()
+    stmt = (
+        update(MailboxMessage)
+        .where(
+            MailboxMessage.due_date < today,
+            _sin_respuesta(),
+            or_(MailboxMessage.message_status.is_(None), MailboxMessage.message_status != "VENCIDO"),
+        )
+        .values(message_status="VENCIDO")
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).rowcount or 0
+
+
+class MailboxOverdueSweeper:
+    """Tarea de fondo que marca los mensajes vencidos cada `mailbox_overdue_sweep_minutes`"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Inicia el barrido en el event loop actual (no hace nada si ya corre)"""
+        if self.running:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    def sweep(self) -> int:
+        """Un barrido en su propia sesión y transacción."""
+        if self._session_factory is None:
+            from ..db import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            marcados = mark_overdue_messages(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if marcados:
+            logger.info(f"Casilla: {marcados} mensajes marcados como VENCIDO")
+        return marcados
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Error marcando mensajes vencidos de la casilla")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.mailbox_overdue_sweep_minutes * 60)
+            except asyncio.TimeoutError:
+                pass
+
+
+overdue_sweeper = MailboxOverdueSweeper()
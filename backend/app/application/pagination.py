@@ -0,0 +1,34 @@
+"""
+Paginación por keyset
+=====================
+
+Cursor opaco con el valor de la columna de orden y el id de la última fila de
+la página (desempate). Lo usan la búsqueda de documentos y los listados de la
+casilla electrónica.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+
+def encode_cursor(valor: Any, last_id: int) -> str:
+    """Cursor de la página siguiente (las fechas viajan en ISO 8601)."""
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([valor, last_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Returns:
+        (valor, last_id)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        valor, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return valor, int(last_id)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido")
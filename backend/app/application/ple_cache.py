@@ -0,0 +1,236 @@
+"""
+Caché de libros PLE generados
+=============================
+
+Los TXT PLE (5.1, 5.2, 8.1, 14.1) se guardan en disco direccionados por
+contenido: la clave es (empresa, libro, período, versión del libro contable del
+período, versión de datos maestros). Una descarga repetida sin cambios en el
+período es un FileResponse directo, sin volver a consultar asientos.
+
+La versión del período (PleLedgerVersion) se incrementa automáticamente en el
+flush de la sesión cuando se crean, postean, anulan o editan asientos, líneas,
+compras o ventas del período. Los cambios en cuentas o terceros incrementan la
+versión de datos maestros (month=0), que invalida todos los períodos.
+
+Los borrados masivos con Core (delete(...)) no pasan por el flush: quien los
+hace llama a invalidate_company_ple_cache en la misma transacción.
+"""
+import csv
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models import Account, EntryLine, JournalEntry, ThirdParty
+from ..domain.models_ext import Purchase, Sale
+from ..domain.models_ple import PleLedgerVersion
+
+logger = logging.getLogger(__name__)
+
+# Libros cuyo contenido depende solo de los datos del período (y de datos maestros)
+LIBROS_CACHEABLES = {"5.1", "5.2", "8.1", "14.1"}
+
+# (company_id, year, month); (company_id, 0, 0) = datos maestros
+ClaveVersion = Tuple[int, int, int]
+
+_SESSION_INFO_KEY = "ple_versiones_pendientes"
+
+
+def _cache_root() -> Path:
+    return settings.uploads_path.parent / "ple_cache"
+
+
+def _parse_period(period: str) -> Tuple[int, int]:
+    y, m = map(int, period.split('-'))
+    return y, m
+
+
+# ===== VERSIONES =====
+
+def get_ledger_version(db: Session, company_id: int, year: int, month: int) -> int:
+    """Versión actual de los datos del período (0 si nunca se modificó)."""
+    version = db.execute(
+        select(PleLedgerVersion.version).where(
+            PleLedgerVersion.company_id == company_id,
+            PleLedgerVersion.year == year,
+            PleLedgerVersion.month == month,
+        )
+    ).scalar()
+    return version or 0
+
+
+def _fechas(obj, attr: str) -> Set[date]:
+    """Valores actual y anterior (si cambió) de un atributo fecha."""
+    history = inspect(obj).attrs[attr].history
+    return {d for d in (getattr(obj, attr), *history.deleted) if d is not None}
+
+
+def _claves_de_objeto(session: Session, obj) -> Iterable[ClaveVersion]:
+    if isinstance(obj, JournalEntry):
+        for d in _fechas(obj, "date"):
+            yield (obj.company_id, d.year, d.month)
+    elif isinstance(obj, EntryLine):
+        entry = obj.entry
+        if entry is None and obj.entry_id is not None:
+            entry = session.get(JournalEntry, obj.entry_id)
+        if entry is not None and entry.date is not None:
+            yield (entry.company_id, entry.date.year, entry.date.month)
+    elif isinstance(obj, (Purchase, Sale)):
+        for d in _fechas(obj, "issue_date"):
+            yield (obj.company_id, d.year, d.month)
+    elif isinstance(obj, (Account, ThirdParty)):
+        if obj.company_id is not None:
+            yield (obj.company_id, 0, 0)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """Registra los períodos afectados por los cambios pendientes."""
+    pendientes: Set[ClaveVersion] = session.info.setdefault(_SESSION_INFO_KEY, set())
+    modificados = [o for o in session.dirty if session.is_modified(o, include_collections=False)]
+    with session.no_autoflush:
+        for obj in (*session.new, *modificados, *session.deleted):
+            for clave in _claves_de_objeto(session, obj):
+                if clave[0] is not None:
+                    pendientes.add(clave)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    """Incrementa, en la misma transacción, la versión de los períodos afectados."""
+    pendientes = session.info.pop(_SESSION_INFO_KEY, None)
+    if pendientes:
+        bump_ledger_versions(session, pendientes)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def bump_ledger_versions(session: Session, claves: Iterable[ClaveVersion]) -> None:
+    """
+    Incrementa la versión de cada (empresa, año, mes) indicado.
+
+    Se ejecuta sobre la conexión de la sesión (sin pasar por la unidad de trabajo),
+    así que es seguro llamarlo dentro de un flush y se revierte con la transacción.
+    """
+    conn = session.connection()
+    table = PleLedgerVersion.__table__
+    now = datetime.now()
+    for company_id, year, month in sorted(claves):
+        where = (table.c.company_id == company_id) & (table.c.year == year) & (table.c.month == month)
+        stmt = update(table).where(where).values(version=table.c.version + 1, updated_at=now)
+        if conn.execute(stmt).rowcount:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(table).values(
+                    company_id=company_id, year=year, month=month, version=1, updated_at=now
+                ))
+        except IntegrityError:
+            # Otra transacción creó la fila en paralelo
+            conn.execute(stmt)
+
+
+def invalidate_company_ple_cache(session: Session, company_id: int) -> None:
+    """
+    Invalida todos los libros cacheados de una empresa (p. ej. tras borrar sus
+    asientos con un delete masivo, que no dispara los listeners).
+
+    Incrementa la versión de datos maestros en la transacción de la sesión (se
+    revierte con ella) y elimina el directorio de caché de la empresa.
+    """
+    bump_ledger_versions(session, [(company_id, 0, 0)])
+    shutil.rmtree(_cache_root() / str(company_id), ignore_errors=True)
+
+
+def register_ple_cache_listeners(session_factory=Session) -> None:
+    """Instala los listeners de invalidación (idempotente)."""
+    for nombre, fn in (("before_flush", _before_flush), ("after_flush", _after_flush), ("after_rollback", _after_rollback)):
+        if not event.contains(session_factory, nombre, fn):
+            event.listen(session_factory, nombre, fn)
+
+
+# ===== CACHÉ EN DISCO =====
+
+def cache_key(company_id: int, libro: str, period: str, version: int, master_version: int) -> str:
+    """Digest SHA-256 que identifica el contenido de un libro generado."""
+    raw = f"{company_id}|{libro}|{period}|{version}|{master_version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _buscar(directorio: Path, libro: str, digest: str) -> Optional[Tuple[Path, int]]:
+    for path in directorio.glob(f"{libro}-{digest}-*.txt"):
+        try:
+            return path, int(path.stem.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            continue
+    return None
+
+
+def _escribir(directorio: Path, libro: str, digest: str, rows: List[List[str]]) -> Path:
+    """Escribe el TXT de forma atómica y elimina versiones anteriores del mismo libro."""
+    directorio.mkdir(parents=True, exist_ok=True)
+    destino = directorio / f"{libro}-{digest}-{len(rows)}.txt"
+    fd, tmp = tempfile.mkstemp(dir=directorio, prefix=f".{libro}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, delimiter='|', lineterminator='\n')
+            writer.writerows(rows)
+        os.replace(tmp, destino)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    for viejo in directorio.glob(f"{libro}-*.txt"):
+        if viejo != destino:
+            try:
+                viejo.unlink()
+            except OSError:
+                pass
+    return destino
+
+
+def get_or_build_ple_txt(
+    db: Session,
+    company_id: int,
+    libro: str,
+    period: str,
+    generador: Callable[[Session, int, str], List[List[str]]],
+) -> Optional[Tuple[Path, int]]:
+    """
+    Devuelve el TXT del libro desde la caché o lo genera si los datos cambiaron.
+
+    Args:
+        generador: Función de ple_completo que produce las filas del libro
+
+    Returns:
+        (ruta_del_archivo, cantidad_de_registros) o None si el período no tiene datos
+    """
+    if libro not in LIBROS_CACHEABLES:
+        raise ValueError(f"Libro PLE no cacheable: {libro}")
+
+    year, month = _parse_period(period)
+    version = get_ledger_version(db, company_id, year, month)
+    master_version = get_ledger_version(db, company_id, 0, 0)
+    digest = cache_key(company_id, libro, period, version, master_version)
+    directorio = _cache_root() / str(company_id) / period
+
+    encontrado = _buscar(directorio, libro, digest)
+    if encontrado:
+        return encontrado
+
+    rows = generador(db, company_id, period)
+    if not rows:
+        return None
+    path = _escribir(directorio, libro, digest, rows)
+    logger.info("PLE %s generado y cacheado: empresa=%s período=%s registros=%s", libro, company_id, period, len(rows))
+    return path, len(rows)
@@ -13,6 +13,7 @@ Libros soportados:
 - 8.2: Registro de Ventas
 """
 from datetime import date
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session, joinedload
 from decimal import Decimal
 from typing import List, Dict, Optional
@@ -418,9 +419,104 @@ def ple_registro_ventas(db: Session, company_id: int, period: str) -> List[List[
     return out
 
 
-def ple_caja_bancos(db: Session, company_id: int, period: str) -> List[List[str]]:
+# Caja (PCGE 101; 10.10 en el plan del sistema): Libro Caja y Bancos 1.1. Las demás
+# cuentas bancarias (10.2x del plan, PCGE 104 cuentas corrientes) van al 1.2
+_PREFIJO_CAJA = "101"
+
+
+def _libro_caja_bancos(code: str) -> str:
+    """Libro (1.1 / 1.2) de una cuenta bancaria según su código, con o sin puntos."""
+    return "1.1" if code.replace(".", "").startswith(_PREFIJO_CAJA) else "1.2"
+
+
+def _caja_bancos_scan(db: Session, company_id: int, period: str):
+    """
+    Recorre una sola vez los movimientos de todas las cuentas bancarias activas (10.x).
+
+    Una única consulta con proyección de columnas (sin hidratar objetos ORM) y
+    saldo acumulado calculado en SQL con una función de ventana particionada por
+    cuenta bancaria. Produce tuplas (libro, fila): la caja (101 / 10.10) va al
+    libro 1.1 y las cuentas corrientes (10.2x, 104) al 1.2.
+    """
+    ini, fin = _period_bounds(period)
+
+    period_id = db.query(Period.id).filter(
+        Period.company_id == company_id,
+        Period.year == int(period.split('-')[0]),
+        Period.month == int(period.split('-')[1])
+    ).scalar()
+
+    if not period_id:
+        return
+
+    saldo = func.sum(EntryLine.debit - EntryLine.credit).over(
+        partition_by=BankAccount.id,
+        order_by=(JournalEntry.date, EntryLine.id),
+    )
+
+    stmt = (
+        select(
+            Account.code,
+            Account.name,
+            JournalEntry.date,
+            EntryLine.memo,
+            JournalEntry.glosa,
+            EntryLine.debit,
+            EntryLine.credit,
+            saldo,
+        )
+        .select_from(BankAccount)
+        .join(Account, Account.id == BankAccount.account_id)
+        .join(EntryLine, EntryLine.account_id == Account.id)
+        .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
+        .where(
+            BankAccount.company_id == company_id,
+            BankAccount.active == True,
+            Account.code.like('10%'),  # Cuentas de efectivo y equivalentes
+            JournalEntry.period_id == period_id,
+            JournalEntry.date >= ini,
+            JournalEntry.date <= fin,
+            JournalEntry.status == "POSTED"
+        )
+        .order_by(BankAccount.id, JournalEntry.date, EntryLine.id)
+    )
+
+    periodo_ple = period.replace('-', '')
+
+    for code, name, fecha, memo, glosa, debit, credit, saldo_acumulado in db.execute(stmt):
+        descripcion = (memo or glosa or "").replace('|', ' ').replace('\n', ' ').strip()
+        libro = _libro_caja_bancos(code)
+
+        yield libro, [
+            periodo_ple,                            # 1: Período
+            fecha.strftime('%Y%m%d'),               # 2: Fecha
+            code,                                   # 3: Código de cuenta
+            name.replace('|', ' ')[:100],           # 4: Nombre de cuenta (máx 100 chars)
+            "",                                    # 5: Tipo documento (opcional)
+            "",                                    # 6: Número documento (opcional)
+            descripcion[:200],                     # 7: Descripción (máx 200 chars)
+            f"{float(debit):.2f}",                 # 8: Ingresos (Cargo)
+            f"{float(credit):.2f}",                # 9: Egresos (Abono)
+            f"{float(saldo_acumulado):.2f}",       # 10: Saldo acumulado
+        ]
+
+
+def ple_caja_bancos_libros(db: Session, company_id: int, period: str) -> Dict[str, List[List[str]]]:
     """
-    Libro Caja y Bancos Electrónico (PLE 1.1).
+    Genera los libros Caja y Bancos 1.1 (efectivo) y 1.2 (cuenta corriente) desde el mismo recorrido.
+
+    Returns:
+        {"1.1": filas, "1.2": filas} con el formato de ple_caja_bancos
+    """
+    libros: Dict[str, List[List[str]]] = {"1.1": [], "1.2": []}
+    for libro, fila in _caja_bancos_scan(db, company_id, period):
+        libros[libro].append(fila)
+    return libros
+
+
+def ple_caja_bancos(db: Session, company_id: int, period: str, libro: Optional[str] = None) -> List[List[str]]:
+    """
+    Libro Caja y Bancos Electrónico (PLE 1.1 / 1.2).
     
     Formato según SUNAT:
     - Columna 1: Período (AAAAMM)
@@ -433,72 +529,14 @@ def ple_caja_bancos(db: Session, company_id: int, period: str) -> List[List[str]
     - Columna 8: Ingresos (Cargo)
     - Columna 9: Egresos (Abono)
     - Columna 10: Saldo
+
+    Args:
+        libro: "1.1" (efectivo), "1.2" (cuentas corrientes) o None para todas las cuentas
     """
-    ini, fin = _period_bounds(period)
-    
-    period_obj = db.query(Period).filter(
-        Period.company_id == company_id,
-        Period.year == int(period.split('-')[0]),
-        Period.month == int(period.split('-')[1])
-    ).first()
-    
-    if not period_obj:
-        return []
-    
-    # Obtener cuentas bancarias y de caja (10.x)
-    bank_accounts = (
-        db.query(BankAccount)
-        .join(Account, Account.id == BankAccount.account_id)
-        .filter(
-            BankAccount.company_id == company_id,
-            BankAccount.active == True,
-            Account.code.like('10%')  # Cuentas de efectivo y equivalentes
-        )
-        .all()
-    )
-    
-    out = []
-    
-    for bank_acc in bank_accounts:
-        account = bank_acc.account
-        
-        # Obtener movimientos desde EntryLine asociados a esta cuenta
-        movements = (
-            db.query(EntryLine, JournalEntry)
-            .join(JournalEntry, JournalEntry.id == EntryLine.entry_id)
-            .filter(
-                EntryLine.account_id == account.id,
-                JournalEntry.period_id == period_obj.id,
-                JournalEntry.date >= ini,
-                JournalEntry.date <= fin,
-                JournalEntry.status == "POSTED"
-            )
-            .order_by(JournalEntry.date, EntryLine.id)
-            .all()
-        )
-        
-        saldo_acumulado = Decimal('0')
-        
-        for line, entry in movements:
-            saldo_acumulado += (line.debit - line.credit)
-            
-            # Descripción/Glosa
-            descripcion = (line.memo or entry.glosa or "").replace('|', ' ').replace('\n', ' ').strip()
-            
-            out.append([
-                period.replace('-', ''),                # 1: Período
-                entry.date.strftime('%Y%m%d'),          # 2: Fecha
-                account.code,                           # 3: Código de cuenta
-                account.name.replace('|', ' ')[:100],   # 4: Nombre de cuenta (máx 100 chars)
-                "",                                    # 5: Tipo documento (opcional)
-                "",                                    # 6: Número documento (opcional)
-                descripcion[:200],                     # 7: Descripción (máx 200 chars)
-                f"{float(line.debit):.2f}",            # 8: Ingresos (Cargo)
-                f"{float(line.credit):.2f}",           # 9: Egresos (Abono)
-                f"{float(saldo_acumulado):.2f}",       # 10: Saldo acumulado
-            ])
-    
-    return out
+    return [
+        fila for libro_fila, fila in _caja_bancos_scan(db, company_id, period)
+        if libro is None or libro_fila == libro
+    ]
 
 
 def ple_inventarios_balances(db: Session, company_id: int, period: str) -> List[List[str]]:
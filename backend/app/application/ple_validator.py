@@ -0,0 +1,364 @@
+"""
+Validador de estructura PLE - SUNAT Perú
+========================================
+
+Verifica que cada fila de un libro electrónico generado cumpla la estructura
+SUNAT antes de subirlo: cantidad de campos, fechas AAAAMMDD, períodos AAAAMM,
+precisión numérica, códigos de catálogo y dígito verificador del RUC.
+
+Las definiciones de cada libro (las mismas que lista read_ple_structure.py desde
+la plantilla oficial) se compilan una sola vez en verificadores por columna.
+La validación es columnar y por lotes con NumPy: cada verificador recibe la
+columna completa del lote y devuelve una máscara de filas inválidas, sin
+recorrer fila por fila ni usar expresiones regulares.
+"""
+from dataclasses import dataclass
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_ERRORES_POR_COLUMNA = 20
+TAMANO_LOTE = 250_000
+
+# Catálogo 06 SUNAT: tipo de documento de identidad
+CATALOGO_06 = ("0", "1", "4", "6", "7", "A", "B", "C", "D", "E", "-")
+# Catálogo 10 SUNAT: tipo de comprobante de pago (subconjunto usado por SISCONT)
+CATALOGO_10 = ("00", "01", "02", "03", "04", "05", "07", "08", "12", "14", "16", "18", "46", "50", "52", "91", "97", "98")
+# Tipo de cuenta PLE usado en 5.3 y 3.1
+TIPOS_CUENTA_PLE = ("A", "P", "PN", "I", "G")
+
+PESOS_RUC = np.array([5, 4, 3, 2, 7, 6, 5, 4, 3, 2], dtype=np.int64)
+_DIAS_POR_MES = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class CampoPLE:
+    """Definición de un campo de la estructura PLE."""
+    nombre: str
+    tipo: str  # PERIODO, FECHA, TEXTO, CODIGO, NUMERO, CATALOGO, DOCUMENTO
+    obligatorio: bool = True
+    longitud_max: Optional[int] = None
+    enteros: int = 12
+    decimales: int = 2
+    catalogo: Tuple[str, ...] = ()
+    columna_tipo_doc: Optional[int] = None  # Para DOCUMENTO: índice (0-based) del campo con el tipo (Catálogo 06)
+
+
+def _periodo() -> CampoPLE:
+    return CampoPLE("Período", "PERIODO")
+
+
+def _importe(nombre: str) -> CampoPLE:
+    return CampoPLE(nombre, "NUMERO", enteros=12, decimales=2)
+
+
+# Estructuras de los libros que genera ple_completo.py (mismo orden de columnas)
+ESTRUCTURAS_PLE: Dict[str, List[CampoPLE]] = {
+    "5.1": [
+        CampoPLE("Fecha", "FECHA"),
+        CampoPLE("Glosa", "TEXTO", obligatorio=False, longitud_max=200),
+        CampoPLE("Código de cuenta", "CODIGO", longitud_max=24),
+        _importe("Debe"),
+        _importe("Haber"),
+    ],
+    "5.2": [
+        CampoPLE("Código de cuenta", "CODIGO", longitud_max=24),
+        CampoPLE("Nombre de cuenta", "TEXTO", longitud_max=100),
+        CampoPLE("Fecha", "FECHA"),
+        _importe("Debe"),
+        _importe("Haber"),
+        _importe("Saldo"),
+    ],
+    "5.3": [
+        CampoPLE("Código de cuenta", "CODIGO", longitud_max=24),
+        CampoPLE("Nombre de cuenta", "TEXTO", longitud_max=100),
+        CampoPLE("Tipo de cuenta", "CATALOGO", catalogo=TIPOS_CUENTA_PLE),
+        CampoPLE("Nivel", "NUMERO", enteros=2, decimales=0),
+    ],
+    "8.1": [
+        _periodo(),
+        CampoPLE("Fecha de emisión", "FECHA"),
+        CampoPLE("Fecha de vencimiento o pago", "FECHA", obligatorio=False),
+        CampoPLE("Tipo de comprobante", "CATALOGO", catalogo=CATALOGO_10),
+        CampoPLE("Serie", "TEXTO", obligatorio=False, longitud_max=20),
+        CampoPLE("Número", "TEXTO", longitud_max=20),
+        CampoPLE("Tipo de documento proveedor", "CATALOGO", catalogo=CATALOGO_06),
+        CampoPLE("Número de documento proveedor", "DOCUMENTO", longitud_max=15, columna_tipo_doc=6),
+        CampoPLE("Denominación proveedor", "TEXTO", longitud_max=100),
+        _importe("Base imponible"),
+        _importe("IGV"),
+        _importe("Importe total"),
+    ],
+    "14.1": [
+        _periodo(),
+        CampoPLE("Fecha de emisión", "FECHA"),
+        CampoPLE("Fecha de vencimiento o pago", "FECHA", obligatorio=False),
+        CampoPLE("Tipo de comprobante", "CATALOGO", catalogo=CATALOGO_10),
+        CampoPLE("Serie", "TEXTO", obligatorio=False, longitud_max=20),
+        CampoPLE("Número", "TEXTO", longitud_max=20),
+        CampoPLE("Tipo de documento cliente", "CATALOGO", catalogo=CATALOGO_06),
+        CampoPLE("Número de documento cliente", "DOCUMENTO", longitud_max=15, columna_tipo_doc=6),
+        CampoPLE("Denominación cliente", "TEXTO", longitud_max=100),
+        _importe("Base imponible"),
+        _importe("IGV"),
+        _importe("Importe total"),
+    ],
+    "1.1": [
+        _periodo(),
+        CampoPLE("Fecha", "FECHA"),
+        CampoPLE("Código de cuenta", "CODIGO", longitud_max=24),
+        CampoPLE("Nombre de cuenta", "TEXTO", longitud_max=100),
+        CampoPLE("Tipo de documento", "CATALOGO", obligatorio=False, catalogo=CATALOGO_06),
+        CampoPLE("Número de documento", "TEXTO", obligatorio=False, longitud_max=20),
+        CampoPLE("Descripción", "TEXTO", obligatorio=False, longitud_max=200),
+        _importe("Ingresos"),
+        _importe("Egresos"),
+        _importe("Saldo"),
+    ],
+    "3.1": [
+        _periodo(),
+        CampoPLE("Código de cuenta", "CODIGO", longitud_max=24),
+        CampoPLE("Nombre de cuenta", "TEXTO", longitud_max=100),
+        CampoPLE("Tipo de cuenta", "CATALOGO", catalogo=TIPOS_CUENTA_PLE),
+        _importe("Saldo inicial Debe"),
+        _importe("Saldo inicial Haber"),
+        _importe("Movimientos Debe"),
+        _importe("Movimientos Haber"),
+        _importe("Saldo final Debe"),
+        _importe("Saldo final Haber"),
+    ],
+}
+# 1.2 (cuenta corriente) comparte el formato de columnas del 1.1
+ESTRUCTURAS_PLE["1.2"] = ESTRUCTURAS_PLE["1.1"]
+
+
+# Un verificador recibe (columna, columnas_del_lote) y devuelve (máscara_inválidos, motivo)
+Verificador = Callable[[np.ndarray, Sequence[np.ndarray]], Tuple[np.ndarray, str]]
+
+
+def _digitos(col: np.ndarray, longitud: int) -> np.ndarray:
+    """Convierte una columna de cadenas numéricas de largo fijo en matriz (n, longitud) de dígitos."""
+    fijo = col.astype(f"U{longitud}")
+    return (fijo.view(np.uint32).reshape(-1, longitud).astype(np.int64) - 48)
+
+
+def _fecha_invalida(col: np.ndarray, largo: int) -> np.ndarray:
+    """Máscara de valores que no son fechas AAAAMMDD (largo=8) o períodos AAAAMM (largo=6)."""
+    invalida = (np.char.str_len(col) != largo) | ~np.char.isdigit(col)
+    validos = ~invalida
+    if not validos.any():
+        return invalida
+    valores = col[validos].astype(np.int64)
+    if largo == 8:
+        anio, mes, dia = valores // 10000, (valores // 100) % 100, valores % 100
+    else:
+        anio, mes, dia = valores // 100, valores % 100, np.ones_like(valores)
+    mes_ok = (mes >= 1) & (mes <= 12)
+    dias_mes = _DIAS_POR_MES[np.where(mes_ok, mes, 0)]
+    bisiesto = ((anio % 4 == 0) & (anio % 100 != 0)) | (anio % 400 == 0)
+    dias_mes = dias_mes + ((mes == 2) & bisiesto)
+    ok = (anio >= 1900) & mes_ok & (dia >= 1) & (dia <= dias_mes)
+    invalida[validos] = ~ok
+    return invalida
+
+
+def _compilar_campo(campo: CampoPLE) -> Verificador:
+    """Compila la definición de un campo en un verificador vectorizado."""
+
+    def _vacios(col: np.ndarray) -> np.ndarray:
+        return np.char.str_len(col) == 0
+
+    def _con_opcional(mask: np.ndarray, col: np.ndarray) -> np.ndarray:
+        vacio = _vacios(col)
+        if campo.obligatorio:
+            return mask | vacio
+        return mask & ~vacio
+
+    if campo.tipo in ("FECHA", "PERIODO"):
+        largo = 8 if campo.tipo == "FECHA" else 6
+        motivo = "Formato AAAAMMDD inválido" if largo == 8 else "Formato AAAAMM inválido"
+
+        def verificar(col, _lote):
+            return _con_opcional(_fecha_invalida(col, largo), col), motivo
+        return verificar
+
+    if campo.tipo == "NUMERO":
+        motivo = (
+            f"Número inválido (máx. {campo.enteros} enteros y {campo.decimales} decimales)"
+            if campo.decimales else f"Entero inválido (máx. {campo.enteros} dígitos)"
+        )
+
+        def verificar(col, _lote):
+            sin_signo = np.char.lstrip(col, "-")
+            largo = np.char.str_len(sin_signo)
+            signos = np.char.str_len(col) - largo
+            punto = np.char.find(sin_signo, ".")
+            invalido = (signos > 1) | ~np.char.isdigit(np.char.replace(sin_signo, ".", "", 1))
+            if campo.decimales:
+                invalido |= (punto < 1) | (punto > campo.enteros) | (punto != largo - campo.decimales - 1)
+            else:
+                invalido |= (punto != -1) | (largo == 0) | (largo > campo.enteros)
+            return _con_opcional(invalido, col), motivo
+        return verificar
+
+    if campo.tipo == "CATALOGO":
+        codigos = np.array(campo.catalogo)
+        motivo = f"Código fuera de catálogo ({', '.join(campo.catalogo[:8])}{'...' if len(campo.catalogo) > 8 else ''})"
+
+        def verificar(col, _lote):
+            return _con_opcional(~np.isin(col, codigos), col), motivo
+        return verificar
+
+    if campo.tipo == "CODIGO":
+        motivo = f"Código debe ser numérico, con segmentos separados por '.' (máx. {campo.longitud_max} caracteres)"
+
+        def verificar(col, _lote):
+            # Códigos PCGE con puntos ("10.21", "60.11"): dígitos entre puntos, sin segmentos vacíos
+            invalido = (
+                ~np.char.isdigit(np.char.replace(col, ".", ""))
+                | np.char.startswith(col, ".") | np.char.endswith(col, ".")
+                | (np.char.find(col, "..") != -1)
+            )
+            if campo.longitud_max:
+                invalido |= np.char.str_len(col) > campo.longitud_max
+            return _con_opcional(invalido, col), motivo
+        return verificar
+
+    if campo.tipo == "DOCUMENTO":
+        motivo = "Documento inválido (RUC: 11 dígitos con dígito verificador; DNI: 8 dígitos)"
+
+        def verificar(col, lote):
+            invalido = np.zeros(col.shape, dtype=bool)
+            if campo.longitud_max:
+                invalido |= np.char.str_len(col) > campo.longitud_max
+            tipos = lote[campo.columna_tipo_doc] if campo.columna_tipo_doc is not None else None
+            if tipos is not None:
+                es_dni = tipos == "1"
+                invalido |= es_dni & ((np.char.str_len(col) != 8) | ~np.char.isdigit(col))
+                es_ruc = tipos == "6"
+                formato_ruc = (np.char.str_len(col) == 11) & np.char.isdigit(col)
+                invalido |= es_ruc & ~formato_ruc
+                candidatos = es_ruc & formato_ruc
+                if candidatos.any():
+                    digitos = _digitos(col[candidatos], 11)
+                    esperado = (11 - (digitos[:, :10] @ PESOS_RUC) % 11) % 10
+                    invalido[candidatos] = esperado != digitos[:, 10]
+            return _con_opcional(invalido, col), motivo
+        return verificar
+
+    # TEXTO
+    motivo = f"Texto vacío o mayor a {campo.longitud_max} caracteres" if campo.longitud_max else "Texto obligatorio vacío"
+
+    def verificar(col, _lote):
+        invalido = np.zeros(col.shape, dtype=bool)
+        if campo.longitud_max:
+            invalido |= np.char.str_len(col) > campo.longitud_max
+        return _con_opcional(invalido, col), motivo
+    return verificar
+
+
+def _columna(lote: List[Sequence[str]], j: int) -> np.ndarray:
+    """Extrae la columna j del lote como arreglo de cadenas de ancho fijo."""
+    valores = list(map(itemgetter(j), lote))
+    ancho = max(1, max(map(len, valores)))
+    return np.fromiter(valores, dtype=f"U{ancho}", count=len(valores))
+
+
+_COMPILADAS: Dict[str, List[Verificador]] = {}
+
+
+def compilar_estructura(libro: str) -> List[Verificador]:
+    """
+    Compila (una sola vez por proceso) la estructura de un libro en verificadores por columna.
+
+    Raises:
+        ValueError: Si el libro no tiene estructura definida
+    """
+    if libro not in ESTRUCTURAS_PLE:
+        raise ValueError(f"Libro PLE no soportado: {libro}. Disponibles: {', '.join(ESTRUCTURAS_PLE)}")
+    if libro not in _COMPILADAS:
+        _COMPILADAS[libro] = [_compilar_campo(c) for c in ESTRUCTURAS_PLE[libro]]
+    return _COMPILADAS[libro]
+
+
+def validar_libro_ple(
+    rows: Iterable[Sequence[str]],
+    libro: str,
+    max_errores: int = MAX_ERRORES_POR_COLUMNA,
+    tamano_lote: int = TAMANO_LOTE,
+) -> Dict:
+    """
+    Valida un libro PLE generado columna por columna, en lotes.
+
+    Args:
+        rows: Filas del libro (listas de strings, como las devuelve ple_completo)
+        libro: Código del libro ("5.1", "8.1", "14.1", ...)
+        max_errores: Máximo de errores de ejemplo a reportar por columna
+        tamano_lote: Filas por lote (acota la memoria usada)
+
+    Returns:
+        Dict con:
+        - libro, registros, valido
+        - errores_estructura: filas con cantidad de campos incorrecta
+        - errores_por_columna: {nro_columna: {campo, total, muestras[{fila, valor, motivo}]}}
+    """
+    verificadores = compilar_estructura(libro)
+    campos = ESTRUCTURAS_PLE[libro]
+    n_campos = len(campos)
+
+    errores_estructura = {"total": 0, "muestras": []}
+    errores_columna: Dict[int, Dict] = {}
+    total = 0
+
+    iterador = iter(rows)
+    while True:
+        lote = list(islice(iterador, tamano_lote))
+        if not lote:
+            break
+        offset = total
+        total += len(lote)
+
+        largos = np.fromiter((len(r) for r in lote), dtype=np.int64, count=len(lote))
+        malos = np.flatnonzero(largos != n_campos)
+        if malos.size:
+            errores_estructura["total"] += int(malos.size)
+            for idx in malos[: max(0, max_errores - len(errores_estructura["muestras"]))]:
+                errores_estructura["muestras"].append({
+                    "fila": offset + int(idx) + 1,
+                    "campos": int(largos[idx]),
+                    "motivo": f"Se esperaban {n_campos} campos",
+                })
+            buenos = np.flatnonzero(largos == n_campos)
+            lote = [lote[i] for i in buenos]
+            filas = buenos + offset + 1
+        else:
+            filas = np.arange(offset + 1, offset + len(lote) + 1)
+
+        if not lote:
+            continue
+
+        columnas = [_columna(lote, j) for j in range(n_campos)]
+        for j, verificar in enumerate(verificadores):
+            mask, motivo = verificar(columnas[j], columnas)
+            invalidos = np.flatnonzero(mask)
+            if not invalidos.size:
+                continue
+            info = errores_columna.setdefault(j + 1, {"campo": campos[j].nombre, "total": 0, "muestras": []})
+            info["total"] += int(invalidos.size)
+            faltan = max_errores - len(info["muestras"])
+            for idx in invalidos[:max(0, faltan)]:
+                info["muestras"].append({
+                    "fila": int(filas[idx]),
+                    "valor": str(columnas[j][idx]),
+                    "motivo": motivo,
+                })
+
+    return {
+        "libro": libro,
+        "registros": total,
+        "valido": errores_estructura["total"] == 0 and not errores_columna,
+        "errores_estructura": errores_estructura,
+        "errores_por_columna": errores_columna,
+    }
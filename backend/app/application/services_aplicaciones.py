@@ -9,7 +9,8 @@ Principios:
 """
 from decimal import Decimal
 from datetime import date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 import logging
 
@@ -71,26 +72,8 @@ class AplicacionPagosService:
             - No permitir aplicar más de lo pendiente
             - No permitir aplicar en periodo cerrado
         """
-        # 1. Validar movimiento de tesorería
-        movimiento = self.db.query(MovimientoTesoreria).filter(
-            MovimientoTesoreria.id == movimiento_tesoreria_id,
-            MovimientoTesoreria.company_id == company_id,
-            MovimientoTesoreria.estado == EstadoMovimiento.REGISTRADO.value
-        ).first()
-        
-        if not movimiento:
-            raise AplicacionPagosError(f"Movimiento de tesorería {movimiento_tesoreria_id} no encontrado o no está registrado")
-        
-        # 2. Validar que no sea TRANSFERENCIA (solo COBRO y PAGO se aplican)
-        if movimiento.tipo == "TRANSFERENCIA":
-            raise AplicacionPagosError("Los movimientos de transferencia no se aplican a documentos")
-        
-        # 3. Validar período abierto
-        periodo = self.uow.periods.get_or_open(company_id, movimiento.fecha)
-        if periodo:
-            es_periodo_abierto, error_periodo = validar_periodo_abierto(periodo)
-            if not es_periodo_abierto:
-                raise AplicacionPagosError(f"Período cerrado: {error_periodo}")
+        # 1-3. Validar movimiento de tesorería, tipo y período abierto
+        movimiento = self._validar_movimiento(movimiento_tesoreria_id, company_id)
         
         # 4. Calcular total aplicado
         total_aplicado = sum(Decimal(str(a.get("monto_aplicado", 0))) for a in aplicaciones)
@@ -181,6 +164,271 @@ class AplicacionPagosService:
         
         return aplicaciones_creadas
     
+    def _validar_movimiento(self, movimiento_tesoreria_id: int, company_id: int) -> MovimientoTesoreria:
+        """Movimiento registrado, que no sea transferencia y con período abierto."""
+        movimiento = self.db.query(MovimientoTesoreria).filter(
+            MovimientoTesoreria.id == movimiento_tesoreria_id,
+            MovimientoTesoreria.company_id == company_id,
+            MovimientoTesoreria.estado == EstadoMovimiento.REGISTRADO.value
+        ).first()
+        
+        if not movimiento:
+            raise AplicacionPagosError(f"Movimiento de tesorería {movimiento_tesoreria_id} no encontrado o no está registrado")
+        
+        # Solo COBRO y PAGO se aplican
+        if movimiento.tipo == "TRANSFERENCIA":
+            raise AplicacionPagosError("Los movimientos de transferencia no se aplican a documentos")
+        
+        self._validar_periodo(company_id, movimiento.fecha)
+        return movimiento
+    
+    def _validar_periodo(self, company_id: int, fecha: date) -> None:
+        periodo = self.uow.periods.get_or_open(company_id, fecha.year, fecha.month)
+        if periodo:
+            es_periodo_abierto, error_periodo = validar_periodo_abierto(periodo)
+            if not es_periodo_abierto:
+                raise AplicacionPagosError(f"Período cerrado: {error_periodo}")
+    
+    def aplicar_pago_masivo(
+        self,
+        movimiento_tesoreria_id: int,
+        company_id: int,
+        documentos: Optional[List[Dict[str, Any]]] = None,
+        tercero_id: Optional[int] = None,
+        usuario_id: Optional[int] = None
+    ) -> List[AplicacionDocumento]:
+        """
+        Aplica un cobro/pago a muchas facturas de una vez.
+        
+        Los saldos de todas las facturas se obtienen en una consulta agrupada,
+        la asignación se hace en memoria y las aplicaciones se insertan en un
+        solo flush.
+        
+        Args:
+            movimiento_tesoreria_id: ID del movimiento de tesorería (cobro o pago)
+            company_id: ID de la empresa
+            documentos: Lista explícita, en orden, de dicts con documento_id y
+                monto_aplicado opcional (sin monto se aplica el saldo pendiente
+                hasta agotar el movimiento). Si es None se aplica FIFO.
+            tercero_id: Cliente/proveedor para FIFO (por defecto el del documento
+                que referencia el movimiento)
+            usuario_id: ID del usuario que realiza la aplicación
+        
+        Returns:
+            Lista de AplicacionDocumento creadas
+        
+        FIFO:
+            Facturas abiertas del tercero de la más antigua a la más reciente por
+            fecha de emisión (los comprobantes no registran fecha de vencimiento),
+            hasta agotar el saldo del movimiento.
+        """
+        movimiento = self._validar_movimiento(movimiento_tesoreria_id, company_id)
+        
+        # Saldo del movimiento descontando sus aplicaciones anteriores
+        ya_aplicado = self.db.execute(
+            select(func.coalesce(func.sum(AplicacionDocumento.monto_aplicado), 0)).where(
+                AplicacionDocumento.movimiento_tesoreria_id == movimiento_tesoreria_id,
+                AplicacionDocumento.company_id == company_id
+            )
+        ).scalar()
+        disponible = Decimal(str(movimiento.monto)) - Decimal(str(ya_aplicado))
+        if disponible <= Decimal("0.00"):
+            raise AplicacionPagosError(f"El movimiento {movimiento_tesoreria_id} ya está totalmente aplicado")
+        
+        if documentos is None:
+            if tercero_id is None:
+                tercero_id = self._tercero_del_movimiento(movimiento)
+            if tercero_id is None:
+                raise AplicacionPagosError("Indique el cliente/proveedor para aplicar por antigüedad (FIFO)")
+            saldos = self.saldos_pendientes(
+                company_id, movimiento.tipo, tercero_id=tercero_id, excluir_movimiento_id=movimiento.id
+            )
+            pedidos = [(doc.id, None) for doc, saldo in saldos if saldo > 0]
+        else:
+            pedidos = [
+                (int(d["documento_id"]), Decimal(str(d["monto_aplicado"])) if d.get("monto_aplicado") is not None else None)
+                for d in documentos
+            ]
+            if len({documento_id for documento_id, _ in pedidos}) != len(pedidos):
+                raise AplicacionPagosError("Hay documentos repetidos en la lista")
+            saldos = self.saldos_pendientes(
+                company_id, movimiento.tipo, documento_ids=[i for i, _ in pedidos], excluir_movimiento_id=movimiento.id
+            )
+        saldo_por_id = {doc.id: saldo for doc, saldo in saldos}
+        
+        # Asignación en memoria
+        tipo_documento = TipoDocumentoAplicacion.FACTURA.value
+        asignaciones: List[Tuple[int, Decimal]] = []
+        for documento_id, monto_aplicado in pedidos:
+            if documento_id not in saldo_por_id:
+                raise AplicacionPagosError(f"Documento {tipo_documento} {documento_id} no encontrado")
+            saldo_pendiente = saldo_por_id[documento_id]
+            if monto_aplicado is None:
+                if disponible <= 0:
+                    break
+                if saldo_pendiente <= 0:
+                    continue
+                monto_aplicado = min(saldo_pendiente, disponible)
+            elif monto_aplicado <= 0:
+                raise AplicacionPagosError("El monto aplicado debe ser mayor a cero")
+            elif monto_aplicado > saldo_pendiente:
+                raise AplicacionPagosError(
+                    f"El monto aplicado ({monto_aplicado}) excede el saldo pendiente ({saldo_pendiente}) "
+                    f"del documento {tipo_documento} {documento_id}"
+                )
+            elif monto_aplicado > disponible:
+                raise AplicacionPagosError(
+                    f"La suma aplicada excede el saldo del movimiento ({Decimal(str(movimiento.monto)) - Decimal(str(ya_aplicado))})"
+                )
+            asignaciones.append((documento_id, monto_aplicado))
+            disponible -= monto_aplicado
+        
+        if not asignaciones:
+            raise AplicacionPagosError("No hay facturas con saldo pendiente para aplicar")
+        
+        # Inserción de todas las aplicaciones en un solo flush
+        aplicaciones_creadas = [
+            AplicacionDocumento(
+                company_id=company_id,
+                movimiento_tesoreria_id=movimiento_tesoreria_id,
+                tipo_documento=tipo_documento,
+                documento_id=documento_id,
+                monto_aplicado=monto_aplicado,
+                fecha=movimiento.fecha,
+                created_by_id=usuario_id
+            )
+            for documento_id, monto_aplicado in asignaciones
+        ]
+        self.db.add_all(aplicaciones_creadas)
+        self.db.flush()
+        
+        logger.info(
+            f"Aplicación masiva: Movimiento {movimiento_tesoreria_id} -> {len(aplicaciones_creadas)} facturas, "
+            f"monto: {sum(m for _, m in asignaciones)}, saldo del movimiento: {disponible}"
+        )
+        
+        return aplicaciones_creadas
+    
+    def _tercero_del_movimiento(self, movimiento: MovimientoTesoreria) -> Optional[int]:
+        """Cliente o proveedor del documento que referencia el movimiento."""
+        if movimiento.referencia_tipo == "VENTA":
+            return self.db.execute(select(Sale.customer_id).where(Sale.id == movimiento.referencia_id)).scalar()
+        if movimiento.referencia_tipo == "COMPRA":
+            return self.db.execute(select(Purchase.supplier_id).where(Purchase.id == movimiento.referencia_id)).scalar()
+        return None
+    
+    def saldos_pendientes(
+        self,
+        company_id: int,
+        movimiento_tipo: str,
+        documento_ids: Optional[Sequence[int]] = None,
+        tercero_id: Optional[int] = None,
+        excluir_movimiento_id: Optional[int] = None
+    ) -> List[Tuple[Any, Decimal]]:
+        """
+        Saldos pendientes de varias facturas en una sola consulta agrupada.
+        
+        Total, menos aplicaciones (o, si el documento no tiene aplicaciones,
+        los cobros/pagos legacy que lo referencian y no se aplicaron a ningún
+        documento), menos notas de crédito, más notas de débito.
+        
+        Args:
+            movimiento_tipo: COBRO (ventas) o PAGO (compras)
+            documento_ids: Limitar a estas facturas
+            tercero_id: Limitar a las facturas de este cliente/proveedor
+            excluir_movimiento_id: Movimiento que se está aplicando; no cuenta
+                como cobro/pago directo del documento que referencia
+        
+        Returns:
+            Lista de (documento, saldo) en orden FIFO (fecha de emisión, id);
+            documento es una fila con id, issue_date, series, number y total_amount
+        """
+        from ..domain.models_notas import NotaDocumento, EstadoNota
+        
+        if movimiento_tipo == "COBRO":
+            modelo, referencia_tipo, tercero = Sale, "VENTA", Sale.customer_id
+        elif movimiento_tipo == "PAGO":
+            modelo, referencia_tipo, tercero = Purchase, "COMPRA", Purchase.supplier_id
+        else:
+            return []
+        
+        filtros = [modelo.company_id == company_id]
+        if documento_ids is not None:
+            filtros.append(modelo.id.in_(list(documento_ids)))
+        if tercero_id is not None:
+            filtros.append(tercero == tercero_id)
+        documentos = select(modelo.id).where(*filtros)
+        
+        aplicado = (
+            select(AplicacionDocumento.documento_id, func.sum(AplicacionDocumento.monto_aplicado).label("monto"))
+            .where(
+                AplicacionDocumento.company_id == company_id,
+                AplicacionDocumento.tipo_documento == TipoDocumentoAplicacion.FACTURA.value,
+                AplicacionDocumento.documento_id.in_(documentos)
+            )
+            .group_by(AplicacionDocumento.documento_id)
+            .subquery()
+        )
+        filtros_directo = [
+            MovimientoTesoreria.company_id == company_id,
+            MovimientoTesoreria.referencia_tipo == referencia_tipo,
+            MovimientoTesoreria.estado == EstadoMovimiento.REGISTRADO.value,
+            MovimientoTesoreria.referencia_id.in_(documentos),
+            # Legacy = cobros/pagos sin aplicaciones; los ya aplicados cuentan por sus aplicaciones
+            ~select(AplicacionDocumento.id).where(
+                AplicacionDocumento.movimiento_tesoreria_id == MovimientoTesoreria.id
+            ).exists()
+        ]
+        if excluir_movimiento_id is not None:
+            filtros_directo.append(MovimientoTesoreria.id != excluir_movimiento_id)
+        directo = (
+            select(MovimientoTesoreria.referencia_id, func.sum(MovimientoTesoreria.monto).label("monto"))
+            .where(*filtros_directo)
+            .group_by(MovimientoTesoreria.referencia_id)
+            .subquery()
+        )
+        notas = (
+            select(
+                NotaDocumento.documento_ref_id,
+                func.sum(case((NotaDocumento.tipo == "CREDITO", NotaDocumento.total), else_=0)).label("credito"),
+                func.sum(case((NotaDocumento.tipo == "DEBITO", NotaDocumento.total), else_=0)).label("debito"),
+            )
+            .where(
+                NotaDocumento.company_id == company_id,
+                NotaDocumento.documento_ref_tipo == referencia_tipo,
+                NotaDocumento.estado == EstadoNota.REGISTRADA.value,
+                NotaDocumento.documento_ref_id.in_(documentos)
+            )
+            .group_by(NotaDocumento.documento_ref_id)
+            .subquery()
+        )
+        filas = self.db.execute(
+            select(
+                modelo.id, modelo.issue_date, modelo.series, modelo.number, modelo.total_amount,
+                func.coalesce(aplicado.c.monto, 0).label("aplicado"),
+                func.coalesce(directo.c.monto, 0).label("directo"),
+                func.coalesce(notas.c.credito, 0).label("notas_credito"),
+                func.coalesce(notas.c.debito, 0).label("notas_debito"),
+            )
+            .outerjoin(aplicado, aplicado.c.documento_id == modelo.id)
+            .outerjoin(directo, directo.c.referencia_id == modelo.id)
+            .outerjoin(notas, notas.c.documento_ref_id == modelo.id)
+            .where(*filtros)
+            .order_by(modelo.issue_date, modelo.id)
+        ).all()
+        
+        resultado = []
+        for fila in filas:
+            total_aplicado = Decimal(str(fila.aplicado))
+            # Si hay aplicaciones se usan las aplicaciones; si no, el sistema legacy (no se duplican)
+            cancelado = total_aplicado if total_aplicado > 0 else Decimal(str(fila.directo))
+            saldo = (
+                Decimal(str(fila.total_amount or 0)) - cancelado
+                - Decimal(str(fila.notas_credito)) + Decimal(str(fila.notas_debito))
+            )
+            resultado.append((fila, max(saldo, Decimal("0.00"))))
+        return resultado
+    
     def desaplicar_pago(
         self,
         aplicacion_id: int,
@@ -218,11 +466,7 @@ class AplicacionPagosService:
             raise AplicacionPagosError(f"Movimiento de tesorería {aplicacion.movimiento_tesoreria_id} no encontrado")
         
         # 3. Validar período abierto
-        periodo = self.uow.periods.get_or_open(company_id, movimiento.fecha)
-        if periodo:
-            es_periodo_abierto, error_periodo = validar_periodo_abierto(periodo)
-            if not es_periodo_abierto:
-                raise AplicacionPagosError(f"Período cerrado: {error_periodo}")
+        self._validar_periodo(company_id, movimiento.fecha)
         
         # 4. Eliminar aplicación
         self.db.delete(aplicacion)
@@ -258,144 +502,11 @@ class AplicacionPagosService:
         Returns:
             Saldo pendiente del documento
         """
-        from ..application.services_tesoreria import TesoreriaService
-        from ..domain.models_notas import NotaDocumento, EstadoNota
-        
         if tipo_documento != TipoDocumentoAplicacion.FACTURA.value:
             return Decimal("0.00")
         
-        # Determinar si es venta o compra según el tipo de movimiento
-        if movimiento_tipo == "COBRO":
-            # Es una venta
-            venta = self.db.query(Sale).filter(
-                Sale.id == documento_id,
-                Sale.company_id == company_id
-            ).first()
-            
-            if not venta:
-                return Decimal("0.00")
-            
-            total_documento = Decimal(str(venta.total_amount))
-            
-            # Sumar cobros que referencian directamente la venta (sistema legacy)
-            cobros_directos = self.db.query(MovimientoTesoreria).filter(
-                MovimientoTesoreria.company_id == company_id,
-                MovimientoTesoreria.referencia_tipo == "VENTA",
-                MovimientoTesoreria.referencia_id == documento_id,
-                MovimientoTesoreria.estado == EstadoMovimiento.REGISTRADO.value
-            ).all()
-            
-            total_cobrado_directo = sum(Decimal(str(c.monto)) for c in cobros_directos)
-            
-            # Sumar aplicaciones de cobros a esta venta
-            aplicaciones = self.db.query(AplicacionDocumento).filter(
-                AplicacionDocumento.company_id == company_id,
-                AplicacionDocumento.tipo_documento == tipo_documento,
-                AplicacionDocumento.documento_id == documento_id
-            ).all()
-            
-            total_aplicado = sum(Decimal(str(a.monto_aplicado)) for a in aplicaciones)
-            
-            # Sumar notas de crédito (reducen saldo)
-            notas_credito = self.db.query(NotaDocumento).filter(
-                NotaDocumento.company_id == company_id,
-                NotaDocumento.documento_ref_tipo == "VENTA",
-                NotaDocumento.documento_ref_id == documento_id,
-                NotaDocumento.tipo == "CREDITO",
-                NotaDocumento.estado == EstadoNota.REGISTRADA.value
-            ).all()
-            
-            total_notas_credito = sum(Decimal(str(n.total)) for n in notas_credito)
-            
-            # Sumar notas de débito (aumentan saldo)
-            notas_debito = self.db.query(NotaDocumento).filter(
-                NotaDocumento.company_id == company_id,
-                NotaDocumento.documento_ref_tipo == "VENTA",
-                NotaDocumento.documento_ref_id == documento_id,
-                NotaDocumento.tipo == "DEBITO",
-                NotaDocumento.estado == EstadoNota.REGISTRADA.value
-            ).all()
-            
-            total_notas_debito = sum(Decimal(str(n.total)) for n in notas_debito)
-            
-            # Calcular saldo pendiente
-            # Consideramos tanto cobros directos como aplicaciones (no duplicamos)
-            # Si hay aplicaciones, usamos aplicaciones; si no, usamos cobros directos
-            if total_aplicado > 0:
-                # Hay aplicaciones, usar aplicaciones
-                saldo_pendiente = total_documento - total_aplicado - total_notas_credito + total_notas_debito
-            else:
-                # No hay aplicaciones, usar sistema legacy
-                saldo_pendiente = total_documento - total_cobrado_directo - total_notas_credito + total_notas_debito
-            
-            return max(saldo_pendiente, Decimal("0.00"))
-        
-        elif movimiento_tipo == "PAGO":
-            # Es una compra
-            compra = self.db.query(Purchase).filter(
-                Purchase.id == documento_id,
-                Purchase.company_id == company_id
-            ).first()
-            
-            if not compra:
-                return Decimal("0.00")
-            
-            total_documento = Decimal(str(compra.total_amount))
-            
-            # Sumar pagos que referencian directamente la compra (sistema legacy)
-            pagos_directos = self.db.query(MovimientoTesoreria).filter(
-                MovimientoTesoreria.company_id == company_id,
-                MovimientoTesoreria.referencia_tipo == "COMPRA",
-                MovimientoTesoreria.referencia_id == documento_id,
-                MovimientoTesoreria.estado == EstadoMovimiento.REGISTRADO.value
-            ).all()
-            
-            total_pagado_directo = sum(Decimal(str(p.monto)) for p in pagos_directos)
-            
-            # Sumar aplicaciones de pagos a esta compra
-            aplicaciones = self.db.query(AplicacionDocumento).filter(
-                AplicacionDocumento.company_id == company_id,
-                AplicacionDocumento.tipo_documento == tipo_documento,
-                AplicacionDocumento.documento_id == documento_id
-            ).all()
-            
-            total_aplicado = sum(Decimal(str(a.monto_aplicado)) for a in aplicaciones)
-            
-            # Sumar notas de crédito (reducen saldo)
-            notas_credito = self.db.query(NotaDocumento).filter(
-                NotaDocumento.company_id == company_id,
-                NotaDocumento.documento_ref_tipo == "COMPRA",
-                NotaDocumento.documento_ref_id == documento_id,
-                NotaDocumento.tipo == "CREDITO",
-                NotaDocumento.estado == EstadoNota.REGISTRADA.value
-            ).all()
-            
-            total_notas_credito = sum(Decimal(str(n.total)) for n in notas_credito)
-            
-            # Sumar notas de débito (aumentan saldo)
-            notas_debito = self.db.query(NotaDocumento).filter(
-                NotaDocumento.company_id == company_id,
-                NotaDocumento.documento_ref_tipo == "COMPRA",
-                NotaDocumento.documento_ref_id == documento_id,
-                NotaDocumento.tipo == "DEBITO",
-                NotaDocumento.estado == EstadoNota.REGISTRADA.value
-            ).all()
-            
-            total_notas_debito = sum(Decimal(str(n.total)) for n in notas_debito)
-            
-            # Calcular saldo pendiente
-            # Consideramos tanto pagos directos como aplicaciones (no duplicamos)
-            # Si hay aplicaciones, usamos aplicaciones; si no, usamos pagos directos
-            if total_aplicado > 0:
-                # Hay aplicaciones, usar aplicaciones
-                saldo_pendiente = total_documento - total_aplicado - total_notas_credito + total_notas_debito
-            else:
-                # No hay aplicaciones, usar sistema legacy
-                saldo_pendiente = total_documento - total_pagado_directo - total_notas_credito + total_notas_debito
-            
-            return max(saldo_pendiente, Decimal("0.00"))
-        
-        return Decimal("0.00")
+        saldos = self.saldos_pendientes(company_id, movimiento_tipo, documento_ids=[documento_id])
+        return saldos[0][1] if saldos else Decimal("0.00")
     
     def listar_aplicaciones_por_movimiento(
         self,
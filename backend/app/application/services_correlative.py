@@ -209,3 +209,43 @@ def parse_correlative(correlative: str) -> Optional[dict]:
     except (ValueError, IndexError):
         return None
 
+
+
+def generate_correlatives(
+    db: Session,
+    company_id: int,
+    origin: str,
+    entry_date: date,
+    count: int,
+    secuential_digits: int = 5,
+    evento_tipo: Optional[str] = None
+) -> list[str]:
+    """
+    Genera `count` correlativos consecutivos del mismo origen y mes con una sola
+    consulta (y un solo lock) del último correlativo. Para registros masivos:
+    los asientos deben insertarse en la misma transacción.
+    
+    Args:
+        db: Sesión de base de datos
+        company_id: ID de la empresa
+        origin: Origen del asiento
+        entry_date: Fecha (define el mes) de los asientos
+        count: Cantidad de correlativos
+        secuential_digits: Número de dígitos para el secuencial (default: 5)
+        evento_tipo: Tipo de evento (ver generate_correlative)
+        
+    Returns:
+        Correlativos en orden ascendente
+    """
+    if count <= 0:
+        return []
+    primero = generate_correlative(
+        db, company_id, origin, entry_date,
+        secuential_digits=secuential_digits, evento_tipo=evento_tipo
+    )
+    origin_code, month, secuential = primero.split('-')
+    inicio = int(secuential)
+    return [
+        f"{origin_code}-{month}-{str(inicio + i).zfill(secuential_digits)}"
+        for i in range(count)
+    ]
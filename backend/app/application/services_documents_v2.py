@@ -2,9 +2,9 @@
 Servicio de Gestión de Documentos - Versión Optimizada
 - Upload rápido (sin OCR/extracción síncrona)
 - Procesamiento asíncrono
-- Deduplicación como advertencia
+- Deduplicación como advertencia (el contenido se guarda una vez por hash)
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from sqlalchemy.orm import Session
 from datetime import datetime
 import hashlib
@@ -17,9 +17,16 @@ from ..domain.models_documents_v2 import (
     DocumentExtractedData, DocumentOCRData
 )
 from ..infrastructure.storage import FileStorageService, get_storage_service
+from ..infrastructure.uploads import StagedUpload, validate_content_matches
+from .blob_store import BlobStore
+from .document_access_log import access_log_buffer
+from .document_search import DocumentSearchPage, build_search_text, refresh_search_text, search_documents
 from ..infrastructure.extractors import DocumentExtractor
+from ..infrastructure.renditions import RENDITION_MIME_TYPES, generate_renditions, missing_renditions
 from ..config import settings
 
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024  # 50MB
+
 
 class DocumentService:
     """Servicio principal para gestión de documentos - Optimizado"""
@@ -47,7 +54,7 @@ class DocumentService:
         self,
         company_id: int,
         user_id: int,
-        file_content: bytes,
+        file_content: Union[bytes, StagedUpload],
         filename: str,
         mime_type: str,
         document_type: str,
@@ -57,7 +64,8 @@ class DocumentService:
         description: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
         enable_extraction: bool = False,  # Por defecto NO extraer en upload
-        enable_ocr: bool = False  # Por defecto NO hacer OCR en upload
+        enable_ocr: bool = False,  # Por defecto NO hacer OCR en upload
+        extracted_data: Optional[Dict[str, Any]] = None  # Datos ya extraídos por el llamador (no se encola extracción)
     ) -> Document:
         """
         Sube un documento al sistema - VERSIÓN RÁPIDA.
@@ -66,18 +74,31 @@ class DocumentService:
         1. Validar archivo
         2. Calcular hash
         3. Verificar duplicados (advertencia, no bloqueo)
-        4. Guardar archivo
+        4. Guardar contenido en el blob store (una copia por hash)
         5. Crear registro en BD
         6. (Opcional) Iniciar extracción/OCR en background
         
         ⚠️ OCR y extracción NO se ejecutan aquí (síncrono).
-        Se pueden iniciar después con process_document_async().
+        Se encolan con schedule_processing() y los ejecuta el worker de documentos.
+
+        file_content puede ser el upload ya copiado a un temporal (StagedUpload,
+        ver infrastructure/uploads.py): hash y tamaño vienen calculados y el
+        temporal se mueve al blob store sin cargarlo en memoria.
+
+        extracted_data permite a quien ya leyó el archivo (p. ej. la importación
+        de comprobantes XML) guardar esos datos sin volver a parsearlo.
         """
+        if isinstance(file_content, StagedUpload):
+            file_size, file_hash, head = file_content.size, file_content.sha256, file_content.head
+        else:
+            file_size, head = len(file_content), file_content[:1024]
+            file_hash = None
+
         # 1. Validación
-        self._validate_file(file_content, filename, mime_type)
+        self._validate_file(file_size, filename, mime_type, head)
         
         # 2. Calcular hash
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        file_hash = file_hash or hashlib.sha256(file_content).hexdigest()
         
         # 3. Verificar duplicados (ADVERTENCIA, no bloqueo)
         duplicate_warning = None
@@ -93,31 +114,37 @@ class DocumentService:
             duplicate_of = existing.id
             duplicate_warning = f"Posible duplicado del documento #{existing.id} ({existing.original_filename})"
         
-        # 4. Generar nombre único
+        # 4. Generar nombre único (identifica el registro; el contenido va al blob)
         file_ext = Path(filename).suffix.lower() or ".bin"
         stored_filename = f"{uuid.uuid4().hex}{file_ext}"
         
-        # 5. Determinar ruta de almacenamiento
-        now = datetime.now()
-        file_path = self.storage.generate_path(
-            company_id=company_id,
-            year=now.year,
-            month=now.month,
-            filename=stored_filename
-        )
+        # 5-6. Guardar contenido una sola vez por hash (si ya existe, solo suma una referencia)
+        blob = BlobStore(self.db, self.storage).put(file_content, file_hash)
+        file_path = blob.blob_path
         
-        # 6. Guardar archivo (rápido)
-        self.storage.save(file_path, file_content)
+        # 7. Extracción ligera SOLO si se solicita explícitamente (y es rápido)
+        if extracted_data is None and enable_extraction and mime_type in ['text/xml', 'application/xml']:
+            # XML es rápido de parsear, se puede hacer síncrono
+            try:
+                xml_content = file_content
+                if isinstance(xml_content, StagedUpload):
+                    # El temporal se movió al blob store; se lee desde ahí
+                    xml_content = self.storage.get(file_path)
+                extracted_data = self.extractor.extract_from_xml(xml_content) or None
+            except Exception as e:
+                # No fallar el upload por error de extracción (se reintenta en la cola)
+                print(f"Error en extracción XML (no crítico): {e}")
         
-        # 7. Crear registro en BD (sin OCR ni extracción)
+        # 8. Crear registro en BD (con los datos extraídos, si los hay)
         document = Document(
             company_id=company_id,
             original_filename=filename,
             stored_filename=stored_filename,
             file_path=file_path,
-            file_size=len(file_content),
+            file_size=file_size,
             mime_type=mime_type,
             file_hash=file_hash,
+            blob_id=blob.id,
             document_type=document_type,
             title=title or filename,
             description=description,
@@ -128,37 +155,32 @@ class DocumentService:
             is_duplicate=(duplicate_of is not None),
             duplicate_of=duplicate_of
         )
+        if extracted_data:
+            document.extracted_data_rel = DocumentExtractedData(
+                extracted_data=extracted_data,
+                extraction_method="XML",
+                extraction_success=True
+            )
+            enable_extraction = False  # Ya extraído: no encolar
+        # Texto para la búsqueda full-text (documento nuevo: aún sin OCR; se
+        # completa al extraer/OCR en la cola)
+        document.search_text = build_search_text(document, extracted_data)
         
         self.db.add(document)
         self.db.flush()  # Para obtener el ID
         
-        # 8. Extracción ligera SOLO si se solicita explícitamente (y es rápido)
-        if enable_extraction and mime_type in ['text/xml', 'application/xml']:
-            # XML es rápido de parsear, se puede hacer síncrono
-            try:
-                extracted_data = self.extractor.extract_from_xml(file_content)
-                if extracted_data:
-                    extracted_data_obj = DocumentExtractedData(
-                        document_id=document.id,
-                        extracted_data=extracted_data,
-                        extraction_method="XML",
-                        extraction_success=True
-                    )
-                    self.db.add(extracted_data_obj)
-            except Exception as e:
-                # No fallar el upload por error de extracción
-                print(f"Error en extracción XML (no crítico): {e}")
-        
         # 9. Log de acceso
         self._log_access(document.id, user_id, 'UPLOAD')
         
-        self.db.flush()
-        
-        # 10. Iniciar procesamiento asíncrono (si se solicita)
-        if enable_extraction or enable_ocr:
-            # En producción, esto sería un job de Celery/Background Tasks
-            # Por ahora, lo hacemos en background thread simple
-            self._schedule_async_processing(document.id, enable_extraction, enable_ocr)
+        # 10. Encolar procesamiento asíncrono; el worker lo toma tras el commit.
+        # Miniatura y vista previa siempre (salvo que el mismo contenido ya las tenga)
+        enable_renditions = (
+            settings.document_renditions_enabled
+            and mime_type in RENDITION_MIME_TYPES
+            and bool(missing_renditions(self.storage, file_hash))
+        )
+        if enable_extraction or enable_ocr or enable_renditions:
+            self.schedule_processing(document, enable_extraction, enable_ocr, enable_renditions)
         
         # Retornar documento y advertencia (si existe)
         return document, duplicate_warning
@@ -172,7 +194,7 @@ class DocumentService:
         """
         Procesa un documento de forma asíncrona (OCR y extracción).
         
-        Este método debe ser llamado desde un background task/job.
+        Lo llama el worker de documentos (application/document_jobs.py) con su propia sesión.
         """
         document = self.db.query(Document).filter(Document.id == document_id).first()
         if not document:
@@ -195,6 +217,9 @@ class DocumentService:
                 if document.mime_type == 'application/pdf':
                     extracted_data = self.extractor.extract_from_pdf(file_content)
                     extraction_method = "PDF"
+                elif document.mime_type in ['text/xml', 'application/xml']:
+                    extracted_data = self.extractor.extract_from_xml(file_content)
+                    extraction_method = "XML"
                 elif document.mime_type in [
                     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
                     'application/vnd.ms-excel'
@@ -236,7 +261,7 @@ class DocumentService:
                 try:
                     from ..infrastructure.ocr import OCRService
                     ocr_service = OCRService()
-                    ocr_result = ocr_service.extract_text(file_content, document.mime_type)
+                    ocr_result = ocr_service.extract_text(file_content, document.mime_type, file_hash=document.file_hash)
                 except (ImportError, Exception) as e:
                     # OCR no disponible o falló
                     print(f"OCR no disponible o falló: {e}")
@@ -295,29 +320,50 @@ class DocumentService:
                 
                 results["ocr"] = {"success": False, "error": str(e)}
         
+        refresh_search_text(self.db, document)
         self.db.commit()
         return results
     
-    def _schedule_async_processing(self, document_id: int, enable_extraction: bool, enable_ocr: bool):
+    def schedule_processing(
+        self,
+        document: Document,
+        enable_extraction: bool,
+        enable_ocr: bool,
+        enable_renditions: bool = False
+    ):
         """
-        Programa procesamiento asíncrono.
+        Encola extracción, OCR y/o rendiciones en la cola persistente de documentos.
         
-        En producción: usar Celery o Background Tasks de FastAPI
-        Por ahora: thread simple (mejorable)
+        No hace commit: el worker (scripts/document_worker.py) toma los trabajos
+        cuando el llamador confirma la transacción.
         """
-        import threading
-        
-        def process():
-            try:
-                self.process_document_async(document_id, enable_extraction, enable_ocr)
-            except Exception as e:
-                print(f"Error en procesamiento asíncrono: {e}")
+        from .document_jobs import enqueue_document_jobs
+        return enqueue_document_jobs(self.db, document, enable_extraction, enable_ocr, enable_renditions)
+    
+    def generate_renditions(self, document_id: int) -> Dict[str, str]:
+        """
+        Genera la miniatura y la vista previa de un documento (las que falten
+        para su contenido). Lo llama el worker de documentos.
         
-        thread = threading.Thread(target=process, daemon=True)
-        thread.start()
+        Returns:
+            Rutas de las rendiciones generadas por nombre (vacío si ya existían)
+        """
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            raise ValueError("Documento no encontrado")
+        return generate_renditions(
+            self.storage, self.storage.get_full_path(document.file_path),
+            document.file_hash, document.mime_type,
+        )
     
-    def get_document(self, document_id: int, user_id: int, include_extracted: bool = False) -> Document:
-        """Obtiene un documento con verificación de permisos"""
+    def get_document(
+        self,
+        document_id: int,
+        user_id: int,
+        include_extracted: bool = False,
+        log_access: bool = True
+    ) -> Document:
+        """Obtiene un documento con verificación de permisos (log_access=False para miniaturas)"""
         document = self.db.query(Document).filter(
             Document.id == document_id,
             Document.status == 'ACTIVE'
@@ -340,7 +386,8 @@ class DocumentService:
             _ = document.extracted_data_rel  # Trigger lazy load
             _ = document.ocr_data_rel  # Trigger lazy load
         
-        self._log_access(document_id, user_id, 'VIEW')
+        if log_access:
+            self._log_access(document_id, user_id, 'VIEW')
         return document
     
     def search_documents(
@@ -358,67 +405,21 @@ class DocumentService:
         offset: int = 0
     ) -> tuple[List[Document], int]:
         """
-        Búsqueda avanzada usando PostgreSQL Full-Text Search.
-        """
-        from sqlalchemy import or_, and_, func
+        Búsqueda full-text (índice GIN en PostgreSQL, FTS5 en SQLite).
         
-        q = self.db.query(Document).filter(
-            Document.company_id == company_id,
-            Document.status == 'ACTIVE'
+        Ver search_documents_page para paginar por cursor y saber si el total es estimado.
+        """
+        page = self.search_documents_page(
+            company_id, query=query, document_type=document_type,
+            related_entity_type=related_entity_type, related_entity_id=related_entity_id,
+            date_from=date_from, date_to=date_to, tags=tags,
+            exclude_duplicates=exclude_duplicates, limit=limit, offset=offset,
         )
-        
-        # Filtrar duplicados si se solicita
-        if exclude_duplicates:
-            q = q.filter(Document.is_duplicate == False)
-        
-        if query:
-            # Búsqueda full-text en título y descripción (PostgreSQL tsvector)
-            # Para SQLite, usar LIKE
-            try:
-                # Intentar usar PostgreSQL full-text search
-                q = q.filter(
-                    or_(
-                        func.to_tsvector('spanish', Document.title).match(query),
-                        Document.title.ilike(f'%{query}%'),
-                        Document.description.ilike(f'%{query}%'),
-                        Document.original_filename.ilike(f'%{query}%')
-                    )
-                )
-            except:
-                # Fallback a LIKE para SQLite
-                q = q.filter(
-                    or_(
-                        Document.title.ilike(f'%{query}%'),
-                        Document.description.ilike(f'%{query}%'),
-                        Document.original_filename.ilike(f'%{query}%')
-                    )
-                )
-        
-        if document_type:
-            q = q.filter(Document.document_type == document_type)
-        
-        if related_entity_type and related_entity_id:
-            q = q.filter(
-                Document.related_entity_type == related_entity_type,
-                Document.related_entity_id == related_entity_id
-            )
-        
-        if date_from:
-            q = q.filter(Document.uploaded_at >= date_from)
-        
-        if date_to:
-            q = q.filter(Document.uploaded_at <= date_to)
-        
-        if tags:
-            q = q.join(DocumentTag).filter(DocumentTag.tag.in_(tags))
-        
-        # Contar total
-        total = q.count()
-        
-        # Aplicar paginación
-        documents = q.order_by(Document.uploaded_at.desc()).limit(limit).offset(offset).all()
-        
-        return documents, total
+        return page.items, page.total
+    
+    def search_documents_page(self, company_id: int, **filtros) -> DocumentSearchPage:
+        """Búsqueda rankeada y paginada por keyset (ver application/document_search.py)"""
+        return search_documents(self.db, company_id, **filtros)
     
     def delete_document(self, document_id: int, user_id: int, soft_delete: bool = True):
         """Elimina un documento (soft delete por defecto)"""
@@ -428,11 +429,14 @@ class DocumentService:
             document.status = 'DELETED'
             document.deleted_at = datetime.now()
         else:
-            # Hard delete: eliminar archivo y registros relacionados
-            try:
-                self.storage.delete(document.file_path)
-            except Exception as e:
-                print(f"Error eliminando archivo: {e}")
+            # Hard delete: liberar el blob (o eliminar el archivo propio) y los registros relacionados
+            if document.blob_id:
+                BlobStore(self.db, self.storage).release(document.blob_id)
+            else:
+                try:
+                    self.storage.delete(document.file_path)
+                except Exception as e:
+                    print(f"Error eliminando archivo: {e}")
             self.db.delete(document)
         
         self._log_access(document_id, user_id, 'DELETE')
@@ -472,11 +476,10 @@ class DocumentService:
             self.db.delete(document_tag)
             self.db.flush()
     
-    def _validate_file(self, content: bytes, filename: str, mime_type: str):
-        """Valida archivo antes de subir"""
-        max_size = 50 * 1024 * 1024  # 50MB
-        if len(content) > max_size:
-            raise ValueError(f"Archivo demasiado grande. Máximo: {max_size / 1024 / 1024}MB")
+    def _validate_file(self, size: int, filename: str, mime_type: str, head: bytes = b""):
+        """Valida archivo antes de subir (tamaño, tipo, extensión y firma del contenido)"""
+        if size > MAX_DOCUMENT_SIZE:
+            raise ValueError(f"Archivo demasiado grande. Máximo: {MAX_DOCUMENT_SIZE / 1024 / 1024}MB")
         
         allowed_types = [
             'application/pdf',
@@ -496,9 +499,14 @@ class DocumentService:
         allowed_extensions = ['.pdf', '.xlsx', '.xls', '.docx', '.doc', '.txt', '.xml']
         if ext not in allowed_extensions:
             raise ValueError(f"Extensión no permitida: {ext}")
+        
+        validate_content_matches(filename, head)
     
     def _log_access(self, document_id: int, user_id: int, action: str):
-        """Registra acceso a documento"""
+        """Registra acceso a documento (las vistas, en segundo plano si el buffer está activo)"""
+        if action == 'VIEW' and access_log_buffer.running:
+            access_log_buffer.record(document_id, user_id, action)
+            return
         log = DocumentAccessLog(
             document_id=document_id,
             user_id=user_id,
@@ -167,19 +167,8 @@ class MotorAsientos:
 
         lineas = []
         for regla in reglas:
-            # Evaluar condicion si existe (cantidad > 0, tiene_igv == True, etc.)
-            if regla.condicion and regla.condicion.strip():
-                try:
-                    datos = datos_operacion or {}
-                    cantidad = float(datos.get("cantidad", 0))
-                    cond = regla.condicion.strip()
-                    ok = (cond == "cantidad > 0" and cantidad > 0) or (cond == "cantidad < 0" and cantidad < 0)
-                    if not ok and cond not in ("cantidad > 0", "cantidad < 0"):
-                        ok = bool(eval(cond, {"__builtins__": {}}, datos))
-                    if not ok:
-                        continue
-                except (TypeError, ValueError, NameError):
-                    continue
+            if not self._regla_aplica(regla, datos_operacion):
+                continue
 
             self._validar_invariantes_evento(evento_tipo, regla.tipo_cuenta)
 
@@ -276,6 +265,22 @@ class MotorAsientos:
         if exp and cuenta.type != exp:
             raise MapeoInvalidoError(f"SAP_RULE: {tipo_cuenta} debe mapear a {exp.value}")
 
+    @staticmethod
+    def _regla_aplica(regla: ReglaContable, datos_operacion: Dict[str, Any]) -> bool:
+        """Evalúa la condición de la regla si existe (cantidad > 0, tiene_igv == True, etc.)"""
+        if not (regla.condicion and regla.condicion.strip()):
+            return True
+        try:
+            datos = datos_operacion or {}
+            cantidad = float(datos.get("cantidad", 0))
+            cond = regla.condicion.strip()
+            ok = (cond == "cantidad > 0" and cantidad > 0) or (cond == "cantidad < 0" and cantidad < 0)
+            if not ok and cond not in ("cantidad > 0", "cantidad < 0"):
+                ok = bool(eval(cond, {"__builtins__": {}}, datos))
+            return ok
+        except (TypeError, ValueError, NameError):
+            return False
+
     def generar_asiento(self, evento_tipo: str, datos_operacion: Dict[str,Any], company_id: int,
                         fecha: date, glosa: str, origin: str="MOTOR",
                         user_id: Optional[int] = None) -> JournalEntry:
@@ -304,19 +309,8 @@ class MotorAsientos:
 
         lineas = []
         for regla in reglas:
-            # Evaluar condicion si existe (cantidad > 0, tiene_igv == True, etc.)
-            if regla.condicion and regla.condicion.strip():
-                try:
-                    datos = datos_operacion or {}
-                    cantidad = float(datos.get("cantidad", 0))
-                    cond = regla.condicion.strip()
-                    ok = (cond == "cantidad > 0" and cantidad > 0) or (cond == "cantidad < 0" and cantidad < 0)
-                    if not ok and cond not in ("cantidad > 0", "cantidad < 0"):
-                        ok = bool(eval(cond, {"__builtins__": {}}, datos))
-                    if not ok:
-                        continue
-                except (TypeError, ValueError, NameError):
-                    continue
+            if not self._regla_aplica(regla, datos_operacion):
+                continue
 
             self._validar_invariantes_evento(evento_tipo, regla.tipo_cuenta)
 
@@ -484,3 +478,131 @@ class MotorAsientos:
             )
         
         return entry
+
+    def generar_asientos_lote(self, evento_tipo: str, operaciones: List[Dict[str, Any]], company_id: int,
+                              origin: str = "MOTOR", user_id: Optional[int] = None) -> List[JournalEntry]:
+        """
+        Genera los asientos de muchas operaciones del mismo evento (importaciones masivas).
+
+        Aplica las mismas reglas y validaciones que generar_asiento, pero evento,
+        reglas, mapeos, cuentas y períodos se resuelven una vez por lote, los
+        correlativos se toman con una consulta por mes y asientos y líneas se
+        insertan en dos flush. No aplica el ajuste de detracciones de VENTA.
+
+        Args:
+            evento_tipo: Evento contable (COMPRA, VENTA, ...)
+            operaciones: Dicts con datos_operacion, fecha, glosa y opcionalmente currency
+            company_id: ID de la empresa
+            origin: Origen de los asientos
+            user_id: Usuario que genera los asientos
+
+        Returns:
+            Asientos en el mismo orden que las operaciones
+
+        Raises:
+            MotorAsientosError, PeriodoCerradoError, CuentaInactivaError, MapeoInvalidoError:
+                Si alguna operación no se puede registrar (no se inserta ningún asiento)
+        """
+        if not operaciones:
+            return []
+
+        evento = self.uow.db.query(EventoContable).filter_by(
+            tipo=evento_tipo, company_id=company_id, activo=True
+        ).first()
+        if not evento:
+            raise MotorAsientosError("Evento no encontrado")
+
+        reglas = self.uow.db.query(ReglaContable).filter_by(
+            evento_id=evento.id, company_id=company_id, activo=True
+        ).order_by(ReglaContable.orden).all()
+        if not reglas:
+            raise MotorAsientosError("Evento sin reglas")
+
+        cuentas: Dict[str, Account] = {}
+
+        def _cuenta(tipo_cuenta: str) -> Account:
+            if tipo_cuenta not in cuentas:
+                self._validar_invariantes_evento(evento_tipo, tipo_cuenta)
+                mapeo = self.uow.db.query(TipoCuentaMapeo).filter_by(
+                    tipo_cuenta=tipo_cuenta, company_id=company_id, activo=True
+                ).first()
+                if not mapeo:
+                    raise CuentaNoMapeadaError(f"No hay mapeo para {tipo_cuenta}")
+                cuenta = mapeo.account
+                self._validar_tipo_vs_accounttype(tipo_cuenta, cuenta)
+                ok, err = validar_cuenta_activa(cuenta)
+                if not ok:
+                    raise CuentaInactivaError(err)
+                cuentas[tipo_cuenta] = cuenta
+            return cuentas[tipo_cuenta]
+
+        lineas_por_operacion = []
+        for op in operaciones:
+            datos_operacion = op["datos_operacion"]
+            if evento_tipo in self._PLANILLA:
+                self._validar_planilla_provision(datos_operacion)
+            lineas = []
+            for regla in reglas:
+                if not self._regla_aplica(regla, datos_operacion):
+                    continue
+                cuenta = _cuenta(regla.tipo_cuenta)
+                key = _TIPO_MONTO_TO_KEY.get(regla.tipo_monto, "total")
+                monto = Decimal(str(datos_operacion.get(key, 0))).quantize(Decimal("0.01"))
+                if regla.lado == LadoAsiento.DEBE.value:
+                    lineas.append((cuenta.id, monto, Decimal("0.00")))
+                else:
+                    lineas.append((cuenta.id, Decimal("0.00"), monto))
+            ok, err = validar_asiento_cuadra(sum(l[1] for l in lineas), sum(l[2] for l in lineas))
+            if not ok:
+                raise AsientoDescuadradoError(f"{op['glosa']}: {err}")
+            lineas_por_operacion.append(lineas)
+
+        # Un período y un bloque de correlativos por mes
+        from .services_correlative import generate_correlatives
+        por_mes: Dict[tuple, List[int]] = {}
+        for i, op in enumerate(operaciones):
+            por_mes.setdefault((op["fecha"].year, op["fecha"].month), []).append(i)
+
+        periodos: Dict[tuple, Period] = {}
+        correlativos: Dict[int, str] = {}
+        for (anio, mes), indices in sorted(por_mes.items()):
+            periodo = self.uow.periods.get_or_open(company_id, anio, mes)
+            ok, err = validar_periodo_abierto(periodo)
+            if not ok:
+                raise PeriodoCerradoError(err)
+            periodos[(anio, mes)] = periodo
+            indices.sort(key=lambda i: operaciones[i]["fecha"])
+            bloque = generate_correlatives(
+                self.uow.db, company_id, origin, operaciones[indices[0]]["fecha"],
+                len(indices), evento_tipo=evento_tipo
+            )
+            correlativos.update(zip(indices, bloque))
+
+        entries = []
+        for i, op in enumerate(operaciones):
+            fecha = op["fecha"]
+            runlog = EngineRunLog(evento_tipo=evento_tipo, company_id=company_id, origin=origin,
+                                  fecha=fecha, glosa=op["glosa"], datos_operacion=op["datos_operacion"] or {})
+            runlog.info("START", {"lote": len(operaciones)})
+            entry = JournalEntry(company_id=company_id, date=fecha,
+                                 period_id=periodos[(fecha.year, fecha.month)].id,
+                                 glosa=op["glosa"], origin=origin, status="POSTED",
+                                 currency=op.get("currency") or "PEN",
+                                 correlative=correlativos[i], created_by=user_id)
+            entry.motor_metadata = runlog.to_metadata(datos_operacion=op["datos_operacion"])
+            entries.append(entry)
+        self.uow.db.add_all(entries)
+        self.uow.db.flush()
+
+        self.uow.db.add_all([
+            EntryLine(entry_id=entry.id, account_id=account_id, debit=debit, credit=credit)
+            for entry, lineas in zip(entries, lineas_por_operacion)
+            for account_id, debit, credit in lineas
+        ])
+        self.uow.db.flush()
+
+        logger.info(
+            f"MOTOR_GENERAR_ASIENTOS_LOTE: evento_tipo={evento_tipo}, company_id={company_id}, "
+            f"asientos={len(entries)}"
+        )
+        return entries
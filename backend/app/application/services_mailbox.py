@@ -5,10 +5,11 @@ Lógica de negocio para notificaciones formales entre SISCONT y empresas.
 Nivel ERP: inmutable, trazable, auditable.
 """
 import hashlib
+from dataclasses import dataclass, field
 from datetime import datetime, date
-from typing import Optional, List
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from typing import Optional, List, Set
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, func, or_, select
 
 from ..domain.models import Company, User
 from ..domain.models_mailbox import (
@@ -21,6 +22,9 @@ from ..domain.models_mailbox import (
     CompanyToAdminAttachment,
     MailboxAuditLog,
 )
+from ..infrastructure.uploads import validate_content_matches
+from .pagination import decode_cursor, encode_cursor
+from .mailbox_stats import get_admin_mailbox_stats, get_mailbox_stats
 
 # Tipos de mensaje permitidos (nivel ERP)
 MESSAGE_TYPES = ["NOTIFICACION", "MULTA", "REQUERIMIENTO", "AUDITORIA", "RECORDATORIO", "DOCUMENTO", "COMUNICADO"]
@@ -131,6 +135,7 @@ def add_message_attachment(
     file_type: str,
     file_hash: Optional[str] = None,
     file_size_bytes: Optional[int] = None,
+    blob_id: Optional[int] = None,
 ) -> MailboxAttachment:
     """Añade un adjunto a un mensaje. Hash SHA256 para integridad."""
     att = MailboxAttachment(
@@ -140,6 +145,7 @@ def add_message_attachment(
         file_type=file_type,
         file_hash=file_hash,
         file_size_bytes=file_size_bytes,
+        blob_id=blob_id,
     )
     db.add(att)
     db.commit()
@@ -147,6 +153,75 @@ def add_message_attachment(
     return att
 
 
+@dataclass
+class MailboxPage:
+    """Página de un listado de la casilla (keyset sobre created_at, id)"""
+    items: list
+    total: int
+    next_cursor: Optional[str]
+    responded_ids: Set[int] = field(default_factory=set)  # Mensajes de la página con respuesta
+
+
+def _paginar(db: Session, stmt, model, limit: int, cursor: Optional[str], offset: int) -> tuple:
+    """
+    Ejecuta una página ordenada por (created_at, id) descendente.
+
+    Returns:
+        (items, total, next_cursor)
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    filtrado = stmt
+    if cursor:
+        valor, ultimo_id = decode_cursor(cursor)
+        try:
+            valor = datetime.fromisoformat(valor)
+        except (TypeError, ValueError):
+            raise ValueError("Cursor de paginación inválido")
+        stmt = stmt.where(or_(model.created_at < valor, and_(model.created_at == valor, model.id < ultimo_id)))
+    elif offset:
+        stmt = stmt.offset(offset)
+
+    items = db.execute(stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)).scalars().unique().all()
+    hay_mas = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if hay_mas else None
+    if not cursor and not hay_mas:
+        # Primera (o única) página completa: el total es exacto sin contar
+        return items, offset + len(items), None
+    contar = select(func.count(model.id))
+    if filtrado.whereclause is not None:
+        contar = contar.where(filtrado.whereclause)
+    total = db.execute(contar).scalar_one()
+    return items, total, next_cursor
+
+
+def _con_respuesta(db: Session, items: List[MailboxMessage]) -> Set[int]:
+    if not items:
+        return set()
+    return set(db.execute(
+        select(MailboxResponse.message_id).where(MailboxResponse.message_id.in_([m.id for m in items])).distinct()
+    ).scalars())
+
+
+def _metadatos_adjuntos(relacion, modelo):
+    """Adjuntos de los mensajes de la página en una consulta IN, sin rutas ni hashes."""
+    return selectinload(relacion).load_only(modelo.file_name, modelo.file_type, modelo.file_size_bytes)
+
+
+def _filtrar_mensajes(stmt, message_type, is_read, priority, message_status):
+    if message_type:
+        stmt = stmt.where(MailboxMessage.message_type == message_type)
+    if is_read is not None:
+        stmt = stmt.where(MailboxMessage.is_read == is_read)
+    if priority:
+        stmt = stmt.where(MailboxMessage.priority == priority)
+    if message_status:
+        stmt = stmt.where(MailboxMessage.message_status == message_status)
+    return stmt
+
+
 def list_messages(
     db: Session,
     company_id: int,
@@ -154,24 +229,37 @@ def list_messages(
     is_read: Optional[bool] = None,
     limit: int = 50,
     offset: int = 0,
-) -> tuple[List[MailboxMessage], int]:
-    """Lista mensajes de una casilla con filtros."""
-    mailbox = db.query(ElectronicMailbox).filter(ElectronicMailbox.company_id == company_id).first()
-    if not mailbox:
-        return [], 0
+    priority: Optional[str] = None,
+    message_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> MailboxPage:
+    """
+    Lista mensajes de una casilla con filtros, del más reciente al más antiguo.
+
+    Args:
+        cursor: next_cursor de la página anterior (keyset)
+        offset: Solo sin cursor (compatibilidad con la paginación anterior)
+
+    Returns:
+        MailboxPage con creador y metadatos de adjuntos cargados solo para la página
 
-    q = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    mailbox_id = db.execute(
+        select(ElectronicMailbox.id).where(ElectronicMailbox.company_id == company_id)
+    ).scalar()
+    if mailbox_id is None:
+        return MailboxPage([], 0, None)
+
+    stmt = select(MailboxMessage).options(
         joinedload(MailboxMessage.creator),
-    ).filter(MailboxMessage.mailbox_id == mailbox.id)
-    if message_type:
-        q = q.filter(MailboxMessage.message_type == message_type)
-    if is_read is not None:
-        q = q.filter(MailboxMessage.is_read == is_read)
+        _metadatos_adjuntos(MailboxMessage.attachments, MailboxAttachment),
+    ).where(MailboxMessage.mailbox_id == mailbox_id)
+    stmt = _filtrar_mensajes(stmt, message_type, is_read, priority, message_status)
 
-    total = q.count()
-    items = q.order_by(desc(MailboxMessage.created_at)).offset(offset).limit(limit).all()
-    return items, total
+    items, total, next_cursor = _paginar(db, stmt, MailboxMessage, limit, cursor, offset)
+    return MailboxPage(items, total, next_cursor, _con_respuesta(db, items))
 
 
 def list_all_messages(
@@ -181,29 +269,23 @@ def list_all_messages(
     is_read: Optional[bool] = None,
     limit: int = 100,
     offset: int = 0,
-) -> tuple[List[MailboxMessage], int]:
-    """Lista todos los mensajes enviados por SISCONT, opcionalmente filtrados por empresa."""
-    q = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
+    priority: Optional[str] = None,
+    message_status: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> MailboxPage:
+    """Lista todos los mensajes enviados por SISCONT, opcionalmente filtrados por empresa (ver list_messages)."""
+    if company_id is not None:
+        return list_messages(db, company_id, message_type, is_read, limit, offset, priority, message_status, cursor)
+
+    stmt = select(MailboxMessage).options(
         joinedload(MailboxMessage.creator),
         joinedload(MailboxMessage.mailbox).joinedload(ElectronicMailbox.company),
+        _metadatos_adjuntos(MailboxMessage.attachments, MailboxAttachment),
     )
-    
-    if company_id is not None:
-        mailbox = db.query(ElectronicMailbox).filter(ElectronicMailbox.company_id == company_id).first()
-        if mailbox:
-            q = q.filter(MailboxMessage.mailbox_id == mailbox.id)
-        else:
-            return [], 0
-    
-    if message_type:
-        q = q.filter(MailboxMessage.message_type == message_type)
-    if is_read is not None:
-        q = q.filter(MailboxMessage.is_read == is_read)
+    stmt = _filtrar_mensajes(stmt, message_type, is_read, priority, message_status)
 
-    total = q.count()
-    items = q.order_by(desc(MailboxMessage.created_at)).offset(offset).limit(limit).all()
-    return items, total
+    items, total, next_cursor = _paginar(db, stmt, MailboxMessage, limit, cursor, offset)
+    return MailboxPage(items, total, next_cursor, _con_respuesta(db, items))
 
 
 def get_message(db: Session, message_id: int, company_id: int) -> Optional[MailboxMessage]:
@@ -289,6 +371,7 @@ def add_response_attachment(
     file_type: str,
     file_hash: Optional[str] = None,
     file_size_bytes: Optional[int] = None,
+    blob_id: Optional[int] = None,
 ) -> MailboxResponseAttachment:
     """Añade un adjunto a una respuesta."""
     att = MailboxResponseAttachment(
@@ -298,6 +381,7 @@ def add_response_attachment(
         file_type=file_type,
         file_hash=file_hash,
         file_size_bytes=file_size_bytes,
+        blob_id=blob_id,
     )
     db.add(att)
     db.commit()
@@ -305,16 +389,22 @@ def add_response_attachment(
     return att
 
 
-def validate_file_upload(filename: str, content: bytes) -> None:
-    """Valida que el archivo sea permitido y no exceda el tamaño."""
+def validate_file_upload(filename: str, size_bytes: Optional[int] = None, head: Optional[bytes] = None) -> None:
+    """
+    Valida que el archivo sea permitido y no exceda el tamaño.
+
+    Se puede llamar solo con el nombre antes de recibir el contenido; con el
+    primer KB (head) verifica además que el contenido corresponda a la extensión.
+    """
     ext = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
     if ext not in ALLOWED_EXTENSIONS:
         raise ValueError(
             f"Tipo de archivo no permitido. Permitidos: PDF, Excel, Word, ZIP"
         )
-    size_mb = len(content) / (1024 * 1024)
-    if size_mb > MAX_FILE_SIZE_MB:
+    if size_bytes is not None and size_bytes / (1024 * 1024) > MAX_FILE_SIZE_MB:
         raise ValueError(f"El archivo excede el tamaño máximo de {MAX_FILE_SIZE_MB} MB")
+    if head is not None:
+        validate_content_matches(filename, head)
 
 
 def compute_file_hash(content: bytes) -> str:
@@ -359,6 +449,7 @@ def add_company_to_admin_attachment(
     file_type: str,
     file_hash: Optional[str] = None,
     file_size_bytes: Optional[int] = None,
+    blob_id: Optional[int] = None,
 ) -> CompanyToAdminAttachment:
     """Añade un adjunto a un mensaje empresa→admin."""
     att = CompanyToAdminAttachment(
@@ -368,6 +459,7 @@ def add_company_to_admin_attachment(
         file_type=file_type,
         file_hash=file_hash,
         file_size_bytes=file_size_bytes,
+        blob_id=blob_id,
     )
     db.add(att)
     db.commit()
@@ -381,19 +473,27 @@ def list_company_to_admin_messages(
     is_read: Optional[bool] = None,
     limit: int = 50,
     offset: int = 0,
-) -> tuple[List[CompanyToAdminMessage], int]:
-    """Lista mensajes empresa→admin. Si company_id es None, lista todos (admin)."""
-    q = db.query(CompanyToAdminMessage).options(
+    cursor: Optional[str] = None,
+) -> MailboxPage:
+    """
+    Lista mensajes empresa→admin. Si company_id es None, lista todos (admin).
+
+    Paginación por keyset como list_messages.
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    stmt = select(CompanyToAdminMessage).options(
         joinedload(CompanyToAdminMessage.creator),
         joinedload(CompanyToAdminMessage.company),
+        _metadatos_adjuntos(CompanyToAdminMessage.attachments, CompanyToAdminAttachment),
     )
     if company_id is not None:
-        q = q.filter(CompanyToAdminMessage.company_id == company_id)
+        stmt = stmt.where(CompanyToAdminMessage.company_id == company_id)
     if is_read is not None:
-        q = q.filter(CompanyToAdminMessage.is_read == is_read)
-    total = q.count()
-    items = q.order_by(desc(CompanyToAdminMessage.created_at)).offset(offset).limit(limit).all()
-    return items, total
+        stmt = stmt.where(CompanyToAdminMessage.is_read == is_read)
+    items, total, next_cursor = _paginar(db, stmt, CompanyToAdminMessage, limit, cursor, offset)
+    return MailboxPage(items, total, next_cursor)
 
 
 def get_company_to_admin_message(db: Session, message_id: int) -> Optional[CompanyToAdminMessage]:
@@ -472,90 +572,9 @@ def log_attachment_download(
 
 def get_mailbox_stats_erp(db: Session, company_id: int) -> dict:
     """Estadísticas ERP: no leídos, críticos, vencidos, pendientes de respuesta."""
-    mailbox = db.query(ElectronicMailbox).filter(ElectronicMailbox.company_id == company_id).first()
-    if not mailbox:
-        return {"unread_count": 0, "critical_count": 0, "overdue_count": 0, "pending_response_count": 0}
-
-    today = date.today()
-    unread = db.query(MailboxMessage).filter(
-        MailboxMessage.mailbox_id == mailbox.id,
-        MailboxMessage.is_read == False,
-    ).count()
-
-    critical = db.query(MailboxMessage).filter(
-        MailboxMessage.mailbox_id == mailbox.id,
-        MailboxMessage.priority == "CRITICA",
-        MailboxMessage.is_read == False,
-    ).count()
-
-    overdue = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
-    ).filter(
-        MailboxMessage.mailbox_id == mailbox.id,
-        MailboxMessage.due_date != None,
-        MailboxMessage.due_date < today,
-    ).all()
-    overdue_count = 0
-    for m in overdue:
-        if len(m.responses) == 0:
-            overdue_count += 1
-            if getattr(m, "message_status", None) != "VENCIDO":
-                m.message_status = "VENCIDO"
-    if overdue_count > 0:
-        db.commit()
-
-    msgs_requiring = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
-    ).filter(
-        MailboxMessage.mailbox_id == mailbox.id,
-        MailboxMessage.requires_response == True,
-    ).all()
-    pending = sum(1 for m in msgs_requiring if len(m.responses) == 0)
-
-    return {
-        "unread_count": unread,
-        "critical_count": critical,
-        "overdue_count": overdue_count,
-        "pending_response_count": pending,
-    }
+    return get_mailbox_stats(db, company_id)
 
 
 def get_admin_mailbox_stats_erp(db: Session) -> dict:
     """Estadísticas ERP para admin: mensajes no leídos de empresas, críticos, vencidos globales."""
-    today = date.today()
-
-    # Mensajes empresa→admin no leídos
-    unread_incoming = db.query(CompanyToAdminMessage).filter(
-        CompanyToAdminMessage.is_read == False,
-    ).count()
-
-    # Mensajes SISCONT→empresa: críticos no leídos, vencidos sin respuesta
-    critical = db.query(MailboxMessage).filter(
-        MailboxMessage.priority == "CRITICA",
-        MailboxMessage.is_read == False,
-    ).count()
-
-    overdue = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
-    ).filter(
-        MailboxMessage.due_date != None,
-        MailboxMessage.due_date < today,
-    ).all()
-    overdue_count = sum(1 for m in overdue if len(m.responses) == 0)
-    for m in overdue:
-        if len(m.responses) == 0 and getattr(m, "message_status", None) != "VENCIDO":
-            m.message_status = "VENCIDO"
-    if overdue_count > 0:
-        db.commit()
-
-    pending_response = db.query(MailboxMessage).options(
-        joinedload(MailboxMessage.responses),
-    ).filter(MailboxMessage.requires_response == True).all()
-    pending_count = sum(1 for m in pending_response if len(m.responses) == 0)
-
-    return {
-        "unread_count": unread_incoming,
-        "critical_count": critical,
-        "overdue_count": overdue_count,
-        "pending_response_count": pending_count,
-    }
+    return get_admin_mailbox_stats(db)
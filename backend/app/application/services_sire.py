@@ -4,11 +4,17 @@ Servicios de aplicación para SIRE
 
 Lógica de negocio para gestión de propuestas SIRE.
 """
+import asyncio
+import os
+import tempfile
 from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
 from decimal import Decimal
 
+from ..config import settings
+
 from ..domain.models_sire import (
     SireRVIEProposal,
     SireRCEProposal,
@@ -16,10 +22,11 @@ from ..domain.models_sire import (
     SireConfiguration,
     SireProposalStatus,
     SireProposalType,
-    SireSyncStatus
+    SireSyncStatus,
+    SireProposalDetail
 )
 from ..infrastructure.sire_client import SIREClient
-from ..infrastructure.sire_parser import SireProposalParser
+from ..infrastructure.sire_parser import SireProposalParser, iter_proposal_records
 from ..infrastructure.unit_of_work import UnitOfWork
 
 
@@ -30,6 +37,35 @@ def get_sire_configuration(uow: UnitOfWork, company_id: int) -> Optional[SireCon
     ).first()
 
 
+def build_sire_client(config: SireConfiguration) -> SIREClient:
+    """Crea un SIREClient con las credenciales (desencriptadas) de la configuración"""
+    from ..infrastructure.sire_auth import SireOAuthClient
+    decrypted_password = SireOAuthClient().decrypt_secret(config.password_generador)
+    if not decrypted_password and config.password_generador and not config.password_generador.startswith('gAAAAAB'):
+        decrypted_password = config.password_generador
+    return SIREClient(
+        company_id=config.company_id,
+        oauth_client_id=config.oauth_client_id,
+        oauth_client_secret=config.oauth_client_secret,
+        access_token=config.oauth_token,
+        refresh_token=config.oauth_refresh_token,
+        token_expires_at=config.oauth_token_expires_at,
+        use_preliminary_mode=config.use_test_env,
+        ruc=config.ruc,
+        usuario_generador=config.usuario_generador,
+        password_generador=decrypted_password
+    )
+
+
+def persist_sire_tokens(config: SireConfiguration, client: SIREClient) -> None:
+    """Guarda en la configuración el token que el cliente renovó (no hace commit)"""
+    if client.access_token != config.oauth_token:
+        config.oauth_token = client.access_token
+        config.oauth_refresh_token = client.refresh_token
+        if client.token_expires_at:
+            config.oauth_token_expires_at = client.token_expires_at
+
+
 def create_or_update_sire_configuration(
     uow: UnitOfWork,
     company_id: int,
@@ -54,7 +90,7 @@ def create_or_update_sire_configuration(
     config = get_sire_configuration(uow, company_id)
     
     # Encriptar password del generador si se proporciona
-    from ..infrastructure.sire_auth import SireOAuthClient
+    from ..infrastructure.sire_auth import SireOAuthClient, invalidate_token_cache
     oauth_client = SireOAuthClient()
     encrypted_password = oauth_client.encrypt_secret(password_generador) if password_generador else None
     
@@ -83,6 +119,9 @@ def create_or_update_sire_configuration(
         )
         uow.db.add(config)
     else:
+        clave_token = (config.oauth_client_id, config.ruc)
+        credenciales_antes = (config.ruc, config.usuario_generador, config.oauth_client_id, config.oauth_client_secret)
+        
         # Actualizar solo los campos que se proporcionan (no None)
         # Esto permite actualizar parcialmente sin perder valores existentes
         if ruc is not None:
@@ -102,6 +141,15 @@ def create_or_update_sire_configuration(
             config.oauth_client_id = oauth_client_id
         if oauth_client_secret and oauth_client_secret.strip() != "":
             config.oauth_client_secret = oauth_client_secret
+        
+        # Credenciales nuevas: el token emitido con las anteriores deja de servir, tanto
+        # en la caché del proceso como el guardado en la configuración (que la volvería a sembrar)
+        credenciales = (config.ruc, config.usuario_generador, config.oauth_client_id, config.oauth_client_secret)
+        if password_generador is not None or credenciales != credenciales_antes:
+            invalidate_token_cache(*clave_token)
+            config.oauth_token = None
+            config.oauth_refresh_token = None
+            config.oauth_token_expires_at = None
         config.auto_sync_enabled = auto_sync_enabled
         config.sync_frequency_hours = sync_frequency_hours
         config.email_notifications = email_notifications
@@ -112,6 +160,38 @@ def create_or_update_sire_configuration(
     return config
 
 
+async def fetch_period_proposals(
+    client: SIREClient,
+    proposal_type: SireProposalType,
+    periods: List[str],
+    concurrency: Optional[int] = None
+) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    Obtiene las propuestas de varios períodos en paralelo con asyncio.gather.
+    
+    La concurrencia se acota con un semáforo (SIRE_SYNC_CONCURRENCY) para no
+    saturar a SUNAT. Un error en un período no cancela los demás.
+    
+    Returns:
+        Lista (en el mismo orden de periods) de (período, datos, error)
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.sire_sync_concurrency)
+    
+    async def fetch(per_tributario: str):
+        async with semaphore:
+            print(f"[SIRE Service] Intentando obtener propuesta para período {per_tributario}...")
+            try:
+                if proposal_type == SireProposalType.RVIE:
+                    data = await client.get_rvie_proposal_by_period(per_tributario)
+                else:
+                    data = await client.get_rce_proposal_by_period(per_tributario)
+                return per_tributario, data, None
+            except Exception as e:
+                return per_tributario, None, e
+    
+    return await asyncio.gather(*(fetch(p) for p in periods))
+
+
 async def sync_sire_proposals(
     uow: UnitOfWork,
     company_id: int,
@@ -183,19 +263,7 @@ async def sync_sire_proposals(
     print(f"[SIRE Service] Password desencriptado: {'Sí' if decrypted_password else 'No'}")
     
     # Crear cliente SIRE
-    # use_test_env ahora representa use_preliminary_mode (compatibilidad)
-    client = SIREClient(
-        company_id=company_id,
-        oauth_client_id=config.oauth_client_id,
-        oauth_client_secret=config.oauth_client_secret,
-        access_token=config.oauth_token,
-        refresh_token=config.oauth_refresh_token,
-        token_expires_at=config.oauth_token_expires_at,
-        use_preliminary_mode=config.use_test_env,  # Mantener compatibilidad
-        ruc=config.ruc,
-        usuario_generador=config.usuario_generador,
-        password_generador=decrypted_password
-    )
+    client = build_sire_client(config)
     
     # Obtener propuestas desde SUNAT
     try:
@@ -237,16 +305,16 @@ async def sync_sire_proposals(
         records_failed = 0
         errors = []
         
-        for per_tributario in periods_to_sync:
+        # Descargar las propuestas de todos los períodos en paralelo (concurrencia acotada)
+        # sobre el cliente HTTP con pool; luego se procesan en orden en la sesión de BD
+        await client.authenticate()
+        fetched = await fetch_period_proposals(client, proposal_type, periods_to_sync)
+        
+        for per_tributario, proposal_data, fetch_error in fetched:
             records_processed += 1
             try:
-                print(f"[SIRE Service] Intentando obtener propuesta para período {per_tributario}...")
-                
-                # Obtener propuesta para este período
-                if proposal_type == SireProposalType.RVIE:
-                    proposal_data = await client.get_rvie_proposal_by_period(per_tributario)
-                else:
-                    proposal_data = await client.get_rce_proposal_by_period(per_tributario)
+                if fetch_error is not None:
+                    raise fetch_error
                 
                 # La respuesta puede ser directamente la propuesta o estar dentro de un objeto
                 if not isinstance(proposal_data, dict):
@@ -353,11 +421,7 @@ async def sync_sire_proposals(
                 print(f"[SIRE Service] {error_msg}")
         
         # Actualizar tokens si se renovaron
-        if client.access_token != config.oauth_token:
-            config.oauth_token = client.access_token
-            config.oauth_refresh_token = client.refresh_token
-            if client.token_expires_at:
-                config.oauth_token_expires_at = client.token_expires_at
+        persist_sire_tokens(config, client)
         
         # Actualizar última sincronización
         config.last_sync_date = datetime.now()
@@ -423,26 +487,7 @@ async def accept_sire_proposal(
     if not config:
         raise ValueError("Configuración SIRE no encontrada")
     
-    # Desencriptar password
-    from ..infrastructure.sire_auth import SireOAuthClient
-    oauth_helper = SireOAuthClient()
-    decrypted_password = oauth_helper.decrypt_secret(config.password_generador)
-    if not decrypted_password and config.password_generador and not config.password_generador.startswith('gAAAAAB'):
-        decrypted_password = config.password_generador
-    
-    # Crear cliente
-    client = SIREClient(
-        company_id=company_id,
-        oauth_client_id=config.oauth_client_id,
-        oauth_client_secret=config.oauth_client_secret,
-        access_token=config.oauth_token,
-        refresh_token=config.oauth_refresh_token,
-        token_expires_at=config.oauth_token_expires_at,
-        use_preliminary_mode=config.use_test_env,
-        ruc=config.ruc,
-        usuario_generador=config.usuario_generador,
-        password_generador=decrypted_password
-    )
+    client = build_sire_client(config)
     
     # Obtener propuesta
     if proposal_type == SireProposalType.RVIE:
@@ -470,11 +515,7 @@ async def accept_sire_proposal(
     proposal.updated_at = datetime.now()
     
     # Actualizar tokens
-    if client.access_token != config.oauth_token:
-        config.oauth_token = client.access_token
-        config.oauth_refresh_token = client.refresh_token
-        if client.token_expires_at:
-            config.oauth_token_expires_at = client.token_expires_at
+    persist_sire_tokens(config, client)
     
     return {"success": True, "response": sunat_response}
 
@@ -496,26 +537,7 @@ async def complement_sire_proposal(
     if not config:
         raise ValueError("Configuración SIRE no encontrada")
     
-    # Desencriptar password
-    from ..infrastructure.sire_auth import SireOAuthClient
-    oauth_helper = SireOAuthClient()
-    decrypted_password = oauth_helper.decrypt_secret(config.password_generador)
-    if not decrypted_password and config.password_generador and not config.password_generador.startswith('gAAAAAB'):
-        decrypted_password = config.password_generador
-    
-    # Crear cliente
-    client = SIREClient(
-        company_id=company_id,
-        oauth_client_id=config.oauth_client_id,
-        oauth_client_secret=config.oauth_client_secret,
-        access_token=config.oauth_token,
-        refresh_token=config.oauth_refresh_token,
-        token_expires_at=config.oauth_token_expires_at,
-        use_preliminary_mode=config.use_test_env,
-        ruc=config.ruc,
-        usuario_generador=config.usuario_generador,
-        password_generador=decrypted_password
-    )
+    client = build_sire_client(config)
     
     # Obtener propuesta
     if proposal_type == SireProposalType.RVIE:
@@ -543,11 +565,7 @@ async def complement_sire_proposal(
     proposal.updated_at = datetime.now()
     
     # Actualizar tokens
-    if client.access_token != config.oauth_token:
-        config.oauth_token = client.access_token
-        config.oauth_refresh_token = client.refresh_token
-        if client.token_expires_at:
-            config.oauth_token_expires_at = client.token_expires_at
+    persist_sire_tokens(config, client)
     
     return {"success": True, "response": sunat_response}
 
@@ -569,26 +587,7 @@ async def replace_sire_proposal(
     if not config:
         raise ValueError("Configuración SIRE no encontrada")
     
-    # Desencriptar password
-    from ..infrastructure.sire_auth import SireOAuthClient
-    oauth_helper = SireOAuthClient()
-    decrypted_password = oauth_helper.decrypt_secret(config.password_generador)
-    if not decrypted_password and config.password_generador and not config.password_generador.startswith('gAAAAAB'):
-        decrypted_password = config.password_generador
-    
-    # Crear cliente
-    client = SIREClient(
-        company_id=company_id,
-        oauth_client_id=config.oauth_client_id,
-        oauth_client_secret=config.oauth_client_secret,
-        access_token=config.oauth_token,
-        refresh_token=config.oauth_refresh_token,
-        token_expires_at=config.oauth_token_expires_at,
-        use_preliminary_mode=config.use_test_env,
-        ruc=config.ruc,
-        usuario_generador=config.usuario_generador,
-        password_generador=decrypted_password
-    )
+    client = build_sire_client(config)
     
     # Obtener propuesta
     if proposal_type == SireProposalType.RVIE:
@@ -608,6 +607,18 @@ async def replace_sire_proposal(
             raise ValueError("Propuesta RCE no encontrada")
         sunat_response = await client.replace_rce_proposal(proposal.sunat_proposal_id, replacement_data)
     
+    # SUNAT procesa el reemplazo de forma asíncrona: el ticket se consulta en segundo plano
+    from .sire_tickets import extract_ticket_number, register_sire_ticket
+    ticket = None
+    ticket_number = extract_ticket_number(sunat_response)
+    if ticket_number:
+        ticket = register_sire_ticket(
+            uow.db, company_id, ticket_number, "REPLACE",
+            proposal_type=proposal_type,
+            period=(proposal.proposal_data or {}).get("perTributario"),
+            created_by=responded_by or created_by
+        )
+    
     # Actualizar propuesta
     proposal.status = SireProposalStatus.REPLACED
     proposal.response_data = sunat_response
@@ -616,10 +627,88 @@ async def replace_sire_proposal(
     proposal.updated_at = datetime.now()
     
     # Actualizar tokens
-    if client.access_token != config.oauth_token:
-        config.oauth_token = client.access_token
-        config.oauth_refresh_token = client.refresh_token
-        if client.token_expires_at:
-            config.oauth_token_expires_at = client.token_expires_at
+    persist_sire_tokens(config, client)
     
-    return {"success": True, "response": sunat_response}
+    return {"success": True, "response": sunat_response, "ticket_id": ticket.id if ticket else None}
+
+
+# ===== DETALLE DE PROPUESTAS (carga masiva) =====
+
+def load_proposal_details(
+    db: Session,
+    company_id: int,
+    proposal_type: SireProposalType,
+    period: str,
+    path: str,
+    chunk_size: int = 5000
+) -> int:
+    """
+    Carga los comprobantes de un archivo de propuesta en sire_proposal_details.
+    
+    El archivo se recorre en streaming y las filas se insertan por lotes
+    (executemany) de chunk_size; el detalle previo del período se reemplaza.
+    
+    Args:
+        path: Archivo de propuesta (TXT, ZIP o JSON)
+        period: Período tributario YYYYMM
+    
+    Returns:
+        Cantidad de comprobantes cargados
+    """
+    db.execute(delete(SireProposalDetail).where(
+        SireProposalDetail.company_id == company_id,
+        SireProposalDetail.proposal_type == proposal_type,
+        SireProposalDetail.period == period,
+    ))
+    
+    stmt = insert(SireProposalDetail)
+    now = datetime.now()
+    lote: List[Dict[str, Any]] = []
+    total = 0
+    for total, registro in enumerate(iter_proposal_records(path, proposal_type.value), 1):
+        registro["company_id"] = company_id
+        registro["proposal_type"] = proposal_type
+        registro["period"] = period
+        registro["line_no"] = total
+        registro["created_at"] = now
+        lote.append(registro)
+        if len(lote) >= chunk_size:
+            db.execute(stmt, lote)
+            lote = []
+    if lote:
+        db.execute(stmt, lote)
+    return total
+
+
+async def import_sire_proposal_details(
+    uow: UnitOfWork,
+    company_id: int,
+    proposal_type: SireProposalType,
+    period: str,
+    proposal_number: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Descarga la propuesta de un período a un archivo temporal y carga su detalle.
+    
+    Returns:
+        Dict con período, cantidad de comprobantes y bytes descargados
+    """
+    config = get_sire_configuration(uow, company_id)
+    if not config or not config.oauth_client_id or not config.oauth_client_secret:
+        raise ValueError("Configuración SIRE no encontrada o incompleta")
+    
+    client = build_sire_client(config)
+    
+    fd, tmp_path = tempfile.mkstemp(prefix=f"sire-{proposal_type.value.lower()}-{period}-")
+    os.close(fd)
+    try:
+        size = await client.download_proposal_file(proposal_type, period, tmp_path, proposal_number)
+        count = load_proposal_details(uow.db, company_id, proposal_type, period, tmp_path)
+    finally:
+        os.unlink(tmp_path)
+    
+    # Actualizar tokens
+    persist_sire_tokens(config, client)
+    
+    print(f"[SIRE Service] Detalle {proposal_type.value} {period}: {count} comprobantes ({size} bytes)")
+    return {"period": period, "records": count, "bytes": size}
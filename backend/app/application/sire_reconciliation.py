@@ -0,0 +1,302 @@
+"""
+Conciliación propuesta SIRE vs. libros
+======================================
+
+Compara el detalle de la propuesta SUNAT de un período (sire_proposal_details,
+cargado con import_sire_proposal_details) con las ventas (RVIE) o compras (RCE)
+registradas en el sistema.
+
+Ambos lados se leen como tuplas por la conexión (sin la capa ORM), con los
+montos ya convertidos a céntimos enteros en SQL, y se indexan en un dict por (RUC, tipo de documento, serie, número) normalizados, de modo que el
+emparejamiento es O(n + m). En RVIE el emisor es la propia empresa, así que el
+RUC de la clave es el de la empresa; en RCE es el RUC del proveedor.
+
+Clasificación de cada comprobante:
+- MISSING_IN_BOOKS: en la propuesta, no registrado
+- EXTRA_IN_BOOKS: registrado, no está en la propuesta
+- AMOUNT_MISMATCH: base, IGV o total distintos (más allá de la tolerancia)
+- DATE_MISMATCH: montos iguales, fecha de emisión distinta
+
+Los comprobantes de la propuesta que no aparecen en el período de los libros
+se buscan además en los 12 meses anteriores y el mes siguiente (compras
+anotadas tarde, fechas mal digitadas) antes de marcarlos como faltantes.
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, case, cast, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from ..domain.models import Company, ThirdParty
+from ..domain.models_ext import Purchase, Sale
+from ..domain.models_sire import (
+    SireProposalDetail,
+    SireProposalType,
+    SireReconciliationItem,
+    SireReconciliationItemStatus,
+    SireReconciliationRun,
+)
+
+Clave = Tuple[str, str, str, str]
+
+_MONTOS = ("base_amount", "igv_amount", "total_amount")
+_LOTE_INSERT = 5000
+
+# Posiciones en las tuplas leídas de ambos lados: la clave normalizada es fila[1:5]
+_ID, _RUC, _TIPO, _SERIE, _NUMERO, _FECHA, _BASE, _IGV, _TOTAL, _TAX_ID = range(10)
+
+
+def normalizar_clave(ruc: Optional[str], doc_type: Optional[str], series: Optional[str], number: Optional[str]) -> Clave:
+    """
+    Clave de comprobante comparable entre SUNAT y el sistema.
+
+    El número se compara sin ceros a la izquierda ("00000123" == "123"), la
+    serie en mayúsculas y el tipo de documento con dos dígitos. Es la misma
+    normalización que _columnas_clave aplica en SQL.
+    """
+    tipo = (doc_type or "").strip()
+    return (
+        (ruc or "").strip(),
+        "0" + tipo if len(tipo) == 1 else tipo,
+        (series or "").strip().upper(),
+        (number or "").strip().lstrip("0") or "0",
+    )
+
+
+def _columnas_clave(ruc, doc_type, series, number) -> Tuple:
+    """normalizar_clave en SQL (trim/upper/ltrim: válido en PostgreSQL y SQLite)."""
+    tipo = func.trim(doc_type)
+    return (
+        func.coalesce(func.trim(ruc), ""),
+        case((func.length(tipo) == 1, literal("0", String) + tipo), else_=func.coalesce(tipo, "")),
+        func.coalesce(func.upper(func.trim(series)), ""),
+        func.coalesce(func.nullif(func.ltrim(func.trim(number), "0"), ""), "0"),
+    )
+
+
+def _centimos(columna):
+    """Monto como entero en céntimos (comparación exacta y sin Decimal por fila)."""
+    return cast(func.round(columna * 100), Integer)
+
+
+def _a_decimal(centimos: Optional[int]) -> Optional[Decimal]:
+    return None if centimos is None else Decimal(int(centimos)).scaleb(-2)
+
+
+def _rango_periodo(period: str) -> Tuple[date, date]:
+    year, month = int(period[:4]), int(period[4:6])
+    inicio = date(year, month, 1)
+    fin = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return inicio, fin
+
+
+def _select_sunat(company_id: int, proposal_type: SireProposalType, period: str, ruc_emisor: Optional[str]):
+    d = SireProposalDetail
+    ruc = literal(ruc_emisor, String) if ruc_emisor is not None else d.counterparty_tax_id
+    return select(
+        d.id, *_columnas_clave(ruc, d.doc_type, d.series, d.number), d.issue_date,
+        _centimos(d.base_amount), _centimos(d.igv_amount), _centimos(d.total_amount),
+        d.counterparty_tax_id,
+    ).where(d.company_id == company_id, d.proposal_type == proposal_type, d.period == period)
+
+
+def _select_libros(company_id: int, proposal_type: SireProposalType, ruc_emisor: Optional[str]):
+    if proposal_type == SireProposalType.RVIE:
+        modelo, tercero_id = Sale, Sale.customer_id
+    else:
+        modelo, tercero_id = Purchase, Purchase.supplier_id
+    ruc = literal(ruc_emisor, String) if ruc_emisor is not None else ThirdParty.tax_id
+    return (
+        select(
+            modelo.id, *_columnas_clave(ruc, modelo.doc_type, modelo.series, modelo.number), modelo.issue_date,
+            _centimos(modelo.base_amount), _centimos(modelo.igv_amount), _centimos(modelo.total_amount),
+            ThirdParty.tax_id,
+        )
+        .outerjoin(ThirdParty, ThirdParty.id == tercero_id)
+        .where(modelo.company_id == company_id)
+    ), modelo
+
+
+def _indexar(filas: Iterable[Tuple]) -> Dict[Clave, List[Tuple]]:
+    """Índice hash clave -> filas (lista por si hay comprobantes duplicados)."""
+    indice: Dict[Clave, List[Tuple]] = {}
+    for fila in filas:
+        indice.setdefault(fila[_RUC:_FECHA], []).append(fila)
+    return indice
+
+
+def _item(status: str, sunat: Optional[Tuple], libro: Optional[Tuple],
+          campos: Optional[List[str]] = None) -> Dict[str, Any]:
+    ref = sunat or libro
+    return {
+        "status": status,
+        "mismatch_fields": ",".join(campos) if campos else None,
+        "counterparty_tax_id": ref[_TAX_ID],
+        "doc_type": ref[_TIPO],
+        "series": ref[_SERIE],
+        "number": ref[_NUMERO],
+        "sunat_detail_id": sunat[_ID] if sunat else None,
+        "book_id": libro[_ID] if libro else None,
+        "sunat_issue_date": sunat[_FECHA] if sunat else None,
+        "book_issue_date": libro[_FECHA] if libro else None,
+        "sunat_base_amount": _a_decimal(sunat[_BASE]) if sunat else None,
+        "sunat_igv_amount": _a_decimal(sunat[_IGV]) if sunat else None,
+        "sunat_total_amount": _a_decimal(sunat[_TOTAL]) if sunat else None,
+        "book_base_amount": _a_decimal(libro[_BASE]) if libro else None,
+        "book_igv_amount": _a_decimal(libro[_IGV]) if libro else None,
+        "book_total_amount": _a_decimal(libro[_TOTAL]) if libro else None,
+    }
+
+
+def _comparar(sunat: Tuple, libro: Tuple, tolerancia: int) -> Optional[Tuple[str, List[str]]]:
+    """Devuelve (estado, campos distintos) o None si el comprobante concilia (montos en céntimos)."""
+    campos = [
+        nombre for nombre, pos in zip(_MONTOS, (_BASE, _IGV, _TOTAL))
+        if abs((sunat[pos] or 0) - (libro[pos] or 0)) > tolerancia
+    ]
+    monto_distinto = bool(campos)
+    if sunat[_FECHA] != libro[_FECHA]:
+        campos.append("issue_date")
+    if monto_distinto:
+        return SireReconciliationItemStatus.AMOUNT_MISMATCH.value, campos
+    if campos:
+        return SireReconciliationItemStatus.DATE_MISMATCH.value, campos
+    return None
+
+
+def reconcile_sire_period(
+    db: Session,
+    company_id: int,
+    proposal_type: SireProposalType,
+    period: str,
+    created_by: Optional[int] = None,
+    tolerance: Decimal = Decimal("0.01"),
+) -> SireReconciliationRun:
+    """
+    Concilia la propuesta SIRE del período con ventas (RVIE) o compras (RCE).
+
+    Args:
+        period: Período tributario YYYYMM
+        tolerance: Diferencia máxima de montos considerada igual (redondeo)
+
+    Returns:
+        SireReconciliationRun con los totales; las diferencias quedan en
+        sire_reconciliation_items (sin commit: lo hace el llamador)
+    """
+    inicio_t = time.perf_counter()
+    inicio, fin = _rango_periodo(period)
+    tolerancia = int((tolerance * 100).to_integral_value())
+    conn = db.connection()
+
+    ruc_emisor = None
+    if proposal_type == SireProposalType.RVIE:
+        ruc_emisor = (db.execute(select(Company.ruc).where(Company.id == company_id)).scalar() or "").strip()
+
+    sunat_rows = conn.execute(_select_sunat(company_id, proposal_type, period, ruc_emisor)).all()
+
+    stmt_libros, modelo = _select_libros(company_id, proposal_type, ruc_emisor)
+    libros_rows = conn.execute(
+        stmt_libros.where(modelo.issue_date >= inicio, modelo.issue_date <= fin)
+    ).all()
+    libros = _indexar(libros_rows)
+
+    items: List[Dict[str, Any]] = []
+    conciliados = 0
+    sin_libro: List[Tuple] = []
+
+    def emparejar(sunat: Tuple, indice: Dict[Clave, List[Tuple]]) -> bool:
+        nonlocal conciliados
+        clave = sunat[_RUC:_FECHA]
+        candidatos = indice.get(clave)
+        if not candidatos:
+            return False
+        libro = candidatos.pop()
+        if not candidatos:
+            del indice[clave]
+        # Caso común: fecha y montos idénticos (una comparación de tuplas)
+        if sunat[_FECHA:_TAX_ID] == libro[_FECHA:_TAX_ID]:
+            conciliados += 1
+            return True
+        diferencia = _comparar(sunat, libro, tolerancia)
+        if diferencia is None:
+            conciliados += 1
+        else:
+            items.append(_item(diferencia[0], sunat, libro, diferencia[1]))
+        return True
+
+    for sunat in sunat_rows:
+        if not emparejar(sunat, libros):
+            sin_libro.append(sunat)
+
+    # Comprobantes registrados fuera del período (misma serie, ventana de 12 meses)
+    if sin_libro:
+        series = sorted({sunat[_SERIE] for sunat in sin_libro if sunat[_SERIE]})
+        fuera = _indexar(conn.execute(stmt_libros.where(
+            func.upper(func.trim(modelo.series)).in_(series),
+            modelo.issue_date >= inicio - timedelta(days=365),
+            modelo.issue_date <= fin + timedelta(days=31),
+            or_(modelo.issue_date < inicio, modelo.issue_date > fin),
+        )).all()) if series else {}
+        for sunat in sin_libro:
+            if not emparejar(sunat, fuera):
+                items.append(_item(SireReconciliationItemStatus.MISSING_IN_BOOKS.value, sunat, None))
+
+    for restantes in libros.values():
+        for libro in restantes:
+            items.append(_item(SireReconciliationItemStatus.EXTRA_IN_BOOKS.value, None, libro))
+
+    conteo = {status: 0 for status in SireReconciliationItemStatus}
+    for item in items:
+        conteo[SireReconciliationItemStatus(item["status"])] += 1
+
+    run = SireReconciliationRun(
+        company_id=company_id,
+        proposal_type=proposal_type,
+        period=period,
+        sunat_count=len(sunat_rows),
+        books_count=len(libros_rows),
+        matched_count=conciliados,
+        missing_in_books_count=conteo[SireReconciliationItemStatus.MISSING_IN_BOOKS],
+        extra_in_books_count=conteo[SireReconciliationItemStatus.EXTRA_IN_BOOKS],
+        amount_mismatch_count=conteo[SireReconciliationItemStatus.AMOUNT_MISMATCH],
+        date_mismatch_count=conteo[SireReconciliationItemStatus.DATE_MISMATCH],
+        created_by=created_by,
+    )
+    db.add(run)
+    db.flush()
+
+    stmt = insert(SireReconciliationItem)
+    for i in range(0, len(items), _LOTE_INSERT):
+        lote = items[i:i + _LOTE_INSERT]
+        for item in lote:
+            item["run_id"] = run.id
+        db.execute(stmt, lote)
+
+    run.duration_ms = int((time.perf_counter() - inicio_t) * 1000)
+    return run
+
+
+def list_reconciliation_items(
+    db: Session,
+    run_id: int,
+    status: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 100,
+) -> List[SireReconciliationItem]:
+    """
+    Diferencias de una conciliación, paginadas por id (keyset).
+
+    Args:
+        after_id: Último id recibido en la página anterior
+
+    Returns:
+        Lista de SireReconciliationItem ordenada por id
+    """
+    stmt = select(SireReconciliationItem).where(SireReconciliationItem.run_id == run_id)
+    if status:
+        stmt = stmt.where(SireReconciliationItem.status == status)
+    if after_id:
+        stmt = stmt.where(SireReconciliationItem.id > after_id)
+    return list(db.execute(stmt.order_by(SireReconciliationItem.id).limit(limit)).scalars())
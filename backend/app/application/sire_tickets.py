@@ -0,0 +1,281 @@
+"""
+Seguimiento de tickets SIRE en segundo plano
+============================================
+
+Las operaciones asíncronas de SUNAT (reemplazo de propuesta, carga de
+preliminares) devuelven un número de ticket. En lugar de que el usuario
+consulte SUNAT a mano, el ticket se registra en sire_tickets y un único
+poller por proceso lo consulta:
+
+- Intervalo adaptativo: la primera consulta a los pocos segundos y luego
+  duplicando la espera hasta un máximo (los procesos largos no saturan SUNAT)
+- Todas las empresas desde el mismo event loop, con concurrencia acotada y
+  un SIREClient por empresa en cada ronda
+- Reanudable: el estado y la próxima consulta viven en la BD; cada ronda
+  reserva sus tickets (next_poll_at = ahora + lease) para que varios workers
+  no consulten el mismo ticket
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..domain.models_sire import SireConfiguration, SireProposalType, SireTicket, SireTicketStatus
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (SireTicketStatus.PENDING.value, SireTicketStatus.PROCESSING.value)
+
+# codEstadoProceso de SUNAT que indica proceso terminado
+_CODIGOS_TERMINADO = {"06"}
+_TEXTOS_TERMINADO = ("TERMINADO", "PROCESADO", "FINALIZADO", "COMPLETED", "SUCCESS")
+_TEXTOS_ERROR = ("ERROR", "RECHAZ", "FAILED", "ANULADO")
+
+
+def extract_ticket_number(response: Any) -> Optional[str]:
+    """Número de ticket de una respuesta SUNAT (None si la operación fue síncrona)"""
+    if not isinstance(response, dict):
+        return None
+    for clave in ("numTicket", "ticket", "ticketNumber", "ticket_number"):
+        valor = response.get(clave)
+        if valor:
+            return str(valor)
+    return None
+
+
+def register_sire_ticket(
+    db: Session,
+    company_id: int,
+    ticket_number: str,
+    operation: str,
+    proposal_type: Optional[SireProposalType] = None,
+    period: Optional[str] = None,
+    created_by: Optional[int] = None,
+) -> SireTicket:
+    """
+    Registra un ticket para seguimiento (idempotente por empresa y número).
+
+    No hace commit: lo hace el llamador junto con la operación que generó el ticket.
+    """
+    ticket = db.query(SireTicket).filter(
+        SireTicket.company_id == company_id,
+        SireTicket.ticket_number == ticket_number
+    ).first()
+    if ticket is None:
+        ticket = SireTicket(
+            company_id=company_id,
+            ticket_number=ticket_number,
+            operation=operation,
+            proposal_type=proposal_type,
+            period=period,
+            status=SireTicketStatus.PENDING.value,
+            next_poll_at=datetime.now() + timedelta(seconds=settings.sire_ticket_poll_initial_seconds),
+            created_by=created_by,
+        )
+        db.add(ticket)
+        db.flush()
+    return ticket
+
+
+def next_poll_delay(attempts: int) -> float:
+    """Segundos hasta la próxima consulta tras `attempts` consultas (backoff exponencial acotado)"""
+    return min(settings.sire_ticket_poll_max_seconds, settings.sire_ticket_poll_initial_seconds * 2 ** attempts)
+
+
+def interpret_ticket_status(response: Any) -> Tuple[str, Optional[str]]:
+    """
+    Traduce la respuesta de consulta de ticket a (SireTicketStatus, detalle).
+
+    Acepta la respuesta directa o la forma paginada de SUNAT ({"registros": [...]}).
+    """
+    registro = response
+    if isinstance(response, dict) and isinstance(response.get("registros"), list) and response["registros"]:
+        registro = response["registros"][0]
+    if not isinstance(registro, dict):
+        return SireTicketStatus.PROCESSING.value, None
+
+    codigo = str(registro.get("codEstadoProceso") or "").strip()
+    texto = str(
+        registro.get("desEstadoProceso") or registro.get("status") or registro.get("estado") or ""
+    ).strip().upper()
+    if any(t in texto for t in _TEXTOS_ERROR):
+        detalle = registro.get("detalle") or registro.get("message") or registro.get("desEstadoProceso")
+        return SireTicketStatus.FAILED.value, str(detalle) if detalle else texto
+    if codigo in _CODIGOS_TERMINADO or any(t in texto for t in _TEXTOS_TERMINADO):
+        return SireTicketStatus.COMPLETED.value, None
+    return SireTicketStatus.PROCESSING.value, None
+
+
+def _aplicar_resultado(ticket: SireTicket, respuesta: Any, error: Optional[str], ahora: datetime) -> None:
+    ticket.attempts += 1
+    ticket.last_polled_at = ahora
+    if error is not None:
+        # Error de consulta (red, credenciales, circuito abierto): se reintenta más tarde
+        ticket.error_message = error
+    else:
+        ticket.last_response = respuesta if isinstance(respuesta, dict) else {"raw_response": respuesta}
+        ticket.status, detalle = interpret_ticket_status(respuesta)
+        ticket.error_message = detalle
+
+    if ticket.status not in ACTIVE_STATUSES:
+        ticket.completed_at = ahora
+    elif ahora - ticket.created_at > timedelta(hours=settings.sire_ticket_max_age_hours):
+        ticket.status = SireTicketStatus.EXPIRED.value
+        ticket.completed_at = ahora
+    else:
+        ticket.next_poll_at = ahora + timedelta(seconds=next_poll_delay(ticket.attempts))
+
+
+def _reservar_vencidos(db: Session, ahora: datetime, limite: int) -> List[SireTicket]:
+    """Reserva los tickets vencidos (update condicional: otro worker no los toma)"""
+    candidatos = db.execute(
+        select(SireTicket.id, SireTicket.next_poll_at)
+        .where(SireTicket.status.in_(ACTIVE_STATUSES), SireTicket.next_poll_at <= ahora)
+        .order_by(SireTicket.next_poll_at)
+        .limit(limite)
+    ).all()
+    lease = ahora + timedelta(seconds=settings.sire_ticket_lease_seconds)
+    ids = []
+    for ticket_id, next_poll_at in candidatos:
+        result = db.execute(
+            update(SireTicket)
+            .where(SireTicket.id == ticket_id, SireTicket.next_poll_at == next_poll_at)
+            .values(next_poll_at=lease)
+        )
+        if result.rowcount == 1:
+            ids.append(ticket_id)
+    db.commit()
+    if not ids:
+        return []
+    return db.query(SireTicket).filter(SireTicket.id.in_(ids)).all()
+
+
+async def poll_due_tickets(
+    session_factory: Optional[Callable[[], Session]] = None,
+    client_factory: Optional[Callable[[SireConfiguration], Any]] = None,
+) -> int:
+    """
+    Consulta en SUNAT los tickets vencidos de todas las empresas (una ronda).
+
+    Args:
+        session_factory: Fábrica de sesiones (por defecto SessionLocal)
+        client_factory: Crea el cliente SIRE de una configuración (por defecto build_sire_client)
+
+    Returns:
+        Cantidad de tickets consultados
+    """
+    if session_factory is None:
+        from ..db import SessionLocal
+        session_factory = SessionLocal
+    if client_factory is None:
+        from .services_sire import build_sire_client
+        client_factory = build_sire_client
+
+    db = session_factory()
+    try:
+        tickets = _reservar_vencidos(db, datetime.now(), settings.sire_ticket_poll_batch)
+        if not tickets:
+            return 0
+
+        empresas = {t.company_id for t in tickets}
+        configs = {
+            c.company_id: c
+            for c in db.query(SireConfiguration).filter(SireConfiguration.company_id.in_(empresas))
+        }
+        clientes: Dict[int, Any] = {}
+        semaforo = asyncio.Semaphore(settings.sire_ticket_poll_concurrency)
+
+        async def consultar(ticket: SireTicket):
+            config = configs.get(ticket.company_id)
+            if config is None:
+                return ticket, None, "Configuración SIRE no encontrada"
+            try:
+                cliente = clientes.get(ticket.company_id)
+                if cliente is None:
+                    cliente = clientes[ticket.company_id] = client_factory(config)
+                async with semaforo:
+                    return ticket, await cliente.check_ticket_status(ticket.ticket_number), None
+            except Exception as e:
+                return ticket, None, str(e)[:1000]
+
+        resultados = await asyncio.gather(*(consultar(t) for t in tickets))
+        ahora = datetime.now()
+        for ticket, respuesta, error in resultados:
+            _aplicar_resultado(ticket, respuesta, error, ahora)
+        db.commit()
+        return len(tickets)
+    finally:
+        db.close()
+
+
+def _segundos_hasta_proximo(session_factory: Callable[[], Session]) -> float:
+    db = session_factory()
+    try:
+        proximo = db.execute(
+            select(func.min(SireTicket.next_poll_at)).where(SireTicket.status.in_(ACTIVE_STATUSES))
+        ).scalar()
+    finally:
+        db.close()
+    if proximo is None:
+        return settings.sire_ticket_poll_idle_seconds
+    segundos = (proximo - datetime.now()).total_seconds()
+    return min(max(segundos, 0.0), settings.sire_ticket_poll_idle_seconds)
+
+
+class SireTicketPoller:
+    """Tarea de fondo que consulta los tickets pendientes mientras la app está arriba"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        client_factory: Optional[Callable[[SireConfiguration], Any]] = None,
+    ):
+        self._session_factory = session_factory
+        self._client_factory = client_factory
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Inicia el poller en el event loop actual (no hace nada si ya corre)"""
+        if self.running:
+            return
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        if self._session_factory is None:
+            from ..db import SessionLocal
+            self._session_factory = SessionLocal
+        while not self._stop.is_set():
+            try:
+                consultados = await poll_due_tickets(self._session_factory, self._client_factory)
+                # Lote completo: puede haber más vencidos, seguir sin esperar
+                if consultados >= settings.sire_ticket_poll_batch:
+                    espera = 0.0
+                else:
+                    espera = _segundos_hasta_proximo(self._session_factory)
+            except Exception:
+                logger.exception("Error consultando tickets SIRE")
+                espera = settings.sire_ticket_poll_idle_seconds
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+
+
+ticket_poller = SireTicketPoller()
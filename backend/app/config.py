@@ -34,6 +34,53 @@ class Settings(BaseSettings):
     uploads_dir: str | None = Field(default=None, env="UPLOADS_DIR")
     max_upload_size_mb: int = Field(default=5, env="MAX_UPLOAD_SIZE_MB")
 
+    # ===== SIRE =====
+    sire_sync_concurrency: int = Field(default=6, env="SIRE_SYNC_CONCURRENCY")  # Períodos consultados en paralelo
+    sire_http_max_connections: int = Field(default=10, env="SIRE_HTTP_MAX_CONNECTIONS")  # Pool por empresa
+    sire_http_keepalive_seconds: float = Field(default=30.0, env="SIRE_HTTP_KEEPALIVE_SECONDS")
+    sire_token_refresh_ahead_seconds: int = Field(default=300, env="SIRE_TOKEN_REFRESH_AHEAD_SECONDS")  # Renovación anticipada en segundo plano
+    sire_retry_max_attempts: int = Field(default=4, env="SIRE_RETRY_MAX_ATTEMPTS")  # Intentos totales por petición idempotente
+    sire_retry_base_delay: float = Field(default=0.5, env="SIRE_RETRY_BASE_DELAY")  # Backoff exponencial con jitter
+    sire_retry_max_delay: float = Field(default=8.0, env="SIRE_RETRY_MAX_DELAY")
+    sire_rate_limit_per_second: float = Field(default=10.0, env="SIRE_RATE_LIMIT_PER_SECOND")  # Token bucket por RUC (0 = sin límite)
+    sire_rate_limit_burst: int = Field(default=20, env="SIRE_RATE_LIMIT_BURST")
+    sire_circuit_failure_threshold: int = Field(default=5, env="SIRE_CIRCUIT_FAILURE_THRESHOLD")  # Fallos consecutivos que abren el circuito
+    sire_circuit_cooldown_seconds: float = Field(default=30.0, env="SIRE_CIRCUIT_COOLDOWN_SECONDS")
+    sire_ticket_poller_enabled: bool = Field(default=True, env="SIRE_TICKET_POLLER_ENABLED")  # Consulta de tickets en segundo plano
+    sire_ticket_poll_initial_seconds: float = Field(default=5.0, env="SIRE_TICKET_POLL_INITIAL_SECONDS")  # Intervalo inicial (se duplica por consulta)
+    sire_ticket_poll_max_seconds: float = Field(default=300.0, env="SIRE_TICKET_POLL_MAX_SECONDS")
+    sire_ticket_poll_idle_seconds: float = Field(default=30.0, env="SIRE_TICKET_POLL_IDLE_SECONDS")  # Espera máxima sin tickets vencidos
+    sire_ticket_poll_concurrency: int = Field(default=4, env="SIRE_TICKET_POLL_CONCURRENCY")
+    sire_ticket_poll_batch: int = Field(default=50, env="SIRE_TICKET_POLL_BATCH")
+    sire_ticket_lease_seconds: int = Field(default=120, env="SIRE_TICKET_LEASE_SECONDS")  # Reserva del ticket mientras se consulta
+    sire_ticket_max_age_hours: int = Field(default=24, env="SIRE_TICKET_MAX_AGE_HOURS")
+
+    # ===== DOCUMENTOS (cola de extracción/OCR) =====
+    document_worker_concurrency: int = Field(default=2, env="DOCUMENT_WORKER_CONCURRENCY")  # Trabajos simultáneos por proceso worker
+    document_worker_idle_seconds: float = Field(default=5.0, env="DOCUMENT_WORKER_IDLE_SECONDS")  # Espera cuando la cola está vacía
+    document_job_max_attempts: int = Field(default=3, env="DOCUMENT_JOB_MAX_ATTEMPTS")
+    document_job_retry_initial_seconds: float = Field(default=30.0, env="DOCUMENT_JOB_RETRY_INITIAL_SECONDS")  # Backoff exponencial entre intentos
+    document_job_retry_max_seconds: float = Field(default=900.0, env="DOCUMENT_JOB_RETRY_MAX_SECONDS")
+    document_job_lease_seconds: int = Field(default=1800, env="DOCUMENT_JOB_LEASE_SECONDS")  # Reserva del trabajo (un worker caído la deja vencer)
+    document_queue_metrics_window_minutes: int = Field(default=15, env="DOCUMENT_QUEUE_METRICS_WINDOW_MINUTES")
+    ocr_dpi: int = Field(default=300, env="OCR_DPI")  # Resolución de rasterizado (Tesseract rinde mejor a 300)
+    ocr_grayscale: bool = Field(default=True, env="OCR_GRAYSCALE")
+    ocr_max_workers: int = Field(default=0, env="OCR_MAX_WORKERS")  # Procesos del pool de OCR compartido (0 = núcleos disponibles)
+    ocr_text_layer_min_chars: int = Field(default=25, env="OCR_TEXT_LAYER_MIN_CHARS")  # Páginas con capa de texto: sin OCR
+    ocr_cache_enabled: bool = Field(default=True, env="OCR_CACHE_ENABLED")  # Cache en disco por (hash, página)
+    blob_gc_grace_hours: float = Field(default=24.0, env="BLOB_GC_GRACE_HOURS")  # Blobs sin referencias se purgan pasado este plazo
+    document_search_count_cap: int = Field(default=1000, env="DOCUMENT_SEARCH_COUNT_CAP")  # Sobre este total la búsqueda informa un estimado
+    document_renditions_enabled: bool = Field(default=True, env="DOCUMENT_RENDITIONS_ENABLED")  # Miniatura y vista previa de PDFs al subir (en la cola)
+    document_access_log_async: bool = Field(default=True, env="DOCUMENT_ACCESS_LOG_ASYNC")  # Vistas de documentos registradas en segundo plano
+    document_access_log_flush_ms: int = Field(default=500, env="DOCUMENT_ACCESS_LOG_FLUSH_MS")
+    document_access_log_batch: int = Field(default=200, env="DOCUMENT_ACCESS_LOG_BATCH")  # Al juntar este número se inserta sin esperar
+    document_access_log_max_queue: int = Field(default=10000, env="DOCUMENT_ACCESS_LOG_MAX_QUEUE")  # Con la cola llena la vacía el request
+    cpe_import_batch_size: int = Field(default=500, env="CPE_IMPORT_BATCH_SIZE")  # Comprobantes por transacción al importar un ZIP de XML
+    cpe_import_max_zip_mb: int = Field(default=200, env="CPE_IMPORT_MAX_ZIP_MB")
+    mailbox_stats_cache_seconds: float = Field(default=60.0, env="MAILBOX_STATS_CACHE_SECONDS")  # Contadores de la casilla (badge); un commit en la casilla los invalida
+    mailbox_overdue_sweeper_enabled: bool = Field(default=True, env="MAILBOX_OVERDUE_SWEEPER_ENABLED")  # Marca VENCIDO en segundo plano
+    mailbox_overdue_sweep_minutes: float = Field(default=60.0, env="MAILBOX_OVERDUE_SWEEP_MINUTES")
+
     # ===== CORS =====
     allowed_origins: str = Field(
         default="http://localhost:5173,http://localhost:3000",
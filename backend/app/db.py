@@ -26,6 +26,26 @@ def _import_all_models():
     from .domain import models_payments  # noqa: F401
     from .domain import models_mailbox  # noqa: F401 - ElectronicMailbox, MailboxMessage, etc.
     from .domain import models_audit  # noqa: F401 - AuditLog (auditoría global ERP)
+    from .domain import models_ple  # noqa: F401 - PleLedgerVersion (caché de libros PLE)
+
+
+def register_session_listeners():
+    """
+    Registra los listeners globales de sesión (idempotente).
+
+    Invalidan la caché PLE, el resumen de conciliación y los contadores de
+    casilla, y limpian las marcas de blobs pendientes. Todo proceso que escriba
+    en la BD (API, worker, scripts) debe llamarla al arrancar.
+    """
+    from .application.ple_cache import register_ple_cache_listeners
+    from .application.bank_reconciliation_stats import register_bank_reconciliation_listeners
+    from .application.mailbox_stats import register_mailbox_stats_listeners
+    from .application.blob_store import register_blob_store_listeners
+
+    register_ple_cache_listeners()
+    register_bank_reconciliation_listeners()
+    register_mailbox_stats_listeners()
+    register_blob_store_listeners()  # Marcas de blobs pendientes de commit
 
 
 def init_db():
@@ -232,8 +232,16 @@ class BankTransaction(Base):
     balance: Mapped[Numeric] = mapped_column(Numeric(14,2))  # Saldo después de la transacción
     reconciled: Mapped[bool] = mapped_column(Boolean, default=False)  # Si está conciliado
     entry_line_id: Mapped[int | None] = mapped_column(ForeignKey("entry_lines.id"), nullable=True)  # Línea contable asociada
+    fingerprint: Mapped[str | None] = mapped_column(String(40), nullable=True, unique=True, index=True)  # Huella (cuenta, fecha, monto, referencia, descripción) para omitir duplicados; única (incluye la cuenta)
     statement = relationship("BankStatement", back_populates="transactions")
 
+class BankTransactionLine(Base):
+    """Líneas contables de un match de varias líneas (un movimiento bancario ↔ N líneas)"""
+    __tablename__ = "bank_transaction_lines"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bank_transaction_id: Mapped[int] = mapped_column(ForeignKey("bank_transactions.id", ondelete="CASCADE"), index=True)
+    entry_line_id: Mapped[int] = mapped_column(ForeignKey("entry_lines.id"), unique=True)  # Una línea solo concilia una vez
+
 class BankReconciliation(Base):
     """Estado de conciliación bancaria por período"""
     __tablename__ = "bank_reconciliations"
@@ -253,6 +261,24 @@ class BankReconciliation(Base):
     bank_account = relationship("BankAccount")
     period = relationship("Period")
 
+class BankReconciliationStats(Base):
+    """Resumen incremental de conciliación por cuenta bancaria y período (ver application/bank_reconciliation_stats.py)"""
+    __tablename__ = "bank_reconciliation_stats"
+    __table_args__ = (UniqueConstraint('bank_account_id', 'period_id', name='uq_bank_reconciliation_stats'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bank_account_id: Mapped[int] = mapped_column(ForeignKey("bank_accounts.id"), index=True)
+    period_id: Mapped[int] = mapped_column(ForeignKey("periods.id"))
+    year: Mapped[int] = mapped_column(Integer)  # Del período, para ordenar el saldo acumulado sin unir periods
+    month: Mapped[int] = mapped_column(Integer)
+    book_movement: Mapped[Numeric] = mapped_column(Numeric(14,2), default=0)  # Debe - haber de asientos POSTED del período
+    book_balance: Mapped[Numeric] = mapped_column(Numeric(14,2), default=0)  # Saldo contable acumulado hasta el período
+    book_lines: Mapped[int] = mapped_column(Integer, default=0)  # Líneas contables POSTED de la cuenta en el período
+    book_lines_reconciled: Mapped[int] = mapped_column(Integer, default=0)
+    bank_transactions: Mapped[int] = mapped_column(Integer, default=0)  # Movimientos de los extractos del período
+    bank_transactions_reconciled: Mapped[int] = mapped_column(Integer, default=0)
+    stale: Mapped[bool] = mapped_column(Boolean, default=False)  # Cambiaron asientos o extractos: recalcular el período
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, default=datetime.now, nullable=True)
+
 class SystemSettings(Base):
     """Configuraciones del sistema por empresa"""
     __tablename__ = "system_settings"
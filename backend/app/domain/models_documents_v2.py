@@ -2,12 +2,31 @@
 Modelos de Dominio para Gestión Documental - Versión Optimizada
 Separación de responsabilidades para mejor rendimiento
 """
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Numeric, Text, BigInteger, UniqueConstraint, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Numeric, Text, BigInteger, UniqueConstraint, JSON, Index, DDL, event
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Dict, Any, Optional
 from datetime import datetime
 from ..db import Base
 
+class StoredBlob(Base):
+    """
+    Contenido almacenado una sola vez, direccionado por su SHA-256.
+    
+    Documentos y adjuntos de la casilla apuntan al blob; ref_count cuenta las
+    referencias y, al llegar a cero, el archivo se elimina tras un período de
+    gracia (purge_unreferenced_blobs).
+    """
+    __tablename__ = "stored_blobs"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    blob_path: Mapped[str] = mapped_column(String(255), nullable=False)  # Relativa al storage de documentos
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    released_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Cuándo quedó sin referencias
+
+
 class Document(Base):
     """
     Documento digital - Núcleo ligero
@@ -25,6 +44,7 @@ class Document(Base):
     file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)  # Bytes
     mime_type: Mapped[str] = mapped_column(String(100), nullable=False)
     file_hash: Mapped[str] = mapped_column(String(64), nullable=False, index=True)  # SHA-256
+    blob_id: Mapped[int | None] = mapped_column(ForeignKey("stored_blobs.id"), nullable=True, index=True)  # None: archivo propio (anterior al blob store)
     
     # Metadatos básicos
     document_type: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
@@ -50,6 +70,14 @@ class Document(Base):
     duplicate_of: Mapped[int | None] = mapped_column(ForeignKey("documents.id", ondelete="SET NULL"), nullable=True)  # Si es duplicado, referencia al original
     is_duplicate: Mapped[bool] = mapped_column(Boolean, default=False, index=True)  # Flag rápido para filtrar
     
+    # Procesamiento en segundo plano (resumen de sus DocumentProcessingJob)
+    processing_status: Mapped[str | None] = mapped_column(String(20), nullable=True)  # PENDING, PROCESSING, COMPLETED, FAILED (None = sin procesar)
+    processing_progress: Mapped[int] = mapped_column(Integer, default=0)  # 0-100: trabajos terminados sobre el total
+    processing_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    # Búsqueda full-text: título, descripción, archivo, OCR y RUC/serie/número extraídos (ver document_search.py)
+    search_text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
     # Auditoría
     uploaded_by: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, index=True)
@@ -66,6 +94,33 @@ class Document(Base):
     # Relaciones a tablas separadas (lazy loading)
     extracted_data_rel = relationship("DocumentExtractedData", back_populates="document", uselist=False, cascade="all, delete-orphan")
     ocr_data_rel = relationship("DocumentOCRData", back_populates="document", uselist=False, cascade="all, delete-orphan")
+    processing_jobs = relationship("DocumentProcessingJob", back_populates="document", cascade="all, delete-orphan")
+
+
+# Índice full-text de search_text, según el motor (la migración 20250222_01 crea lo mismo):
+# - PostgreSQL: columna generada tsvector con índice GIN
+# - SQLite: tabla FTS5 de contenido externo, sincronizada por triggers
+DOCUMENT_SEARCH_DDL = {
+    "postgresql": (
+        "ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('spanish', coalesce(search_text, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_documents_search_vector ON documents USING GIN (search_vector)",
+    ),
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+        "search_text, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS documents_fts_ai AFTER INSERT ON documents BEGIN "
+        "INSERT INTO documents_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+        "CREATE TRIGGER IF NOT EXISTS documents_fts_ad AFTER DELETE ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+        "CREATE TRIGGER IF NOT EXISTS documents_fts_au AFTER UPDATE OF search_text ON documents BEGIN "
+        "INSERT INTO documents_fts(documents_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+        "INSERT INTO documents_fts(rowid, search_text) VALUES (new.id, new.search_text); END",
+    ),
+}
+for _dialect, _sentencias in DOCUMENT_SEARCH_DDL.items():
+    for _sentencia in _sentencias:
+        event.listen(Document.__table__, "after_create", DDL(_sentencia).execute_if(dialect=_dialect))
 
 
 class DocumentExtractedData(Base):
@@ -113,6 +168,41 @@ class DocumentOCRData(Base):
     document = relationship("Document", back_populates="ocr_data_rel")
 
 
+class DocumentProcessingJob(Base):
+    """
+    Trabajo de extracción u OCR en cola, ejecutado por el worker de documentos.
+    
+    La cola vive en la BD: un reinicio no pierde trabajos (los PROCESSING con
+    reserva vencida se retoman). priority menor se atiende primero (XML antes
+    que OCR); next_run_at aplica el backoff entre reintentos.
+    """
+    __tablename__ = "document_processing_jobs"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    job_type: Mapped[str] = mapped_column(String(20), nullable=False)  # EXTRACTION, OCR
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    
+    status: Mapped[str] = mapped_column(String(20), default="PENDING", nullable=False)  # PENDING, PROCESSING, COMPLETED, FAILED
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+    next_run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Reserva del worker que lo ejecuta
+    worker_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    
+    document = relationship("Document", back_populates="processing_jobs")
+    
+    __table_args__ = (
+        Index('idx_document_job_status_priority', 'status', 'priority', 'next_run_at'),
+    )
+
+
 class DocumentTag(Base):
     """Tags/Etiquetas para documentos"""
     __tablename__ = "document_tags"
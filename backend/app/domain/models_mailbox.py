@@ -6,7 +6,7 @@ Buzón oficial por empresa, no editable por la empresa.
 """
 from datetime import datetime
 from typing import Any, Dict, Optional
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Date, DateTime, Text, Index
 from sqlalchemy import JSON
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from ..db import Base
@@ -52,6 +52,16 @@ class MailboxMessage(Base):
     attachments = relationship("MailboxAttachment", back_populates="message", cascade="all, delete-orphan")
     responses = relationship("MailboxResponse", back_populates="message", cascade="all, delete-orphan")
 
+    # Listado por keyset (created_at, id), con y sin filtros; due_date para el barrido de vencidos
+    __table_args__ = (
+        Index('idx_mailbox_msg_mailbox_created', 'mailbox_id', 'created_at', 'id'),
+        Index('idx_mailbox_msg_mailbox_read', 'mailbox_id', 'is_read', 'created_at', 'id'),
+        Index('idx_mailbox_msg_mailbox_priority', 'mailbox_id', 'priority', 'created_at', 'id'),
+        Index('idx_mailbox_msg_mailbox_status', 'mailbox_id', 'message_status', 'created_at', 'id'),
+        Index('idx_mailbox_msg_created', 'created_at', 'id'),
+        Index('idx_mailbox_msg_due_date', 'due_date'),
+    )
+
 
 class MailboxAttachment(Base):
     """Adjunto de un mensaje. Hash SHA256, inmutable, no reemplazable."""
@@ -63,6 +73,7 @@ class MailboxAttachment(Base):
     file_type: Mapped[str] = mapped_column(String(100))
     file_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)  # SHA256
     file_size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    blob_id: Mapped[int | None] = mapped_column(ForeignKey("stored_blobs.id"), nullable=True)  # None: archivo en MAILBOX_UPLOAD_DIR
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
     message = relationship("MailboxMessage", back_populates="attachments")
@@ -93,6 +104,7 @@ class MailboxResponseAttachment(Base):
     file_type: Mapped[str] = mapped_column(String(100))
     file_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     file_size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    blob_id: Mapped[int | None] = mapped_column(ForeignKey("stored_blobs.id"), nullable=True)  # None: archivo en MAILBOX_UPLOAD_DIR
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
     response = relationship("MailboxResponse", back_populates="attachments")
@@ -118,6 +130,11 @@ class CompanyToAdminMessage(Base):
     creator = relationship("User", foreign_keys=[created_by])
     attachments = relationship("CompanyToAdminAttachment", back_populates="message", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('idx_company_admin_msg_company_created', 'company_id', 'created_at', 'id'),
+        Index('idx_company_admin_msg_read_created', 'is_read', 'created_at', 'id'),
+    )
+
 
 class MailboxAuditLog(Base):
     """Auditoría de acciones en la casilla electrónica. Inmutable, nada se borra."""
@@ -142,6 +159,7 @@ class CompanyToAdminAttachment(Base):
     file_type: Mapped[str] = mapped_column(String(100))
     file_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     file_size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    blob_id: Mapped[int | None] = mapped_column(ForeignKey("stored_blobs.id"), nullable=True)  # None: archivo en MAILBOX_UPLOAD_DIR
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
     message = relationship("CompanyToAdminMessage", back_populates="attachments")
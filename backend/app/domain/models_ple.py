@@ -0,0 +1,31 @@
+"""
+Modelos de soporte para el Programa de Libros Electrónicos (PLE)
+================================================================
+Versión del libro contable por empresa/período: se incrementa en cada
+posteo, anulación o edición de comprobantes del período y sirve como
+clave de la caché de archivos PLE generados.
+"""
+from datetime import datetime
+from sqlalchemy import Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from ..db import Base
+
+
+class PleLedgerVersion(Base):
+    """
+    Contador de versión de los datos que alimentan los libros PLE.
+
+    month = 0 representa los datos maestros de la empresa (plan de cuentas,
+    terceros) que afectan a todos los períodos.
+    """
+    __tablename__ = "ple_ledger_versions"
+    __table_args__ = (
+        UniqueConstraint("company_id", "year", "month", name="uq_ple_ledger_version_period"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), index=True)
+    year: Mapped[int] = mapped_column(Integer)
+    month: Mapped[int] = mapped_column(Integer)  # 1-12; 0 = datos maestros
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
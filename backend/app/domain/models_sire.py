@@ -5,7 +5,7 @@ Modelos de datos para SIRE (Sistema Integrado de Registros Electrónicos)
 Gestiona las propuestas de ventas (RVIE) y compras (RCE) que SUNAT genera automáticamente.
 """
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Date, ForeignKey, DateTime, Text, Enum, JSON, Boolean, UniqueConstraint, Index
+from sqlalchemy import Integer, String, Date, ForeignKey, DateTime, Text, Enum, JSON, Boolean, UniqueConstraint, Index, Numeric
 from datetime import datetime
 from typing import Dict, Any
 from .models import Base
@@ -31,6 +31,21 @@ class SireSyncStatus(str, enum.Enum):
     ERROR = "ERROR"
     PARTIAL = "PARTIAL"  # Algunos registros fallaron
 
+class SireReconciliationItemStatus(str, enum.Enum):
+    """Resultado de conciliar un comprobante de la propuesta SIRE con los libros"""
+    MISSING_IN_BOOKS = "MISSING_IN_BOOKS"  # En la propuesta SUNAT, no registrado en el sistema
+    EXTRA_IN_BOOKS = "EXTRA_IN_BOOKS"  # Registrado en el sistema, no está en la propuesta
+    AMOUNT_MISMATCH = "AMOUNT_MISMATCH"  # Base, IGV o total distintos
+    DATE_MISMATCH = "DATE_MISMATCH"  # Montos iguales, fecha de emisión distinta
+
+class SireTicketStatus(str, enum.Enum):
+    """Estado de un ticket de operación asíncrona en SUNAT (reemplazo, carga de preliminar)"""
+    PENDING = "PENDING"        # Registrado, aún sin consultar
+    PROCESSING = "PROCESSING"  # SUNAT lo está procesando
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    EXPIRED = "EXPIRED"        # Se dejó de consultar (antigüedad máxima)
+
 class SireRVIEProposal(Base):
     """
     Propuesta de Registro de Ventas e Ingresos Electrónico (RVIE) desde SUNAT
@@ -165,6 +180,140 @@ class SireSyncLog(Base):
         Index('idx_sire_sync_company_type_date', 'company_id', 'sync_type', 'sync_date'),
     )
 
+class SireProposalDetail(Base):
+    """
+    Comprobante individual de una propuesta SIRE (RVIE o RCE) descargada.
+    
+    Se carga en bloque desde el archivo de la propuesta (TXT/ZIP/JSON) con el
+    parser incremental; cada recarga de un período reemplaza sus filas.
+    """
+    __tablename__ = "sire_proposal_details"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), nullable=False)
+    proposal_type: Mapped[SireProposalType] = mapped_column(Enum(SireProposalType), nullable=False)
+    period: Mapped[str] = mapped_column(String(6), nullable=False)  # YYYYMM
+    line_no: Mapped[int] = mapped_column(Integer, nullable=False)  # Posición en el archivo
+    
+    # Comprobante
+    car_sunat: Mapped[str | None] = mapped_column(String(40), nullable=True)  # Código de Anotación de Registro
+    doc_type: Mapped[str | None] = mapped_column(String(2), nullable=True)
+    series: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    number: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    issue_date: Mapped[Date | None] = mapped_column(Date, nullable=True)
+    
+    # Cliente (RVIE) o proveedor (RCE)
+    counterparty_doc_type: Mapped[str | None] = mapped_column(String(2), nullable=True)
+    counterparty_tax_id: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    counterparty_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    
+    # Montos
+    base_amount: Mapped[Numeric] = mapped_column(Numeric(14, 2), default=0)
+    igv_amount: Mapped[Numeric] = mapped_column(Numeric(14, 2), default=0)
+    total_amount: Mapped[Numeric] = mapped_column(Numeric(14, 2), default=0)
+    currency: Mapped[str] = mapped_column(String(3), default="PEN")
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_sire_detail_company_type_period', 'company_id', 'proposal_type', 'period'),
+        Index('idx_sire_detail_document', 'company_id', 'proposal_type', 'doc_type', 'series', 'number'),
+    )
+
+class SireReconciliationRun(Base):
+    """
+    Ejecución de la conciliación propuesta SIRE vs. libros (ventas o compras) de un período.
+    
+    Guarda los totales por clasificación; las diferencias se guardan en
+    SireReconciliationItem (los comprobantes conciliados solo se cuentan).
+    """
+    __tablename__ = "sire_reconciliation_runs"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), nullable=False)
+    proposal_type: Mapped[SireProposalType] = mapped_column(Enum(SireProposalType), nullable=False)
+    period: Mapped[str] = mapped_column(String(6), nullable=False)  # YYYYMM
+    
+    sunat_count: Mapped[int] = mapped_column(Integer, default=0)
+    books_count: Mapped[int] = mapped_column(Integer, default=0)
+    matched_count: Mapped[int] = mapped_column(Integer, default=0)
+    missing_in_books_count: Mapped[int] = mapped_column(Integer, default=0)
+    extra_in_books_count: Mapped[int] = mapped_column(Integer, default=0)
+    amount_mismatch_count: Mapped[int] = mapped_column(Integer, default=0)
+    date_mismatch_count: Mapped[int] = mapped_column(Integer, default=0)
+    duration_ms: Mapped[int] = mapped_column(Integer, default=0)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    created_by: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+    
+    __table_args__ = (
+        Index('idx_sire_recon_run_company_type_period', 'company_id', 'proposal_type', 'period'),
+    )
+
+class SireReconciliationItem(Base):
+    """Diferencia encontrada en una conciliación SIRE"""
+    __tablename__ = "sire_reconciliation_items"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("sire_reconciliation_runs.id", ondelete="CASCADE"), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # SireReconciliationItemStatus
+    mismatch_fields: Mapped[str | None] = mapped_column(String(100), nullable=True)  # ej: "igv_amount,issue_date"
+    
+    # Clave del comprobante (normalizada)
+    counterparty_tax_id: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    doc_type: Mapped[str | None] = mapped_column(String(2), nullable=True)
+    series: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    number: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    
+    # Lado SUNAT (sire_proposal_details) y lado libros (sales / purchases)
+    sunat_detail_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    book_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    sunat_issue_date: Mapped[Date | None] = mapped_column(Date, nullable=True)
+    book_issue_date: Mapped[Date | None] = mapped_column(Date, nullable=True)
+    sunat_base_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    sunat_igv_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    sunat_total_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    book_base_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    book_igv_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    book_total_amount: Mapped[Numeric | None] = mapped_column(Numeric(14, 2), nullable=True)
+    
+    __table_args__ = (
+        Index('idx_sire_recon_item_run_status', 'run_id', 'status', 'id'),
+    )
+
+class SireTicket(Base):
+    """
+    Ticket devuelto por SUNAT en operaciones asíncronas, consultado en segundo plano.
+    
+    next_poll_at guarda cuándo toca la próxima consulta: el poller retoma los
+    tickets pendientes tras un reinicio sin estado en memoria.
+    """
+    __tablename__ = "sire_tickets"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), nullable=False)
+    ticket_number: Mapped[str] = mapped_column(String(50), nullable=False)
+    operation: Mapped[str] = mapped_column(String(30), nullable=False)  # ej: "REPLACE", "PRELIMINARY_UPLOAD"
+    proposal_type: Mapped[SireProposalType | None] = mapped_column(Enum(SireProposalType), nullable=True)
+    period: Mapped[str | None] = mapped_column(String(6), nullable=True)  # YYYYMM
+    
+    status: Mapped[str] = mapped_column(String(20), default=SireTicketStatus.PENDING.value, nullable=False)  # SireTicketStatus
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_poll_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    last_polled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_response: Mapped[Dict[str, Any] | None] = mapped_column(JSON, nullable=True)  # Última respuesta de SUNAT
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+    created_by: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint('company_id', 'ticket_number', name='uq_sire_ticket_company_number'),
+        Index('idx_sire_ticket_status_next_poll', 'status', 'next_poll_at'),
+    )
+
 class SireConfiguration(Base):
     """
     Configuración de SIRE por empresa
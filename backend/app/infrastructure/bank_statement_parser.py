@@ -0,0 +1,438 @@
+"""
+Parser de extractos bancarios
+=============================
+
+Lee los extractos que exportan los bancos sin cargarlos completos en memoria:
+
+- CSV/TXT delimitado (BCP, BBVA, Interbank, Scotiabank, BanBif...): se
+  detectan codificación, separador y fila de cabecera; las columnas se
+  reconocen por nombre
+- XLSX: openpyxl en modo read_only, fila por fila
+- MT940 (SWIFT): campos :61: y :86:, saldos :60F: y :62F:
+- OFX/QFX (SGML o XML): bloques <STMTTRN>
+
+Cada movimiento sale como dict con transaction_date, description, reference,
+debit, credit y balance (Decimal; cargo y abono siempre positivos, balance
+None si el formato no lo trae).
+"""
+import csv
+import io
+import re
+import unicodedata
+from functools import lru_cache
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Sequence
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+FORMAT_CSV = "CSV"
+FORMAT_XLSX = "XLSX"
+FORMAT_MT940 = "MT940"
+FORMAT_OFX = "OFX"
+
+# Nombres de columna por campo (normalizados: minúsculas, sin tildes ni signos).
+# Una cabecera coincide si es igual al alias o empieza por "alias " (p. ej.
+# "cargo s" o "importe usd"); gana la primera columna que coincide.
+_ALIAS_COLUMNAS = {
+    "transaction_date": (
+        "fecha", "fecha operacion", "fecha de operacion", "f operacion", "fec operacion",
+        "fecha proceso", "fecha transaccion", "fecha movimiento", "fecha mov",
+    ),
+    "description": (
+        "descripcion", "descripcion operacion", "descripcion de la operacion", "concepto",
+        "detalle", "glosa", "movimiento", "operacion",
+    ),
+    "reference": (
+        "referencia", "nro operacion", "n operacion", "no operacion", "num operacion",
+        "numero de operacion", "numero operacion", "operacion numero", "nro doc", "n doc",
+        "documento", "nro documento", "numero de documento", "cheque",
+    ),
+    "debit": ("cargo", "cargos", "debe", "debito", "retiro", "retiros", "egreso", "egresos"),
+    "credit": ("abono", "abonos", "haber", "credito", "deposito", "depositos", "ingreso", "ingresos"),
+    "amount": ("monto", "importe", "valor", "monto total"),
+    "balance": ("saldo", "saldo contable", "saldo disponible", "saldo final"),
+}
+
+_MESES = {
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6, "jul": 7, "ago": 8,
+    "set": 9, "sep": 9, "oct": 10, "nov": 11, "dic": 12,
+    "jan": 1, "apr": 4, "aug": 8, "dec": 12,
+}
+_FORMATOS_FECHA = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%Y/%m/%d", "%Y%m%d")
+_FECHA_MES_TEXTO = re.compile(r"^(\d{1,2})[-/ ]([a-z]{3})[a-z]*[-/ ](\d{2,4})$")
+_MONTO_SIMPLE = re.compile(r"^-?\d+(\.\d+)?$")
+_MILES_COMA = re.compile(r"^\d{1,3}(,\d{3})+(\.\d+)?$")
+_MILES_PUNTO = re.compile(r"^\d{1,3}(\.\d{3}){2,}(,\d+)?$")
+_FILAS_BUSQUEDA_CABECERA = 40
+
+
+def _normalizar_texto(valor: Any) -> str:
+    texto = unicodedata.normalize("NFKD", str(valor or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", texto.lower()).split())
+
+
+def parse_amount(value: Any) -> Optional[Decimal]:
+    """
+    Convierte un monto de extracto a Decimal.
+
+    Acepta símbolos de moneda (S/, US$), separadores de miles con coma o punto,
+    coma decimal, signo negativo al inicio o al final y paréntesis contables.
+
+    Returns:
+        Decimal con signo, o None si la celda está vacía o no es un monto
+    """
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    texto = str(value).strip().replace("\xa0", "").replace(" ", "")
+    if _MONTO_SIMPLE.match(texto):
+        return Decimal(texto)
+    if not texto or texto in ("-", "--"):
+        return None
+    negativo = False
+    if texto.startswith("(") and texto.endswith(")"):
+        negativo, texto = True, texto[1:-1]
+    for simbolo in ("US$", "USD", "PEN", "S/.", "S/", "$"):
+        texto = texto.replace(simbolo, "")
+    if texto.endswith("-"):
+        negativo, texto = True, texto[:-1]
+    if texto.startswith("-"):
+        negativo, texto = not negativo, texto[1:]
+    texto = texto.lstrip("+")
+
+    if "," in texto and "." in texto:
+        # El último separador es el decimal
+        if texto.rfind(",") > texto.rfind("."):
+            texto = texto.replace(".", "").replace(",", ".")
+        else:
+            texto = texto.replace(",", "")
+    elif "," in texto:
+        texto = texto.replace(",", "") if _MILES_COMA.match(texto) else texto.replace(",", ".")
+    elif _MILES_PUNTO.match(texto):
+        texto = texto.replace(".", "")
+    try:
+        monto = Decimal(texto)
+    except InvalidOperation:
+        return None
+    return -monto if negativo else monto
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Convierte una fecha de extracto (dd/mm/aaaa, aaaa-mm-dd, 05-ENE-2025, celda Excel...) a date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return _fecha_texto(str(value).strip())
+
+
+@lru_cache(maxsize=4096)
+def _fecha_texto(texto: str) -> Optional[date]:
+    # Un extracto repite pocas fechas distintas: se cachea el parseo
+    if not texto:
+        return None
+    texto = re.sub(r"[ T]\d{1,2}:\d{2}.*$", "", texto)
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    m = _FECHA_MES_TEXTO.match(texto.lower())
+    if m and m.group(2) in _MESES:
+        anio = int(m.group(3))
+        try:
+            return date(anio + 2000 if anio < 100 else anio, _MESES[m.group(2)], int(m.group(1)))
+        except ValueError:
+            return None
+    return None
+
+
+def detect_statement_format(filename: str, head: bytes) -> str:
+    """
+    Detecta el formato por el contenido inicial y, si no es concluyente, por la extensión.
+
+    Raises:
+        ValueError: si es un XLS binario (no soportado)
+    """
+    nombre = (filename or "").lower()
+    if head.startswith(b"PK"):
+        return FORMAT_XLSX
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        raise ValueError("Formato XLS no soportado: guarde el archivo como XLSX o CSV")
+    texto = head.removeprefix(b"\xef\xbb\xbf").decode("latin-1").lstrip("\r\n\t ").upper()
+    if texto.startswith("OFXHEADER") or "<OFX>" in texto or nombre.endswith((".ofx", ".qfx")):
+        return FORMAT_OFX
+    if re.search(r"^(\{1:|:20:)", texto) or re.search(r"\n:(20|25|60F):", texto) or nombre.endswith((".sta", ".mt940")):
+        return FORMAT_MT940
+    return FORMAT_CSV
+
+
+class BankStatementReader:
+    """
+    Recorre los movimientos de un extracto en streaming.
+
+    Los saldos y la fecha del extracto, si el formato los trae (MT940, OFX),
+    quedan en opening_balance, closing_balance y statement_date al terminar
+    de iterar; skipped_rows cuenta las filas sin fecha o sin monto (totales,
+    líneas de pie, etc.).
+    """
+
+    def __init__(self, stream: IO[bytes], filename: str = "", fmt: Optional[str] = None):
+        self.stream = stream
+        self.filename = filename
+        if fmt is None:
+            head = stream.read(4096)
+            stream.seek(0)
+            fmt = detect_statement_format(filename, head)
+        self.format = fmt.upper()
+        self.opening_balance: Optional[Decimal] = None
+        self.closing_balance: Optional[Decimal] = None
+        self.statement_date: Optional[date] = None
+        self.skipped_rows = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self.format == FORMAT_XLSX:
+            return self._iter_tabla(self._filas_xlsx())
+        if self.format == FORMAT_MT940:
+            return self._iter_mt940(self._lineas())
+        if self.format == FORMAT_OFX:
+            return self._iter_ofx(self._lineas())
+        if self.format == FORMAT_CSV:
+            return self._iter_tabla(self._filas_csv())
+        raise ValueError(f"Formato de extracto no soportado: {self.format}")
+
+    # ===== LECTURA =====
+
+    def _texto(self) -> IO[str]:
+        muestra = self.stream.read(65536)
+        self.stream.seek(0)
+        try:
+            muestra.decode("utf-8")
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError as e:
+            # Un corte a mitad de un carácter multibyte no invalida UTF-8
+            encoding = "utf-8-sig" if e.start >= len(muestra) - 3 else "cp1252"
+        return io.TextIOWrapper(self.stream, encoding=encoding, errors="replace", newline="")
+
+    def _lineas(self) -> Iterator[str]:
+        texto = self._texto()
+        try:
+            for linea in texto:
+                yield linea.rstrip("\r\n")
+        finally:
+            texto.detach()  # el stream es del llamador: no cerrarlo
+
+    def _filas_csv(self) -> Iterator[Sequence[Any]]:
+        texto = self._texto()
+        muestra = texto.read(16384)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t|")
+            separador = dialecto.delimiter
+        except csv.Error:
+            separador = ";" if muestra.count(";") > muestra.count(",") else ","
+        try:
+            yield from csv.reader(texto, delimiter=separador)
+        finally:
+            texto.detach()
+
+    def _filas_xlsx(self) -> Iterator[Sequence[Any]]:
+        if not OPENPYXL_AVAILABLE:
+            raise ValueError("openpyxl no está instalado. Use: pip install openpyxl")
+        workbook = openpyxl.load_workbook(self.stream, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    # ===== TABLAS (CSV / XLSX) =====
+
+    @staticmethod
+    def _mapear_cabecera(fila: Sequence[Any]) -> Dict[str, int]:
+        columnas: Dict[str, int] = {}
+        for indice, celda in enumerate(fila):
+            nombre = _normalizar_texto(celda)
+            if not nombre:
+                continue
+            for campo, alias in _ALIAS_COLUMNAS.items():
+                if campo in columnas:
+                    continue
+                if any(nombre == a or nombre.startswith(a + " ") for a in alias):
+                    columnas[campo] = indice
+                    break
+        return columnas
+
+    def _iter_tabla(self, filas: Iterable[Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+        columnas: Optional[Dict[str, int]] = None
+        for numero, fila in enumerate(filas):
+            if columnas is None:
+                if numero >= _FILAS_BUSQUEDA_CABECERA:
+                    raise ValueError("No se encontró la fila de cabecera (fecha y monto/cargo/abono)")
+                candidata = self._mapear_cabecera(fila)
+                if "transaction_date" in candidata and (
+                    "amount" in candidata or "debit" in candidata or "credit" in candidata
+                ):
+                    columnas = candidata
+                continue
+
+            def celda(campo):
+                indice = columnas.get(campo)
+                return fila[indice] if indice is not None and indice < len(fila) else None
+
+            fecha = parse_date(celda("transaction_date"))
+            if "amount" in columnas and "debit" not in columnas and "credit" not in columnas:
+                monto = parse_amount(celda("amount"))
+                cargo = -monto if monto is not None and monto < 0 else Decimal("0")
+                abono = monto if monto is not None and monto > 0 else Decimal("0")
+            else:
+                monto = None
+                cargo = abs(parse_amount(celda("debit")) or Decimal("0"))
+                abono = abs(parse_amount(celda("credit")) or Decimal("0"))
+            if fecha is None or (not cargo and not abono and monto is None):
+                self.skipped_rows += 1
+                continue
+            referencia = celda("reference")
+            yield {
+                "transaction_date": fecha,
+                "description": str(celda("description") or "").strip(),
+                "reference": str(referencia).strip() if referencia not in (None, "") else None,
+                "debit": cargo,
+                "credit": abono,
+                "balance": parse_amount(celda("balance")),
+            }
+
+    # ===== MT940 =====
+
+    _MT940_61 = re.compile(
+        r"^(?P<fecha>\d{6})(?P<contable>\d{4})?(?P<marca>R?[CD])[A-Z]?(?P<monto>\d+,\d*)"
+        r"(?P<tipo>[NFS][A-Z0-9]{3})(?P<ref>[^/]*)(?://(?P<ref_banco>.*))?$"
+    )
+    _MT940_SALDO = re.compile(r"^(?P<marca>[CD])(?P<fecha>\d{6})[A-Z]{3}(?P<monto>\d+,\d*)")
+
+    @staticmethod
+    def _fecha_mt940(yymmdd: str) -> date:
+        return date(2000 + int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6]))
+
+    def _iter_mt940(self, lineas: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        campo, valor = None, []
+        pendiente: Optional[Dict[str, Any]] = None
+
+        def cerrar_campo():
+            nonlocal pendiente
+            if campo is None:
+                return None
+            contenido = "\n".join(valor)
+            if campo == "61":
+                emitido, pendiente = pendiente, self._movimiento_mt940(contenido)
+                return emitido
+            if campo == "86" and pendiente is not None:
+                pendiente["description"] = " ".join(p.strip() for p in valor if p.strip())[:500]
+            elif campo in ("60F", "60M", "62F", "62M"):
+                m = self._MT940_SALDO.match(contenido.strip())
+                if m:
+                    saldo = parse_amount(m.group("monto"))
+                    saldo = -saldo if m.group("marca") == "D" else saldo
+                    if campo.startswith("60") and self.opening_balance is None:
+                        self.opening_balance = saldo
+                    elif campo.startswith("62"):
+                        self.closing_balance = saldo
+                        self.statement_date = self._fecha_mt940(m.group("fecha"))
+            return None
+
+        for linea in lineas:
+            m = re.match(r"^:(\d{2}[A-Z]?):(.*)$", linea)
+            if m:
+                emitido = cerrar_campo()
+                if emitido:
+                    yield emitido
+                campo, valor = m.group(1), [m.group(2)]
+            elif linea.startswith("-}") or linea.startswith("{"):
+                emitido = cerrar_campo()
+                if emitido:
+                    yield emitido
+                campo, valor = None, []
+            elif campo is not None:
+                valor.append(linea)
+        emitido = cerrar_campo()
+        if emitido:
+            yield emitido
+        if pendiente is not None:
+            yield pendiente
+
+    def _movimiento_mt940(self, contenido: str) -> Optional[Dict[str, Any]]:
+        primera, _, extra = contenido.partition("\n")
+        m = self._MT940_61.match(primera.strip())
+        if not m:
+            self.skipped_rows += 1
+            return None
+        monto = parse_amount(m.group("monto"))
+        # RC (reverso de abono) resta, RD (reverso de cargo) suma
+        es_cargo = m.group("marca") in ("D", "RC")
+        referencia = (m.group("ref") or "").strip()
+        if not referencia or referencia.upper() == "NONREF":
+            referencia = (m.group("ref_banco") or "").strip()
+        return {
+            "transaction_date": self._fecha_mt940(m.group("fecha")),
+            "description": extra.strip()[:500],
+            "reference": referencia or None,
+            "debit": monto if es_cargo else Decimal("0"),
+            "credit": Decimal("0") if es_cargo else monto,
+            "balance": None,
+        }
+
+    # ===== OFX =====
+
+    _OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<]*)", re.IGNORECASE)
+
+    def _iter_ofx(self, lineas: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        actual: Optional[Dict[str, str]] = None
+        en_saldo = False
+        for linea in lineas:
+            for cierre, etiqueta, texto in self._OFX_TAG.findall(linea):
+                etiqueta, texto = etiqueta.upper(), texto.strip()
+                if etiqueta == "STMTTRN":
+                    if cierre:
+                        movimiento = self._movimiento_ofx(actual or {})
+                        if movimiento:
+                            yield movimiento
+                        actual = None
+                    else:
+                        actual = {}
+                elif etiqueta == "LEDGERBAL":
+                    en_saldo = not cierre
+                elif cierre:
+                    continue
+                elif actual is not None:
+                    actual[etiqueta] = texto
+                elif en_saldo and etiqueta == "BALAMT":
+                    self.closing_balance = parse_amount(texto)
+                elif en_saldo and etiqueta == "DTASOF":
+                    self.statement_date = parse_date(texto[:8])
+                elif etiqueta == "DTEND" and self.statement_date is None:
+                    self.statement_date = parse_date(texto[:8])
+
+    def _movimiento_ofx(self, campos: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        fecha = parse_date(campos.get("DTPOSTED", "")[:8])
+        monto = parse_amount(campos.get("TRNAMT"))
+        if fecha is None or monto is None:
+            self.skipped_rows += 1
+            return None
+        descripcion = " ".join(p for p in (campos.get("NAME"), campos.get("MEMO")) if p)
+        return {
+            "transaction_date": fecha,
+            "description": descripcion[:500],
+            "reference": campos.get("CHECKNUM") or campos.get("REFNUM") or campos.get("FITID") or None,
+            "debit": -monto if monto < 0 else Decimal("0"),
+            "credit": monto if monto > 0 else Decimal("0"),
+            "balance": None,
+        }
@@ -0,0 +1,147 @@
+"""
+Exportación a Excel en streaming
+================================
+
+Escribe libros XLSX con openpyxl en modo write_only:
+
+- Las filas se serializan a medida que se agregan (memoria constante, sin un
+  objeto Cell por celda en el libro)
+- El formato usa estilos con nombre registrados una vez en el libro; las celdas
+  solo referencian el estilo en lugar de llevar su propio Font/PatternFill
+- El archivo se guarda en un temporal que se devuelve con FileResponse y se
+  borra al terminar el envío
+"""
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+    from openpyxl.utils import get_column_letter
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FORMATO_MONTO = "#,##0.00"
+
+# Estilos con nombre disponibles en todo libro exportado
+ESTILO_TITULO = "titulo"
+ESTILO_TITULO_CENTRADO = "titulo_centrado"
+ESTILO_NEGRITA = "negrita"
+ESTILO_ENCABEZADO = "encabezado"
+ESTILO_MONTO = "monto"
+ESTILO_TOTAL = "total"
+ESTILO_TOTAL_MONTO = "total_monto"
+
+
+def _estilos(color_encabezado: str) -> Iterable["NamedStyle"]:
+    relleno_total = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+    yield NamedStyle(name=ESTILO_TITULO, font=Font(bold=True, size=14))
+    yield NamedStyle(name=ESTILO_TITULO_CENTRADO, font=Font(bold=True, size=14), alignment=Alignment(horizontal="center"))
+    yield NamedStyle(name=ESTILO_NEGRITA, font=Font(bold=True, size=11))
+    yield NamedStyle(
+        name=ESTILO_ENCABEZADO,
+        font=Font(bold=True, color="FFFFFF", size=11),
+        fill=PatternFill(start_color=color_encabezado, end_color=color_encabezado, fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center"),
+    )
+    yield NamedStyle(name=ESTILO_MONTO, number_format=FORMATO_MONTO)
+    yield NamedStyle(name=ESTILO_TOTAL, font=Font(bold=True, size=11), fill=relleno_total)
+    yield NamedStyle(name=ESTILO_TOTAL_MONTO, font=Font(bold=True, size=11), fill=relleno_total, number_format=FORMATO_MONTO)
+
+
+class StreamingXlsx:
+    """
+    Libro XLSX de solo escritura con estilos con nombre.
+
+    Uso:
+        xlsx = StreamingXlsx()
+        xlsx.add_sheet("Libro Diario", widths=[12, 12, 50])
+        xlsx.append(["LIBRO DIARIO"], style=ESTILO_TITULO, merge_to=7)
+        xlsx.append([1, "01/01/2025", 100.0], styles={2: ESTILO_MONTO})
+        path = xlsx.save()
+    """
+
+    def __init__(self, header_color: str = "366092"):
+        if not OPENPYXL_AVAILABLE:
+            raise RuntimeError("openpyxl no está instalado. Use: pip install openpyxl")
+        self.workbook = Workbook(write_only=True)
+        for estilo in _estilos(header_color):
+            self.workbook.add_named_style(estilo)
+        self.sheet = None
+        self.row_count = 0
+        self._plantillas: Dict[str, Any] = {}
+
+    def add_sheet(self, title: str, widths: Sequence[float] = ()) -> None:
+        """Crea una hoja y la deja como actual (los anchos van antes de la primera fila)."""
+        self.sheet = self.workbook.create_sheet(title)
+        for i, ancho in enumerate(widths, 1):
+            self.sheet.column_dimensions[get_column_letter(i)].width = ancho
+        self.row_count = 0
+
+    def _celda(self, valor, estilo: str):
+        # Resolver el nombre del estilo una vez y copiar su StyleArray en cada celda
+        plantilla = self._plantillas.get(estilo)
+        if plantilla is None:
+            celda = WriteOnlyCell(self.sheet)
+            celda.style = estilo
+            plantilla = self._plantillas[estilo] = celda._style
+        celda = WriteOnlyCell(self.sheet, value=valor)
+        celda._style = plantilla.__copy__()
+        return celda
+
+    def append(
+        self,
+        values: Sequence[Any] = (),
+        style: Optional[str] = None,
+        styles: Optional[Dict[int, str]] = None,
+        merge_to: Optional[int] = None,
+    ) -> int:
+        """
+        Agrega una fila a la hoja actual.
+
+        Args:
+            values: Valores de la fila
+            style: Estilo con nombre para todas las celdas
+            styles: Estilo por columna (índice desde 0), tiene prioridad sobre style
+            merge_to: Combinar la fila desde la columna A hasta esta columna (desde 1)
+
+        Returns:
+            Número de la fila agregada
+        """
+        if style is None and not styles:
+            self.sheet.append(values)
+        else:
+            styles = styles or {}
+            fila = []
+            for i, valor in enumerate(values):
+                estilo = styles.get(i, style)
+                fila.append(valor if estilo is None else self._celda(valor, estilo))
+            self.sheet.append(fila)
+        self.row_count += 1
+        if merge_to:
+            self.sheet.merged_cells.add(f"A{self.row_count}:{get_column_letter(merge_to)}{self.row_count}")
+        return self.row_count
+
+    def save(self, prefix: str = "export_") -> str:
+        """Guarda el libro en un archivo temporal y devuelve su ruta."""
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=".xlsx")
+        os.close(fd)
+        try:
+            self.workbook.save(path)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
+
+
+def xlsx_file_response(path: str, filename: str) -> FileResponse:
+    """FileResponse de un XLSX temporal que se elimina al terminar el envío."""
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=filename, background=BackgroundTask(os.unlink, path))
@@ -1,9 +1,29 @@
 """
 Servicio de OCR (Optical Character Recognition)
 Opcional - Solo se usa cuando se solicita explícitamente
+
+Procesamiento por página:
+- Las páginas cuya capa de texto extrae pdfplumber no pasan por OCR
+- El resto se rasteriza página a página a archivos temporales (DPI y escala
+  de grises configurables) y se reconoce en un pool de procesos compartido
+  por todo el proceso (ocr_max_workers), no uno por documento
+- Cada página se cachea en disco por (file_hash, página) apenas termina:
+  reprocesar un documento, aunque el intento anterior haya fallado a mitad,
+  solo reconoce las páginas que faltan
 """
-from typing import Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+import hashlib
 import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from ..config import settings
 
 try:
     import pytesseract
@@ -13,97 +33,288 @@ try:
 except ImportError:
     TESSERACT_AVAILABLE = False
 
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+
+
+def _init_proceso():
+    # Tesseract usa OpenMP: con un proceso por página, un hilo por proceso rinde más
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+# ===== POOL DE PROCESOS COMPARTIDO =====
+# Se crea al primer uso y lo comparten todos los documentos (y los hilos del
+# worker de documentos): el arranque de los procesos spawn se paga una vez y el
+# total de procesos de OCR no pasa de ocr_max_workers.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_workers() -> int:
+    return settings.ocr_max_workers or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn: el worker de documentos usa hilos y fork no es seguro con ellos
+            _POOL = ProcessPoolExecutor(
+                max_workers=_pool_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_proceso,
+            )
+        return _POOL
+
+
+def _descartar_pool(pool: ProcessPoolExecutor) -> None:
+    """Olvida un pool roto (un proceso murió); el siguiente uso crea otro."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_ocr_pool() -> None:
+    """Cierra el pool compartido (apagado del worker)."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _ocr_pagina(pdf_path: str, page: int, dpi: int, grayscale: bool, language: str, tmp_dir: str) -> Dict[str, Any]:
+    """
+    Rasteriza una página a un archivo temporal y ejecuta Tesseract sobre ella.
+
+    Corre dentro del pool de procesos: recibe rutas, no bytes ni imágenes.
+    """
+    rutas = pdf2image.convert_from_path(
+        pdf_path, dpi=dpi, grayscale=grayscale, first_page=page, last_page=page,
+        output_folder=tmp_dir, fmt="png", paths_only=True
+    )
+    if not rutas:
+        return {"page": page, "text": "", "confidence": None}
+    try:
+        with Image.open(rutas[0]) as image:
+            ocr_data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+    finally:
+        os.unlink(rutas[0])
+
+    text_parts = []
+    confidences = []
+    for i, word in enumerate(ocr_data['text']):
+        if word.strip():
+            text_parts.append(word)
+            conf = float(ocr_data.get('conf', [0])[i])
+            if conf > 0:  # Ignorar confianza 0 (probablemente espacios)
+                confidences.append(conf)
+    return {
+        "page": page,
+        "text": ' '.join(text_parts),
+        "confidence": round(sum(confidences) / len(confidences), 2) if confidences else None,
+    }
+
+
+class OCRPageCache:
+    """
+    Cache en disco del OCR por página: {base}/{hash[:2]}/{hash}/{página}-{perfil}.json
+
+    El perfil (idioma, DPI, escala de grises) es parte de la clave: cambiar la
+    configuración no reutiliza resultados obtenidos con otra.
+    """
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+
+    def _ruta(self, file_hash: str, page: int, perfil: str) -> Path:
+        return self.base_dir / file_hash[:2] / file_hash / f"{page}-{perfil}.json"
+
+    def get(self, file_hash: str, page: int, perfil: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._ruta(file_hash, page, perfil), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, file_hash: str, page: int, perfil: str, resultado: Dict[str, Any]) -> None:
+        ruta = self._ruta(file_hash, page, perfil)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: otro worker nunca lee un JSON a medias
+        fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        os.replace(tmp, ruta)
+
 
 class OCRService:
     """
     Servicio de OCR usando Tesseract.
-    
+
     ⚠️ OCR es costoso en CPU/RAM. Solo usar cuando sea necesario.
     """
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        dpi: Optional[int] = None,
+        grayscale: Optional[bool] = None,
+        max_workers: Optional[int] = None,
+        cache_dir: Optional[Path] = None,
+    ):
         if not TESSERACT_AVAILABLE:
             raise ImportError(
                 "Tesseract no está disponible. "
                 "Instalar: apt-get install tesseract-ocr (Linux) o brew install tesseract (Mac)"
             )
-    
+        self.dpi = dpi or settings.ocr_dpi
+        self.grayscale = settings.ocr_grayscale if grayscale is None else grayscale
+        self.max_workers = max_workers or settings.ocr_max_workers or os.cpu_count() or 1
+        self.cache = None
+        if settings.ocr_cache_enabled or cache_dir is not None:
+            self.cache = OCRPageCache(cache_dir or settings.uploads_path.parent / "ocr_cache")
+
     def extract_text(
-        self, 
-        content: bytes, 
+        self,
+        content: bytes,
         mime_type: str,
-        language: str = 'spa'  # Español
+        language: str = 'spa',  # Español
+        file_hash: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Extrae texto de un documento usando OCR.
-        
+
         Args:
             content: Contenido del archivo en bytes
             mime_type: Tipo MIME del archivo
             language: Idioma para OCR (default: español)
-        
+            file_hash: SHA-256 del contenido (clave del cache; se calcula si falta)
+
         Returns:
             Dict con:
-            - text: Texto extraído
-            - confidence: Confianza del OCR (0-100)
+            - text: Texto extraído (páginas en orden)
+            - confidence: Confianza del OCR (0-100, promedio de las páginas reconocidas)
+            - pages_processed: Páginas con texto
+            - pages_text_layer / pages_ocr / pages_cached: Origen del texto por página
         """
         if not TESSERACT_AVAILABLE:
             return None
-        
+
         if mime_type != 'application/pdf':
             # Para otros formatos, convertir a imagen primero
             return None
-        
+
         try:
-            # Convertir PDF a imágenes
-            images = pdf2image.convert_from_bytes(content)
-            
-            if not images:
+            capa_texto, total_paginas = self._text_layer(content)
+            if not total_paginas:
                 return None
-            
-            # Extraer texto de todas las páginas
+
+            file_hash = file_hash or hashlib.sha256(content).hexdigest()
+            perfil = f"{language}-{self.dpi}{'g' if self.grayscale else 'c'}"
+            paginas: Dict[int, Dict[str, Any]] = {}
+            cacheadas = 0
+            pendientes = []
+            for page in range(1, total_paginas + 1):
+                if page in capa_texto:
+                    continue
+                cacheado = self.cache.get(file_hash, page, perfil) if self.cache else None
+                if cacheado is not None:
+                    paginas[page] = cacheado
+                    cacheadas += 1
+                else:
+                    pendientes.append(page)
+
+            # Cada página se guarda al terminar: si otra falla, las ya
+            # reconocidas no se repiten en el siguiente intento
+            if pendientes:
+                for resultado in self._ocr_pages(content, pendientes, language):
+                    paginas[resultado["page"]] = resultado
+                    if self.cache:
+                        self.cache.set(file_hash, resultado["page"], perfil, resultado)
+
             all_text = []
-            total_confidence = 0
-            page_count = 0
-            
-            for image in images:
-                # Ejecutar OCR
-                ocr_data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
-                
-                # Extraer texto y confianza
-                text_parts = []
-                confidences = []
-                
-                for i, word in enumerate(ocr_data['text']):
-                    if word.strip():
-                        text_parts.append(word)
-                        conf = ocr_data.get('conf', [0])[i]
-                        if conf > 0:  # Ignorar confianza 0 (probablemente espacios)
-                            confidences.append(float(conf))
-                
-                if text_parts:
-                    all_text.append(' '.join(text_parts))
-                    if confidences:
-                        total_confidence += sum(confidences) / len(confidences)
-                    page_count += 1
-            
+            for page in range(1, total_paginas + 1):
+                texto = capa_texto.get(page) or paginas.get(page, {}).get("text")
+                if texto:
+                    all_text.append(texto)
+
             if not all_text:
                 return None
-            
-            # Calcular confianza promedio
-            avg_confidence = total_confidence / page_count if page_count > 0 else 0
-            
+
+            confidences = [p["confidence"] for p in paginas.values() if p.get("text") and p.get("confidence") is not None]
+            if confidences:
+                avg_confidence = sum(confidences) / len(confidences)
+            else:
+                avg_confidence = 100.0 if capa_texto else 0  # Solo capa de texto: texto exacto
+
             return {
                 'text': '\n\n'.join(all_text),
                 'confidence': round(avg_confidence, 2),
-                'pages_processed': page_count
+                'pages_processed': len(all_text),
+                'pages_text_layer': len(capa_texto),
+                'pages_ocr': len(pendientes),
+                'pages_cached': cacheadas
             }
-        
+
         except Exception as e:
             print(f"Error en OCR: {e}")
             return None
-    
+
+    def _text_layer(self, content: bytes) -> tuple[Dict[int, str], int]:
+        """Texto de las páginas con capa de texto suficiente y el total de páginas"""
+        if not PDFPLUMBER_AVAILABLE:
+            return {}, int(pdf2image.pdfinfo_from_bytes(content).get("Pages", 0))
+        textos = {}
+        with pdfplumber.open(io.BytesIO(content)) as pdf:
+            for page_number, page in enumerate(pdf.pages, 1):
+                texto = (page.extract_text() or "").strip()
+                if len(texto) >= settings.ocr_text_layer_min_chars:
+                    textos[page_number] = texto
+                page.flush_cache()
+            return textos, len(pdf.pages)
+
+    def _ocr_pages(self, content: bytes, pages: List[int], language: str) -> Iterator[Dict[str, Any]]:
+        """
+        Reconoce las páginas indicadas y entrega cada una al terminar (en el
+        pool compartido si hay más de una y más de un worker).
+
+        Si una página falla, las demás siguen y se entregan; el error se
+        relanza al final.
+        """
+        with tempfile.TemporaryDirectory(prefix="ocr_") as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, "documento.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(content)
+            args = [(pdf_path, page, self.dpi, self.grayscale, language, tmp_dir) for page in pages]
+            if min(self.max_workers, len(pages)) <= 1:
+                for a in args:
+                    yield _ocr_pagina(*a)
+                return
+            pool = _get_pool()
+            futuros = [pool.submit(_ocr_pagina, *a) for a in args]
+            error = None
+            try:
+                for futuro in as_completed(futuros):
+                    try:
+                        resultado = futuro.result()
+                    except BrokenProcessPool:
+                        _descartar_pool(pool)
+                        raise
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    yield resultado
+            finally:
+                # Corte anticipado: no dejar páginas en cola sobre un temporal ya borrado
+                for futuro in futuros:
+                    futuro.cancel()
+            if error is not None:
+                raise error
+
     def is_available(self) -> bool:
         """Verifica si OCR está disponible"""
         return TESSERACT_AVAILABLE
-
@@ -0,0 +1,111 @@
+"""
+Miniaturas y vistas previas de documentos
+=========================================
+
+La primera página de un PDF se renderiza una sola vez (en la cola de
+documentos) y se guarda junto al blob, por hash y ancho:
+
+    renditions/{hash[0:2]}/{hash[2:4]}/{hash}/{ancho}.jpg
+
+Como el contenido es direccionado por hash, una rendición nunca cambia: se
+sirve con ETag y Cache-Control immutable, y los duplicados la comparten. El
+render usa pdfplumber (pypdfium2), sin poppler.
+"""
+import io
+from pathlib import Path
+from typing import Dict, Optional
+
+from .storage import FileStorageService
+
+try:
+    import pdfplumber
+    from PIL import Image
+    RENDER_AVAILABLE = True
+except ImportError:
+    RENDER_AVAILABLE = False
+
+# Ancho máximo en píxeles de cada rendición
+RENDITION_SIZES = {"thumbnail": 256, "preview": 1200}
+RENDITION_MIME_TYPES = ("application/pdf",)
+RENDITION_MEDIA_TYPE = "image/jpeg"
+JPEG_QUALITY = 80
+
+
+def rendition_path(sha256: str, width: int) -> str:
+    """Ruta relativa (al storage de documentos) de una rendición"""
+    return f"renditions/{sha256[:2]}/{sha256[2:4]}/{sha256}/{width}.jpg"
+
+
+def rendition_etag(sha256: str, width: int) -> str:
+    return f'"{sha256}-{width}"'
+
+
+def missing_renditions(storage: FileStorageService, sha256: str) -> Dict[str, int]:
+    """Rendiciones que aún no existen para un contenido"""
+    return {
+        nombre: ancho for nombre, ancho in RENDITION_SIZES.items()
+        if not storage.exists(rendition_path(sha256, ancho))
+    }
+
+
+def _render_primera_pagina(source: Path, width: int) -> "Image.Image":
+    with pdfplumber.open(source) as pdf:
+        if not pdf.pages:
+            raise ValueError("El PDF no tiene páginas")
+        page = pdf.pages[0]
+        # Resolución para que el ancho renderizado alcance el mayor tamaño pedido
+        resolution = max(36, min(300, 72 * width / float(page.width or width)))
+        return page.to_image(resolution=resolution).original.convert("RGB")
+
+
+def generate_renditions(
+    storage: FileStorageService,
+    source: Path,
+    sha256: str,
+    mime_type: str,
+    sizes: Optional[Dict[str, int]] = None,
+) -> Dict[str, str]:
+    """
+    Genera las rendiciones que falten de un contenido. La página se renderiza
+    una vez al mayor ancho y las demás se reducen desde esa imagen.
+
+    Args:
+        storage: Storage de documentos (el mismo del blob)
+        source: Ruta en disco del archivo original
+        sha256: Hash del contenido
+        mime_type: Tipo del documento (solo RENDITION_MIME_TYPES)
+        sizes: Rendiciones a generar (por defecto las que falten)
+
+    Returns:
+        Rutas guardadas por nombre de rendición
+
+    Raises:
+        ValueError: Si el tipo no admite vista previa o el archivo no es válido
+        RuntimeError: Si pdfplumber/Pillow no están instalados
+    """
+    if mime_type not in RENDITION_MIME_TYPES:
+        raise ValueError(f"Sin vista previa para {mime_type}")
+    if not RENDER_AVAILABLE:
+        raise RuntimeError("pdfplumber/Pillow no instalados: no se pueden generar vistas previas")
+    sizes = missing_renditions(storage, sha256) if sizes is None else sizes
+    if not sizes:
+        return {}
+
+    imagen = _render_primera_pagina(source, max(sizes.values()))
+    guardadas = {}
+    try:
+        for nombre, ancho in sorted(sizes.items(), key=lambda s: -s[1]):
+            copia = imagen.copy()
+            copia.thumbnail((ancho, ancho * 4), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            copia.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+            guardadas[nombre] = storage.save(rendition_path(sha256, ancho), buffer.getvalue())
+    finally:
+        imagen.close()
+    return guardadas
+
+
+def delete_renditions(storage: FileStorageService, sha256: str) -> None:
+    """Elimina las rendiciones de un contenido (al purgar su blob)"""
+    for ancho in RENDITION_SIZES.values():
+        storage.delete(rendition_path(sha256, ancho))
@@ -4,9 +4,13 @@ Autenticación OAuth 2.0 para SIRE SUNAT
 
 Gestiona la autenticación y renovación de tokens OAuth para comunicación con SIRE.
 """
+import asyncio
+import logging
 import os
+import weakref
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Awaitable, Callable, Tuple
 import httpx
 from cryptography.fernet import Fernet
 import base64
@@ -19,11 +23,146 @@ import hashlib
 
 # URL base para servicios SIRE
 # Según manual oficial: https://api-sire.sunat.gob.pe/v1/contribuyente/migeigv/
-SIRE_BASE_URL = "https://api-sire.sunat.gob.pe/v1/contribuyente/migeigv"
+# SIRE_BASE_URL / SIRE_TOKEN_BASE_URL pueden sobrescribirse por entorno (ej. servidor SUNAT simulado local)
+SIRE_BASE_URL = os.getenv("SIRE_BASE_URL", "https://api-sire.sunat.gob.pe/v1/contribuyente/migeigv")
 
 # URL base para autenticación OAuth
 # NOTA: El client_id va en el body de la petición, no en el path de la URL
-SIRE_TOKEN_BASE_URL = "https://api-seguridad.sunat.gob.pe"
+SIRE_TOKEN_BASE_URL = os.getenv("SIRE_TOKEN_BASE_URL", "https://api-seguridad.sunat.gob.pe")
+
+logger = logging.getLogger(__name__)
+
+
+# ===== CACHÉ DE TOKENS (por proceso) =====
+#
+# Un token por (client_id, RUC) compartido por todos los SIREClient del proceso.
+# - Dentro de la ventana de renovación anticipada se sigue usando el token vigente
+#   y se lanza la renovación en segundo plano.
+# - Si el token venció (o está a punto), los llamadores esperan la renovación.
+# - En ambos casos hay una sola petición en vuelo por clave (single-flight).
+
+# Margen mínimo de vigencia para usar un token sin esperar la renovación
+TOKEN_HARD_MARGIN = timedelta(seconds=30)
+
+
+@dataclass
+class CachedToken:
+    access_token: str
+    refresh_token: Optional[str]
+    expires_at: datetime
+
+
+# Función que obtiene un token nuevo a partir del refresh token vigente (o None)
+TokenFetcher = Callable[[Optional[str]], Awaitable[Dict[str, Any]]]
+
+_TOKEN_CACHE: Dict[Tuple[str, str], CachedToken] = {}
+# Renovaciones en vuelo por event loop y (client_id, RUC). Se registra el loop
+# (no su id, que un loop nuevo puede reutilizar); las de loops cerrados se
+# descartan al registrar otro loop.
+_TOKEN_INFLIGHT: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], asyncio.Task[CachedToken]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def token_cache_key(client_id: Optional[str], ruc: Optional[str]) -> Tuple[str, str]:
+    return (client_id or "").strip(), (ruc or "").strip()
+
+
+def seed_token_cache(
+    client_id: Optional[str],
+    ruc: Optional[str],
+    access_token: Optional[str],
+    refresh_token: Optional[str],
+    expires_at: Optional[datetime]
+) -> None:
+    """
+    Registra un token conocido (ej. el guardado en SireConfiguration) si es
+    vigente y más reciente que el de la caché.
+    """
+    if not access_token or not expires_at:
+        return
+    if datetime.now() + TOKEN_HARD_MARGIN >= expires_at:
+        return
+    key = token_cache_key(client_id, ruc)
+    actual = _TOKEN_CACHE.get(key)
+    if actual is None or actual.expires_at < expires_at:
+        _TOKEN_CACHE[key] = CachedToken(access_token, refresh_token, expires_at)
+
+
+def invalidate_token_cache(client_id: Optional[str], ruc: Optional[str]) -> None:
+    """Descarta el token en caché (ej. al cambiar credenciales o tras un 401)."""
+    _TOKEN_CACHE.pop(token_cache_key(client_id, ruc), None)
+
+
+async def _renovar(key: Tuple[str, str], fetch: TokenFetcher) -> CachedToken:
+    actual = _TOKEN_CACHE.get(key)
+    token_data = await fetch(actual.refresh_token if actual else None)
+    entry = CachedToken(
+        access_token=token_data["access_token"],
+        refresh_token=token_data.get("refresh_token") or (actual.refresh_token if actual else None),
+        expires_at=datetime.fromisoformat(token_data["expires_at"]),
+    )
+    _TOKEN_CACHE[key] = entry
+    return entry
+
+
+def _renovaciones_del_loop() -> Dict[Tuple[str, str], "asyncio.Task[CachedToken]"]:
+    loop = asyncio.get_running_loop()
+    renovaciones = _TOKEN_INFLIGHT.get(loop)
+    if renovaciones is None:
+        for cerrado in [l for l in list(_TOKEN_INFLIGHT.keys()) if l.is_closed()]:
+            _TOKEN_INFLIGHT.pop(cerrado, None)
+        renovaciones = _TOKEN_INFLIGHT[loop] = {}
+    return renovaciones
+
+
+def _iniciar_renovacion(key: Tuple[str, str], fetch: TokenFetcher) -> "asyncio.Task[CachedToken]":
+    """Devuelve la renovación en vuelo de la clave o lanza una nueva."""
+    renovaciones = _renovaciones_del_loop()
+    task = renovaciones.get(key)
+    if task is not None and not task.done():
+        return task
+
+    task = asyncio.ensure_future(_renovar(key, fetch))
+    renovaciones[key] = task
+
+    def _terminar(t: "asyncio.Task[CachedToken]") -> None:
+        if renovaciones.get(key) is t:
+            del renovaciones[key]
+        if not t.cancelled() and t.exception() is not None:
+            logger.warning("No se pudo renovar el token SIRE (RUC %s): %s", key[1], t.exception())
+
+    task.add_done_callback(_terminar)
+    return task
+
+
+async def get_cached_token(
+    client_id: Optional[str],
+    ruc: Optional[str],
+    fetch: TokenFetcher
+) -> CachedToken:
+    """
+    Obtiene un token vigente para (client_id, RUC) desde la caché del proceso.
+    
+    Args:
+        fetch: Corrutina que solicita el token a SUNAT; recibe el refresh token
+               en caché (o None) y devuelve el dict de SireOAuthClient
+               (access_token, refresh_token, expires_at ISO)
+    
+    Returns:
+        Token en caché (renovado si era necesario)
+    """
+    from ..config import settings
+
+    key = token_cache_key(client_id, ruc)
+    entry = _TOKEN_CACHE.get(key)
+    now = datetime.now()
+    if entry is not None and now + TOKEN_HARD_MARGIN < entry.expires_at:
+        if now + timedelta(seconds=settings.sire_token_refresh_ahead_seconds) >= entry.expires_at:
+            _iniciar_renovacion(key, fetch)
+        return entry
+    # shield: si un llamador se cancela, la renovación sigue para los demás
+    return await asyncio.shield(_iniciar_renovacion(key, fetch))
 
 class SireOAuthClient:
     """
@@ -4,12 +4,67 @@ Cliente API para comunicación con SIRE SUNAT
 
 Gestiona todas las operaciones de comunicación con el API de SIRE.
 """
+import asyncio
+import weakref
 import httpx
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date
-from .sire_auth import SireOAuthClient
+from .sire_auth import SireOAuthClient, get_cached_token, seed_token_cache
+from .sire_resilience import SireCircuitOpenError, send_with_resilience
+from ..config import settings
 from ..domain.models_sire import SireProposalType, SireProposalStatus
 
+
+# ===== CLIENTE HTTP COMPARTIDO (pool de conexiones) =====
+# Un httpx.AsyncClient de larga vida por empresa: reutiliza conexiones keep-alive
+# (HTTP/1.1) y evita un handshake TLS nuevo por cada petición a SUNAT.
+# Un AsyncClient está ligado al event loop que lo creó, por eso se registra por
+# loop (el objeto, no su id: un loop nuevo puede reutilizar el id de uno cerrado).
+# Los clientes de loops ya cerrados se descartan en la siguiente llamada.
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _descartar_loops_cerrados() -> None:
+    """Olvida los clientes de loops cerrados (ya no se pueden cerrar con aclose)."""
+    for loop in [l for l in list(_HTTP_CLIENTS.keys()) if l.is_closed()]:
+        _HTTP_CLIENTS.pop(loop, None)
+
+
+def get_shared_http_client(company_id: int) -> httpx.AsyncClient:
+    """
+    Obtiene (o crea) el cliente HTTP con pool de conexiones de una empresa.
+
+    Debe llamarse desde una corrutina (usa el event loop en ejecución).
+    """
+    loop = asyncio.get_running_loop()
+    clientes = _HTTP_CLIENTS.get(loop)
+    if clientes is None:
+        _descartar_loops_cerrados()
+        clientes = _HTTP_CLIENTS[loop] = {}
+    client = clientes.get(company_id)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.sire_http_max_connections,
+                max_keepalive_connections=settings.sire_http_max_connections,
+                keepalive_expiry=settings.sire_http_keepalive_seconds,
+            ),
+            headers={"Connection": "keep-alive"},
+        )
+        clientes[company_id] = client
+    return client
+
+
+async def close_shared_http_clients() -> None:
+    """Cierra los clientes HTTP compartidos del event loop actual (apagado de la app)."""
+    clientes = _HTTP_CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clientes.values():
+        await client.aclose()
+
+
 class SIREClient:
     """
     Cliente para comunicación con API SIRE de SUNAT
@@ -26,7 +81,8 @@ class SIREClient:
         use_preliminary_mode: bool = True,
         ruc: Optional[str] = None,
         usuario_generador: Optional[str] = None,
-        password_generador: Optional[str] = None
+        password_generador: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None
     ):
         """
         Inicializa el cliente SIRE
@@ -44,8 +100,11 @@ class SIREClient:
             ruc: RUC del contribuyente (requerido según manual SUNAT)
             usuario_generador: Usuario del generador (requerido según manual SUNAT)
             password_generador: Password del generador (requerido según manual SUNAT)
+            http_client: Cliente HTTP a usar (opcional). Por defecto, el cliente
+                         compartido de la empresa con pool de conexiones.
         """
         self.company_id = company_id
+        self._http_client = http_client
         self.oauth_client = SireOAuthClient(use_preliminary_mode=use_preliminary_mode)
         self.base_url = self.oauth_client.base_url
         self.use_preliminary_mode = use_preliminary_mode
@@ -71,6 +130,18 @@ class SIREClient:
         self.refresh_token = refresh_token
         self.token_expires_at = token_expires_at
     
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Cliente HTTP con keep-alive (compartido por empresa salvo que se inyecte uno)."""
+        if self._http_client is not None:
+            return self._http_client
+        return get_shared_http_client(self.company_id)
+    
+    @property
+    def transport_key(self) -> str:
+        """Clave de limitador, circuito y métricas: el RUC (o la empresa si no hay RUC)."""
+        return self.ruc or f"empresa-{self.company_id}"
+    
     async def _ensure_valid_token(self) -> str:
         """
         Asegura que tenemos un token válido, renovándolo si es necesario
@@ -86,40 +157,49 @@ class SIREClient:
             else:
                 expires_at_dt = self.token_expires_at
         
-        if not self.access_token or self.oauth_client.is_token_expired(expires_at_dt):
-            # Renovar token
-            if self.refresh_token:
-                try:
-                    token_data = await self.oauth_client.refresh_access_token(
-                        self.refresh_token,
-                        self.oauth_client_id,
-                        self.oauth_client_secret
-                    )
-                except Exception:
-                    # Si falla refresh, obtener nuevo token con credenciales del generador
-                    token_data = await self.oauth_client.get_access_token(
-                        self.oauth_client_id,
-                        self.oauth_client_secret,
-                        ruc=self.ruc,
-                        usuario_generador=self.usuario_generador,
-                        password_generador=self.password_generador
-                    )
-            else:
-                # Obtener nuevo token con credenciales del generador
-                token_data = await self.oauth_client.get_access_token(
-                    self.oauth_client_id,
-                    self.oauth_client_secret,
-                    ruc=self.ruc,
-                    usuario_generador=self.usuario_generador,
-                    password_generador=self.password_generador
-                )
-            
-            self.access_token = token_data.get("access_token")
-            self.refresh_token = token_data.get("refresh_token") or self.refresh_token
-            self.token_expires_at = datetime.fromisoformat(token_data.get("expires_at"))
+        # Token compartido por proceso para (client_id, RUC): renovación anticipada
+        # y una sola petición a SUNAT aunque haya sincronizaciones en paralelo
+        seed_token_cache(
+            self.oauth_client_id, self.ruc,
+            self.access_token, self.refresh_token, expires_at_dt
+        )
+        entry = await get_cached_token(self.oauth_client_id, self.ruc, self._fetch_token)
+        
+        self.access_token = entry.access_token
+        self.refresh_token = entry.refresh_token
+        self.token_expires_at = entry.expires_at
         
         return self.access_token
     
+    async def _fetch_token(self, refresh_token: Optional[str]) -> Dict[str, Any]:
+        """
+        Solicita un token a SUNAT: con refresh token si existe y, si falla,
+        con las credenciales del generador.
+        """
+        if refresh_token:
+            try:
+                return await self.oauth_client.refresh_access_token(
+                    refresh_token,
+                    self.oauth_client_id,
+                    self.oauth_client_secret
+                )
+            except Exception:
+                pass
+        return await self.oauth_client.get_access_token(
+            self.oauth_client_id,
+            self.oauth_client_secret,
+            ruc=self.ruc,
+            usuario_generador=self.usuario_generador,
+            password_generador=self.password_generador
+        )
+    
+    async def authenticate(self) -> str:
+        """
+        Obtiene o renueva el token antes de lanzar peticiones concurrentes,
+        para que todas compartan el mismo token.
+        """
+        return await self._ensure_valid_token()
+    
     async def _make_request(
         self,
         method: str,
@@ -154,75 +234,78 @@ class SIREClient:
             "Accept": "application/json",
         }
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"Método HTTP no soportado: {method}")
+        client = self.http
+        
+        async def enviar() -> httpx.Response:
+            return await client.request(
+                method, url, headers=headers, params=params,
+                json=data if method in ("POST", "PUT") else None
+            )
+        
+        try:
+            # Reintentos con backoff, límite de ritmo por RUC y circuit breaker
+            response = await send_with_resilience(self.transport_key, method, enviar)
+            
+            # Para errores 500, intentar parsear la respuesta JSON si es posible
+            if response.status_code == 500:
+                try:
+                    error_json = response.json()
+                    # Si hay un JSON con información del error, usarlo
+                    if isinstance(error_json, dict):
+                        error_msg = error_json.get("msg", error_json.get("message", "Error 500 del servidor"))
+                        error_code = error_json.get("cod", error_json.get("code", 500))
+                        raise Exception(f"Error {error_code}: {error_msg}")
+                except:
+                    pass  # Si no se puede parsear como JSON, continuar con el manejo normal
+            
+            response.raise_for_status()
+            
+            # Intentar parsear como JSON
             try:
-                if method == "GET":
-                    response = await client.get(url, headers=headers, params=params)
-                elif method == "POST":
-                    response = await client.post(url, headers=headers, json=data, params=params)
-                elif method == "PUT":
-                    response = await client.put(url, headers=headers, json=data, params=params)
-                elif method == "DELETE":
-                    response = await client.delete(url, headers=headers, params=params)
-                else:
-                    raise ValueError(f"Método HTTP no soportado: {method}")
-                
-                # Para errores 500, intentar parsear la respuesta JSON si es posible
-                if response.status_code == 500:
-                    try:
-                        error_json = response.json()
-                        # Si hay un JSON con información del error, usarlo
-                        if isinstance(error_json, dict):
-                            error_msg = error_json.get("msg", error_json.get("message", "Error 500 del servidor"))
-                            error_code = error_json.get("cod", error_json.get("code", 500))
-                            raise Exception(f"Error {error_code}: {error_msg}")
-                    except:
-                        pass  # Si no se puede parsear como JSON, continuar con el manejo normal
-                
-                response.raise_for_status()
+                return response.json()
+            except:
+                # Si no es JSON, retornar el texto
+                return {"raw_response": response.text}
                 
-                # Intentar parsear como JSON
+        except httpx.HTTPStatusError as e:
+            # Para errores 500, intentar obtener más información
+            if e.response.status_code == 500:
                 try:
-                    return response.json()
+                    error_json = e.response.json()
+                    if isinstance(error_json, dict):
+                        error_msg = error_json.get("msg", error_json.get("message", "Error 500 del servidor"))
+                        error_code = error_json.get("cod", error_json.get("code", 500))
+                        raise Exception(f"Error {error_code}: {error_msg}")
                 except:
-                    # Si no es JSON, retornar el texto
-                    return {"raw_response": response.text}
-                    
-            except httpx.HTTPStatusError as e:
-                # Para errores 500, intentar obtener más información
-                if e.response.status_code == 500:
-                    try:
-                        error_json = e.response.json()
-                        if isinstance(error_json, dict):
-                            error_msg = error_json.get("msg", error_json.get("message", "Error 500 del servidor"))
-                            error_code = error_json.get("cod", error_json.get("code", 500))
-                            raise Exception(f"Error {error_code}: {error_msg}")
-                    except:
-                        pass  # Si no se puede parsear, continuar con el manejo normal
-                
-                error_text = e.response.text[:1000] if e.response.text else "Sin detalles"
-                error_msg = (
-                    f"Error API SIRE {e.response.status_code}:\n"
-                    f"URL: {url}\n"
-                    f"Respuesta: {error_text}\n"
-                    f"Verifica que:\n"
-                    f"1. El endpoint sea correcto según el manual de SUNAT\n"
-                    f"2. Los parámetros sean válidos\n"
-                    f"3. El token tenga los permisos necesarios"
-                )
-                print(f"[SIRE Client] Error: {error_msg}")
-                raise Exception(error_msg)
-            except httpx.ConnectError as e:
-                # Error de conexión (URL no existe, DNS, etc.)
-                raise Exception(f"Error de conexión con SUNAT: No se pudo conectar a {self.base_url}. Verifica que la URL sea correcta y que tengas acceso a internet.")
-            except httpx.TimeoutException:
-                raise Exception(f"Timeout al conectar con SUNAT: {self.base_url}. El servidor no respondió a tiempo.")
-            except Exception as e:
-                error_str = str(e)
-                # Si el error menciona una URL truncada, intentar mostrar la URL completa
-                if "gob.p" in error_str and "gob.pe" not in error_str:
-                    raise Exception(f"Error de conexión con SIRE: {str(e)}. URL base configurada: {self.base_url}")
-                raise Exception(f"Error de conexión con SIRE: {str(e)}")
+                    pass  # Si no se puede parsear, continuar con el manejo normal
+            
+            error_text = e.response.text[:1000] if e.response.text else "Sin detalles"
+            error_msg = (
+                f"Error API SIRE {e.response.status_code}:\n"
+                f"URL: {url}\n"
+                f"Respuesta: {error_text}\n"
+                f"Verifica que:\n"
+                f"1. El endpoint sea correcto según el manual de SUNAT\n"
+                f"2. Los parámetros sean válidos\n"
+                f"3. El token tenga los permisos necesarios"
+            )
+            print(f"[SIRE Client] Error: {error_msg}")
+            raise Exception(error_msg)
+        except httpx.ConnectError as e:
+            # Error de conexión (URL no existe, DNS, etc.)
+            raise Exception(f"Error de conexión con SUNAT: No se pudo conectar a {self.base_url}. Verifica que la URL sea correcta y que tengas acceso a internet.")
+        except httpx.TimeoutException:
+            raise Exception(f"Timeout al conectar con SUNAT: {self.base_url}. El servidor no respondió a tiempo.")
+        except SireCircuitOpenError:
+            raise
+        except Exception as e:
+            error_str = str(e)
+            # Si el error menciona una URL truncada, intentar mostrar la URL completa
+            if "gob.p" in error_str and "gob.pe" not in error_str:
+                raise Exception(f"Error de conexión con SIRE: {str(e)}. URL base configurada: {self.base_url}")
+            raise Exception(f"Error de conexión con SIRE: {str(e)}")
     
     # ===== MÉTODOS GENERALES =====
     
@@ -479,6 +562,61 @@ class SIREClient:
         
         return await self._make_request("GET", endpoint, params=params)
     
+    async def download_proposal_file(
+        self,
+        proposal_type: SireProposalType,
+        period: str,
+        destination: str,
+        proposal_number: Optional[str] = None,
+        chunk_size: int = 64 * 1024
+    ) -> int:
+        """
+        Descarga una propuesta directamente a disco, sin cargarla en memoria
+        
+        Args:
+            proposal_type: Tipo de propuesta (RVIE o RCE)
+            period: Periodo tributario (formato: YYYYMM)
+            destination: Ruta del archivo destino (TXT, ZIP o JSON según responda SUNAT)
+            proposal_number: Número de propuesta (opcional)
+            chunk_size: Tamaño de bloque de escritura en bytes
+        
+        Returns:
+            Bytes escritos
+        """
+        token = await self._ensure_valid_token()
+        endpoint = f"/sire/v1/{proposal_type.value.lower()}/proposals/download"
+        url = f"{self.base_url}{endpoint}"
+        params = {"period": period}
+        if proposal_number:
+            params["proposal_number"] = proposal_number
+        
+        print(f"[SIRE Client] GET {url} (streaming a {destination})")
+        
+        async def descargar() -> int:
+            # Cada intento reescribe el archivo desde el inicio
+            escritos = 0
+            async with self.http.stream(
+                "GET", url, params=params, headers={"Authorization": f"Bearer {token}"}, timeout=300.0
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    response.raise_for_status()
+                with open(destination, "wb") as f:
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        f.write(chunk)
+                        escritos += len(chunk)
+            return escritos
+        
+        try:
+            escritos = await send_with_resilience(self.transport_key, "GET", descargar)
+        except httpx.HTTPStatusError as e:
+            error_text = e.response.text[:1000] if e.response.text else "Sin detalles"
+            raise Exception(f"Error API SIRE {e.response.status_code} descargando propuesta {period}: {error_text}")
+        except httpx.TimeoutException:
+            raise Exception(f"Timeout descargando propuesta {period} desde SUNAT: {self.base_url}")
+        
+        return escritos
+    
     async def replace_proposal_with_preliminary(
         self,
         proposal_type: SireProposalType,
@@ -506,18 +644,22 @@ class SIREClient:
             "Authorization": f"Bearer {token}",
         }
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
+        async def enviar() -> httpx.Response:
+            # POST no idempotente: solo se reintenta si la conexión no llegó a establecerse o hubo 429
             with open(zip_file_path, 'rb') as file:
                 files = {'file': ('data.zip', file, 'application/zip')}
                 data = {'period': period}
-                response = await client.post(
+                return await self.http.post(
                     url,
                     headers=headers,
                     files=files,
-                    data=data
+                    data=data,
+                    timeout=120.0
                 )
-                response.raise_for_status()
-                return response.json()
+        
+        response = await send_with_resilience(self.transport_key, "POST", enviar)
+        response.raise_for_status()
+        return response.json()
     
     async def check_ticket_status(self, ticket_number: str) -> Dict[str, Any]:
         """
@@ -4,9 +4,20 @@ Parser de propuestas SIRE
 
 Convierte las respuestas JSON/XML de SUNAT en estructuras de datos manejables.
 """
-from typing import Dict, Any, List, Optional, Tuple
+import io
+import json
+import zipfile
+from typing import Dict, Any, List, Optional, Tuple, Callable, IO, Iterator
 from datetime import datetime, date
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from operator import itemgetter
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
 
 class SireProposalParser:
     """
@@ -235,3 +246,253 @@ class SireProposalParser:
         
         return True, None
 
+
+
+# ===== PARSER INCREMENTAL (propuestas grandes) =====
+#
+# Las propuestas de períodos con 100k+ comprobantes no se decodifican completas:
+# el archivo descargado (TXT de SUNAT, ZIP con TXT/JSON, o JSON) se recorre
+# registro a registro y cada campo se convierte con funciones precompiladas
+# (sin probar formatos por cada valor).
+
+_ZERO = Decimal("0")
+
+# Posición de cada campo en los TXT de propuesta SUNAT (separados por "|").
+# Una tupla de posiciones se suma (RCE: BI/IGV de adquisiciones gravadas,
+# mixtas y no gravadas).
+_TXT_COLUMNAS = {
+    "RVIE": {
+        "car_sunat": 3, "issue_date": 4, "doc_type": 6, "series": 7, "number": 8,
+        "counterparty_doc_type": 10, "counterparty_tax_id": 11, "counterparty_name": 12,
+        "base_amount": 14, "igv_amount": 16, "total_amount": 25, "currency": 26,
+    },
+    "RCE": {
+        "car_sunat": 3, "issue_date": 4, "doc_type": 6, "series": 7, "number": 9,
+        "counterparty_doc_type": 11, "counterparty_tax_id": 12, "counterparty_name": 13,
+        "base_amount": (14, 16, 18), "igv_amount": (15, 17, 19), "total_amount": 24, "currency": 25,
+    },
+}
+
+# Claves alternativas de cada campo en las respuestas JSON (API SUNAT y formatos antiguos)
+_JSON_CLAVES = {
+    "car_sunat": ("codCar", "car", "numCar"),
+    "doc_type": ("codTipoCDP", "tipoDocumento", "doc_type", "tipoComprobante"),
+    "series": ("numSerieCDP", "serie", "series"),
+    "number": ("numCDP", "numero", "number", "numeroComprobante"),
+    "issue_date": ("fecEmisionCDP", "fechaEmision", "issue_date", "fecha"),
+    "counterparty_doc_type": ("codTipoDocIdentidad", "tipoDocIdentidad"),
+    "counterparty_tax_id": ("numDocIdentidad", "rucCliente", "rucProveedor", "ruc"),
+    "counterparty_name": ("nomRazonSocial", "nombreCliente", "nombreProveedor", "razonSocial"),
+    "base_amount": ("mtoBIGravada", "baseImponible", "base_amount", "base"),
+    "igv_amount": ("mtoIGV", "igv", "igv_amount", "impuesto"),
+    "total_amount": ("mtoTotalCP", "total", "total_amount", "importeTotal"),
+    "currency": ("codMoneda", "moneda", "currency"),
+}
+
+# Listas que contienen los comprobantes dentro de un JSON de propuesta
+_JSON_LISTAS = ("registros", "comprobantes", "items", "detalle", "lines", "data")
+
+
+def _to_decimal(value: Any) -> Decimal:
+    if value is None or value == "":
+        return _ZERO
+    if isinstance(value, str):
+        try:
+            return Decimal(value.replace(",", "") if "," in value else value)
+        except InvalidOperation:
+            return _ZERO
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def _to_date(value: Any) -> Optional[date]:
+    """Fecha DD/MM/AAAA (TXT SUNAT) o AAAA-MM-DD (JSON) por posición fija."""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    s = str(value)
+    try:
+        if len(s) >= 10 and s[2] == "/":
+            return date(int(s[6:10]), int(s[3:5]), int(s[0:2]))
+        if len(s) >= 10 and s[4] == "-":
+            return date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+    except ValueError:
+        return None
+    return SireProposalParser._parse_date(s)
+
+
+def _to_text(value: Any, max_len: int) -> Optional[str]:
+    if value is None:
+        return None
+    s = str(value).strip()
+    return s[:max_len] or None
+
+
+_CONVERSORES: Dict[str, Callable[[Any], Any]] = {
+    "car_sunat": partial(_to_text, max_len=40),
+    "doc_type": partial(_to_text, max_len=2),
+    "series": partial(_to_text, max_len=20),
+    "number": partial(_to_text, max_len=20),
+    "issue_date": _to_date,
+    "counterparty_doc_type": partial(_to_text, max_len=2),
+    "counterparty_tax_id": partial(_to_text, max_len=20),
+    "counterparty_name": partial(_to_text, max_len=255),
+    "base_amount": _to_decimal,
+    "igv_amount": _to_decimal,
+    "total_amount": _to_decimal,
+    "currency": lambda v: _to_text(v, 3) or "PEN",
+}
+
+
+_LONGITUD_TEXTO = {
+    "car_sunat": 40, "doc_type": 2, "series": 20, "number": 20,
+    "counterparty_doc_type": 2, "counterparty_tax_id": 20, "counterparty_name": 255,
+}
+
+
+def _getter_tupla(posiciones: List[int]) -> Callable[[List[str]], Tuple[str, ...]]:
+    """itemgetter que siempre devuelve tupla (también con una sola posición)."""
+    if len(posiciones) == 1:
+        pos = posiciones[0]
+        return lambda partes: (partes[pos],)
+    return itemgetter(*posiciones)
+
+
+def _decimales(valores: Tuple[str, ...]) -> List[Decimal]:
+    try:
+        return [Decimal(v) if v else _ZERO for v in valores]
+    except InvalidOperation:
+        return [_to_decimal(v) for v in valores]
+
+
+def _iter_txt(stream: IO[str], proposal_type: str) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre un TXT de propuesta SUNAT línea a línea.
+    
+    Las columnas se agrupan por tipo y se extraen con itemgetter, de modo que
+    cada grupo se convierte en una sola comprensión por línea.
+    """
+    columnas = _TXT_COLUMNAS[proposal_type]
+    textos = [(c, p) for c, p in columnas.items() if c in _LONGITUD_TEXTO]
+    montos = [(c, p) for c, p in columnas.items() if isinstance(p, int) and c.endswith("_amount")]
+    sumas = [(c, _getter_tupla(list(p))) for c, p in columnas.items() if isinstance(p, tuple)]
+    pos_fecha, pos_moneda = columnas["issue_date"], columnas["currency"]
+
+    nombres = [c for c, _ in textos] + [c for c, _ in montos]
+    longitudes = [_LONGITUD_TEXTO[c] for c, _ in textos]
+    get_textos = _getter_tupla([p for _, p in textos])
+    get_montos = _getter_tupla([p for _, p in montos])
+    ancho = max(max(p) if isinstance(p, tuple) else p for p in columnas.values()) + 1
+    relleno = [""] * ancho
+
+    for linea in stream:
+        linea = linea.rstrip("\r\n")
+        if not linea:
+            continue
+        partes = linea.split("|")
+        # Cabecera del TXT (primera columna = "RUC") u otras líneas no numéricas
+        if not partes[0].strip().isdigit():
+            continue
+        if len(partes) < ancho:
+            partes.extend(relleno[len(partes):])
+
+        valores = [v.strip()[:n] or None for v, n in zip(get_textos(partes), longitudes)]
+        valores.extend(_decimales(get_montos(partes)))
+        registro = dict(zip(nombres, valores))
+        for campo, get_sumandos in sumas:
+            registro[campo] = sum(_decimales(get_sumandos(partes)), _ZERO)
+        registro["issue_date"] = _to_date(partes[pos_fecha])
+        registro["currency"] = partes[pos_moneda].strip()[:3] or "PEN"
+        yield registro
+
+
+def _compilar_claves_json(muestra: Dict[str, Any]) -> List[Tuple[str, Optional[str], Callable[[Any], Any]]]:
+    """Resuelve una sola vez qué clave JSON alimenta cada campo."""
+    compilado = []
+    for campo, claves in _JSON_CLAVES.items():
+        clave = next((c for c in claves if c in muestra), None)
+        compilado.append((campo, clave, _CONVERSORES[campo]))
+    return compilado
+
+
+def _convertir_json(registros: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    compilado = None
+    for rec in registros:
+        if not isinstance(rec, dict):
+            continue
+        if compilado is None:
+            compilado = _compilar_claves_json(rec)
+        yield {campo: conv(rec.get(clave) if clave else None) for campo, clave, conv in compilado}
+
+
+def _buscar_prefijo_ijson(stream: IO[bytes]) -> Optional[str]:
+    """Prefijo ijson de la lista de comprobantes (prefiere las listas conocidas)."""
+    primero = None
+    for prefijo, evento, _ in ijson.parse(stream):
+        if evento == "start_map" and (prefijo == "item" or prefijo.endswith(".item")):
+            lista = prefijo[:-len(".item")].rsplit(".", 1)[-1] if prefijo != "item" else ""
+            if lista in _JSON_LISTAS or prefijo == "item":
+                return prefijo
+            primero = primero or prefijo
+    return primero
+
+
+def _iter_json(abrir: Callable[[], IO[bytes]]) -> Iterator[Dict[str, Any]]:
+    if IJSON_AVAILABLE:
+        with abrir() as f:
+            prefijo = _buscar_prefijo_ijson(f)
+        if prefijo is None:
+            return
+        with abrir() as f:
+            yield from _convertir_json(ijson.items(f, prefijo, use_float=False))
+        return
+
+    # Sin ijson: se decodifica el JSON completo, pero la conversión sigue siendo incremental
+    with abrir() as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = next((data[k] for k in _JSON_LISTAS if isinstance(data.get(k), list)), [data])
+    yield from _convertir_json(iter(data))
+
+
+def _es_json(cabecera: bytes) -> bool:
+    return cabecera.lstrip(b"\xef\xbb\xbf \t\r\n")[:1] in (b"{", b"[")
+
+
+def iter_proposal_records(path: str, proposal_type: str) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre los comprobantes de un archivo de propuesta sin cargarlo en memoria.
+    
+    Args:
+        path: Archivo descargado (TXT, ZIP con TXT/JSON, o JSON)
+        proposal_type: "RVIE" o "RCE"
+    
+    Returns:
+        Iterador de dicts con los campos de SireProposalDetail (sin claves de empresa/período)
+    """
+    proposal_type = getattr(proposal_type, "value", proposal_type)
+    with open(path, "rb") as f:
+        cabecera = f.read(64)
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for nombre in sorted(zf.namelist()):
+                if nombre.endswith("/"):
+                    continue
+                with zf.open(nombre) as miembro:
+                    inicio = miembro.read(64)
+                if nombre.lower().endswith(".json") or _es_json(inicio):
+                    yield from _iter_json(partial(zf.open, nombre))
+                else:
+                    with zf.open(nombre) as miembro:
+                        texto = io.TextIOWrapper(miembro, encoding="utf-8", errors="replace", newline="")
+                        yield from _iter_txt(texto, proposal_type)
+    elif _es_json(cabecera):
+        yield from _iter_json(partial(open, path, "rb"))
+    else:
+        with open(path, "r", encoding="utf-8", errors="replace", newline="") as texto:
+            yield from _iter_txt(texto, proposal_type)
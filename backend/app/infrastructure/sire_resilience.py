@@ -0,0 +1,345 @@
+"""
+Resiliencia del transporte HTTP hacia SIRE SUNAT
+================================================
+
+Componentes que SIREClient aplica a cada petición:
+- Reintentos con backoff exponencial y jitter completo (solo operaciones
+  idempotentes; un POST solo se reintenta si la conexión nunca se estableció
+  o si SUNAT respondió 429)
+- Limitador token bucket por RUC: ritmo sostenido + ráfaga, compartido por
+  todas las sincronizaciones concurrentes del proceso
+- Circuit breaker por RUC: tras N fallos consecutivos corta las peticiones
+  durante un enfriamiento y luego deja pasar una sola de prueba
+- Métricas por RUC de peticiones, reintentos, esperas y latencias
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Respuestas que indican saturación o indisponibilidad temporal de SUNAT.
+# 500 no se incluye: SIRE devuelve errores de negocio con 500 y cuerpo JSON.
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Límites superiores (segundos) del histograma de latencias
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class SireCircuitOpenError(Exception):
+    """El circuito del RUC está abierto: no se envían peticiones a SUNAT."""
+
+    def __init__(self, ruc: str, retry_in: float):
+        self.ruc = ruc
+        self.retry_in = retry_in
+        super().__init__(
+            f"SUNAT SIRE no disponible para el RUC {ruc}: demasiados fallos consecutivos. "
+            f"Reintentar en {retry_in:.0f}s."
+        )
+
+
+# ===== REINTENTOS =====
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=settings.sire_retry_max_attempts,
+            base_delay=settings.sire_retry_base_delay,
+            max_delay=settings.sire_retry_max_delay,
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Espera antes del reintento número `attempt` (1 = primer reintento).
+
+        Jitter completo: uniforme en [0, min(max, base * 2^(attempt-1))], así los
+        períodos que fallan a la vez no reintentan todos al mismo tiempo.
+        Si SUNAT envía Retry-After se respeta (acotado a max_delay).
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_delay)
+        techo = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, techo)
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    valor = response.headers.get("Retry-After")
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+# ===== LIMITADOR TOKEN BUCKET =====
+
+class TokenBucket:
+    """
+    Token bucket sin locks: en asyncio la reserva es atómica (no hay await
+    entre leer y descontar). Los tokens pueden quedar negativos; ese saldo es
+    la cola de espera y cada llamador duerme exactamente su turno.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Consume un token y devuelve los segundos que hay que esperar por él."""
+        if self.rate <= 0:
+            return 0.0
+        ahora = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (ahora - self._updated) * self.rate)
+        self._updated = ahora
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        espera = self.reserve()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return espera
+
+
+# ===== CIRCUIT BREAKER =====
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self, ruc: str) -> None:
+        """Lanza SireCircuitOpenError si el circuito no admite la petición."""
+        if self.state == self.CLOSED:
+            return
+        restante = self.cooldown - (time.monotonic() - self._opened_at)
+        if self.state == self.OPEN and restante <= 0:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        raise SireCircuitOpenError(ruc, max(restante, 0.0))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Libera la petición de prueba si terminó sin resultado (cancelación, error local)."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuito SIRE abierto tras %s fallos consecutivos", self.failures)
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+# ===== MÉTRICAS =====
+
+@dataclass
+class TransportMetrics:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    throttled: int = 0
+    circuit_rejections: int = 0
+    rate_limit_wait_seconds: float = 0.0
+    latency_count: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    latency_buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def observe(self, segundos: float) -> None:
+        self.latency_count += 1
+        self.latency_sum += segundos
+        self.latency_max = max(self.latency_max, segundos)
+        for i, limite in enumerate(LATENCY_BUCKETS):
+            if segundos <= limite:
+                self.latency_buckets[i] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        etiquetas = [f"<={b}" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "circuit_rejections": self.circuit_rejections,
+            "rate_limit_wait_seconds": round(self.rate_limit_wait_seconds, 3),
+            "latency": {
+                "count": self.latency_count,
+                "avg_seconds": round(self.latency_sum / self.latency_count, 4) if self.latency_count else None,
+                "max_seconds": round(self.latency_max, 4),
+                "buckets": dict(zip(etiquetas, self.latency_buckets)),
+            },
+        }
+
+
+# ===== REGISTRO POR RUC (por proceso) =====
+
+_LIMITERS: Dict[str, TokenBucket] = {}
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_METRICS: Dict[str, TransportMetrics] = {}
+
+
+def get_rate_limiter(ruc: str) -> TokenBucket:
+    limiter = _LIMITERS.get(ruc)
+    if limiter is None:
+        limiter = _LIMITERS[ruc] = TokenBucket(settings.sire_rate_limit_per_second, settings.sire_rate_limit_burst)
+    return limiter
+
+
+def get_circuit_breaker(ruc: str) -> CircuitBreaker:
+    breaker = _BREAKERS.get(ruc)
+    if breaker is None:
+        breaker = _BREAKERS[ruc] = CircuitBreaker(
+            settings.sire_circuit_failure_threshold, settings.sire_circuit_cooldown_seconds
+        )
+    return breaker
+
+
+def get_transport_metrics(ruc: str) -> TransportMetrics:
+    metrics = _METRICS.get(ruc)
+    if metrics is None:
+        metrics = _METRICS[ruc] = TransportMetrics()
+    return metrics
+
+
+def transport_status(ruc: str) -> Dict[str, Any]:
+    """Métricas y estado del circuito de un RUC (para monitoreo)."""
+    breaker = _BREAKERS.get(ruc)
+    return {
+        "ruc": ruc,
+        "circuit_state": breaker.state if breaker else CircuitBreaker.CLOSED,
+        "consecutive_failures": breaker.failures if breaker else 0,
+        **get_transport_metrics(ruc).snapshot(),
+    }
+
+
+def reset_transport_state() -> None:
+    """Limpia limitadores, circuitos y métricas (tests)."""
+    _LIMITERS.clear()
+    _BREAKERS.clear()
+    _METRICS.clear()
+
+
+# ===== EJECUCIÓN CON RESILIENCIA =====
+
+async def send_with_resilience(
+    ruc: str,
+    method: str,
+    send: Callable[[], Awaitable[Any]],
+    policy: Optional[RetryPolicy] = None,
+) -> Any:
+    """
+    Ejecuta `send` (un intento HTTP) aplicando circuito, limitador, reintentos y métricas.
+
+    Args:
+        ruc: RUC del contribuyente (clave de limitador, circuito y métricas)
+        method: Método HTTP (decide si el intento es idempotente)
+        send: Corrutina sin argumentos que hace un intento. Puede devolver un
+              httpx.Response o lanzar httpx.HTTPStatusError / errores de transporte.
+        policy: Política de reintentos (por defecto, la de settings)
+
+    Returns:
+        Lo que devuelva `send`. Si se agotan los reintentos con una respuesta
+        reintentable, se devuelve esa última respuesta para que el llamador
+        formatee el error como siempre.
+    """
+    policy = policy or RetryPolicy.from_settings()
+    idempotente = method.upper() in IDEMPOTENT_METHODS
+    breaker = get_circuit_breaker(ruc)
+    limiter = get_rate_limiter(ruc)
+    metrics = get_transport_metrics(ruc)
+
+    intento = 0
+    while True:
+        intento += 1
+        try:
+            breaker.before_call(ruc)
+        except SireCircuitOpenError:
+            metrics.circuit_rejections += 1
+            raise
+        metrics.rate_limit_wait_seconds += await limiter.acquire()
+        metrics.requests += 1
+
+        inicio = time.monotonic()
+        resultado: Any = None
+        respuesta: Optional[httpx.Response] = None
+        error: Optional[BaseException] = None
+        try:
+            resultado = await send()
+            if isinstance(resultado, httpx.Response):
+                respuesta = resultado
+        except httpx.HTTPStatusError as e:
+            respuesta, error = e.response, e
+        except httpx.TransportError as e:
+            error = e
+        except BaseException:
+            # Error ajeno al transporte (o cancelación): no cuenta como fallo de SUNAT
+            breaker.release_probe()
+            raise
+        finally:
+            metrics.observe(time.monotonic() - inicio)
+
+        transitorio = respuesta.status_code in RETRYABLE_STATUS if respuesta is not None else error is not None
+        if not transitorio:
+            breaker.record_success()
+            if error is not None:
+                raise error
+            return resultado
+
+        breaker.record_failure()
+        if respuesta is not None and respuesta.status_code == 429:
+            metrics.throttled += 1
+        # Sin conexión establecida el servidor no recibió nada: reintentar es seguro
+        reintentable = idempotente or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)) or (
+            respuesta is not None and respuesta.status_code == 429
+        )
+        if not reintentable or intento >= policy.max_attempts:
+            metrics.failures += 1
+            if error is not None:
+                raise error
+            return resultado
+
+        espera = policy.delay(intento, _retry_after(respuesta))
+        metrics.retries += 1
+        motivo = f"HTTP {respuesta.status_code}" if respuesta is not None else type(error).__name__
+        logger.warning(
+            "SIRE %s (RUC %s): %s, reintento %s/%s en %.2fs",
+            method, ruc, motivo, intento, policy.max_attempts - 1, espera,
+        )
+        await asyncio.sleep(espera)
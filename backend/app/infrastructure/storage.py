@@ -6,6 +6,8 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Optional
 import os
+import shutil
+import tempfile
 
 class FileStorageService(ABC):
     """Interfaz para servicios de almacenamiento"""
@@ -15,6 +17,16 @@ class FileStorageService(ABC):
         """Guarda un archivo y retorna la ruta"""
         pass
     
+    def save_file(self, file_path: str, source_path: Path) -> str:
+        """
+        Guarda un archivo ya escrito en disco (p. ej. un upload en streaming).
+        
+        Implementación por defecto: lee el archivo y usa save(). Los storages
+        locales lo mueven sin cargarlo en memoria.
+        """
+        with open(source_path, 'rb') as f:
+            return self.save(file_path, f.read())
+    
     @abstractmethod
     def get(self, file_path: str) -> bytes:
         """Obtiene el contenido de un archivo"""
@@ -56,12 +68,41 @@ class LocalFileStorage(FileStorageService):
         full_path = self.base_path / file_path
         full_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(full_path, 'wb') as f:
-            f.write(content)
+        # Escritura atómica (temporal + rename): un lector concurrente nunca ve
+        # el archivo a medias, y dos escrituras del mismo blob no se pisan
+        fd, tmp_path = tempfile.mkstemp(dir=full_path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
         
         # Retornar ruta relativa al base_path
         return str(full_path.relative_to(self.base_path))
     
+    def save_file(self, file_path: str, source_path: Path) -> str:
+        """Mueve un archivo al storage con un rename atómico (copia + rename si está en otro disco)"""
+        full_path = self.base_path / file_path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(source_path, full_path)
+        except OSError:
+            # Distinto sistema de archivos: copiar a un temporal junto al destino y renombrar
+            fd, tmp_path = tempfile.mkstemp(dir=full_path.parent, prefix=".tmp_")
+            os.close(fd)
+            try:
+                shutil.copyfile(source_path, tmp_path)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            os.unlink(source_path)
+        return str(full_path.relative_to(self.base_path))
+    
     def get(self, file_path: str) -> bytes:
         """Obtiene el contenido de un archivo"""
         full_path = self.base_path / file_path
@@ -0,0 +1,187 @@
+"""
+Recepción de archivos subidos en streaming
+==========================================
+
+En lugar de `await file.read()` (todo el archivo en memoria, y luego una
+copia por validación, hash y guardado), el upload se copia por bloques a un
+temporal:
+
+- SHA-256 y tamaño se calculan mientras se copia
+- El límite de tamaño se aplica en cada bloque: un archivo excedido se corta
+  sin leerlo entero
+- Solo se conserva el primer KB en memoria para reconocer el tipo real del
+  contenido (firma del archivo)
+- El temporal se mueve al storage con un rename atómico
+
+La memoria por upload queda acotada al tamaño del bloque.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ..config import settings
+
+CHUNK_SIZE = 1024 * 1024
+SNIFF_SIZE = 1024
+
+# Familia de contenido que admite cada extensión
+_FAMILIAS_POR_EXTENSION = {
+    ".pdf": {"pdf"},
+    ".xlsx": {"zip"},
+    ".docx": {"zip"},
+    ".zip": {"zip"},
+    ".xls": {"ole"},
+    ".doc": {"ole"},
+    ".xml": {"xml"},
+    ".txt": {"text", "xml"},
+    ".csv": {"text"},
+    ".jpg": {"jpeg"},
+    ".jpeg": {"jpeg"},
+    ".png": {"png"},
+    ".gif": {"gif"},
+    ".webp": {"webp"},
+}
+
+
+def staging_dir() -> Path:
+    """Directorio de temporales, en el mismo volumen que documentos y uploads"""
+    return settings.uploads_path.parent / ".staging"
+
+
+class UploadTooLarge(ValueError):
+    """El archivo supera el tamaño máximo permitido"""
+
+
+@dataclass
+class StagedUpload:
+    """Upload ya copiado a un temporal, con su hash, tamaño y primer KB"""
+    path: Path
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    head: bytes
+
+    def read_bytes(self) -> bytes:
+        """Contenido completo (solo para procesos que lo necesitan, p. ej. parsear un XML)"""
+        return self.path.read_bytes()
+
+    def discard(self) -> None:
+        """Elimina el temporal si no se movió al storage"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def sniff_content(head: bytes) -> str:
+    """
+    Familia del contenido según su firma (primer KB): pdf, zip (xlsx, docx),
+    ole (xls, doc), xml, jpeg, png, gif, webp, text o binary.
+    """
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return "zip"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "ole"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    texto = head.lstrip(b"\xef\xbb\xbf").lstrip()
+    if texto.startswith(b"<"):
+        return "xml"
+    if b"\x00" in head:
+        return "binary"
+    return "text"
+
+
+def validate_content_matches(filename: str, head: bytes) -> None:
+    """
+    Verifica que el contenido corresponda a la extensión (un .pdf que no es
+    PDF se rechaza). Extensiones sin firma conocida no se verifican.
+
+    Raises:
+        ValueError: Si el contenido no corresponde a la extensión
+    """
+    ext = Path(filename).suffix.lower()
+    familias = _FAMILIAS_POR_EXTENSION.get(ext)
+    if familias and sniff_content(head) not in familias:
+        raise ValueError(f"El contenido del archivo no corresponde a la extensión {ext}")
+
+
+async def stage_upload(
+    file,
+    max_bytes: Optional[int] = None,
+    tmp_dir: Optional[Path] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> StagedUpload:
+    """
+    Copia un UploadFile por bloques a un temporal, calculando SHA-256 y
+    aplicando el límite de tamaño sobre la marcha.
+
+    Args:
+        file: UploadFile de FastAPI (o cualquier objeto con `async read(n)`)
+        max_bytes: Tamaño máximo (por defecto max_upload_size_mb)
+        tmp_dir: Directorio del temporal (conviene el mismo disco que el storage
+            para que el movimiento final sea un rename)
+        chunk_size: Tamaño de cada bloque leído
+
+    Raises:
+        UploadTooLarge: Si el archivo supera max_bytes (el temporal se elimina)
+    """
+    if max_bytes is None:
+        max_bytes = settings.max_upload_size_mb * 1024 * 1024
+    if tmp_dir is not None:
+        Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="upload_", dir=tmp_dir)
+    sha256 = hashlib.sha256()
+    head = b""
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(
+                        f"Archivo demasiado grande. Máximo: {max_bytes / 1024 / 1024:g}MB"
+                    )
+                if len(head) < SNIFF_SIZE:
+                    head += chunk[:SNIFF_SIZE - len(head)]
+                sha256.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return StagedUpload(
+        path=Path(tmp_path),
+        filename=getattr(file, "filename", None) or "sin_nombre",
+        content_type=getattr(file, "content_type", None) or "application/octet-stream",
+        size=size,
+        sha256=sha256.hexdigest(),
+        head=head,
+    )
+
+
+def staged_from_bytes(content: bytes, filename: str, content_type: str, tmp_dir: Optional[Path] = None) -> StagedUpload:
+    """StagedUpload de un contenido ya en memoria (scripts, importaciones internas)"""
+    if tmp_dir is not None:
+        Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="upload_", dir=tmp_dir)
+    with os.fdopen(fd, "wb") as out:
+        out.write(content)
+    return StagedUpload(
+        path=Path(tmp_path), filename=filename, content_type=content_type, size=len(content),
+        sha256=hashlib.sha256(content).hexdigest(), head=content[:SNIFF_SIZE],
+    )
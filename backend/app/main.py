@@ -1,8 +1,9 @@
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from .db import init_db
+from .db import init_db, register_session_listeners
 from .infrastructure.logging_config import setup_logging
 from .config import settings
 
@@ -46,6 +47,11 @@ except Exception as e:
         e
     )
 
+# ======================================================
+# 📚 CACHÉ PLE, RESUMEN DE CONCILIACIÓN Y CONTADORES DE CASILLA (se invalidan al modificar)
+# ======================================================
+register_session_listeners()
+
 # ======================================================
 # 🚀 FASTAPI APP
 # ======================================================
@@ -126,3 +132,44 @@ app.include_router(aplicaciones.router)
 app.include_router(mailbox.router)
 app.include_router(empresa.router)
 app.include_router(audit.router)
+
+# ======================================================
+# 🎫 TICKETS SIRE (consulta en segundo plano)
+# ======================================================
+@app.on_event("startup")
+async def start_sire_ticket_poller():
+    if settings.sire_ticket_poller_enabled:
+        from .application.sire_tickets import ticket_poller
+        ticket_poller.start()
+
+# ======================================================
+# 📄 ACCESOS A DOCUMENTOS (insertados por lotes en segundo plano)
+# ======================================================
+@app.on_event("startup")
+async def start_document_access_log():
+    if settings.document_access_log_async:
+        from .application.document_access_log import access_log_buffer
+        access_log_buffer.start()
+
+# ======================================================
+# 📬 CASILLA (barrido periódico de mensajes vencidos)
+# ======================================================
+@app.on_event("startup")
+async def start_mailbox_overdue_sweeper():
+    if settings.mailbox_overdue_sweeper_enabled:
+        from .application.mailbox_stats import overdue_sweeper
+        overdue_sweeper.start()
+
+# ======================================================
+# 🔌 SHUTDOWN (detiene poller y barrido, vacía los accesos pendientes y cierra pools HTTP de SIRE)
+# ======================================================
+@app.on_event("shutdown")
+async def close_http_clients():
+    from .application.sire_tickets import ticket_poller
+    from .application.document_access_log import access_log_buffer
+    from .application.mailbox_stats import overdue_sweeper
+    from .infrastructure.sire_client import close_shared_http_clients
+    await ticket_poller.stop()
+    await overdue_sweeper.stop()
+    await asyncio.to_thread(access_log_buffer.stop)
+    await close_shared_http_clients()
@@ -1,5 +1,23 @@
 """
 Configuración global de pytest para tests del Motor de Asientos
+
+Fixtures de base de datos compartidas (SQLite con el esquema completo):
+- engine: motor nuevo por test
+- session_factory: sessionmaker ligado al motor
+- db: sesión abierta (se cierra al terminar el test)
+
+Cada archivo agrega sus datos sobrescribiendo db o session_factory:
+
+    @pytest.fixture
+    def db(db):
+        db.add(Company(id=1, name="Empresa"))
+        db.commit()
+        return db
+
+El motor se ajusta con el marcador sqlite (por archivo con pytestmark o por test):
+- archivo=True: base en tmp_path (varias conexiones, ej. hilos de fondo)
+- compartida=True: en memoria con una conexión compartida entre hilos (StaticPool)
+- foreign_keys=True: PRAGMA foreign_keys=ON
 """
 import pytest
 import sys
@@ -9,3 +27,43 @@ from pathlib import Path
 root_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(root_dir))
 
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "sqlite(archivo=False, compartida=False, foreign_keys=False): opciones del motor de la fixture engine"
+    )
+
+
+@pytest.fixture
+def engine(request, tmp_path):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.pool import StaticPool
+    from app.db import Base, _import_all_models
+
+    marcador = request.node.get_closest_marker("sqlite")
+    opciones = marcador.kwargs if marcador else {}
+    _import_all_models()
+    if opciones.get("archivo"):
+        motor = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    elif opciones.get("compartida"):
+        motor = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        motor = create_engine("sqlite:///:memory:")
+    if opciones.get("foreign_keys"):
+        event.listen(motor, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(motor)
+    yield motor
+    motor.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
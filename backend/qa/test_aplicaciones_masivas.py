@@ -0,0 +1,102 @@
+"""
+Tests de la aplicación masiva de cobros a facturas
+
+Cubre:
+- Saldos pendientes en una consulta agrupada (aplicaciones, legacy, notas)
+- FIFO por antigüedad sobre las facturas abiertas del cliente del movimiento
+- Lista explícita con y sin monto, y validaciones (saldo, movimiento, repetidos)
+- Movimiento parcialmente aplicado: solo se asigna lo disponible
+- Período cerrado
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.domain.models import Company, Period
+from app.domain.models_aplicaciones import AplicacionDocumento
+from app.domain.models_ext import Sale
+from app.domain.models_notas import NotaDocumento
+from app.domain.models_tesoreria import MovimientoTesoreria
+from app.infrastructure.unit_of_work import UnitOfWork
+from app.application.services_aplicaciones import AplicacionPagosError, AplicacionPagosService
+
+
+@pytest.fixture
+def db(db):
+    db.add(Company(id=1, name="Empresa"))
+    # Facturas del cliente 7 (la 4 es de otro cliente); emisión desordenada respecto al id
+    db.add_all([
+        Sale(id=1, company_id=1, doc_type="01", series="F001", number="1", issue_date=date(2025, 1, 20), customer_id=7, total_amount=Decimal("300")),
+        Sale(id=2, company_id=1, doc_type="01", series="F001", number="2", issue_date=date(2025, 1, 5), customer_id=7, total_amount=Decimal("200")),
+        Sale(id=3, company_id=1, doc_type="01", series="F001", number="3", issue_date=date(2025, 1, 10), customer_id=7, total_amount=Decimal("500")),
+        Sale(id=4, company_id=1, doc_type="01", series="F001", number="4", issue_date=date(2025, 1, 1), customer_id=8, total_amount=Decimal("999")),
+    ])
+    db.commit()
+    return db
+
+
+def _movimiento(db, monto, referencia_id=1, fecha=date(2025, 2, 1)):
+    mov = MovimientoTesoreria(company_id=1, tipo="COBRO", referencia_tipo="VENTA", referencia_id=referencia_id,
+                              monto=Decimal(monto), fecha=fecha, metodo_pago_id=1, estado="REGISTRADO")
+    db.add(mov)
+    db.commit()
+    return mov
+
+
+def _service(db):
+    return AplicacionPagosService(UnitOfWork(db))
+
+
+class TestAplicacionesMasivas:
+
+    def test_saldos_en_consulta_agrupada(self, db):
+        _movimiento(db, "50", referencia_id=2)  # cobro legacy (sin aplicaciones) de la factura 2
+        aplicado = _movimiento(db, "100", referencia_id=1)  # aplicado a la 3: no cuenta para la 1
+        db.add(AplicacionDocumento(company_id=1, movimiento_tesoreria_id=aplicado.id, tipo_documento="FACTURA",
+                                   documento_id=3, monto_aplicado=Decimal("100"), fecha=date(2025, 2, 1)))
+        db.add(NotaDocumento(company_id=1, tipo="CREDITO", origen="VENTA", documento_ref_id=3, documento_ref_tipo="VENTA",
+                             serie="FC01", numero="1", fecha_emision=date(2025, 2, 1), motivo="01", total=Decimal("40")))
+        db.commit()
+
+        saldos = _service(db).saldos_pendientes(1, "COBRO", tercero_id=7)
+        assert [(d.id, s) for d, s in saldos] == [(2, Decimal("150")), (3, Decimal("360")), (1, Decimal("300"))]
+        assert _service(db)._obtener_saldo_pendiente_documento("FACTURA", 3, 1, "COBRO") == Decimal("360")
+
+    def test_fifo_por_antiguedad(self, db):
+        mov = _movimiento(db, "600")
+        creadas = _service(db).aplicar_pago_masivo(mov.id, 1)
+        db.commit()
+        assert [(a.documento_id, a.monto_aplicado) for a in creadas] == [(2, Decimal("200")), (3, Decimal("400"))]
+
+        # El primer cobro referenciaba la factura 1, pero ya aplicado no la cancela
+        otro = _movimiento(db, "1000", referencia_id=4)
+        creadas = _service(db).aplicar_pago_masivo(otro.id, 1, tercero_id=7)
+        assert [(a.documento_id, a.monto_aplicado) for a in creadas] == [(3, Decimal("100")), (1, Decimal("300"))]
+
+    def test_lista_explicita_y_validaciones(self, db):
+        mov = _movimiento(db, "450")
+        service = _service(db)
+        with pytest.raises(AplicacionPagosError, match="excede el saldo pendiente"):
+            service.aplicar_pago_masivo(mov.id, 1, documentos=[{"documento_id": 2, "monto_aplicado": "250"}])
+        with pytest.raises(AplicacionPagosError, match="repetidos"):
+            service.aplicar_pago_masivo(mov.id, 1, documentos=[{"documento_id": 2}, {"documento_id": 2}])
+        with pytest.raises(AplicacionPagosError, match="no encontrado"):
+            service.aplicar_pago_masivo(mov.id, 1, documentos=[{"documento_id": 99}])
+        with pytest.raises(AplicacionPagosError, match="saldo del movimiento"):
+            service.aplicar_pago_masivo(mov.id, 1, documentos=[{"documento_id": 3, "monto_aplicado": "460"}])
+
+        creadas = service.aplicar_pago_masivo(mov.id, 1, documentos=[
+            {"documento_id": 1, "monto_aplicado": "100"}, {"documento_id": 3}, {"documento_id": 2},
+        ])
+        db.commit()
+        assert [(a.documento_id, a.monto_aplicado) for a in creadas] == [(1, Decimal("100")), (3, Decimal("350"))]
+        with pytest.raises(AplicacionPagosError, match="totalmente aplicado"):
+            service.aplicar_pago_masivo(mov.id, 1)
+
+    def test_periodo_cerrado(self, db):
+        db.add(Period(company_id=1, year=2025, month=2, status="CERRADO"))
+        db.commit()
+        mov = _movimiento(db, "100")
+        with pytest.raises(AplicacionPagosError, match="Período cerrado"):
+            _service(db).aplicar_pago_masivo(mov.id, 1)
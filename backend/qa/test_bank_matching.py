@@ -0,0 +1,209 @@
+"""
+Tests del motor de emparejamiento de conciliación bancaria
+
+Cubre:
+- Monto exacto con la fecha más cercana y respeto de la dirección (cargo/abono)
+- Monto cercano solo con fecha próxima
+- Un movimiento contra varias líneas (suma exacta)
+- Cada línea contable se usa una sola vez
+- Carga desde la BD excluyendo líneas ya conciliadas (incluye matches de varias líneas)
+- Tokens de referencia (comprobante, RUC, operación) antes que monto/fecha
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.domain.enums import AccountType
+from app.domain.models import (
+    Account, BankAccount, BankStatement, BankTransaction, BankTransactionLine,
+    Company, EntryLine, JournalEntry, Period, ThirdParty, User,
+)
+from app.domain.models_ext import Sale
+from app.domain.models_payments import PaymentTransaction
+from app.application.bank_matching import (
+    MatchingOptions,
+    bank_movement,
+    book_movement,
+    match_movements,
+    reference_tokens,
+    suggest_bank_matches,
+)
+
+D = date(2025, 3, 10)
+
+
+def _dia(n):
+    return date(2025, 3, n)
+
+
+class TestBankMatching:
+
+    def test_monto_exacto_fecha_mas_cercana(self):
+        banco = [bank_movement(1, D, debit=0, credit=Decimal("500.00"))]
+        libros = [
+            book_movement(10, _dia(4), debit=Decimal("500.00"), credit=0),
+            book_movement(11, _dia(11), debit=Decimal("500.00"), credit=0),
+            book_movement(12, D, debit=0, credit=Decimal("500.00")),  # dirección opuesta
+        ]
+        (p,) = match_movements(banco, libros)
+        assert p.entry_line_ids == [11]
+        assert p.confidence == pytest.approx(0.9)
+        assert p.reason.startswith("monto exacto")
+
+    def test_monto_cercano_requiere_fecha_proxima(self):
+        banco = [
+            bank_movement(1, D, debit=Decimal("100.00"), credit=0),
+            bank_movement(2, D, debit=Decimal("300.00"), credit=0),
+        ]
+        libros = [
+            book_movement(10, _dia(11), debit=0, credit=Decimal("102.00")),
+            book_movement(11, _dia(20), debit=0, credit=Decimal("301.00")),
+        ]
+        (p,) = match_movements(banco, libros)
+        assert (p.bank_transaction_id, p.entry_line_ids) == (1, [10])
+        assert p.reason.startswith("monto cercano")
+
+    def test_un_movimiento_varias_lineas(self):
+        banco = [
+            bank_movement(1, D, debit=0, credit=Decimal("1000.00")),
+            bank_movement(2, D, debit=0, credit=Decimal("75.00")),
+        ]
+        libros = [
+            book_movement(10, _dia(8), debit=Decimal("400.00"), credit=0),
+            book_movement(11, _dia(9), debit=Decimal("350.00"), credit=0),
+            book_movement(12, _dia(10), debit=Decimal("250.00"), credit=0),
+            book_movement(13, _dia(10), debit=Decimal("75.00"), credit=0),
+            book_movement(14, _dia(10), debit=Decimal("999.00"), credit=0),
+        ]
+        propuestas = {p.bank_transaction_id: p for p in match_movements(banco, libros)}
+        assert propuestas[2].entry_line_ids == [13]
+        assert sorted(propuestas[1].entry_line_ids) == [10, 11, 12]
+        assert "suma exacta de 3 líneas" in propuestas[1].reason
+        # Sin búsqueda de combinaciones queda el monto cercano (999)
+        sin_sumas = {p.bank_transaction_id: p for p in match_movements(banco, libros, MatchingOptions(max_lines_per_match=1))}
+        assert sin_sumas[1].entry_line_ids == [14]
+        assert sin_sumas[1].reason.startswith("monto cercano")
+
+    def test_lineas_no_se_reutilizan(self):
+        banco = [bank_movement(i, D, debit=0, credit=Decimal("50.00")) for i in range(1, 4)]
+        libros = [book_movement(10 + i, D, debit=Decimal("50.00"), credit=0) for i in range(2)]
+        propuestas = match_movements(banco, libros)
+        assert len(propuestas) == 2
+        assert sorted(i for p in propuestas for i in p.entry_line_ids) == [10, 11]
+
+    def test_tokens_de_referencia(self):
+        assert reference_tokens("PAGO FACT F001-00001234 RUC 20123456789", "OP 000123456") == {
+            "F001-1234", "20123456789", "123456"
+        }
+        assert reference_tokens("TRANSF INTERBANCARIA 2024", None) == set()
+        assert reference_tokens("Cobro F001 1234") == reference_tokens("F001-00001234")
+
+    def test_referencia_antes_que_monto_y_fecha(self):
+        banco = [
+            bank_movement(1, D, debit=0, credit=Decimal("500.00")),
+            bank_movement(2, D, debit=0, credit=Decimal("1180.00")),
+            bank_movement(3, D, debit=0, credit=Decimal("970.00")),
+        ]
+        libros = [
+            book_movement(10, D, debit=Decimal("500.00"), credit=0),
+            book_movement(11, _dia(2), debit=Decimal("500.00"), credit=0),
+            book_movement(12, _dia(1), debit=Decimal("700.00"), credit=0),
+            book_movement(13, _dia(1), debit=Decimal("480.00"), credit=0),
+            book_movement(14, _dia(1), debit=Decimal("1000.00"), credit=0),
+        ]
+        bank_refs = {
+            1: reference_tokens("ABONO F001-77"),
+            2: reference_tokens("COBRO F001-80 F001-81"),
+            3: reference_tokens("COBRO F001-90 RET"),
+        }
+        book_refs = {
+            10: set(), 11: reference_tokens("F001-00000077"), 12: reference_tokens("F001-80"),
+            13: reference_tokens("F001-81"), 14: reference_tokens("F001-90"),
+        }
+        propuestas = {p.bank_transaction_id: p for p in match_movements(banco, libros, None, bank_refs, book_refs)}
+        # La misma fecha pierde contra la referencia
+        assert propuestas[1].entry_line_ids == [11]
+        assert propuestas[1].reason == "referencia F001-77, monto exacto"
+        assert sorted(propuestas[2].entry_line_ids) == [12, 13]
+        assert propuestas[2].confidence == pytest.approx(0.9)
+        # 970 vs 1000 (retención) entra por referencia y monto cercano
+        assert (propuestas[3].entry_line_ids, propuestas[3].confidence) == ([14], 0.75)
+        # Un token repetido en muchas líneas no discrimina
+        comunes = {i: {"20100070970"} for i in range(10, 15)}
+        sin_filtro = match_movements(banco, libros, MatchingOptions(max_token_lines=4), {1: {"20100070970"}}, comunes)
+        (p,) = [p for p in sin_filtro if p.bank_transaction_id == 1]
+        assert (p.entry_line_ids, p.reason) == ([10], "monto exacto, misma fecha")
+
+    def test_referencias_desde_bd(self, db):
+        db.add_all([
+            Company(id=1, name="Empresa"),
+            User(id=1, username="u", password_hash="x"),
+            Account(id=1, company_id=1, code="1041", name="Banco", type=AccountType.ASSET),
+            Period(id=1, company_id=1, year=2025, month=3),
+            BankAccount(id=1, company_id=1, account_id=1, bank_name="BCP", account_number="123"),
+            BankStatement(id=1, bank_account_id=1, period_id=1, statement_date=_dia(31),
+                          opening_balance=0, closing_balance=0, uploaded_by=1),
+            ThirdParty(id=1, company_id=1, tax_id="20555555551", name="Cliente", type="CLIENTE"),
+            Sale(id=1, company_id=1, doc_type="01", series="F001", number="00000456", issue_date=_dia(1),
+                 customer_id=1, total_amount=Decimal("300")),
+            PaymentTransaction(id=1, company_id=1, transaction_type="COLLECTION", sale_id=1,
+                               payment_date=_dia(2), amount=Decimal("300"), journal_entry_id=1),
+            JournalEntry(id=1, company_id=1, date=_dia(2), period_id=1, status="POSTED", glosa="Cobranza"),
+            JournalEntry(id=2, company_id=1, date=D, period_id=1, status="POSTED", glosa="Depósito OP 88812345"),
+        ])
+        db.add_all([
+            EntryLine(id=1, entry_id=1, account_id=1, debit=Decimal("300"), credit=0),
+            EntryLine(id=2, entry_id=2, account_id=1, debit=Decimal("300"), credit=0),
+        ])
+        db.add_all([
+            BankTransaction(id=1, statement_id=1, transaction_date=D, description="ABONO CLIENTE FACT F001-456",
+                            debit=0, credit=Decimal("300"), balance=0),
+            BankTransaction(id=2, statement_id=1, transaction_date=_dia(2), description="DEPOSITO",
+                            reference="88812345", debit=0, credit=Decimal("300"), balance=0),
+        ])
+        db.commit()
+
+        propuestas = {p.bank_transaction_id: p for p in suggest_bank_matches(db, 1, 1, 1)}
+        # Por monto y fecha quedarían cruzados; por referencia no
+        assert propuestas[1].entry_line_ids == [1]
+        assert propuestas[2].entry_line_ids == [2]
+        assert propuestas[2].reason.startswith("referencia 88812345")
+        sin_referencias = suggest_bank_matches(db, 1, 1, 1, MatchingOptions(use_references=False))
+        assert {p.bank_transaction_id: p.entry_line_ids for p in sin_referencias} == {2: [1], 1: [2]}
+
+    def test_carga_desde_bd(self, db):
+        db.add_all([
+            Company(id=1, name="Empresa"),
+            User(id=1, username="u", password_hash="x"),
+            Account(id=1, company_id=1, code="1041", name="Banco", type=AccountType.ASSET),
+            Period(id=1, company_id=1, year=2025, month=3),
+            BankAccount(id=1, company_id=1, account_id=1, bank_name="BCP", account_number="123"),
+            BankStatement(id=1, bank_account_id=1, period_id=1, statement_date=_dia(31),
+                          opening_balance=0, closing_balance=0, uploaded_by=1),
+            JournalEntry(id=1, company_id=1, date=D, period_id=1, status="POSTED"),
+            JournalEntry(id=2, company_id=1, date=D, period_id=1, status="DRAFT"),
+        ])
+        db.add_all([
+            EntryLine(id=1, entry_id=1, account_id=1, debit=Decimal("100"), credit=0),
+            EntryLine(id=2, entry_id=1, account_id=1, debit=Decimal("60"), credit=0),
+            EntryLine(id=3, entry_id=1, account_id=1, debit=Decimal("40"), credit=0),
+            EntryLine(id=4, entry_id=2, account_id=1, debit=Decimal("100"), credit=0),  # borrador
+        ])
+        db.add_all([
+            BankTransaction(id=1, statement_id=1, transaction_date=D, description="Depósito",
+                            debit=0, credit=Decimal("100"), balance=0),
+            # Ya conciliada contra las líneas 2 y 3
+            BankTransaction(id=2, statement_id=1, transaction_date=D, description="Depósito",
+                            debit=0, credit=Decimal("100"), balance=0, reconciled=True, entry_line_id=2),
+            BankTransaction(id=3, statement_id=1, transaction_date=D, description="Depósito",
+                            debit=0, credit=Decimal("100"), balance=0),
+        ])
+        db.add_all([
+            BankTransactionLine(bank_transaction_id=2, entry_line_id=2),
+            BankTransactionLine(bank_transaction_id=2, entry_line_id=3),
+        ])
+        db.commit()
+
+        propuestas = suggest_bank_matches(db, 1, 1, 1)
+        assert [(p.bank_transaction_id, p.entry_line_ids) for p in propuestas] == [(1, [1])]
@@ -0,0 +1,207 @@
+"""
+Tests del resumen incremental de conciliación bancaria
+
+Cubre:
+- Construcción inicial: saldo contable acumulado por período (solo POSTED)
+- Asientos nuevos o anulados marcan el período y se propagan a los siguientes
+- Match, match de varias líneas, bulk-match y desconciliación ajustan conteos
+- Una línea ya conciliada (1:1 o en un match de varias) no se concilia de nuevo
+- Importación de extractos y verificación del cierre contra un recuento
+- El GET del resumen no escribe: recuenta en memoria los períodos marcados
+"""
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app.domain.enums import AccountType, UserRole
+from app.domain.models import (
+    Account, BankAccount, BankReconciliationStats, BankStatement, BankTransaction,
+    Company, EntryLine, JournalEntry, Period, User,
+)
+from app.api.routers.bank_reconciliation import (
+    BulkMatchRequest,
+    FinalizeReconciliationRequest,
+    MatchRequest,
+    create_bulk_matches,
+    create_match,
+    finalize_reconciliation,
+    get_reconciliation_summary,
+    remove_match,
+)
+from app.application.bank_reconciliation_stats import (
+    refresh_stats,
+    register_bank_reconciliation_listeners,
+    verify_stats,
+)
+from app.application.bank_statement_import import import_bank_statement
+
+pytestmark = pytest.mark.sqlite(compartida=True)
+
+
+@pytest.fixture
+def db(db):
+    register_bank_reconciliation_listeners()
+    db.add_all([
+        Company(id=1, name="Empresa"),
+        User(id=1, username="u", password_hash="x", role=UserRole.ADMINISTRADOR),
+        Account(id=1, company_id=1, code="1041", name="Banco", type=AccountType.ASSET),
+        Account(id=2, company_id=1, code="1212", name="Clientes", type=AccountType.ASSET),
+        Period(id=1, company_id=1, year=2025, month=1),
+        Period(id=2, company_id=1, year=2025, month=2),
+        Period(id=3, company_id=1, year=2025, month=3),
+        BankAccount(id=1, company_id=1, account_id=1, bank_name="BCP", account_number="123"),
+    ])
+    db.commit()
+    return db
+
+
+def _asiento(db, period_id, monto, status="POSTED"):
+    """Cobro (monto > 0) o pago (monto < 0) por banco; devuelve la línea de la cuenta 1041."""
+    entry = JournalEntry(company_id=1, date=date(2025, period_id, 10), period_id=period_id, glosa="x", status=status)
+    banco = EntryLine(account_id=1, debit=max(monto, 0), credit=max(-monto, 0))
+    entry.lines.extend([banco, EntryLine(account_id=2, debit=max(-monto, 0), credit=max(monto, 0))])
+    db.add(entry)
+    db.commit()
+    return banco
+
+
+def _extracto(db, period_id, montos):
+    statement = BankStatement(bank_account_id=1, period_id=period_id, statement_date=date(2025, period_id, 28),
+                              opening_balance=0, closing_balance=sum(montos), uploaded_by=1)
+    statement.transactions = [
+        BankTransaction(transaction_date=date(2025, period_id, 10), description="mov", balance=0,
+                        debit=max(-m, 0), credit=max(m, 0), reconciled=False)
+        for m in montos
+    ]
+    db.add(statement)
+    db.commit()
+    return statement.transactions
+
+
+def _stats(db, period_id):
+    return refresh_stats(db, db.get(BankAccount, 1), db.get(Period, period_id))
+
+
+class TestBankReconciliationStats:
+
+    def test_construccion_y_saldo_acumulado(self, db):
+        _asiento(db, 1, Decimal("1000"))
+        _asiento(db, 1, Decimal("500"), status="DRAFT")
+        _asiento(db, 2, Decimal("-300"))
+        assert db.query(BankReconciliationStats).count() == 0
+
+        febrero = _stats(db, 2)
+        assert (febrero.book_movement, febrero.book_balance, febrero.book_lines) == (Decimal("-300"), Decimal("700"), 1)
+        assert _stats(db, 1).book_balance == Decimal("1000")
+        user = db.get(User, 1)
+        resumen = get_reconciliation_summary(1, 2, db, user)
+        assert (resumen.book_balance, resumen.unreconciled_lines) == (Decimal("700.0"), 1)
+
+    def test_asientos_marcan_y_propagan(self, db):
+        linea = _asiento(db, 1, Decimal("1000"))
+        _asiento(db, 2, Decimal("-300"))
+        assert _stats(db, 2).book_balance == Decimal("700")
+
+        # Asiento nuevo en enero: enero queda marcado y marzo (sin fila) se crea
+        _asiento(db, 1, Decimal("200"))
+        assert db.query(BankReconciliationStats).filter_by(period_id=1).one().stale
+        _asiento(db, 3, Decimal("50"))
+        assert _stats(db, 3).book_balance == Decimal("950")
+        assert _stats(db, 2).book_balance == Decimal("900")
+
+        # Anular y editar líneas también cuentan
+        linea.entry.status = "VOIDED"
+        db.commit()
+        assert _stats(db, 3).book_balance == Decimal("-50")
+        assert _stats(db, 1).book_lines == 1
+
+    def test_match_bulk_y_desconciliacion(self, db):
+        user = db.get(User, 1)
+        l1 = _asiento(db, 1, Decimal("100"))
+        l2 = _asiento(db, 1, Decimal("60"))
+        l3 = _asiento(db, 1, Decimal("40"))
+        l4 = _asiento(db, 1, Decimal("-25"))
+        t1, t2, t3 = _extracto(db, 1, [Decimal("100"), Decimal("100"), Decimal("-25")])
+        stats = _stats(db, 1)
+        db.commit()
+        assert (stats.book_lines, stats.book_lines_reconciled, stats.bank_transactions) == (4, 0, 3)
+
+        create_match(MatchRequest(bank_transaction_id=t1.id, entry_line_id=l1.id), db, user)
+        create_bulk_matches(BulkMatchRequest(matches=[
+            MatchRequest(bank_transaction_id=t2.id, entry_line_id=l2.id, entry_line_ids=[l2.id, l3.id]),
+            MatchRequest(bank_transaction_id=t3.id, entry_line_id=l4.id),
+        ]), db, user)
+        stats = db.query(BankReconciliationStats).filter_by(period_id=1).one()
+        db.refresh(stats)
+        assert not stats.stale
+        assert (stats.book_lines_reconciled, stats.bank_transactions_reconciled) == (4, 3)
+
+        remove_match(t2.id, db, user)
+        db.refresh(stats)
+        assert (stats.book_lines_reconciled, stats.bank_transactions_reconciled) == (2, 2)
+        assert verify_stats(db, db.get(BankAccount, 1), db.get(Period, 1)).book_lines_reconciled == 2
+
+    def test_linea_conciliada_no_se_reutiliza(self, db):
+        user = db.get(User, 1)
+        l1 = _asiento(db, 1, Decimal("100"))
+        l2 = _asiento(db, 1, Decimal("60"))
+        l3 = _asiento(db, 1, Decimal("40"))
+        t1, t2, t3 = _extracto(db, 1, [Decimal("100"), Decimal("100"), Decimal("40")])
+        create_match(MatchRequest(bank_transaction_id=t1.id, entry_line_id=l1.id), db, user)
+
+        # l1 está conciliada 1:1: no entra en un match de varias líneas ni en otro 1:1
+        with pytest.raises(HTTPException) as exc:
+            create_match(MatchRequest(bank_transaction_id=t2.id, entry_line_id=l1.id, entry_line_ids=[l1.id, l2.id]), db, user)
+        assert exc.value.status_code == 400
+        with pytest.raises(HTTPException):
+            create_match(MatchRequest(bank_transaction_id=t2.id, entry_line_id=l1.id), db, user)
+
+        # l3 dentro de un match de varias líneas tampoco se concilia 1:1 después
+        create_match(MatchRequest(bank_transaction_id=t2.id, entry_line_id=l2.id, entry_line_ids=[l2.id, l3.id]), db, user)
+        with pytest.raises(HTTPException):
+            create_match(MatchRequest(bank_transaction_id=t3.id, entry_line_id=l3.id), db, user)
+        assert not db.get(BankTransaction, t3.id).reconciled
+
+    def test_importacion_y_cierre_verifica(self, db):
+        user = db.get(User, 1)
+        _asiento(db, 1, Decimal("1500"))
+        assert _stats(db, 1).bank_transactions == 0
+        db.commit()
+
+        csv = "Fecha,Descripción,Monto,Saldo\n02/01/2025,ABONO,1500.00,1500.00\n"
+        import_bank_statement(db, 1, 1, 1, io.BytesIO(csv.encode()), "extracto.csv")
+        db.commit()
+        assert _stats(db, 1).bank_transactions == 1
+
+        # Cambio fuera de la sesión ORM: el resumen no lo ve, el cierre sí
+        db.execute(update(EntryLine).where(EntryLine.account_id == 1).values(debit=Decimal("1400")))
+        db.commit()
+        assert _stats(db, 1).book_balance == Decimal("1500")
+        resultado = finalize_reconciliation(1, 1, FinalizeReconciliationRequest(), db, user)
+        assert resultado["unreconciled_lines_warning"] == 1
+        assert _stats(db, 1).book_balance == Decimal("1400")
+
+    def test_resumen_get_no_escribe(self, db):
+        user = db.get(User, 1)
+        _asiento(db, 1, Decimal("1000"))
+        _asiento(db, 2, Decimal("-300"))
+
+        # Cuenta sin resumen: se calcula sin construir filas
+        resumen = get_reconciliation_summary(1, 2, db, user)
+        assert (resumen.book_balance, resumen.book_lines) == (Decimal("700.0"), 1)
+        assert db.query(BankReconciliationStats).count() == 0
+
+        # Períodos marcados: se recuentan en memoria y las filas siguen marcadas
+        _stats(db, 3)
+        db.commit()
+        _asiento(db, 1, Decimal("200"))
+        _asiento(db, 3, Decimal("50"))
+        resumen = get_reconciliation_summary(1, 3, db, user)
+        assert (resumen.book_balance, resumen.book_lines) == (Decimal("950.0"), 1)
+        assert get_reconciliation_summary(1, 2, db, user).book_balance == Decimal("900.0")
+        assert db.query(BankReconciliationStats).filter_by(stale=True).count() == 2
+        assert _stats(db, 3).book_balance == Decimal("950")
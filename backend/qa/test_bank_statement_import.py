@@ -0,0 +1,245 @@
+"""
+Tests de la importación masiva de extractos bancarios
+
+Cubre:
+- Normalización de montos y fechas de los formatos de bancos peruanos
+- CSV con preámbulo, separador ';', cp1252 y monto con signo
+- CSV con columnas Cargo/Abono y XLSX
+- MT940 (:61:/:86:, saldos) y OFX SGML
+- Carga por lotes: duplicados omitidos por huella, movimientos idénticos en
+  el mismo archivo, saldo corrido y reimportación sin cambios
+- Huella única: un lote que pierde la carrera con otra importación se vuelve
+  a filtrar en lugar de duplicar o fallar
+"""
+import io
+from datetime import date
+from decimal import Decimal
+
+import openpyxl
+import pytest
+from sqlalchemy import false, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.domain.enums import AccountType
+from app.domain.models import Account, BankAccount, BankStatement, BankTransaction, Company, Period, User
+from app.application.bank_statement_import import import_bank_statement
+from app.infrastructure.bank_statement_parser import (
+    FORMAT_MT940,
+    FORMAT_OFX,
+    FORMAT_XLSX,
+    BankStatementReader,
+    parse_amount,
+    parse_date,
+)
+
+CSV_BCP = (
+    "Cuenta;191-12345678-0-12\r\n"
+    "Moneda;Soles\r\n"
+    "\r\n"
+    "Fecha;Fecha valuta;Descripción operación;Monto;Saldo;Sucursal - agencia;Operación - Número\r\n"
+    "02/01/2025;02/01/2025;ABONO TRANSF. CLIENTE;1.500,00;11.500,00;191;000123\r\n"
+    "03/01/2025;03/01/2025;COMISIÓN MANTENIMIENTO;-15,50;11.484,50;191;\r\n"
+    "Total;;;;;;\r\n"
+)
+
+MT940 = """{1:F01BCPLPEPLAXXX0000000000}{2:I940BCPLPEPLXXXXN}{4:
+:20:STMT0001
+:25:19112345678012
+:28C:1/1
+:60F:C250101PEN10000,00
+:61:2501020102C1500,00NTRFCLI-001//BK123
+:86:ABONO TRANSFERENCIA
+CLIENTE SAC
+:61:250103D15,50NCHGNONREF//BK124
+:86:COMISION MANTENIMIENTO
+:62F:C250131PEN11484,50
+-}"""
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<BANKTRANLIST>
+<DTSTART>20250101
+<DTEND>20250131
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20250102120000[-5:PET]
+<TRNAMT>1500.00
+<FITID>A1
+<NAME>Cliente SAC
+<MEMO>Transferencia
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250103
+<TRNAMT>-15.50
+<FITID>A2
+<NAME>Comision
+</STMTTRN>
+</BANKTRANLIST>
+<LEDGERBAL><BALAMT>11484.50<DTASOF>20250131</LEDGERBAL>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        Company(id=1, name="Empresa"),
+        User(id=1, username="u", password_hash="x"),
+        Account(id=1, company_id=1, code="1041", name="Banco", type=AccountType.ASSET),
+        Period(id=1, company_id=1, year=2025, month=1),
+        BankAccount(id=1, company_id=1, account_id=1, bank_name="BCP", account_number="123"),
+    ])
+    db.commit()
+    return db
+
+
+def _leer(contenido, nombre="extracto.csv"):
+    datos = contenido if isinstance(contenido, bytes) else contenido.encode("utf-8")
+    reader = BankStatementReader(io.BytesIO(datos), nombre)
+    return reader, list(reader)
+
+
+class TestBankStatementImport:
+
+    def test_montos_y_fechas(self):
+        assert parse_amount("1,234.56") == Decimal("1234.56")
+        assert parse_amount("1.234,56") == Decimal("1234.56")
+        assert parse_amount("S/ -1,500.00") == Decimal("-1500.00")
+        assert parse_amount("(250.00)") == Decimal("-250.00")
+        assert parse_amount("250.00-") == Decimal("-250.00")
+        assert parse_amount("1.234.567") == Decimal("1234567")
+        assert parse_amount("15,5") == Decimal("15.5")
+        assert parse_amount("") is None and parse_amount("abc") is None
+        assert parse_date("05/01/2025") == date(2025, 1, 5)
+        assert parse_date("2025-01-05 10:30:00") == date(2025, 1, 5)
+        assert parse_date("05-ENE-2025") == date(2025, 1, 5)
+        assert parse_date("05/01/25") == date(2025, 1, 5)
+        assert parse_date("Total") is None
+
+    def test_csv_con_preambulo_y_monto_con_signo(self):
+        reader, filas = _leer(CSV_BCP.encode("cp1252"))
+        assert reader.format == "CSV"
+        assert len(filas) == 2 and reader.skipped_rows == 1
+        abono, cargo = filas
+        assert (abono["transaction_date"], abono["credit"], abono["debit"]) == (date(2025, 1, 2), Decimal("1500.00"), 0)
+        assert abono["description"] == "ABONO TRANSF. CLIENTE"
+        assert abono["reference"] == "000123" and abono["balance"] == Decimal("11500.00")
+        assert (cargo["debit"], cargo["credit"], cargo["reference"]) == (Decimal("15.50"), 0, None)
+        assert cargo["description"] == "COMISIÓN MANTENIMIENTO"
+
+    def test_csv_cargo_abono_y_xlsx(self):
+        cabecera = ["Fecha de operación", "Descripción", "Nro. Operación", "Cargo S/", "Abono S/", "Saldo S/"]
+        filas = [
+            ["02/01/2025", "DEPOSITO", "555", "", "1,500.00", "11,500.00"],
+            ["03/01/2025", "PAGO PROVEEDOR", "556", "300.00", "", "11,200.00"],
+        ]
+        _, csv_filas = _leer("\n".join(",".join(f'"{c}"' for c in f) for f in [cabecera] + filas))
+        assert [(f["debit"], f["credit"]) for f in csv_filas] == [(0, Decimal("1500.00")), (Decimal("300.00"), 0)]
+        assert csv_filas[1]["reference"] == "556"
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["Movimientos cuenta corriente"])
+        ws.append(["F. Operación", "Concepto", "Importe", "Saldo"])
+        ws.append([date(2025, 1, 2), "DEPOSITO", 1500.0, 11500.0])
+        ws.append([date(2025, 1, 3), "COMISION", -15.5, 11484.5])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        reader, xlsx_filas = _leer(buffer.getvalue(), "movimientos.xlsx")
+        assert reader.format == FORMAT_XLSX
+        assert [(f["transaction_date"], f["debit"], f["credit"]) for f in xlsx_filas] == [
+            (date(2025, 1, 2), 0, Decimal("1500.0")),
+            (date(2025, 1, 3), Decimal("15.5"), 0),
+        ]
+
+    def test_mt940(self):
+        reader, filas = _leer(MT940, "extracto.sta")
+        assert reader.format == FORMAT_MT940
+        assert len(filas) == 2
+        assert (filas[0]["credit"], filas[0]["reference"]) == (Decimal("1500.00"), "CLI-001")
+        assert filas[0]["description"] == "ABONO TRANSFERENCIA CLIENTE SAC"
+        assert (filas[1]["debit"], filas[1]["reference"]) == (Decimal("15.50"), "BK124")
+        assert (reader.opening_balance, reader.closing_balance) == (Decimal("10000.00"), Decimal("11484.50"))
+        assert reader.statement_date == date(2025, 1, 31)
+
+    def test_ofx(self):
+        reader, filas = _leer(OFX, "extracto.ofx")
+        assert reader.format == FORMAT_OFX
+        assert [(f["transaction_date"], f["debit"], f["credit"], f["reference"]) for f in filas] == [
+            (date(2025, 1, 2), 0, Decimal("1500.00"), "A1"),
+            (date(2025, 1, 3), Decimal("15.50"), 0, "A2"),
+        ]
+        assert filas[0]["description"] == "Cliente SAC Transferencia"
+        assert (reader.closing_balance, reader.statement_date) == (Decimal("11484.50"), date(2025, 1, 31))
+
+    def test_carga_por_lotes_y_duplicados(self, db):
+        resultado = import_bank_statement(db, 1, 1, 1, io.BytesIO(MT940.encode()), "extracto.sta", chunk_size=1)
+        db.commit()
+        assert (resultado["imported"], resultado["duplicates"]) == (2, 0)
+        statement = db.get(BankStatement, resultado["statement_id"])
+        assert (statement.opening_balance, statement.closing_balance) == (Decimal("10000.00"), Decimal("11484.50"))
+        assert statement.statement_date == date(2025, 1, 31)
+        saldos = [t.balance for t in db.query(BankTransaction).order_by(BankTransaction.id)]
+        assert saldos == [Decimal("11500.00"), Decimal("11484.50")]
+
+        # El mismo archivo otra vez: nada nuevo y no se crea otro extracto
+        otra_vez = import_bank_statement(db, 1, 1, 1, io.BytesIO(MT940.encode()), "extracto.sta")
+        db.commit()
+        assert (otra_vez["statement_id"], otra_vez["imported"], otra_vez["duplicates"]) == (None, 0, 2)
+        assert db.query(BankStatement).count() == 1
+
+        # Dos comisiones idénticas en un archivo se cargan ambas; la ya existente se omite
+        csv = (
+            "Fecha,Descripción,Monto\n"
+            "03/01/2025,COMISION ITF,-0.05\n"
+            "03/01/2025,COMISION ITF,-0.05\n"
+            "04/01/2025,COMISION ITF,-0.05\n"
+        )
+        primero = import_bank_statement(db, 1, 1, 1, io.BytesIO(csv.encode()), "a.csv", opening_balance=Decimal("100"))
+        db.commit()
+        assert primero["imported"] == 3
+        segundo = import_bank_statement(
+            db, 1, 1, 1, io.BytesIO((csv + "05/01/2025,COMISION ITF,-0.05\n").encode()), "b.csv"
+        )
+        db.commit()
+        assert (segundo["imported"], segundo["duplicates"]) == (1, 3)
+        assert db.query(BankTransaction).count() == 6
+        ultimo = db.get(BankStatement, primero["statement_id"])
+        assert (ultimo.closing_balance, ultimo.statement_date) == (Decimal("99.85"), date(2025, 1, 4))
+
+    def test_huella_unica_y_carrera(self, db, monkeypatch):
+        csv = "Fecha,Descripción,Monto\n03/01/2025,COMISION ITF,-0.05\n04/01/2025,ABONO,10.00\n"
+        primero = import_bank_statement(db, 1, 1, 1, io.BytesIO(csv.encode()), "a.csv", opening_balance=Decimal("100"))
+        db.commit()
+        existente = db.query(BankTransaction).first()
+        with pytest.raises(IntegrityError):
+            db.execute(insert(BankTransaction.__table__).values(
+                statement_id=primero["statement_id"], transaction_date=date(2025, 1, 3), description="x",
+                balance=0, fingerprint=existente.fingerprint,
+            ))
+        db.rollback()
+
+        # La primera consulta de huellas no ve las cargadas (como otra importación en curso)
+        execute = db.execute
+        cegadas = []
+
+        def execute_con_carrera(stmt, *args, **kwargs):
+            if not cegadas and str(stmt).startswith("SELECT bank_transactions.fingerprint"):
+                cegadas.append(stmt)
+                stmt = select(BankTransaction.fingerprint).where(false())
+            return execute(stmt, *args, **kwargs)
+
+        monkeypatch.setattr(db, "execute", execute_con_carrera)
+        segundo = import_bank_statement(
+            db, 1, 1, 1, io.BytesIO((csv + "05/01/2025,COMISION ITF,-0.05\n").encode()), "b.csv"
+        )
+        db.commit()
+        assert cegadas
+        assert (segundo["imported"], segundo["duplicates"]) == (1, 2)
+        assert db.query(BankTransaction).count() == 3
@@ -0,0 +1,147 @@
+"""
+Tests del almacén de contenido direccionado por hash
+
+Cubre:
+- Uploads con el mismo contenido: un solo archivo y un blob con dos referencias
+- Borrado definitivo: libera la referencia; el archivo se purga tras la gracia
+- Volver a subir un contenido liberado lo reutiliza
+- Archivo escrito por una transacción sin commit: queda pendiente y la purga lo elimina
+- Archivo pendiente adoptado por un commit posterior: la purga solo quita la marca
+- Adjuntos de la casilla en el mismo almacén (y adjuntos anteriores en su ruta)
+"""
+import pytest
+
+from app.domain.enums import UserRole
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import StoredBlob
+from app.domain.models_mailbox import ElectronicMailbox, MailboxAttachment, MailboxMessage
+from app.infrastructure.storage import LocalFileStorage
+from app.application.blob_store import (
+    BlobStore,
+    blob_path,
+    pending_marker_path,
+    purge_unreferenced_blobs,
+    register_blob_store_listeners,
+)
+from app.application.services_documents_v2 import DocumentService
+from app.application.services_mailbox import add_message_attachment
+from app.api.routers import mailbox as mailbox_router
+
+XML = b"<?xml version='1.0'?><Invoice><ID>F001-77</ID></Invoice>"
+
+
+@pytest.fixture
+def db(db):
+    register_blob_store_listeners()
+    db.add_all([Company(id=1, name="Empresa"),
+                User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True)])
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalFileStorage(base_path=str(tmp_path))
+
+
+def _subir(db, storage, nombre="factura.xml", contenido=XML):
+    document, _ = DocumentService(db, storage).upload_document(
+        company_id=1, user_id=1, file_content=contenido, filename=nombre,
+        mime_type="application/xml", document_type="COMPROBANTE_COMPRA",
+    )
+    db.commit()
+    return document
+
+
+def _archivos(tmp_path):
+    return sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file())
+
+
+class TestBlobStore:
+
+    def test_mismo_contenido_una_copia(self, db, storage, tmp_path):
+        a = _subir(db, storage)
+        b = _subir(db, storage, nombre="copia.xml")
+        otro = _subir(db, storage, contenido=b"<Invoice/>")
+
+        assert a.blob_id == b.blob_id != otro.blob_id
+        assert a.file_path == b.file_path == blob_path(a.file_hash)
+        assert a.stored_filename != b.stored_filename and b.is_duplicate
+        assert db.get(StoredBlob, a.blob_id).ref_count == 2
+        assert _archivos(tmp_path) == sorted([a.file_path, otro.file_path])
+        assert storage.get(b.file_path) == XML
+
+        DocumentService(db, storage).delete_document(b.id, 1)  # El soft delete conserva la referencia
+        assert db.get(StoredBlob, a.blob_id).ref_count == 2
+
+    def test_borrado_y_purga(self, db, storage, tmp_path, monkeypatch):
+        a = _subir(db, storage)
+        b = _subir(db, storage)
+        service = DocumentService(db, storage)
+
+        service.delete_document(a.id, 1, soft_delete=False)
+        blob = db.get(StoredBlob, b.blob_id)
+        db.refresh(blob)
+        assert (blob.ref_count, blob.released_at) == (1, None)
+
+        service.delete_document(b.id, 1, soft_delete=False)
+        db.refresh(blob)
+        assert blob.ref_count == 0 and blob.released_at is not None
+        assert purge_unreferenced_blobs(db, storage, grace_hours=1) == 0
+        assert storage.exists(blob.blob_path)
+
+        # Se vuelve a subir dentro de la gracia: reutiliza el blob
+        c = _subir(db, storage)
+        db.refresh(blob)
+        assert (c.blob_id, blob.ref_count, blob.released_at) == (blob.id, 1, None)
+
+        DocumentService(db, storage).delete_document(c.id, 1, soft_delete=False)
+        # El archivo se borra con la fila aún bloqueada (antes del commit de la purga)
+        en_transaccion = []
+        borrar = storage.delete
+        monkeypatch.setattr(storage, "delete", lambda path: en_transaccion.append(db.in_transaction()) or borrar(path))
+        assert purge_unreferenced_blobs(db, storage, grace_hours=0) == 1
+        assert en_transaccion and all(en_transaccion)
+        assert db.query(StoredBlob).count() == 0 and _archivos(tmp_path) == []
+
+    def test_rollback_deja_pendiente_y_se_purga(self, db, storage, tmp_path):
+        blob = BlobStore(db, storage).put(XML)
+        path, sha256 = blob.blob_path, blob.sha256
+        db.rollback()
+        assert db.query(StoredBlob).count() == 0
+        assert _archivos(tmp_path) == sorted([path, pending_marker_path(sha256)])
+
+        assert purge_unreferenced_blobs(db, storage, grace_hours=1) == 0
+        assert purge_unreferenced_blobs(db, storage, grace_hours=0) == 1
+        assert db.query(StoredBlob).count() == 0 and _archivos(tmp_path) == []
+
+    def test_pendiente_adoptado_por_otro_commit(self, db, storage, tmp_path):
+        BlobStore(db, storage).put(XML)
+        db.rollback()
+        a = _subir(db, storage)  # El archivo ya existe: se reutiliza y el commit crea la fila
+        assert _archivos(tmp_path) == sorted([a.file_path, pending_marker_path(a.file_hash)])
+
+        assert purge_unreferenced_blobs(db, storage, grace_hours=0) == 0
+        assert _archivos(tmp_path) == [a.file_path]
+        assert storage.get(a.file_path) == XML
+        assert db.get(StoredBlob, a.blob_id).ref_count == 1
+
+    def test_adjuntos_de_casilla(self, db, storage, monkeypatch):
+        monkeypatch.setattr(mailbox_router, "get_blob_storage", lambda: storage)
+        documento = _subir(db, storage)
+        mailbox = ElectronicMailbox(company_id=1)
+        db.add(mailbox)
+        db.flush()
+        msg = MailboxMessage(mailbox_id=mailbox.id, subject="Factura", body="Adjunta", message_type="DOCUMENTO")
+        db.add(msg)
+        db.commit()
+
+        blob = BlobStore(db, storage).put(XML)
+        att = add_message_attachment(db, msg.id, "f.xml", blob.blob_path, "application/xml",
+                                     file_hash=blob.sha256, file_size_bytes=len(XML), blob_id=blob.id)
+        assert blob.id == documento.blob_id and db.get(StoredBlob, blob.id).ref_count == 2
+        assert mailbox_router._attachment_full_path(att) == storage.get_full_path(documento.file_path)
+
+        anterior = MailboxAttachment(message_id=msg.id, file_name="viejo.pdf", file_path="1/messages/1/abc_viejo.pdf",
+                                     file_type="application/pdf")
+        assert str(mailbox_router._attachment_full_path(anterior)).endswith("mailbox/1/messages/1/abc_viejo.pdf")
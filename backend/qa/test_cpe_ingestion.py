@@ -0,0 +1,242 @@
+"""
+Tests de la importación de comprobantes de compra desde un ZIP de XML UBL
+
+Cubre:
+- Parseo en streaming: cabecera, líneas, IGV solo del tributo 1000, errores
+- Compras con líneas, asientos cuadrados con correlativos consecutivos y el XML
+  como documento vinculado a la compra
+- Proveedores resueltos por RUC (existentes) y creados en bloque (nuevos)
+- Rechazos por archivo: XML inválido, nota de crédito, emitido a otra empresa
+- Reimportación sin duplicados
+- Período cerrado: el lote se reintenta uno por uno y solo falla ese comprobante
+- RUC con espacios en terceros: el proveedor sigue ganando sobre el cliente
+- Lote fallido: los XML ya guardados quedan pendientes y la purga los elimina
+"""
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func
+
+from app.domain.enums import AccountType, UserRole
+from app.domain.models import Account, Company, EntryLine, JournalEntry, Period, ThirdParty, User
+from app.domain.models_documents_v2 import Document
+from app.domain.models_ext import Purchase
+from app.domain.models_journal_engine import EventoContable, ReglaContable, TipoCuentaMapeo
+from app.infrastructure.storage import LocalFileStorage
+from app.application import cpe_ingestion
+from app.application.blob_store import purge_unreferenced_blobs, register_blob_store_listeners
+from app.application.cpe_ingestion import CpeParseError, import_cpe_zip, parse_ubl_invoice
+
+pytestmark = pytest.mark.sqlite(archivo=True)
+
+RUC_EMPRESA = "20100000001"
+
+
+def _xml(numero, ruc="20512345678", nombre="Aceros del Sur SAC", fecha="2025-01-15",
+         cliente=RUC_EMPRESA, lineas=((2, "100.00", "Cemento"),), icbper="0.00", raiz="Invoice"):
+    detalle, base = [], Decimal("0")
+    for i, (cantidad, precio, descripcion) in enumerate(lineas, start=1):
+        valor = Decimal(precio) * cantidad
+        base += valor
+        detalle.append(f"""
+  <cac:InvoiceLine>
+    <cbc:ID>{i}</cbc:ID>
+    <cbc:InvoicedQuantity unitCode="NIU">{cantidad}</cbc:InvoicedQuantity>
+    <cbc:LineExtensionAmount currencyID="PEN">{valor:.2f}</cbc:LineExtensionAmount>
+    <cac:TaxTotal><cbc:TaxAmount currencyID="PEN">{valor * Decimal('0.18'):.2f}</cbc:TaxAmount>
+      <cac:TaxSubtotal><cbc:TaxAmount currencyID="PEN">{valor * Decimal('0.18'):.2f}</cbc:TaxAmount>
+        <cac:TaxCategory><cac:TaxScheme><cbc:ID>1000</cbc:ID></cac:TaxScheme></cac:TaxCategory>
+      </cac:TaxSubtotal></cac:TaxTotal>
+    <cac:Item><cbc:Description>{descripcion}</cbc:Description></cac:Item>
+    <cac:Price><cbc:PriceAmount currencyID="PEN">{precio}</cbc:PriceAmount></cac:Price>
+  </cac:InvoiceLine>""")
+    igv = (base * Decimal("0.18")).quantize(Decimal("0.01"))
+    total = base + igv + Decimal(icbper)
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<{raiz} xmlns="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2"
+  xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2"
+  xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2"
+  xmlns:ext="urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2"
+  xmlns:ds="http://www.w3.org/2000/09/xmldsig#">
+  <ext:UBLExtensions><ext:UBLExtension><ext:ExtensionContent>
+    <ds:Signature Id="SIGN"><ds:SignatureValue>{'A' * 2000}</ds:SignatureValue></ds:Signature>
+  </ext:ExtensionContent></ext:UBLExtension></ext:UBLExtensions>
+  <cbc:UBLVersionID>2.1</cbc:UBLVersionID>
+  <cbc:ID>{numero}</cbc:ID>
+  <cbc:IssueDate>{fecha}</cbc:IssueDate>
+  <cbc:InvoiceTypeCode listID="0101">01</cbc:InvoiceTypeCode>
+  <cbc:DocumentCurrencyCode>PEN</cbc:DocumentCurrencyCode>
+  <cac:Signature><cbc:ID>IDSignKG</cbc:ID></cac:Signature>
+  <cac:AccountingSupplierParty><cac:Party>
+    <cac:PartyIdentification><cbc:ID schemeID="6">{ruc}</cbc:ID></cac:PartyIdentification>
+    <cac:PartyLegalEntity><cbc:RegistrationName>{nombre}</cbc:RegistrationName></cac:PartyLegalEntity>
+  </cac:Party></cac:AccountingSupplierParty>
+  <cac:AccountingCustomerParty><cac:Party>
+    <cac:PartyIdentification><cbc:ID schemeID="6">{cliente}</cbc:ID></cac:PartyIdentification>
+  </cac:Party></cac:AccountingCustomerParty>
+  <cac:TaxTotal>
+    <cbc:TaxAmount currencyID="PEN">{igv + Decimal(icbper):.2f}</cbc:TaxAmount>
+    <cac:TaxSubtotal><cbc:TaxAmount currencyID="PEN">{igv:.2f}</cbc:TaxAmount>
+      <cac:TaxCategory><cac:TaxScheme><cbc:ID>1000</cbc:ID><cbc:Name>IGV</cbc:Name></cac:TaxScheme></cac:TaxCategory>
+    </cac:TaxSubtotal>
+    <cac:TaxSubtotal><cbc:TaxAmount currencyID="PEN">{icbper}</cbc:TaxAmount>
+      <cac:TaxCategory><cac:TaxScheme><cbc:ID>7152</cbc:ID><cbc:Name>ICBPER</cbc:Name></cac:TaxScheme></cac:TaxCategory>
+    </cac:TaxSubtotal>
+  </cac:TaxTotal>
+  <cac:LegalMonetaryTotal><cbc:PayableAmount currencyID="PEN">{total:.2f}</cbc:PayableAmount></cac:LegalMonetaryTotal>
+  {''.join(detalle)}
+</{raiz}>""".encode("utf-8")
+
+
+def _zip(tmp_path, archivos, nombre="compras.zip"):
+    ruta = tmp_path / nombre
+    with zipfile.ZipFile(ruta, "w", zipfile.ZIP_DEFLATED) as zf:
+        for archivo, contenido in archivos.items():
+            zf.writestr(archivo, contenido)
+    return ruta
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        Company(id=1, name="Empresa", ruc=RUC_EMPRESA),
+        User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True),
+        Account(id=1, company_id=1, code="60.11", name="Compras", type=AccountType.EXPENSE),
+        Account(id=2, company_id=1, code="40.11", name="IGV", type=AccountType.ASSET),
+        Account(id=3, company_id=1, code="42.12", name="Proveedores", type=AccountType.LIABILITY),
+        EventoContable(id=1, company_id=1, tipo="COMPRA", nombre="Compra"),
+        ThirdParty(id=7, company_id=1, tax_id="20512345678", name="Aceros del Sur SAC", type="PROVEEDOR"),
+    ])
+    for orden, (lado, tipo_cuenta, tipo_monto, account_id) in enumerate([
+        ("DEBE", "GASTO_COMPRAS", "BASE", 1), ("DEBE", "IGV_CREDITO", "IGV", 2), ("HABER", "PROVEEDORES", "TOTAL", 3),
+    ], start=1):
+        db.add(ReglaContable(evento_id=1, company_id=1, lado=lado, tipo_cuenta=tipo_cuenta,
+                             tipo_monto=tipo_monto, orden=orden))
+        db.add(TipoCuentaMapeo(company_id=1, tipo_cuenta=tipo_cuenta, account_id=account_id))
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalFileStorage(base_path=str(tmp_path / "documents"))
+
+
+class TestParseUbl:
+
+    def test_cabecera_y_lineas(self):
+        cpe = parse_ubl_invoice(_xml("F001-00000123", lineas=((2, "100.00", "Cemento"), (1, "50.00", "Arena")),
+                                     icbper="0.50"))
+        assert (cpe.doc_type, cpe.series, cpe.number) == ("01", "F001", "00000123")
+        assert (cpe.issue_date, cpe.currency, cpe.supplier_ruc) == (date(2025, 1, 15), "PEN", "20512345678")
+        assert cpe.customer_ruc == RUC_EMPRESA
+        # El ICBPER no es IGV: queda en la base para que el asiento cuadre
+        assert (cpe.igv_amount, cpe.total_amount, cpe.base_amount) == (
+            Decimal("45.00"), Decimal("295.50"), Decimal("250.50"))
+        assert [(l.description, l.quantity, l.base_amount, l.igv_amount) for l in cpe.lines] == [
+            ("Cemento", Decimal("2"), Decimal("200.00"), Decimal("36.00")),
+            ("Arena", Decimal("1"), Decimal("50.00"), Decimal("9.00")),
+        ]
+
+    def test_errores(self):
+        with pytest.raises(CpeParseError):
+            parse_ubl_invoice(b"<Invoice><cbc:ID>")
+        with pytest.raises(CpeParseError, match="no soportado"):
+            parse_ubl_invoice(_xml("FC01-1", raiz="CreditNote"))
+        with pytest.raises(CpeParseError, match="Serie"):
+            parse_ubl_invoice(_xml("SINGUION"))
+
+
+class TestImportCpeZip:
+
+    def test_importa_compras_asientos_y_documentos(self, db, storage, tmp_path):
+        ruta = _zip(tmp_path, {
+            "enero/F001-1.xml": _xml("F001-1", fecha="2025-01-20"),
+            "enero/F001-2.xml": _xml("F001-2", fecha="2025-01-10", lineas=((3, "10.00", "Clavos"),)),
+            "E001-9.xml": _xml("E001-9", ruc="20600000009", nombre="Ferretería Norte EIRL"),
+            "roto.xml": b"<Invoice>",
+            "nota.xml": _xml("FC01-1", raiz="CreditNote"),
+            "ajena.xml": _xml("F001-3", cliente="20999999999"),
+            "leeme.txt": b"no es xml",
+        })
+        result = import_cpe_zip(db, storage, ruta, company_id=1, user_id=1, batch_size=2)
+
+        assert (result.total, result.created, result.duplicates, result.suppliers_created) == (6, 3, 0, 1)
+        assert sorted(e["file"] for e in result.errors) == ["ajena.xml", "nota.xml", "roto.xml"]
+
+        nuevo = db.query(ThirdParty).filter_by(tax_id="20600000009").one()
+        assert (nuevo.name, nuevo.type, nuevo.tax_id_type) == ("Ferretería Norte EIRL", "PROVEEDOR", "6")
+
+        compra = db.query(Purchase).filter_by(series="F001", number="2").one()
+        assert compra.supplier_id == 7 and compra.total_amount == Decimal("35.40")
+        assert [(l.description, l.quantity) for l in compra.lines] == [("Clavos", Decimal("3"))]
+
+        entry = db.get(JournalEntry, compra.journal_entry_id)
+        assert (entry.origin, entry.status, entry.date) == ("COMPRAS", "POSTED", date(2025, 1, 10))
+        lineas = db.query(EntryLine).filter_by(entry_id=entry.id).all()
+        assert sum(l.debit for l in lineas) == sum(l.credit for l in lineas) == Decimal("35.40")
+
+        # Correlativos consecutivos, en orden de fecha de emisión
+        asientos = db.query(JournalEntry).order_by(JournalEntry.date, JournalEntry.id).all()
+        assert sorted(a.correlative for a in asientos) == ["02-01-00001", "02-01-00002", "02-01-00003"]
+        assert asientos[0].id == compra.journal_entry_id and asientos[0].correlative == "02-01-00001"
+
+        documento = db.query(Document).filter_by(related_entity_type="PURCHASE", related_entity_id=compra.id).one()
+        assert documento.original_filename == "F001-2.xml" and storage.get(documento.file_path).startswith(b"<?xml")
+        assert documento.extracted_data_rel.extracted_data["ruc_emisor"] == "20512345678"
+        assert "F001-2" in documento.search_text
+
+    def test_reimportar_omite_duplicados(self, db, storage, tmp_path):
+        ruta = _zip(tmp_path, {"a.xml": _xml("F001-1"), "b.xml": _xml("F001-2"), "copia.xml": _xml("F001-1")})
+        primera = import_cpe_zip(db, storage, ruta, company_id=1, user_id=1)
+        assert (primera.created, primera.duplicates) == (2, 1)
+
+        segunda = import_cpe_zip(db, storage, ruta, company_id=1, user_id=1)
+        assert (segunda.created, segunda.duplicates) == (0, 3)
+        assert db.query(func.count(Purchase.id)).scalar() == 2
+        assert db.query(func.count(JournalEntry.id)).scalar() == 2
+
+    def test_periodo_cerrado_solo_rechaza_ese_comprobante(self, db, storage, tmp_path):
+        db.add(Period(company_id=1, year=2024, month=12, status="CERRADO"))
+        db.commit()
+        ruta = _zip(tmp_path, {
+            "a.xml": _xml("F001-1"),
+            "diciembre.xml": _xml("F001-2", fecha="2024-12-30"),
+            "b.xml": _xml("F001-3"),
+        })
+        result = import_cpe_zip(db, storage, ruta, company_id=1, user_id=1)
+        assert result.created == 2
+        assert [e["file"] for e in result.errors] == ["diciembre.xml"] and "cerrado" in result.errors[0]["error"]
+        assert db.query(func.count(JournalEntry.id)).scalar() == 2
+
+    def test_sin_crear_proveedores(self, db, storage, tmp_path):
+        ruta = _zip(tmp_path, {"a.xml": _xml("F001-1"), "b.xml": _xml("E001-1", ruc="20600000009")})
+        result = import_cpe_zip(db, storage, ruta, company_id=1, user_id=1, create_suppliers=False)
+        assert result.created == 1 and result.suppliers_created == 0
+        assert "no registrado" in result.errors[0]["error"]
+
+    def test_ruc_con_espacios_prefiere_proveedor(self, db, storage, tmp_path):
+        db.add(ThirdParty(id=8, company_id=1, tax_id="20512345678 ", name="Aceros (cliente)", type="CLIENTE"))
+        db.commit()
+        result = import_cpe_zip(db, storage, _zip(tmp_path, {"a.xml": _xml("F001-1")}), company_id=1, user_id=1)
+        assert result.created == 1 and result.suppliers_created == 0
+        assert db.query(Purchase).one().supplier_id == 7
+
+    def test_lote_fallido_no_deja_archivos(self, db, storage, tmp_path, monkeypatch):
+        register_blob_store_listeners()
+        original = cpe_ingestion.CpeImporter.import_batch
+
+        def falla_al_final(self, items, result):
+            original(self, items, result)
+            raise RuntimeError("falla antes del commit")
+
+        monkeypatch.setattr(cpe_ingestion.CpeImporter, "import_batch", falla_al_final)
+        with pytest.raises(RuntimeError):
+            import_cpe_zip(db, storage, _zip(tmp_path, {"a.xml": _xml("F001-1")}), company_id=1, user_id=1)
+        assert db.query(func.count(Document.id)).scalar() == 0
+        assert any(p.is_file() for p in (tmp_path / "documents" / "blobs").rglob("*"))
+
+        assert purge_unreferenced_blobs(db, storage, grace_hours=0) == 1
+        assert not any(p.is_file() for p in (tmp_path / "documents").rglob("*"))
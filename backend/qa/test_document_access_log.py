@@ -0,0 +1,138 @@
+"""
+Tests del registro de accesos a documentos en segundo plano
+
+Cubre:
+- Sin el hilo en marcha: la vista se registra en la transacción (como antes)
+- Con el hilo: la vista no escribe; se inserta por lote al juntar el tamaño de
+  lote o al vencer el intervalo, y al detener se vacía lo pendiente
+- Cola llena: el request que la llena la vacía
+- Documento eliminado mientras su acceso esperaba: se descarta solo ese acceso
+- Error al insertar: los accesos vuelven a la cola hasta el tope y los más
+  antiguos que no caben se cuentan como descartados
+"""
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from app.domain.enums import UserRole
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import DocumentAccessLog
+from app.infrastructure.storage import LocalFileStorage
+from app.application import services_documents_v2
+from app.application.document_access_log import DocumentAccessLogBuffer
+from app.application.services_documents_v2 import DocumentService
+
+pytestmark = pytest.mark.sqlite(archivo=True, foreign_keys=True)
+
+
+@pytest.fixture
+def factory(session_factory):
+    session = session_factory()
+    session.add_all([Company(id=1, name="Empresa"),
+                     User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True)])
+    session.commit()
+    session.close()
+    return session_factory
+
+
+@pytest.fixture
+def service(factory, tmp_path):
+    db = factory()
+    yield DocumentService(db, LocalFileStorage(base_path=str(tmp_path / "documents")))
+    db.close()
+
+
+def _subir(service, nombre="a.txt"):
+    document, _ = service.upload_document(
+        company_id=1, user_id=1, file_content=f"contenido {nombre}".encode(), filename=nombre,
+        mime_type="text/plain", document_type="OTRO",
+    )
+    service.db.commit()
+    return document
+
+
+def _vistas(factory):
+    with factory() as db:
+        return db.execute(select(func.count()).where(DocumentAccessLog.action == "VIEW")).scalar()
+
+
+def _esperar(condicion, segundos=3.0):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestDocumentAccessLog:
+
+    def test_sincrono_sin_hilo(self, factory, service, monkeypatch):
+        monkeypatch.setattr(services_documents_v2, "access_log_buffer", DocumentAccessLogBuffer(factory))
+        doc = _subir(service)
+        service.get_document(doc.id, 1)
+        service.db.commit()
+        assert _vistas(factory) == 1
+
+    def test_por_lotes_en_segundo_plano(self, factory, service, monkeypatch):
+        buffer = DocumentAccessLogBuffer(factory, flush_ms=60_000, batch_size=3, max_queue=100)
+        monkeypatch.setattr(services_documents_v2, "access_log_buffer", buffer)
+        doc = _subir(service)
+        buffer.start()
+        try:
+            service.get_document(doc.id, 1)
+            service.get_document(doc.id, 1)
+            assert not service.db.new and buffer.pending == 2
+            assert _vistas(factory) == 0  # la lectura no escribió
+
+            service.get_document(doc.id, 1)  # completa el lote: el hilo lo inserta sin esperar el intervalo
+            assert _esperar(lambda: _vistas(factory) == 3)
+
+            service.get_document(doc.id, 1)
+        finally:
+            buffer.stop()
+        assert _vistas(factory) == 4 and buffer.pending == 0 and not buffer.running
+
+    def test_intervalo(self, factory, service):
+        buffer = DocumentAccessLogBuffer(factory, flush_ms=50, batch_size=100, max_queue=100)
+        doc = _subir(service)
+        buffer.start()
+        try:
+            buffer.record(doc.id, 1, "VIEW")
+            assert _esperar(lambda: _vistas(factory) == 1)
+        finally:
+            buffer.stop()
+
+    def test_cola_llena_y_documento_eliminado(self, factory, service):
+        buffer = DocumentAccessLogBuffer(factory, flush_ms=60_000, batch_size=100, max_queue=3)
+        a, b = _subir(service, "a.txt"), _subir(service, "b.txt")
+        buffer.record(a.id, 1, "VIEW")
+        buffer.record(b.id, 1, "VIEW")
+        service.delete_document(b.id, 1, soft_delete=False)
+        service.db.commit()
+
+        buffer.record(a.id, 1, "VIEW")  # llena la cola: se vacía en el llamador
+        assert buffer.pending == 0
+        with factory() as db:
+            assert db.execute(select(DocumentAccessLog.document_id).where(
+                DocumentAccessLog.action == "VIEW")).scalars().all() == [a.id, a.id]
+
+    def test_error_reencola_hasta_el_tope(self, factory, service, monkeypatch):
+        buffer = DocumentAccessLogBuffer(factory, flush_ms=60_000, batch_size=100, max_queue=3)
+        a = _subir(service)
+        insertar = buffer._insertar
+
+        def falla(filas):
+            raise RuntimeError("BD no disponible")
+
+        monkeypatch.setattr(buffer, "_insertar", falla)
+        for _ in range(3):
+            buffer.record(a.id, 1, "VIEW")  # la tercera llena la cola y el flush falla
+        assert (buffer.pending, buffer.dropped) == (3, 0)
+        buffer.record(a.id, 1, "VIEW")
+        assert (buffer.pending, buffer.dropped) == (3, 1)
+
+        monkeypatch.setattr(buffer, "_insertar", insertar)
+        assert buffer.flush() == 3
+        assert _vistas(factory) == 3
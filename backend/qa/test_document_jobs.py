@@ -0,0 +1,187 @@
+"""
+Tests de la cola persistente de procesamiento de documentos
+
+Cubre:
+- Upload/solicitudes encolan trabajos (idempotente) y el documento muestra el avance
+- Reserva por prioridad (XML, miniaturas, extracción, OCR) sin duplicar entre workers
+- Worker con sesiones propias: extracción completada de punta a punta
+- Reintentos con backoff exponencial y FAILED al agotar intentos
+- Reserva vencida (worker caído): se retoma o se da por fallida
+- Métricas de la cola (la vista global solo para administradores)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routers.documents_processing import get_processing_queue
+from app.config import settings
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import Document, DocumentExtractedData, DocumentProcessingJob
+from app.infrastructure.storage import LocalFileStorage
+from app.application.document_jobs import (
+    COMPLETED, FAILED, JOB_EXTRACTION, JOB_OCR, JOB_RENDITIONS, PENDING, PROCESSING,
+    DocumentWorker, claim_jobs, queue_stats, retry_delay, run_job,
+)
+from app.application.services_documents_v2 import DocumentService
+
+pytestmark = pytest.mark.sqlite(archivo=True)
+
+XML = b"<?xml version='1.0'?><Invoice><ID>F001-1</ID></Invoice>"
+
+
+@pytest.fixture
+def factory(session_factory):
+    session = session_factory()
+    session.add_all([Company(id=1, name="Empresa"), User(id=1, username="u", password_hash="x")])
+    session.commit()
+    session.close()
+    return session_factory
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalFileStorage(base_path=str(tmp_path / "documents"))
+
+
+def _subir(factory, storage, nombre, contenido, mime, **opciones):
+    db = factory()
+    try:
+        document, _ = DocumentService(db, storage).upload_document(
+            company_id=1, user_id=1, file_content=contenido, filename=nombre,
+            mime_type=mime, document_type="OTRO", **opciones
+        )
+        db.commit()
+        return document.id
+    finally:
+        db.close()
+
+
+class TestDocumentJobs:
+
+    def test_encolado_y_prioridad(self, factory, storage):
+        pdf = _subir(factory, storage, "a.pdf", b"%PDF-1.4 falso", "application/pdf", enable_extraction=True, enable_ocr=True)
+        txt = _subir(factory, storage, "b.txt", b"Factura F001-1", "text/plain", enable_ocr=True)
+        xml = _subir(factory, storage, "c.xml", XML, "application/xml")
+
+        db = factory()
+        doc = db.get(Document, pdf)
+        assert (doc.processing_status, doc.processing_progress) == (PENDING, 0)
+        assert db.get(Document, txt).processing_status is None  # OCR solo aplica a PDF
+        # Solicitud repetida: no duplica el trabajo activo
+        service = DocumentService(db, storage)
+        assert len(service.schedule_processing(doc, enable_extraction=True, enable_ocr=True)) == 2
+        service.schedule_processing(db.get(Document, xml), enable_extraction=True, enable_ocr=False)
+        db.commit()
+        assert db.query(DocumentProcessingJob).count() == 4  # el PDF encola además su miniatura
+
+        ids = claim_jobs(db, "w1", 10)
+        orden = [(j.document_id, j.job_type) for j in (db.get(DocumentProcessingJob, i) for i in ids)]
+        assert orden == [(xml, JOB_EXTRACTION), (pdf, JOB_RENDITIONS), (pdf, JOB_EXTRACTION), (pdf, JOB_OCR)]
+        assert claim_jobs(db, "w2", 10) == []
+        db.expire_all()
+        assert db.get(Document, pdf).processing_status == PROCESSING
+        db.close()
+
+    def test_worker_completa_extraccion(self, factory, storage):
+        txt = _subir(factory, storage, "b.txt", b"Factura F001-123 por S/ 118.00", "text/plain", enable_extraction=True)
+        xml = _subir(factory, storage, "c.xml", XML, "application/xml")
+        db = factory()
+        DocumentService(db, storage).schedule_processing(db.get(Document, xml), True, False)
+        db.commit()
+
+        assert DocumentWorker(concurrency=2, session_factory=factory, storage=storage).run_once() == 2
+
+        db.expire_all()
+        for document_id in (txt, xml):
+            doc = db.get(Document, document_id)
+            assert (doc.processing_status, doc.processing_progress) == (COMPLETED, 100)
+            assert db.query(DocumentExtractedData).filter_by(document_id=document_id).one().extraction_success
+        assert {j.status for j in db.query(DocumentProcessingJob)} == {COMPLETED}
+        db.close()
+
+    def test_reintentos_con_backoff(self, factory, storage, monkeypatch):
+        assert [retry_delay(n) for n in (1, 2, 3)] == [30.0, 60.0, 120.0]
+        assert retry_delay(20) == settings.document_job_retry_max_seconds
+        monkeypatch.setattr(settings, "document_renditions_enabled", False)
+
+        # PDF truncado: el OCR falla en cada intento
+        pdf = _subir(factory, storage, "a.pdf", b"%PDF-1.4 truncado", "application/pdf", enable_ocr=True)
+        db = factory()
+        (job_id,) = claim_jobs(db, "w1", 5)
+        antes = datetime.now()
+        assert run_job(job_id, factory, storage) == PENDING
+        job = db.get(DocumentProcessingJob, job_id)
+        assert job.attempts == 1 and job.error_message
+        assert job.next_run_at >= antes + timedelta(seconds=30)
+        assert claim_jobs(db, "w1", 5) == []  # aún en espera
+
+        monkeypatch.setattr(settings, "document_job_retry_initial_seconds", 0.0)
+        job.next_run_at = antes
+        db.commit()
+        worker = DocumentWorker(concurrency=1, session_factory=factory, storage=storage)
+        assert worker.run_once() == 1 and worker.run_once() == 1 and worker.run_once() == 0
+
+        db.expire_all()
+        job = db.get(DocumentProcessingJob, job_id)
+        assert (job.status, job.attempts) == (FAILED, 3)
+        doc = db.get(Document, pdf)
+        assert (doc.processing_status, doc.processing_progress) == (FAILED, 100)
+        assert doc.processing_error == job.error_message
+        db.close()
+
+    def test_reserva_vencida(self, factory, storage):
+        _subir(factory, storage, "b.txt", b"texto", "text/plain", enable_extraction=True)
+        db = factory()
+        (job_id,) = claim_jobs(db, "w1", 5)
+        vencida = datetime.now() + timedelta(seconds=settings.document_job_lease_seconds + 1)
+
+        # El worker w1 murió: w2 lo retoma al vencer la reserva
+        assert claim_jobs(db, "w2", 5, ahora=vencida) == [job_id]
+        job = db.get(DocumentProcessingJob, job_id)
+        assert (job.worker_id, job.attempts) == ("w2", 2)
+
+        job.max_attempts = 2
+        db.commit()
+        assert claim_jobs(db, "w3", 5, ahora=vencida + timedelta(seconds=settings.document_job_lease_seconds + 1)) == []
+        db.refresh(job)
+        assert job.status == FAILED
+        db.close()
+
+    def test_metricas(self, factory, storage, monkeypatch):
+        monkeypatch.setattr(settings, "document_renditions_enabled", False)
+        _subir(factory, storage, "a.pdf", b"%PDF", "application/pdf", enable_extraction=True, enable_ocr=True)
+        _subir(factory, storage, "b.txt", b"texto", "text/plain", enable_extraction=True)
+        db = factory()
+        ahora = datetime.now()
+        terminado = db.query(DocumentProcessingJob).filter_by(job_type=JOB_EXTRACTION).first()
+        terminado.status = COMPLETED
+        terminado.started_at = ahora - timedelta(seconds=4)
+        terminado.completed_at = ahora - timedelta(seconds=1)
+        db.query(DocumentProcessingJob).update({DocumentProcessingJob.created_at: ahora - timedelta(seconds=60)})
+        db.commit()
+
+        stats = queue_stats(db, ahora=ahora)
+        assert (stats["pending"], stats["processing"]) == (2, 0)
+        assert stats["depth"][PENDING] == {JOB_EXTRACTION: 1, JOB_OCR: 1, JOB_RENDITIONS: 0}
+        assert stats["oldest_pending_seconds"] == 60.0
+        assert (stats["completed"], stats["failed"], stats["avg_duration_seconds"]) == (1, 0, 3.0)
+        assert queue_stats(db, company_id=2, ahora=ahora)["pending"] == 0
+        db.close()
+
+    def test_metricas_por_empresa_del_usuario(self, factory):
+        db = factory()
+        usuario = db.get(User, 1)
+        usuario.companies.append(db.get(Company, 1))
+        db.add(Company(id=2, name="Otra"))
+        db.commit()
+
+        assert get_processing_queue(1, db, usuario)["pending"] == 0
+        for company_id in (None, 2):
+            with pytest.raises(HTTPException) as error:
+                get_processing_queue(company_id, db, usuario)
+            assert error.value.status_code == 403
+
+        usuario.is_admin = True
+        assert get_processing_queue(None, db, usuario)["pending"] == 0
+        db.close()
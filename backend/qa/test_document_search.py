@@ -0,0 +1,115 @@
+"""
+Tests de la búsqueda full-text de documentos (SQLite FTS5)
+
+Cubre:
+- search_text mantenido al subir y al procesar (OCR y RUC/serie/número extraídos)
+- Búsqueda por prefijo, sin acentos, con todas las palabras y filtros
+- Orden por relevancia y paginación por cursor sin repetidos
+- Total exacto en una sola página; estimado por encima del tope
+- Índice sincronizado al editar y borrar
+"""
+import pytest
+from sqlalchemy import text
+
+from app.config import settings
+from app.domain.enums import UserRole
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import DocumentExtractedData, DocumentOCRData, DocumentTag
+from app.infrastructure.storage import LocalFileStorage
+from app.application.document_search import refresh_search_text, search_documents
+from app.application.services_documents_v2 import DocumentService
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([Company(id=1, name="Empresa"), Company(id=2, name="Otra"),
+                User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True)])
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def service(db, tmp_path):
+    return DocumentService(db, LocalFileStorage(base_path=str(tmp_path)))
+
+
+def _subir(service, nombre, contenido=None, company_id=1, **kwargs):
+    contenido = contenido or f"%PDF-1.4 {nombre}".encode()
+    document, _ = service.upload_document(
+        company_id=company_id, user_id=1, file_content=contenido, filename=nombre,
+        mime_type="application/pdf", document_type="COMPROBANTE_COMPRA", **kwargs,
+    )
+    service.db.commit()
+    return document
+
+
+def _ids(page):
+    return [d.id for d in page.items]
+
+
+class TestDocumentSearch:
+
+    def test_indexa_ocr_y_datos_extraidos(self, db, service):
+        escaneado = _subir(service, "escaneo_001.pdf", title="Factura de Aceros Arequipa")
+        _subir(service, "otra.pdf", title="Recibo de luz")
+        _subir(service, "ajena.pdf", title="Factura de Aceros Arequipa", company_id=2)
+
+        db.add(DocumentOCRData(document_id=escaneado.id, ocr_text="Cemento Pacasmayo bolsa 42.5 kg", ocr_status="COMPLETED"))
+        db.add(DocumentExtractedData(document_id=escaneado.id, extracted_data={"ruc": "20370146994", "serie": "F001", "numero": "4521"}))
+        refresh_search_text(db, escaneado)
+        db.commit()
+
+        assert _ids(search_documents(db, 1, query="pacasmayo")) == [escaneado.id]
+        assert _ids(search_documents(db, 1, query="2037014")) == [escaneado.id]  # prefijo del RUC
+        assert _ids(search_documents(db, 1, query="F001-4521")) == [escaneado.id]
+        assert _ids(search_documents(db, 1, query="ÁCEROS factura")) == [escaneado.id]  # sin acentos ni mayúsculas
+        assert _ids(search_documents(db, 1, query="aceros luz")) == []  # todas las palabras
+        assert _ids(search_documents(db, 1, query="escaneo")) == [escaneado.id]  # nombre de archivo
+        assert search_documents(db, 1, query="--").total == 2  # sin palabras: sin filtro de texto
+
+    def test_relevancia_y_cursor(self, db, service):
+        docs = [_subir(service, f"f{i}.pdf", title=f"Factura {i}") for i in range(7)]
+        relevante = _subir(service, "x.pdf", title="Factura factura factura", description="factura")
+        db.add(DocumentTag(document_id=docs[0].id, tag="urgente"))
+        db.commit()
+
+        primera = search_documents(db, 1, query="factura", limit=3)
+        assert primera.items[0].id == relevante.id and primera.next_cursor
+        assert (primera.total, primera.total_is_estimate) == (8, False)
+
+        vistos = _ids(primera)
+        cursor = primera.next_cursor
+        while cursor:
+            page = search_documents(db, 1, query="factura", limit=3, cursor=cursor)
+            vistos += _ids(page)
+            cursor = page.next_cursor
+        assert sorted(vistos) == sorted(d.id for d in docs + [relevante])
+
+        # Sin texto: por fecha de subida, también por cursor
+        page = search_documents(db, 1, limit=5)
+        siguiente = search_documents(db, 1, limit=5, cursor=page.next_cursor)
+        assert len(set(_ids(page)) | set(_ids(siguiente))) == 8 and siguiente.next_cursor is None
+
+        assert _ids(search_documents(db, 1, query="factura", tags=["urgente"])) == [docs[0].id]
+        with pytest.raises(ValueError):
+            search_documents(db, 1, query="factura", cursor="no-es-un-cursor")
+
+    def test_total_estimado(self, db, service, monkeypatch):
+        for i in range(6):
+            _subir(service, f"f{i}.pdf", title="Factura")
+        monkeypatch.setattr(settings, "document_search_count_cap", 4)
+        page = search_documents(db, 1, query="factura", limit=2)
+        assert (page.total, page.total_is_estimate) == (4, True)
+        assert search_documents(db, 1, query="factura", limit=10).total == 6
+
+    def test_indice_sincronizado(self, db, service):
+        doc = _subir(service, "a.pdf", title="Contrato de alquiler")
+        doc.title = "Contrato de leasing"
+        refresh_search_text(db, doc)
+        db.commit()
+        assert _ids(search_documents(db, 1, query="leasing")) == [doc.id]
+        assert _ids(search_documents(db, 1, query="alquiler")) == []
+
+        service.delete_document(doc.id, 1, soft_delete=False)
+        db.commit()
+        assert db.execute(text("SELECT count(*) FROM documents_fts WHERE documents_fts MATCH 'leasing'")).scalar() == 0
@@ -0,0 +1,136 @@
+"""
+Tests de la exportación a Excel en streaming
+
+Cubre:
+- Libro write_only con estilos con nombre, celdas combinadas y anchos
+- Libro diario: filtros, anulados omitidos, totales y 404 sin datos
+- Conciliación bancaria: matches (incluye varias líneas) y pendientes
+- El temporal se elimina al terminar el envío
+"""
+import io
+import os
+from datetime import date
+from decimal import Decimal
+
+import openpyxl
+import pytest
+from fastapi import HTTPException
+
+from app.domain.enums import AccountType, UserRole
+from app.domain.models import (
+    Account, BankAccount, BankStatement, BankTransaction, BankTransactionLine,
+    Company, EntryLine, JournalEntry, Period, User,
+)
+from app.api.routers.bank_reconciliation import export_reconciliation_excel
+from app.api.routers.journal import export_entries_excel
+from app.infrastructure.excel_export import ESTILO_MONTO, ESTILO_TITULO, StreamingXlsx
+
+pytestmark = pytest.mark.sqlite(compartida=True)
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        Company(id=1, name="Empresa SAC", ruc="20100070970"),
+        User(id=1, username="u", password_hash="x", role=UserRole.ADMINISTRADOR),
+        Account(id=1, company_id=1, code="1041", name="Banco", type=AccountType.ASSET),
+        Account(id=2, company_id=1, code="1212", name="Clientes", type=AccountType.ASSET),
+        Period(id=1, company_id=1, year=2025, month=1),
+        BankAccount(id=1, company_id=1, account_id=1, bank_name="BCP", account_number="123"),
+    ])
+    db.commit()
+    return db
+
+
+def _asiento(db, dia, monto, status="POSTED"):
+    entry = JournalEntry(company_id=1, date=date(2025, 1, dia), period_id=1, glosa=f"Cobro {dia}", status=status)
+    banco = EntryLine(account_id=1, debit=monto, credit=0)
+    entry.lines.extend([banco, EntryLine(account_id=2, debit=0, credit=monto)])
+    db.add(entry)
+    db.commit()
+    return banco
+
+
+def _leer(response):
+    """Lee el XLSX de un FileResponse y ejecuta su tarea de fondo (borrado)."""
+    with open(response.path, "rb") as f:
+        wb = openpyxl.load_workbook(io.BytesIO(f.read()))
+    response.background.func(*response.background.args)
+    assert not os.path.exists(response.path)
+    return wb
+
+
+def _exportar_diario(db, **filtros):
+    params = dict(period_id=None, date_from=None, date_to=None, account_code=None, status=None)
+    params.update(filtros)
+    return export_entries_excel(company_id=1, db=db, **params)
+
+
+class TestExcelExport:
+
+    def test_libro_write_only_con_estilos(self, tmp_path):
+        xlsx = StreamingXlsx()
+        xlsx.add_sheet("Hoja", widths=[10, 20])
+        xlsx.append(["Título"], style=ESTILO_TITULO, merge_to=3)
+        assert xlsx.append(["a", 1.5], styles={1: ESTILO_MONTO}) == 2
+        path = xlsx.save()
+        try:
+            ws = openpyxl.load_workbook(path).active
+        finally:
+            os.unlink(path)
+        assert ws["A1"].font.bold and ws["A1"].style == ESTILO_TITULO
+        assert ws["B2"].number_format == "#,##0.00" and ws["A2"].style == "Normal"
+        assert "A1:C1" in {str(r) for r in ws.merged_cells.ranges}
+        assert ws.column_dimensions["B"].width == 20
+
+    def test_libro_diario(self, db):
+        _asiento(db, 5, Decimal("100"))
+        _asiento(db, 6, Decimal("50"), status="VOIDED")
+        _asiento(db, 7, Decimal("25.50"))
+
+        ws = _leer(_exportar_diario(db))["Libro Diario"]
+        filas = [r for r in ws.iter_rows(values_only=True)]
+        assert filas[0][0] == "LIBRO DIARIO - FORMATO SUNAT"
+        assert ws["A1"].alignment.horizontal == "center" and "A1:G1" in ws.merged_cells
+        assert filas[3][:2] == ("RUC:", "20100070970")
+        datos = [f for f in filas if isinstance(f[0], int)]
+        assert [(f[0], f[1], f[3], f[5], f[6]) for f in datos] == [
+            (1, "05/01/2025", "1041", 100, 0), (2, "05/01/2025", "1212", 0, 100),
+            (3, "07/01/2025", "1041", 25.5, 0), (4, "07/01/2025", "1212", 0, 25.5),
+        ]
+        assert filas[-1] == ("TOTALES", None, None, None, None, 125.5, 125.5)
+        assert ws.cell(row=ws.max_row, column=6).number_format == "#,##0.00"
+
+        with pytest.raises(HTTPException) as exc:
+            _exportar_diario(db, account_code="9999")
+        assert exc.value.status_code == 404
+
+    def test_conciliacion(self, db):
+        l1 = _asiento(db, 5, Decimal("100"))
+        l2 = _asiento(db, 6, Decimal("60"))
+        l3 = _asiento(db, 6, Decimal("40"))
+        statement = BankStatement(bank_account_id=1, period_id=1, statement_date=date(2025, 1, 31),
+                                  opening_balance=0, closing_balance=Decimal("210"), uploaded_by=1)
+        statement.transactions = [
+            BankTransaction(transaction_date=date(2025, 1, 5), description="ABONO", balance=100, debit=0,
+                            credit=Decimal("100"), reconciled=True, entry_line_id=l1.id),
+            BankTransaction(transaction_date=date(2025, 1, 6), description="ABONO 2", balance=200, debit=0,
+                            credit=Decimal("100"), reconciled=True, entry_line_id=l2.id),
+            BankTransaction(transaction_date=date(2025, 1, 9), description="INTERES", reference="OP1", balance=210,
+                            debit=0, credit=Decimal("10"), reconciled=False),
+        ]
+        db.add(statement)
+        db.flush()
+        db.add_all([BankTransactionLine(bank_transaction_id=statement.transactions[1].id, entry_line_id=i)
+                    for i in (l2.id, l3.id)])
+        db.commit()
+
+        ws = _leer(export_reconciliation_excel(bank_account_id=1, period_id=1, db=db, current_user=db.get(User, 1))).active
+        filas = [r for r in ws.iter_rows(values_only=True)]
+        assert filas[0][0].startswith("Reporte de Conciliación Bancaria - BCP")
+        assert ("Saldo según contabilidad", 200) == filas[5][:2]
+        inicio = filas.index(("TRANSACCIONES CONCILIADAS",) + (None,) * 6)
+        assert [f[:3] + f[5:7] for f in filas[inicio + 2:inicio + 4]] == [
+            ("2025-01-06", "ABONO 2", 100, 100, 0), ("2025-01-05", "ABONO", 100, 100, 0),
+        ]
+        assert filas[-1][:6] == ("2025-01-09", "INTERES", "OP1", 0, 10, 210)
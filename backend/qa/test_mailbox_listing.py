@@ -0,0 +1,99 @@
+"""
+Tests del listado paginado de la casilla
+
+Cubre:
+- Keyset sobre (created_at, id): páginas sin repetidos ni saltos, con empates de fecha
+- Filtros por leído, prioridad y estado
+- has_response y metadatos de adjuntos solo para la página
+- Listado global (admin) y mensajes empresa→admin
+- Offset sin cursor (compatibilidad) y cursor inválido
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.domain.models import Company
+from app.domain.models_mailbox import (
+    CompanyToAdminMessage,
+    ElectronicMailbox,
+    MailboxAttachment,
+    MailboxMessage,
+    MailboxResponse,
+)
+from app.application.services_mailbox import list_all_messages, list_company_to_admin_messages, list_messages
+
+pytestmark = pytest.mark.sqlite(archivo=True)
+
+BASE = datetime(2025, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([Company(id=1, name="A"), Company(id=2, name="B"),
+                ElectronicMailbox(id=1, company_id=1), ElectronicMailbox(id=2, company_id=2)])
+    for i in range(1, 13):
+        db.add(MailboxMessage(
+            id=i, mailbox_id=1, subject=f"Aviso {i}", body="...", message_type="NOTIFICACION",
+            # Pares con la misma fecha: el id desempata
+            created_at=BASE + timedelta(hours=(i + 1) // 2),
+            is_read=i % 3 == 0, priority="CRITICA" if i % 4 == 0 else "NORMAL",
+            message_status="LEIDO" if i % 3 == 0 else "ENVIADO",
+        ))
+    db.add(MailboxMessage(id=13, mailbox_id=2, subject="Otra", body="...", message_type="MULTA", created_at=BASE))
+    db.add(MailboxResponse(message_id=12, company_id=1, response_text="ok"))
+    db.add(MailboxAttachment(message_id=11, file_name="a.pdf", file_path="x/a.pdf", file_type="application/pdf",
+                             file_size_bytes=10))
+    for i in range(1, 4):
+        db.add(CompanyToAdminMessage(company_id=1 + i % 2, subject=f"Consulta {i}", body="...",
+                                     created_at=BASE + timedelta(minutes=i)))
+    db.commit()
+    return db
+
+
+def _todas(fn, *args, limit, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page = fn(*args, limit=limit, cursor=cursor, **kwargs)
+        ids += [m.id for m in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids, page
+
+
+class TestMailboxListing:
+
+    def test_keyset_por_empresa(self, db):
+        page = list_messages(db, 1, limit=5)
+        assert [m.id for m in page.items] == [12, 11, 10, 9, 8]
+        assert page.total == 12 and page.next_cursor
+        assert page.responded_ids == {12}
+        adjuntos = {m.id: [(a.file_name, a.file_size_bytes) for a in m.attachments] for m in page.items}
+        assert adjuntos[11] == [("a.pdf", 10)] and adjuntos[12] == []
+
+        ids, ultima = _todas(list_messages, db, 1, limit=5)
+        assert ids == list(range(12, 0, -1))
+        assert ultima.total == 12
+
+    def test_filtros(self, db):
+        assert [m.id for m in list_messages(db, 1, is_read=True, limit=50).items] == [12, 9, 6, 3]
+        assert [m.id for m in list_messages(db, 1, priority="CRITICA", limit=50).items] == [12, 8, 4]
+        ids, _ = _todas(list_messages, db, 1, message_status="ENVIADO", limit=3)
+        assert ids == [11, 10, 8, 7, 5, 4, 2, 1]
+        assert list_messages(db, 99, limit=10).items == []
+
+    def test_listado_global_y_offset(self, db):
+        ids, ultima = _todas(list_all_messages, db, limit=4)
+        assert ids == list(range(12, 0, -1)) + [13] and ultima.total == 13
+        page = list_all_messages(db, company_id=2, limit=10)
+        assert [m.id for m in page.items] == [13] and page.total == 1
+        assert [m.id for m in list_messages(db, 1, limit=3, offset=3).items] == [9, 8, 7]
+
+    def test_empresa_a_admin(self, db):
+        ids, _ = _todas(list_company_to_admin_messages, db, limit=1)
+        assert len(ids) == 3
+        page = list_company_to_admin_messages(db, company_id=2, limit=10)
+        assert [m.subject for m in page.items] == ["Consulta 3", "Consulta 1"] and page.total == 2
+
+    def test_cursor_invalido(self, db):
+        with pytest.raises(ValueError):
+            list_messages(db, 1, limit=5, cursor="no-es-un-cursor")
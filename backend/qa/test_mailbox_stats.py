@@ -0,0 +1,115 @@
+"""
+Tests de estadísticas de la casilla y barrido de vencidos
+
+Cubre:
+- Conteos por agregados: no leídos, críticos, vencidos y pendientes sin respuesta
+- La consulta de estadísticas no modifica mensajes (no marca VENCIDO)
+- Estadísticas de admin: no leídos empresa→admin y conteos globales
+- Barrido: un UPDATE marca vencidos sin respuesta y es idempotente
+- Caché por empresa: se reutiliza y se invalida al confirmar cambios en la casilla
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.domain.models import Company
+from app.domain.models_mailbox import CompanyToAdminMessage, ElectronicMailbox, MailboxMessage, MailboxResponse
+from app.application import mailbox_stats
+from app.application.mailbox_stats import (
+    MailboxOverdueSweeper,
+    MailboxStatsCache,
+    count_admin_mailbox_stats,
+    count_mailbox_stats,
+    get_mailbox_stats,
+    mark_overdue_messages,
+    register_mailbox_stats_listeners,
+)
+
+pytestmark = pytest.mark.sqlite(archivo=True)
+
+HOY = date.today()
+AYER = HOY - timedelta(days=1)
+
+
+def _mensaje(mailbox_id, **kw):
+    datos = {"subject": "Aviso", "body": "...", "message_type": "NOTIFICACION"}
+    datos.update(kw)
+    return MailboxMessage(mailbox_id=mailbox_id, **datos)
+
+
+@pytest.fixture
+def factory(session_factory):
+    with session_factory() as db:
+        db.add_all([Company(id=1, name="A"), Company(id=2, name="B"),
+                    ElectronicMailbox(id=1, company_id=1), ElectronicMailbox(id=2, company_id=2)])
+        db.add_all([
+            _mensaje(1, id=1),                                                   # no leído
+            _mensaje(1, id=2, priority="CRITICA"),                               # crítico no leído
+            _mensaje(1, id=3, is_read=True, priority="CRITICA", due_date=AYER),  # vencido
+            _mensaje(1, id=4, is_read=True, due_date=AYER, requires_response=True),  # respondido
+            _mensaje(1, id=5, is_read=True, requires_response=True, due_date=HOY),   # pendiente, vence hoy
+            _mensaje(2, id=6, due_date=AYER),
+        ])
+        db.add(MailboxResponse(message_id=4, company_id=1, response_text="ok"))
+        db.add(CompanyToAdminMessage(company_id=1, subject="Consulta", body="..."))
+        db.commit()
+    return session_factory
+
+
+class TestMailboxStats:
+
+    def test_conteos_por_empresa(self, factory):
+        with factory() as db:
+            assert count_mailbox_stats(db, 1) == {
+                "unread_count": 2, "critical_count": 1, "overdue_count": 1, "pending_response_count": 1,
+            }
+            assert count_mailbox_stats(db, 99) == {
+                "unread_count": 0, "critical_count": 0, "overdue_count": 0, "pending_response_count": 0,
+            }
+            # La consulta no marca vencidos
+            assert db.get(MailboxMessage, 3).message_status == "ENVIADO"
+
+    def test_conteos_admin(self, factory):
+        with factory() as db:
+            assert count_admin_mailbox_stats(db) == {
+                "unread_count": 1, "critical_count": 1, "overdue_count": 2, "pending_response_count": 1,
+            }
+
+    def test_barrido_de_vencidos(self, factory):
+        with factory() as db:
+            assert mark_overdue_messages(db) == 2
+            db.commit()
+            vencidos = db.execute(
+                select(MailboxMessage.id).where(MailboxMessage.message_status == "VENCIDO").order_by(MailboxMessage.id)
+            ).scalars().all()
+            assert vencidos == [3, 6]
+            assert mark_overdue_messages(db) == 0
+            # Al día siguiente vence el que vencía hoy
+            assert mark_overdue_messages(db, today=HOY + timedelta(days=1)) == 1
+
+        assert MailboxOverdueSweeper(factory).sweep() == 0
+
+    def test_cache_invalida_al_confirmar(self, factory, monkeypatch):
+        monkeypatch.setattr(mailbox_stats, "stats_cache", MailboxStatsCache(ttl_seconds=3600))
+        register_mailbox_stats_listeners()
+        with factory() as db:
+            assert get_mailbox_stats(db, 1)["unread_count"] == 2
+            assert get_mailbox_stats(db, 2)["unread_count"] == 1
+
+            # Escritura sin pasar por la sesión: la caché sigue sirviendo el valor guardado
+            db.execute(MailboxMessage.__table__.update().values(is_read=True))
+            db.commit()
+            assert get_mailbox_stats(db, 1)["unread_count"] == 2
+
+            db.add(_mensaje(1, priority="CRITICA"))
+            db.flush()
+            db.rollback()
+            assert get_mailbox_stats(db, 1)["unread_count"] == 2
+
+            db.add(_mensaje(1, priority="CRITICA"))
+            db.commit()
+            assert get_mailbox_stats(db, 1) == {
+                "unread_count": 1, "critical_count": 1, "overdue_count": 1, "pending_response_count": 1,
+            }
+            assert get_mailbox_stats(db, 2)["unread_count"] == 1  # otra empresa: no se invalidó
@@ -0,0 +1,120 @@
+"""
+Tests del OCR por página
+
+Cubre:
+- Páginas con capa de texto (pdfplumber) no pasan por OCR
+- Texto final en orden de página y confianza de las páginas reconocidas
+- Cache por (file_hash, página): el segundo proceso no reconoce de nuevo
+- El perfil (DPI, escala de grises) forma parte de la clave del cache
+- Fallo a mitad del documento: las páginas reconocidas quedan en el cache
+- Pool de procesos compartido entre documentos, acotado por ocr_max_workers
+"""
+import io
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from app.config import settings
+from app.infrastructure import ocr
+from app.infrastructure.ocr import OCRPageCache, OCRService
+
+pytestmark = pytest.mark.skipif(not (ocr.TESSERACT_AVAILABLE and ocr.PDFPLUMBER_AVAILABLE),
+                                reason="pytesseract/pdf2image/pdfplumber no instalados")
+
+
+def _pdf(paginas):
+    """PDF con una página por elemento: texto (capa de texto) o None (página escaneada, sin texto)."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for texto in paginas:
+        if texto:
+            c.drawString(72, 720, texto)
+        else:
+            c.rect(72, 600, 200, 100, fill=1)  # Solo imagen/trazos
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _servicio(tmp_path, llamadas, **kwargs):
+    service = OCRService(cache_dir=tmp_path / "cache", **kwargs)
+
+    def _ocr_pages(content, pages, language):
+        llamadas.append(list(pages))
+        return [{"page": p, "text": f"escaneada {p}", "confidence": 80.0 + p} for p in pages]
+
+    service._ocr_pages = _ocr_pages
+    return service
+
+
+class TestOCR:
+
+    def test_capa_de_texto_y_cache(self, tmp_path):
+        contenido = _pdf(["FACTURA ELECTRONICA F001-00000123 RUC 20100070970", None, None])
+        llamadas = []
+        service = _servicio(tmp_path, llamadas)
+
+        resultado = service.extract_text(contenido, "application/pdf", file_hash="ab" * 32)
+        assert llamadas == [[2, 3]]
+        assert resultado["text"].split("\n\n") == [
+            "FACTURA ELECTRONICA F001-00000123 RUC 20100070970", "escaneada 2", "escaneada 3"
+        ]
+        assert resultado["confidence"] == 82.5
+        assert (resultado["pages_text_layer"], resultado["pages_ocr"], resultado["pages_cached"]) == (1, 2, 0)
+
+        # Segundo proceso del mismo archivo: todo desde el cache
+        repetido = _servicio(tmp_path, llamadas).extract_text(contenido, "application/pdf", file_hash="ab" * 32)
+        assert llamadas == [[2, 3]]
+        assert repetido["text"] == resultado["text"]
+        assert (repetido["pages_ocr"], repetido["pages_cached"]) == (0, 2)
+
+        # Otro DPI: el cache no aplica
+        _servicio(tmp_path, llamadas, dpi=150).extract_text(contenido, "application/pdf", file_hash="ab" * 32)
+        assert llamadas[-1] == [2, 3]
+
+    def test_solo_capa_de_texto(self, tmp_path):
+        llamadas = []
+        resultado = _servicio(tmp_path, llamadas).extract_text(
+            _pdf(["Pagina uno con texto suficiente para omitir OCR"]), "application/pdf"
+        )
+        assert llamadas == [] and resultado["confidence"] == 100.0
+        assert _servicio(tmp_path, llamadas).extract_text(b"<xml/>", "application/xml") is None
+
+    def test_fallo_parcial_conserva_paginas_reconocidas(self, tmp_path):
+        contenido = _pdf([None, None, None])
+        llamadas = []
+        service = OCRService(cache_dir=tmp_path / "cache")
+
+        def _ocr_pages(content, pages, language):
+            llamadas.append(list(pages))
+            for p in pages:
+                if p == 3 and len(llamadas) == 1:
+                    raise RuntimeError("tesseract murió")
+                yield {"page": p, "text": f"escaneada {p}", "confidence": 90.0}
+
+        service._ocr_pages = _ocr_pages
+        assert service.extract_text(contenido, "application/pdf", file_hash="ef" * 32) is None
+        resultado = service.extract_text(contenido, "application/pdf", file_hash="ef" * 32)
+        assert llamadas == [[1, 2, 3], [3]]
+        assert (resultado["pages_ocr"], resultado["pages_cached"]) == (1, 2)
+
+    def test_pool_compartido(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "ocr_max_workers", 2)
+        contenido = _pdf([None, None])
+        try:
+            OCRService(cache_dir=tmp_path / "a").extract_text(contenido, "application/pdf")
+            pool = ocr._POOL
+            assert pool is not None and pool._max_workers == 2
+            OCRService(cache_dir=tmp_path / "b").extract_text(contenido, "application/pdf")
+            assert ocr._POOL is pool
+        finally:
+            ocr.shutdown_ocr_pool()
+        assert ocr._POOL is None
+
+    def test_cache_por_pagina(self, tmp_path):
+        cache = OCRPageCache(tmp_path)
+        assert cache.get("cd" * 32, 1, "spa-300g") is None
+        cache.set("cd" * 32, 1, "spa-300g", {"page": 1, "text": "ñandú", "confidence": 90.0})
+        assert cache.get("cd" * 32, 1, "spa-300g")["text"] == "ñandú"
+        assert cache.get("cd" * 32, 2, "spa-300g") is None
+        assert list((tmp_path / "cd").iterdir())[0].name == "cd" * 32
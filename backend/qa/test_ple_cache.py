@@ -0,0 +1,129 @@
+"""
+Tests de la caché de libros PLE
+
+Cubre:
+- Versión del período incrementada al crear/editar asientos y comprobantes
+- Hit de caché sin volver a generar
+- Regeneración solo del período cuyos datos cambiaron
+- Invalidación global por cambios en datos maestros (cuentas)
+- Borrado masivo de la empresa (limpieza de datos): invalida sus libros y borra su caché
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete
+
+from app.domain.models import Account, JournalEntry, EntryLine
+from app.domain.models_ext import Sale
+from app.domain.enums import AccountType
+from app.application import ple_cache
+from app.application.ple_cache import (
+    get_ledger_version,
+    get_or_build_ple_txt,
+    invalidate_company_ple_cache,
+    register_ple_cache_listeners,
+)
+
+
+@pytest.fixture
+def db(db, tmp_path, monkeypatch):
+    register_ple_cache_listeners()
+    monkeypatch.setattr(ple_cache, "_cache_root", lambda: tmp_path / "ple_cache")
+    return db
+
+
+class _Generador:
+    def __init__(self):
+        self.llamadas = 0
+
+    def __call__(self, db, company_id, period):
+        self.llamadas += 1
+        return [[period.replace('-', ''), "glosa", "1011", "10.00", "0.00"]]
+
+
+def _asiento(db, fecha):
+    cuenta = db.query(Account).filter_by(code="1011").first()
+    if cuenta is None:
+        cuenta = Account(company_id=1, code="1011", name="Caja", type=AccountType.ASSET)
+        db.add(cuenta)
+    entry = JournalEntry(company_id=1, date=fecha, period_id=1, glosa="x", status="POSTED")
+    entry.lines.append(EntryLine(account=cuenta, debit=Decimal("10"), credit=Decimal("0")))
+    db.add(entry)
+    db.commit()
+    return entry
+
+
+class TestPleCache:
+
+    def test_version_incrementa_con_asientos_y_ventas(self, db):
+        assert get_ledger_version(db, 1, 2025, 1) == 0
+        entry = _asiento(db, date(2025, 1, 10))
+        v1 = get_ledger_version(db, 1, 2025, 1)
+        assert v1 >= 1
+
+        entry.status = "VOIDED"
+        db.commit()
+        assert get_ledger_version(db, 1, 2025, 1) == v1 + 1
+
+        db.add(Sale(company_id=1, doc_type="01", series="F001", number="1", issue_date=date(2025, 2, 3),
+                    customer_id=1, base_amount=Decimal("100"), igv_amount=Decimal("18"), total_amount=Decimal("118")))
+        db.commit()
+        assert get_ledger_version(db, 1, 2025, 2) == 1
+        assert get_ledger_version(db, 1, 2025, 1) == v1 + 1
+
+    def test_rollback_no_incrementa(self, db):
+        _asiento(db, date(2025, 1, 10))
+        v = get_ledger_version(db, 1, 2025, 1)
+        db.add(JournalEntry(company_id=1, date=date(2025, 1, 11), period_id=1, glosa="y"))
+        db.flush()
+        db.rollback()
+        assert get_ledger_version(db, 1, 2025, 1) == v
+
+    def test_hit_y_regeneracion_por_periodo(self, db):
+        _asiento(db, date(2025, 1, 10))
+        _asiento(db, date(2025, 2, 10))
+        gen = _Generador()
+
+        path, registros = get_or_build_ple_txt(db, 1, "5.1", "2025-01", gen)
+        assert registros == 1
+        assert path.read_text(encoding="utf-8") == "202501|glosa|1011|10.00|0.00\n"
+        get_or_build_ple_txt(db, 1, "5.1", "2025-01", gen)
+        get_or_build_ple_txt(db, 1, "5.1", "2025-02", gen)
+        assert gen.llamadas == 2
+
+        # Cambio en febrero: enero sigue en caché
+        _asiento(db, date(2025, 2, 15))
+        get_or_build_ple_txt(db, 1, "5.1", "2025-01", gen)
+        assert gen.llamadas == 2
+        nuevo, _ = get_or_build_ple_txt(db, 1, "5.1", "2025-02", gen)
+        assert gen.llamadas == 3
+        assert len(list(nuevo.parent.glob("5.1-*.txt"))) == 1
+
+    def test_datos_maestros_invalidan_todo(self, db):
+        _asiento(db, date(2025, 1, 10))
+        gen = _Generador()
+        get_or_build_ple_txt(db, 1, "5.2", "2025-01", gen)
+        cuenta = db.query(Account).filter_by(code="1011").first()
+        cuenta.name = "Caja general"
+        db.commit()
+        get_or_build_ple_txt(db, 1, "5.2", "2025-01", gen)
+        assert gen.llamadas == 2
+
+    def test_periodo_sin_datos(self, db):
+        assert get_or_build_ple_txt(db, 1, "8.1", "2025-03", lambda *a: []) is None
+
+    def test_borrado_masivo_invalida_la_empresa(self, db, tmp_path):
+        _asiento(db, date(2025, 1, 10))
+        gen = _Generador()
+        get_or_build_ple_txt(db, 1, "5.1", "2025-01", gen)
+        assert (tmp_path / "ple_cache" / "1").is_dir()
+
+        # Core delete: no pasa por el flush ni incrementa la versión
+        db.execute(delete(EntryLine))
+        db.execute(delete(JournalEntry))
+        invalidate_company_ple_cache(db, 1)
+        db.commit()
+        assert not (tmp_path / "ple_cache" / "1").exists()
+        get_or_build_ple_txt(db, 1, "5.1", "2025-01", gen)
+        assert gen.llamadas == 2
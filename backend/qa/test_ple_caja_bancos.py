@@ -0,0 +1,79 @@
+"""
+Tests del Libro Caja y Bancos PLE (1.1 / 1.2) en un solo recorrido
+
+Cubre:
+- Saldo acumulado calculado en SQL por cuenta bancaria
+- Separación efectivo (1.1) / cuenta corriente (1.2) con el plan del sistema
+  (10.10 Caja, 10.21/10.22 Bancos) y con códigos PCGE sin puntos (101x / 104x)
+- Solo asientos POSTED del período
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.domain.models import Account, BankAccount, JournalEntry, EntryLine, Period
+from app.domain.enums import AccountType
+from app.application.ple_completo import _libro_caja_bancos, ple_caja_bancos, ple_caja_bancos_libros
+
+
+@pytest.fixture
+def db(db):
+
+    caja = Account(company_id=1, code="10.10", name="Caja", type=AccountType.ASSET)
+    banco = Account(company_id=1, code="10.21", name="Banco Nacional", type=AccountType.ASSET)
+    extranjero = Account(company_id=1, code="10.22", name="Banco Extranjero", type=AccountType.ASSET)
+    ventas = Account(company_id=1, code="70.10", name="Ventas", type=AccountType.INCOME)
+    db.add_all([caja, banco, extranjero, ventas])
+    db.flush()
+    db.add_all([
+        BankAccount(company_id=1, account_id=caja.id, bank_name="CAJA", account_number="-"),
+        BankAccount(company_id=1, account_id=banco.id, bank_name="BCP", account_number="191-000"),
+        BankAccount(company_id=1, account_id=extranjero.id, bank_name="BBVA", account_number="011-000"),
+    ])
+    periodo = Period(company_id=1, year=2025, month=1)
+    db.add(periodo)
+    db.flush()
+
+    def asiento(fecha, cuenta, debe, haber, status="POSTED"):
+        entry = JournalEntry(company_id=1, date=fecha, period_id=periodo.id, glosa=f"Mov {cuenta.code}", status=status)
+        entry.lines.append(EntryLine(account=cuenta, debit=Decimal(debe), credit=Decimal(haber)))
+        entry.lines.append(EntryLine(account=ventas, debit=Decimal(haber), credit=Decimal(debe)))
+        db.add(entry)
+
+    asiento(date(2025, 1, 5), banco, "1000", "0")
+    asiento(date(2025, 1, 3), caja, "200", "0")
+    asiento(date(2025, 1, 9), banco, "0", "300")
+    asiento(date(2025, 1, 8), extranjero, "40", "0")
+    asiento(date(2025, 1, 10), caja, "0", "50")
+    asiento(date(2025, 1, 11), banco, "999", "0", status="DRAFT")
+    db.commit()
+    return db
+
+
+class TestPleCajaBancos:
+
+    def test_libros_separados_con_saldo_acumulado(self, db):
+        libros = ple_caja_bancos_libros(db, 1, "2025-01")
+        assert [(r[1], r[2], r[9]) for r in libros["1.1"]] == [
+            ("20250103", "10.10", "200.00"),
+            ("20250110", "10.10", "150.00"),
+        ]
+        assert [(r[1], r[2], r[7], r[8], r[9]) for r in libros["1.2"]] == [
+            ("20250105", "10.21", "1000.00", "0.00", "1000.00"),
+            ("20250109", "10.21", "0.00", "300.00", "700.00"),
+            ("20250108", "10.22", "40.00", "0.00", "40.00"),
+        ]
+
+    def test_todas_las_cuentas_por_cuenta_bancaria(self, db):
+        rows = ple_caja_bancos(db, 1, "2025-01")
+        assert [r[2] for r in rows] == ["10.10", "10.10", "10.21", "10.21", "10.22"]
+        assert ple_caja_bancos(db, 1, "2025-01", libro="1.2") == ple_caja_bancos_libros(db, 1, "2025-01")["1.2"]
+
+    def test_periodo_inexistente(self, db):
+        assert ple_caja_bancos_libros(db, 1, "2024-12") == {"1.1": [], "1.2": []}
+
+    def test_codigos_pcge_sin_puntos(self):
+        assert [_libro_caja_bancos(c) for c in ("10.10", "1011", "10.21", "1041", "104.1")] == [
+            "1.1", "1.1", "1.2", "1.2", "1.2",
+        ]
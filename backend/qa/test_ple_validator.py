@@ -0,0 +1,94 @@
+"""
+Tests del validador de estructura PLE
+
+Cubre:
+- Libro válido sin errores
+- Cantidad de campos incorrecta
+- Fechas AAAAMMDD / períodos AAAAMM inválidos
+- Precisión numérica
+- Códigos de cuenta del plan (con puntos: 10.21, 60.11)
+- Catálogos y dígito verificador de RUC
+- Límite de errores reportados por columna y procesamiento por lotes
+"""
+import pytest
+
+from app.application.ple_validator import validar_libro_ple, compilar_estructura
+
+
+def _fila_compra(overrides=None):
+    fila = {
+        0: "202501", 1: "20250115", 2: "", 3: "01", 4: "F001", 5: "123",
+        6: "6", 7: "20100070970", 8: "PROVEEDOR SAC", 9: "100.00", 10: "18.00", 11: "118.00",
+    }
+    fila.update(overrides or {})
+    return [fila[i] for i in range(12)]
+
+
+class TestValidadorPLE:
+
+    def test_libro_diario_valido(self):
+        rows = [["20250115", "Asiento de apertura", "1011", "1500.00", "0.00"],
+                ["20240229", "", "4011", "0.00", "-1500.00"]]
+        res = validar_libro_ple(rows, "5.1")
+        assert res["valido"] is True
+        assert res["registros"] == 2
+
+    def test_codigos_de_cuenta_con_puntos(self):
+        rows = [["20250131", "g", "10.1", "1.00", "0.00"],
+                ["20250131", "g", "10.21", "0.00", "1.00"],
+                ["20250131", "g", "60.11", "1.00", "0.00"],
+                ["20250131", "g", "70.10", "0.00", "1.00"],
+                ["20250131", "g", "10.", "1.00", "0.00"],
+                ["20250131", "g", ".10", "1.00", "0.00"],
+                ["20250131", "g", "10..2", "1.00", "0.00"],
+                ["20250131", "g", "10.2A", "1.00", "0.00"]]
+        res = validar_libro_ple(rows, "5.1")
+        assert [m["fila"] for m in res["errores_por_columna"][3]["muestras"]] == [5, 6, 7, 8]
+
+    def test_cantidad_de_campos(self):
+        rows = [["20250115", "Glosa", "1011", "1.00", "0.00"], ["20250115", "Glosa"]]
+        res = validar_libro_ple(rows, "5.1")
+        assert res["valido"] is False
+        assert res["errores_estructura"]["total"] == 1
+        assert res["errores_estructura"]["muestras"][0]["fila"] == 2
+
+    def test_fechas_invalidas(self):
+        rows = [["20251301", "x", "1011", "1.00", "0.00"],
+                ["20250230", "x", "1011", "1.00", "0.00"],
+                ["2025-01-15", "x", "1011", "1.00", "0.00"]]
+        res = validar_libro_ple(rows, "5.1")
+        assert res["errores_por_columna"][1]["total"] == 3
+
+    def test_precision_numerica(self):
+        rows = [["20250115", "x", "1011", "1.5", "0.00"],
+                ["20250115", "x", "1011", "1234567890123.00", "0.00"],
+                ["20250115", "x", "1011", "--1.00", "0.00"],
+                ["20250115", "x", "1011", "-12.34", "0.00"]]
+        res = validar_libro_ple(rows, "5.1")
+        filas = [m["fila"] for m in res["errores_por_columna"][4]["muestras"]]
+        assert filas == [1, 2, 3]
+
+    def test_ruc_digito_verificador(self):
+        rows = [_fila_compra(), _fila_compra({7: "20100070971"}), _fila_compra({6: "1", 7: "1234567"})]
+        res = validar_libro_ple(rows, "8.1")
+        errores = res["errores_por_columna"][8]
+        assert errores["total"] == 2
+        assert [m["fila"] for m in errores["muestras"]] == [2, 3]
+
+    def test_catalogo(self):
+        rows = [_fila_compra({3: "99"}), _fila_compra({0: "202513"})]
+        res = validar_libro_ple(rows, "8.1")
+        assert res["errores_por_columna"][4]["total"] == 1
+        assert res["errores_por_columna"][1]["total"] == 1
+
+    def test_limite_errores_y_lotes(self):
+        rows = [["2025011X", "x", "1011", "1.00", "0.00"] for _ in range(50)]
+        res = validar_libro_ple(rows, "5.1", max_errores=5, tamano_lote=7)
+        errores = res["errores_por_columna"][1]
+        assert errores["total"] == 50
+        assert len(errores["muestras"]) == 5
+        assert res["registros"] == 50
+
+    def test_libro_no_soportado(self):
+        with pytest.raises(ValueError):
+            compilar_estructura("99.9")
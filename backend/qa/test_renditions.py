@@ -0,0 +1,120 @@
+"""
+Tests de miniaturas y vistas previas de documentos
+
+Cubre:
+- Upload de PDF encola las rendiciones; el worker las genera junto al blob
+- Contenido duplicado: reutiliza las rendiciones sin encolar
+- Endpoint: 202 mientras no existen, archivo con ETag/Cache-Control, 304 con If-None-Match
+- Purga del blob elimina sus rendiciones
+"""
+import io
+
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from app.domain.enums import UserRole
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import DocumentProcessingJob
+from app.infrastructure.renditions import RENDITION_SIZES, rendition_etag, rendition_path
+from app.infrastructure.storage import LocalFileStorage
+from app.application.blob_store import purge_unreferenced_blobs, register_blob_store_listeners
+from app.application.document_jobs import JOB_RENDITIONS, DocumentWorker
+from app.application.services_documents_v2 import DocumentService
+from app.api.routers import documents as documents_router
+
+pytestmark = pytest.mark.sqlite(archivo=True)
+
+
+def _pdf(texto: str) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(595, 842))
+    pdf.drawString(72, 770, texto)
+    pdf.rect(72, 400, 300, 200, fill=1)
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def factory(session_factory):
+    register_blob_store_listeners()  # El commit quita la marca de blob pendiente
+    session = session_factory()
+    session.add_all([Company(id=1, name="Empresa"),
+                     User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True)])
+    session.commit()
+    session.close()
+    return session_factory
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalFileStorage(base_path=str(tmp_path / "documents"))
+    monkeypatch.setattr(documents_router, "get_documents_storage_service", lambda: storage)
+    return storage
+
+
+def _subir(db, storage, contenido, nombre="factura.pdf"):
+    document, _ = DocumentService(db, storage).upload_document(
+        company_id=1, user_id=1, file_content=contenido, filename=nombre,
+        mime_type="application/pdf", document_type="COMPROBANTE_COMPRA",
+    )
+    db.commit()
+    return document
+
+
+def _rendiciones(db):
+    return db.query(DocumentProcessingJob).filter_by(job_type=JOB_RENDITIONS).count()
+
+
+class TestRenditions:
+
+    def test_generadas_en_la_cola(self, factory, storage):
+        db = factory()
+        contenido = _pdf("Factura F001-1")
+        doc = _subir(db, storage, contenido)
+        assert _rendiciones(db) == 1
+
+        assert DocumentWorker(concurrency=1, session_factory=factory, storage=storage).run_once() == 1
+        for ancho in RENDITION_SIZES.values():
+            with Image.open(storage.get_full_path(rendition_path(doc.file_hash, ancho))) as imagen:
+                assert imagen.format == "JPEG" and imagen.width == ancho
+
+        # Mismo contenido: ya tiene rendiciones, no se encola nada
+        _subir(db, storage, contenido, nombre="copia.pdf")
+        assert _rendiciones(db) == 1
+        db.close()
+
+    def test_endpoint_con_etag(self, factory, storage):
+        db = factory()
+        admin = db.get(User, 1)
+        doc = _subir(db, storage, _pdf("Factura F001-2"))
+        db.query(DocumentProcessingJob).delete()
+        db.commit()
+
+        pendiente = documents_router.document_thumbnail(doc.id, "thumbnail", None, db, admin)
+        assert pendiente.status_code == 202 and pendiente.headers["Retry-After"]
+        assert _rendiciones(db) == 1  # la vista encola la generación
+
+        DocumentWorker(concurrency=1, session_factory=factory, storage=storage).run_once()
+        respuesta = documents_router.document_thumbnail(doc.id, "thumbnail", None, db, admin)
+        etag = rendition_etag(doc.file_hash, RENDITION_SIZES["thumbnail"])
+        assert respuesta.media_type == "image/jpeg" and respuesta.headers["ETag"] == etag
+        assert "immutable" in respuesta.headers["Cache-Control"]
+
+        assert documents_router.document_thumbnail(doc.id, "thumbnail", f'W/{etag}', db, admin).status_code == 304
+        assert documents_router.preview_document(doc.id, f'"{doc.file_hash}"', db, admin).status_code == 304
+        db.close()
+
+    def test_purga_elimina_rendiciones(self, factory, storage):
+        db = factory()
+        doc = _subir(db, storage, _pdf("Factura F001-3"))
+        DocumentWorker(concurrency=1, session_factory=factory, storage=storage).run_once()
+        miniatura = rendition_path(doc.file_hash, RENDITION_SIZES["thumbnail"])
+        assert storage.exists(miniatura)
+
+        DocumentService(db, storage).delete_document(doc.id, 1, soft_delete=False)
+        db.commit()
+        assert purge_unreferenced_blobs(db, storage, grace_hours=0) == 1
+        assert not storage.exists(miniatura)
+        db.close()
@@ -0,0 +1,104 @@
+"""
+Tests de la conciliación propuesta SIRE vs. libros
+
+Cubre:
+- Clave normalizada (ceros a la izquierda, mayúsculas)
+- Clasificación: faltante, sobrante, diferencia de montos y de fecha
+- Comprobante registrado en otro período (fecha distinta, no faltante)
+- Persistencia de diferencias y paginación por id
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.domain.models import Company, ThirdParty
+from app.domain.models_ext import Purchase, Sale
+from app.domain.models_sire import SireProposalDetail, SireProposalType, SireReconciliationItem
+from app.application.sire_reconciliation import (
+    list_reconciliation_items,
+    normalizar_clave,
+    reconcile_sire_period,
+)
+
+
+@pytest.fixture
+def db(db):
+    db.add(Company(id=1, name="Empresa", ruc="20100070970"))
+    db.add_all([
+        ThirdParty(id=1, company_id=1, tax_id="20555555551", name="Proveedor A"),
+        ThirdParty(id=2, company_id=1, tax_id="20666666661", name="Proveedor B"),
+    ])
+    db.commit()
+    return db
+
+
+def _compra(db, proveedor, serie, numero, fecha, base, igv):
+    db.add(Purchase(company_id=1, doc_type="01", series=serie, number=numero, issue_date=fecha,
+                    supplier_id=proveedor, base_amount=Decimal(base), igv_amount=Decimal(igv),
+                    total_amount=Decimal(base) + Decimal(igv)))
+
+
+def _sunat(db, tipo, ruc, serie, numero, fecha, base, igv, period="202501"):
+    db.add(SireProposalDetail(company_id=1, proposal_type=tipo, period=period, line_no=1,
+                              doc_type="01", series=serie, number=numero, issue_date=fecha,
+                              counterparty_tax_id=ruc, base_amount=Decimal(base), igv_amount=Decimal(igv),
+                              total_amount=Decimal(base) + Decimal(igv)))
+
+
+class TestSireReconciliation:
+
+    def test_clave_normalizada(self):
+        assert normalizar_clave(" 2055 ", "1", "f001 ", "000123") == ("2055", "01", "F001", "123")
+
+    def test_clasificacion_rce(self, db):
+        # Concilia (número con ceros a la izquierda en SUNAT)
+        _compra(db, 1, "F001", "10", date(2025, 1, 5), "100.00", "18.00")
+        _sunat(db, SireProposalType.RCE, "20555555551", "F001", "00000010", date(2025, 1, 5), "100.00", "18.00")
+        # Diferencia de IGV
+        _compra(db, 1, "F001", "11", date(2025, 1, 6), "100.00", "17.00")
+        _sunat(db, SireProposalType.RCE, "20555555551", "F001", "11", date(2025, 1, 6), "100.00", "18.00")
+        # Misma serie/número pero otro proveedor: faltante + sobrante
+        _compra(db, 2, "F001", "12", date(2025, 1, 7), "50.00", "9.00")
+        _sunat(db, SireProposalType.RCE, "20555555551", "F001", "12", date(2025, 1, 7), "50.00", "9.00")
+        # Registrada en diciembre: diferencia de fecha, no faltante
+        _compra(db, 1, "E001", "1", date(2024, 12, 28), "10.00", "1.80")
+        _sunat(db, SireProposalType.RCE, "20555555551", "E001", "1", date(2025, 1, 2), "10.00", "1.80")
+        # Diferencia de redondeo dentro de la tolerancia
+        _compra(db, 2, "F002", "1", date(2025, 1, 9), "20.00", "3.60")
+        _sunat(db, SireProposalType.RCE, "20666666661", "F002", "1", date(2025, 1, 9), "20.01", "3.60")
+        db.commit()
+
+        run = reconcile_sire_period(db, 1, SireProposalType.RCE, "202501")
+        db.commit()
+        assert (run.sunat_count, run.books_count) == (5, 4)
+        assert run.matched_count == 2
+        assert (run.missing_in_books_count, run.extra_in_books_count) == (1, 1)
+        assert (run.amount_mismatch_count, run.date_mismatch_count) == (1, 1)
+
+        (monto,) = list_reconciliation_items(db, run.id, status="AMOUNT_MISMATCH")
+        assert (monto.number, monto.mismatch_fields) == ("11", "igv_amount,total_amount")
+        (fecha,) = list_reconciliation_items(db, run.id, status="DATE_MISMATCH")
+        assert (fecha.sunat_issue_date, fecha.book_issue_date) == (date(2025, 1, 2), date(2024, 12, 28))
+        (sobrante,) = list_reconciliation_items(db, run.id, status="EXTRA_IN_BOOKS")
+        assert sobrante.counterparty_tax_id == "20666666661"
+
+    def test_rvie_usa_ruc_de_la_empresa(self, db):
+        db.add(Sale(company_id=1, doc_type="03", series="B001", number="5", issue_date=date(2025, 1, 3),
+                    customer_id=99, base_amount=Decimal("10"), igv_amount=Decimal("1.80"), total_amount=Decimal("11.80")))
+        _sunat(db, SireProposalType.RVIE, "00000000", "B001", "5", date(2025, 1, 3), "10", "1.80")
+        db.query(SireProposalDetail).update({"doc_type": "03"})
+        db.commit()
+        run = reconcile_sire_period(db, 1, SireProposalType.RVIE, "202501")
+        assert run.matched_count == 1
+
+    def test_paginacion(self, db):
+        for n in range(1, 8):
+            _sunat(db, SireProposalType.RCE, "20555555551", "F009", str(n), date(2025, 1, 1), "1", "0")
+        db.commit()
+        run = reconcile_sire_period(db, 1, SireProposalType.RCE, "202501")
+        db.commit()
+        pagina1 = list_reconciliation_items(db, run.id, limit=5)
+        pagina2 = list_reconciliation_items(db, run.id, after_id=pagina1[-1].id, limit=5)
+        assert len(pagina1) == 5 and len(pagina2) == 2
+        assert db.query(SireReconciliationItem).count() == 7
@@ -0,0 +1,171 @@
+"""
+Tests de la resiliencia del transporte SIRE
+
+Cubre:
+- Backoff exponencial con jitter y respeto de Retry-After
+- Token bucket: ráfaga y luego ritmo sostenido
+- Circuit breaker: apertura, enfriamiento, petición de prueba y cierre
+- Reintentos contra el servidor SUNAT simulado (fallos 503 y 429)
+- POST no idempotente sin reintento ante 503
+- Métricas por RUC
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.application.services_sire import fetch_period_proposals
+from app.config import settings
+from app.domain.models_sire import SireProposalType
+from app.infrastructure import sire_resilience
+from app.infrastructure.sire_client import SIREClient
+from app.infrastructure.sire_resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    SireCircuitOpenError,
+    TokenBucket,
+    send_with_resilience,
+    transport_status,
+)
+from scripts.sire_fake_server import SIRE_PATH, create_app
+
+RUC = "20100070970"
+
+
+@pytest.fixture(autouse=True)
+def transporte(monkeypatch):
+    monkeypatch.setattr(settings, "sire_retry_base_delay", 0.001)
+    monkeypatch.setattr(settings, "sire_retry_max_delay", 0.01)
+    monkeypatch.setattr(settings, "sire_rate_limit_per_second", 0)
+    sire_resilience.reset_transport_state()
+    yield
+    sire_resilience.reset_transport_state()
+
+
+def _cliente(transport):
+    http = httpx.AsyncClient(transport=transport)
+    client = SIREClient(
+        company_id=1, oauth_client_id="id", oauth_client_secret="secret",
+        access_token="tok", token_expires_at=datetime.now() + timedelta(hours=1),
+        ruc=RUC, usuario_generador="U", password_generador="P",
+        http_client=http,
+    )
+    client.base_url = "http://sunat.test" + SIRE_PATH
+    return client, http
+
+
+class TestSireResilience:
+
+    def test_backoff_con_jitter_y_retry_after(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=4.0)
+        for intento, techo in [(1, 0.5), (2, 1.0), (3, 2.0), (4, 4.0), (6, 4.0)]:
+            esperas = [policy.delay(intento) for _ in range(50)]
+            assert all(0 <= e <= techo for e in esperas)
+        assert policy.delay(1, retry_after=2.0) == 2.0
+        assert policy.delay(1, retry_after=60.0) == 4.0
+
+    def test_token_bucket_rafaga_y_ritmo(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+        assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+        assert TokenBucket(rate=0, capacity=1).reserve() == 0.0
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        breaker.before_call(RUC)
+        breaker.record_failure()
+        with pytest.raises(SireCircuitOpenError):
+            breaker.before_call(RUC)
+
+        asyncio.run(asyncio.sleep(0.06))
+        breaker.before_call(RUC)  # petición de prueba
+        with pytest.raises(SireCircuitOpenError):
+            breaker.before_call(RUC)  # solo una a la vez
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        asyncio.run(asyncio.sleep(0.06))
+        breaker.before_call(RUC)
+        breaker.record_success()
+        assert (breaker.state, breaker.failures) == (CircuitBreaker.CLOSED, 0)
+
+    def test_reintentos_contra_servidor_simulado(self, monkeypatch):
+        # Con 3 períodos en paralelo fallando a la vez no debe abrirse el circuito
+        monkeypatch.setattr(settings, "sire_circuit_failure_threshold", 20)
+        app = create_app(latency=0, comprobantes_por_periodo=1, fallos_iniciales=2)
+        periodos = [f"2024{m:02d}" for m in range(1, 7)]
+
+        async def run():
+            client, http = _cliente(httpx.ASGITransport(app=app))
+            async with http:
+                return await fetch_period_proposals(client, SireProposalType.RCE, periodos, concurrency=3)
+
+        resultados = asyncio.run(run())
+        assert all(error is None for _, _, error in resultados)
+        assert resultados[0][1]["perTributario"] == "202401"
+        assert app.state.stats["failed"] == 12
+
+        estado = transport_status(RUC)
+        assert (estado["requests"], estado["retries"], estado["failures"]) == (18, 12, 0)
+        assert estado["latency"]["count"] == 18
+        assert estado["circuit_state"] == CircuitBreaker.CLOSED
+
+    def test_reintentos_agotados_y_429(self, monkeypatch):
+        monkeypatch.setattr(settings, "sire_retry_max_attempts", 2)
+        app = create_app(latency=0, comprobantes_por_periodo=1, fallos_iniciales=5, status_fallo=429)
+
+        async def run():
+            client, http = _cliente(httpx.ASGITransport(app=app))
+            async with http:
+                with pytest.raises(Exception, match="429"):
+                    await client.get_rce_proposal_by_period("202401")
+
+        asyncio.run(run())
+        estado = transport_status(RUC)
+        assert (estado["requests"], estado["retries"], estado["failures"], estado["throttled"]) == (2, 1, 1, 2)
+
+    def test_post_no_se_reintenta_y_circuito_abre(self, monkeypatch):
+        monkeypatch.setattr(settings, "sire_circuit_failure_threshold", 3)
+        llamadas = []
+
+        def handler(request: httpx.Request):
+            llamadas.append(request.method)
+            return httpx.Response(503, text="no disponible")
+
+        async def run():
+            client, http = _cliente(httpx.MockTransport(handler))
+            async with http:
+                with pytest.raises(Exception, match="503"):
+                    await client._make_request("POST", "/x", data={})
+                assert llamadas == ["POST"]
+                # El GET se reintenta hasta que el tercer fallo consecutivo abre el circuito
+                with pytest.raises(SireCircuitOpenError):
+                    await client._make_request("GET", "/x")
+                with pytest.raises(SireCircuitOpenError):
+                    await client._make_request("GET", "/x")
+
+        asyncio.run(run())
+        assert llamadas == ["POST", "GET", "GET"]
+        estado = transport_status(RUC)
+        assert estado["circuit_state"] == CircuitBreaker.OPEN
+        assert estado["circuit_rejections"] == 2
+
+    def test_limite_de_ritmo_compartido(self, monkeypatch):
+        monkeypatch.setattr(settings, "sire_rate_limit_per_second", 50)
+        monkeypatch.setattr(settings, "sire_rate_limit_burst", 1)
+
+        async def ok():
+            return httpx.Response(200)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            inicio = loop.time()
+            await asyncio.gather(*(send_with_resilience(RUC, "GET", ok) for _ in range(6)))
+            return loop.time() - inicio
+
+        assert asyncio.run(run()) >= 0.09
+        assert transport_status(RUC)["rate_limit_wait_seconds"] > 0
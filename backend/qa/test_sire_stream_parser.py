@@ -0,0 +1,105 @@
+"""
+Tests del parser incremental de propuestas SIRE
+
+Cubre:
+- TXT SUNAT (RVIE/RCE) con cabecera, fechas DD/MM/AAAA y montos
+- ZIP con TXT y con JSON
+- JSON sin ijson (lectura completa) y alias de claves
+- Carga masiva por lotes que reemplaza el detalle del período
+"""
+import json
+import zipfile
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from app.domain.models_sire import SireProposalDetail, SireProposalType
+from app.infrastructure import sire_parser
+from app.infrastructure.sire_parser import iter_proposal_records
+from app.application.services_sire import load_proposal_details
+
+
+def _linea_rvie(n, total="118.00"):
+    campos = [""] * 30
+    campos[0:13] = ["20100070970", "EMPRESA SAC", "202501", f"CAR{n}", "15/01/2025", "", "01", "F001",
+                    str(n), "", "6", "20555555551", "CLIENTE SAC"]
+    campos[14], campos[16], campos[25], campos[26] = "100.00", "18.00", total, "PEN"
+    return "|".join(campos)
+
+
+def _linea_rce(n):
+    campos = [""] * 30
+    campos[0:14] = ["20100070970", "EMPRESA SAC", "202501", f"CAR{n}", "03/01/2025", "", "01", "E001",
+                    "", str(n), "", "6", "20100070970", "PROVEEDOR SAC"]
+    campos[14:20] = ["100.00", "18.00", "50.00", "9.00", "", ""]
+    campos[24], campos[25] = "177.00", "USD"
+    return "|".join(campos)
+
+
+@pytest.fixture
+def db(db):
+    return db
+
+
+class TestSireStreamParser:
+
+    def test_txt_rvie_con_cabecera(self, tmp_path):
+        path = tmp_path / "rvie.txt"
+        path.write_text("RUC|Razon Social|Periodo|CAR\n" + _linea_rvie(1) + "\n" + _linea_rvie(2, "1,180.00") + "\n",
+                        encoding="utf-8")
+        registros = list(iter_proposal_records(str(path), "RVIE"))
+        assert len(registros) == 2
+        r = registros[0]
+        assert (r["doc_type"], r["series"], r["number"]) == ("01", "F001", "1")
+        assert r["issue_date"] == date(2025, 1, 15)
+        assert r["counterparty_tax_id"] == "20555555551"
+        assert (r["base_amount"], r["igv_amount"], r["currency"]) == (Decimal("100.00"), Decimal("18.00"), "PEN")
+        assert registros[1]["total_amount"] == Decimal("1180.00")
+
+    def test_txt_rce_suma_bases(self, tmp_path):
+        path = tmp_path / "rce.txt"
+        path.write_text(_linea_rce(7) + "\n", encoding="utf-8")
+        (r,) = iter_proposal_records(str(path), SireProposalType.RCE)
+        assert r["number"] == "7"
+        assert r["base_amount"] == Decimal("150.00")
+        assert r["igv_amount"] == Decimal("27.00")
+        assert r["total_amount"] == Decimal("177.00")
+        assert r["currency"] == "USD"
+
+    def test_zip_con_txt_y_json(self, tmp_path):
+        path = tmp_path / "propuesta.zip"
+        data = {"perTributario": "202501", "registros": [
+            {"codTipoCDP": "03", "numSerieCDP": "B001", "numCDP": "9", "fecEmisionCDP": "2025-01-20",
+             "mtoBIGravada": 10.5, "mtoIGV": 1.89, "mtoTotalCP": 12.39},
+        ]}
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("a.txt", _linea_rvie(1) + "\n")
+            zf.writestr("b.json", json.dumps(data))
+        registros = list(iter_proposal_records(str(path), "RVIE"))
+        assert [r["series"] for r in registros] == ["F001", "B001"]
+        assert registros[1]["issue_date"] == date(2025, 1, 20)
+        assert registros[1]["base_amount"] == Decimal("10.5")
+
+    def test_json_sin_ijson(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sire_parser, "IJSON_AVAILABLE", False)
+        path = tmp_path / "propuesta.json"
+        path.write_text(json.dumps({"comprobantes": [
+            {"tipoDocumento": "01", "serie": "F002", "numero": "5", "fechaEmision": "05/01/2025", "total": "118"},
+        ]}), encoding="utf-8")
+        (r,) = iter_proposal_records(str(path), "RCE")
+        assert (r["series"], r["issue_date"], r["total_amount"]) == ("F002", date(2025, 1, 5), Decimal("118"))
+        assert r["igv_amount"] == Decimal("0")
+
+    def test_carga_por_lotes_reemplaza_periodo(self, db, tmp_path):
+        path = tmp_path / "rvie.txt"
+        path.write_text("\n".join(_linea_rvie(n) for n in range(1, 26)) + "\n", encoding="utf-8")
+        assert load_proposal_details(db, 1, SireProposalType.RVIE, "202501", str(path), chunk_size=10) == 25
+        assert load_proposal_details(db, 1, SireProposalType.RVIE, "202501", str(path), chunk_size=10) == 25
+        db.commit()
+
+        total = db.execute(select(func.count()).select_from(SireProposalDetail)).scalar()
+        assert total == 25
+        ultima = db.execute(select(SireProposalDetail).order_by(SireProposalDetail.line_no.desc())).scalars().first()
+        assert (ultima.line_no, ultima.number, ultima.total_amount) == (25, "25", Decimal("118.00"))
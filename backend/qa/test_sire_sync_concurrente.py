@@ -0,0 +1,82 @@
+"""
+Tests de la descarga concurrente de propuestas SIRE
+
+Cubre:
+- Orden de resultados igual al de los períodos solicitados
+- Concurrencia acotada por el semáforo
+- Error en un período sin cancelar los demás
+- Un único token y un único cliente HTTP para todas las peticiones
+- Cliente HTTP compartido por loop: uno por empresa, descartado al cerrarse el loop
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.application.services_sire import fetch_period_proposals
+from app.domain.models_sire import SireProposalType
+from app.infrastructure import sire_client
+from app.infrastructure.sire_client import SIREClient, close_shared_http_clients, get_shared_http_client
+
+
+def _cliente(handler):
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = SIREClient(
+        company_id=1, oauth_client_id="id", oauth_client_secret="secret",
+        access_token="tok", token_expires_at=datetime.now() + timedelta(hours=1),
+        ruc="20100070970", usuario_generador="U", password_generador="P",
+        http_client=http,
+    )
+    return client, http
+
+
+class TestSireSyncConcurrente:
+
+    def test_orden_concurrencia_y_errores(self):
+        estado = {"actual": 0, "maximo": 0, "tokens": set()}
+
+        async def handler(request: httpx.Request):
+            estado["actual"] += 1
+            estado["maximo"] = max(estado["maximo"], estado["actual"])
+            estado["tokens"].add(request.headers["Authorization"])
+            await asyncio.sleep(0.01)
+            estado["actual"] -= 1
+            periodo = request.url.path.rsplit("/", 1)[1]
+            if periodo == "202403":
+                return httpx.Response(404, text="sin propuesta")
+            return httpx.Response(200, json={"perTributario": periodo, "registros": []})
+
+        async def run():
+            client, http = _cliente(handler)
+            async with http:
+                return await fetch_period_proposals(
+                    client, SireProposalType.RCE, [f"2024{m:02d}" for m in range(1, 13)], concurrency=3
+                )
+
+        resultados = asyncio.run(run())
+        assert [r[0] for r in resultados] == [f"2024{m:02d}" for m in range(1, 13)]
+        assert [r[0] for r in resultados if r[2] is not None] == ["202403"]
+        assert resultados[0][1]["perTributario"] == "202401"
+        assert estado["maximo"] == 3
+        assert estado["tokens"] == {"Bearer tok"}
+
+    def test_cliente_compartido_por_loop(self):
+        async def obtener():
+            a, b = get_shared_http_client(1), get_shared_http_client(2)
+            assert get_shared_http_client(1) is a and a is not b
+            return asyncio.get_running_loop(), a
+
+        # asyncio.run cierra el loop sin cerrar los clientes: el siguiente loop no los reutiliza
+        loop1, primero = asyncio.run(obtener())
+        assert loop1 in sire_client._HTTP_CLIENTS
+        loop2, segundo = asyncio.run(obtener())
+        assert segundo is not primero
+        assert loop1 not in sire_client._HTTP_CLIENTS and loop2 in sire_client._HTTP_CLIENTS
+
+        async def cerrar():
+            cliente = get_shared_http_client(1)
+            await close_shared_http_clients()
+            assert cliente.is_closed
+            assert asyncio.get_running_loop() not in sire_client._HTTP_CLIENTS
+
+        asyncio.run(cerrar())
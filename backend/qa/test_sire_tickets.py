@@ -0,0 +1,144 @@
+"""
+Tests del seguimiento de tickets SIRE en segundo plano
+
+Cubre:
+- Interpretación del estado devuelto por SUNAT
+- Ronda de consulta: un cliente por empresa, estados y backoff adaptativo
+- Errores de consulta (se reintenta) y expiración por antigüedad
+- Reserva de tickets: dos rondas simultáneas no consultan el mismo ticket
+- Poller en segundo plano con arranque y parada
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.domain.models import Company
+from app.domain.models_sire import SireConfiguration, SireTicket, SireTicketStatus
+from app.application import sire_tickets
+from app.application.sire_tickets import (
+    SireTicketPoller,
+    interpret_ticket_status,
+    poll_due_tickets,
+    register_sire_ticket,
+)
+
+pytestmark = pytest.mark.sqlite(compartida=True)
+
+
+class _ClienteFalso:
+    def __init__(self, respuestas, creados):
+        self.respuestas = respuestas
+        creados.append(self)
+
+    async def check_ticket_status(self, ticket_number):
+        await asyncio.sleep(0)
+        respuesta = self.respuestas[ticket_number]
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    with session_factory() as db:
+        db.add_all([Company(id=1, name="A", ruc="20100070970"), Company(id=2, name="B", ruc="20555555551")])
+        db.add_all([SireConfiguration(company_id=1, ruc="20100070970"), SireConfiguration(company_id=2, ruc="20555555551")])
+        db.commit()
+    return session_factory
+
+
+def _registrar(factory, company_id, numero, vencido=True):
+    with factory() as db:
+        ticket = register_sire_ticket(db, company_id, numero, "REPLACE")
+        if vencido:
+            ticket.next_poll_at = datetime.now() - timedelta(seconds=1)
+        db.commit()
+        return ticket.id
+
+
+class TestSireTickets:
+
+    def test_interpretar_estado(self):
+        assert interpret_ticket_status({"registros": [{"codEstadoProceso": "06"}]})[0] == "COMPLETED"
+        assert interpret_ticket_status({"desEstadoProceso": "En proceso"})[0] == "PROCESSING"
+        estado, detalle = interpret_ticket_status({"status": "ERROR", "message": "Archivo inválido"})
+        assert (estado, detalle) == ("FAILED", "Archivo inválido")
+        assert interpret_ticket_status({"raw_response": ""})[0] == "PROCESSING"
+
+    def test_ronda_de_consulta(self, session_factory):
+        _registrar(session_factory, 1, "T1")
+        _registrar(session_factory, 1, "T2")
+        _registrar(session_factory, 2, "T3")
+        _registrar(session_factory, 2, "T4", vencido=False)
+        # Registrar de nuevo es idempotente
+        _registrar(session_factory, 1, "T1")
+        respuestas = {
+            "T1": {"codEstadoProceso": "06", "desEstadoProceso": "Terminado"},
+            "T2": {"desEstadoProceso": "En proceso"},
+            "T3": {"desEstadoProceso": "Terminado con errores", "detalle": "Fila 3 inválida"},
+        }
+        creados = []
+        consultados = asyncio.run(poll_due_tickets(session_factory, lambda c: _ClienteFalso(respuestas, creados)))
+        assert consultados == 3
+        assert len(creados) == 2  # un cliente por empresa
+
+        with session_factory() as db:
+            tickets = {t.ticket_number: t for t in db.query(SireTicket)}
+            assert len(tickets) == 4
+            assert (tickets["T1"].status, tickets["T1"].attempts) == ("COMPLETED", 1)
+            assert tickets["T1"].completed_at is not None
+            assert tickets["T3"].status == "FAILED"
+            assert tickets["T3"].error_message == "Fila 3 inválida"
+            t2 = tickets["T2"]
+            assert t2.status == "PROCESSING"
+            espera = (t2.next_poll_at - t2.last_polled_at).total_seconds()
+            assert espera == pytest.approx(settings.sire_ticket_poll_initial_seconds * 2)
+            assert tickets["T4"].status == "PENDING"
+
+        # Nada vencido: la siguiente ronda no consulta
+        assert asyncio.run(poll_due_tickets(session_factory, lambda c: _ClienteFalso(respuestas, creados))) == 0
+
+    def test_error_de_consulta_y_expiracion(self, session_factory):
+        _registrar(session_factory, 1, "T1")
+        viejo = _registrar(session_factory, 2, "T2")
+        with session_factory() as db:
+            db.get(SireTicket, viejo).created_at = datetime.now() - timedelta(hours=settings.sire_ticket_max_age_hours + 1)
+            db.commit()
+        respuestas = {"T1": Exception("Timeout al conectar con SUNAT"), "T2": {"desEstadoProceso": "En proceso"}}
+        asyncio.run(poll_due_tickets(session_factory, lambda c: _ClienteFalso(respuestas, [])))
+
+        with session_factory() as db:
+            tickets = {t.ticket_number: t for t in db.query(SireTicket)}
+            assert tickets["T1"].status == "PENDING"
+            assert "Timeout" in tickets["T1"].error_message
+            assert tickets["T1"].next_poll_at > datetime.now()
+            assert tickets["T2"].status == SireTicketStatus.EXPIRED.value
+
+    def test_reserva_evita_doble_consulta(self, session_factory):
+        _registrar(session_factory, 1, "T1")
+        with session_factory() as db1, session_factory() as db2:
+            ahora = datetime.now()
+            assert len(sire_tickets._reservar_vencidos(db1, ahora, 10)) == 1
+            assert sire_tickets._reservar_vencidos(db2, ahora, 10) == []
+
+    def test_poller_en_segundo_plano(self, session_factory, monkeypatch):
+        monkeypatch.setattr(settings, "sire_ticket_poll_idle_seconds", 0.05)
+        _registrar(session_factory, 1, "T1")
+        respuestas = {"T1": {"codEstadoProceso": "06"}}
+
+        async def run():
+            poller = SireTicketPoller(session_factory, lambda c: _ClienteFalso(respuestas, []))
+            poller.start()
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                with session_factory() as db:
+                    if db.query(SireTicket).one().status == "COMPLETED":
+                        break
+            await poller.stop()
+            return poller.running
+
+        assert asyncio.run(run()) is False
+        with session_factory() as db:
+            assert db.query(SireTicket).one().status == "COMPLETED"
@@ -0,0 +1,166 @@
+"""
+Tests de la caché de tokens SIRE
+
+Cubre:
+- Una sola petición de token para llamadores concurrentes (single-flight)
+- Renovación anticipada en segundo plano sin bloquear al llamador
+- Token vencido: los llamadores esperan la renovación
+- Error de renovación propagado sin dejar la clave bloqueada
+- Token guardado en SireConfiguration reutilizado sin pedir otro
+- Cambio de credenciales: se descarta el token en caché y el guardado en la configuración
+- Cliente creado desde la configuración y token renovado guardado de vuelta
+- Renovación en vuelo de un loop cerrado: el loop siguiente no la reutiliza
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.domain.models import Company
+from app.application.services_sire import build_sire_client, create_or_update_sire_configuration, persist_sire_tokens
+from app.infrastructure import sire_auth
+from app.infrastructure.unit_of_work import UnitOfWork
+from app.infrastructure.sire_auth import get_cached_token, seed_token_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    sire_auth._TOKEN_CACHE.clear()
+    sire_auth._TOKEN_INFLIGHT.clear()
+    yield
+    sire_auth._TOKEN_CACHE.clear()
+
+
+class _Fetcher:
+    def __init__(self, vigencia=timedelta(hours=1), falla=False):
+        self.llamadas = 0
+        self.vigencia = vigencia
+        self.falla = falla
+
+    async def __call__(self, refresh_token):
+        self.llamadas += 1
+        await asyncio.sleep(0.01)
+        if self.falla:
+            raise RuntimeError("SUNAT no disponible")
+        return {
+            "access_token": f"tok{self.llamadas}",
+            "expires_at": (datetime.now() + self.vigencia).isoformat(),
+        }
+
+
+class TestSireTokenCache:
+
+    def test_single_flight(self):
+        fetch = _Fetcher()
+
+        async def run():
+            return await asyncio.gather(*(get_cached_token("cid", "20100070970", fetch) for _ in range(10)))
+
+        tokens = asyncio.run(run())
+        assert fetch.llamadas == 1
+        assert {t.access_token for t in tokens} == {"tok1"}
+
+    def test_renovacion_anticipada(self):
+        seed_token_cache("cid", "20100070970", "viejo", None, datetime.now() + timedelta(minutes=2))
+        fetch = _Fetcher()
+
+        async def run():
+            primero = await get_cached_token("cid", "20100070970", fetch)
+            segundo = await get_cached_token("cid", "20100070970", fetch)
+            await asyncio.sleep(0.05)
+            return primero, segundo, await get_cached_token("cid", "20100070970", fetch)
+
+        primero, segundo, despues = asyncio.run(run())
+        assert (primero.access_token, segundo.access_token) == ("viejo", "viejo")
+        assert despues.access_token == "tok1"
+        assert fetch.llamadas == 1
+
+    def test_token_vencido_espera(self):
+        seed_token_cache("cid", "20100070970", "viejo", None, datetime.now() + timedelta(seconds=5))
+        fetch = _Fetcher()
+        token = asyncio.run(get_cached_token("cid", "20100070970", fetch))
+        assert token.access_token == "tok1"
+
+    def test_error_no_bloquea_clave(self):
+        fetch = _Fetcher(falla=True)
+
+        async def run():
+            return await asyncio.gather(
+                *(get_cached_token("cid", "1", fetch) for _ in range(3)), return_exceptions=True
+            )
+
+        resultados = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in resultados)
+        assert fetch.llamadas == 1
+
+        fetch.falla = False
+        assert asyncio.run(get_cached_token("cid", "1", fetch)).access_token == "tok2"
+
+    def test_token_guardado_reutilizado(self):
+        seed_token_cache("cid", "1", "guardado", "ref", datetime.now() + timedelta(hours=1))
+        fetch = _Fetcher()
+        assert asyncio.run(get_cached_token("cid", "1", fetch)).access_token == "guardado"
+        assert fetch.llamadas == 0
+
+    def test_renovacion_de_loop_cerrado_no_se_reutiliza(self):
+        async def colgado(refresh_token):
+            await asyncio.Event().wait()
+
+        async def iniciar():
+            sire_auth._iniciar_renovacion(("cid", "1"), colgado)
+
+        viejo = asyncio.new_event_loop()
+        viejo.run_until_complete(iniciar())
+        viejo.close()  # La renovación queda pendiente en un loop muerto
+        assert viejo in sire_auth._TOKEN_INFLIGHT
+
+        fetch = _Fetcher()
+        assert asyncio.run(get_cached_token("cid", "1", fetch)).access_token == "tok1"
+        assert fetch.llamadas == 1
+        assert viejo not in sire_auth._TOKEN_INFLIGHT
+
+    def test_cambio_de_credenciales_descarta_token_guardado(self, db):
+        uow = UnitOfWork(db)
+        uow.db.add(Company(id=1, name="Empresa"))
+        config = create_or_update_sire_configuration(
+            uow, 1, "cid", "secreto", ruc="20100070970", usuario_generador="USR", password_generador="clave",
+        )
+        vence = datetime.now() + timedelta(hours=1)
+        config.oauth_token, config.oauth_refresh_token, config.oauth_token_expires_at = "viejo", "ref", vence
+        uow.commit()
+        seed_token_cache("cid", "20100070970", "viejo", "ref", vence)
+
+        # Guardar sin cambiar credenciales conserva el token
+        create_or_update_sire_configuration(uow, 1, "cid", "secreto", auto_sync_enabled=True)
+        assert config.oauth_token == "viejo"
+        assert sire_auth._TOKEN_CACHE
+
+        # Password nueva: ni la caché ni la configuración pueden volver a sembrar el token anterior
+        create_or_update_sire_configuration(uow, 1, "cid", "", password_generador="nueva")
+        assert (config.oauth_token, config.oauth_refresh_token, config.oauth_token_expires_at) == (None, None, None)
+        assert not sire_auth._TOKEN_CACHE
+
+        # Cambio de client_id: igual
+        config.oauth_token = "otro"
+        seed_token_cache("cid", "20100070970", "otro", None, vence)
+        create_or_update_sire_configuration(uow, 1, "cid2", "")
+        assert config.oauth_token is None and not sire_auth._TOKEN_CACHE
+
+    def test_cliente_desde_configuracion_y_token_renovado(self, db):
+        uow = UnitOfWork(db)
+        uow.db.add(Company(id=1, name="Empresa"))
+        config = create_or_update_sire_configuration(
+            uow, 1, "cid", "secreto", ruc="20100070970", usuario_generador="USR", password_generador="clave",
+        )
+        config.oauth_token = "viejo"
+        client = build_sire_client(config)
+        assert (client.company_id, client.access_token, client.password_generador) == (1, "viejo", "clave")
+
+        # Sin renovación no se toca la configuración
+        persist_sire_tokens(config, client)
+        assert config.oauth_token == "viejo"
+
+        vence = datetime.now() + timedelta(hours=1)
+        client.access_token, client.refresh_token, client.token_expires_at = "nuevo", "ref", vence
+        persist_sire_tokens(config, client)
+        assert (config.oauth_token, config.oauth_refresh_token, config.oauth_token_expires_at) == ("nuevo", "ref", vence)
@@ -0,0 +1,120 @@
+"""
+Tests de la recepción de uploads en streaming
+
+Cubre:
+- Copia por bloques: SHA-256, tamaño y primer KB calculados sobre la marcha
+- Límite de tamaño aplicado por bloque (el temporal excedido se elimina)
+- Firma del contenido contra la extensión
+- Movimiento del temporal al storage sin copia en memoria
+- Upload de documentos desde el temporal (blob store y extracción XML)
+"""
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from app.domain.enums import UserRole
+from app.domain.models import Company, User
+from app.domain.models_documents_v2 import DocumentExtractedData
+from app.infrastructure.storage import LocalFileStorage
+from app.infrastructure.uploads import (
+    UploadTooLarge, sniff_content, stage_upload, staged_from_bytes, validate_content_matches,
+)
+from app.application.services_documents_v2 import DocumentService
+from app.application.services_mailbox import validate_file_upload
+
+XML = b"<?xml version='1.0'?><Invoice><ID>F001-90</ID></Invoice>"
+
+
+class _FakeUpload:
+    """Imita UploadFile: lectura asíncrona por bloques, registrando cuánto se leyó"""
+
+    def __init__(self, content: bytes, filename: str = "archivo.pdf", content_type: str = "application/pdf"):
+        self._buffer = io.BytesIO(content)
+        self.filename = filename
+        self.content_type = content_type
+        self.lecturas = []
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self._buffer.read(size)
+        self.lecturas.append(len(chunk))
+        return chunk
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([Company(id=1, name="Empresa"),
+                User(id=1, username="admin", password_hash="x", role=UserRole.ADMINISTRADOR, is_admin=True)])
+    db.commit()
+    return db
+
+
+class TestUploads:
+
+    def test_stage_por_bloques(self, tmp_path):
+        contenido = b"%PDF-1.4\n" + bytes(range(256)) * 40
+        upload = _FakeUpload(contenido)
+        staged = asyncio.run(stage_upload(upload, max_bytes=len(contenido), tmp_dir=tmp_path, chunk_size=1000))
+
+        assert staged.path.parent == tmp_path and staged.path.read_bytes() == contenido
+        assert (staged.size, staged.sha256) == (len(contenido), hashlib.sha256(contenido).hexdigest())
+        assert staged.head == contenido[:1024]
+        assert max(upload.lecturas) == 1000
+        staged.discard()
+        staged.discard()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_limite_corta_la_lectura(self, tmp_path):
+        upload = _FakeUpload(b"x" * 10_000)
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(stage_upload(upload, max_bytes=2500, tmp_dir=tmp_path, chunk_size=1000))
+        assert sum(upload.lecturas) == 3000  # no siguió leyendo tras exceder
+        assert list(tmp_path.iterdir()) == []
+
+    def test_firma_del_contenido(self):
+        assert sniff_content(b"%PDF-1.7") == "pdf"
+        assert sniff_content(b"PK\x03\x04resto") == "zip"
+        assert sniff_content(b"\xef\xbb\xbf  <?xml") == "xml"
+        assert sniff_content(b"MZ\x00\x90") == "binary"
+        validate_content_matches("reporte.xlsx", b"PK\x03\x04")
+        validate_content_matches("sin_firma.xyz", b"MZ\x00")
+        with pytest.raises(ValueError):
+            validate_content_matches("factura.pdf", b"MZ\x00\x90")
+        validate_file_upload("informe.pdf")
+        with pytest.raises(ValueError):
+            validate_file_upload("informe.pdf", 100, b"<html>")
+        with pytest.raises(ValueError):
+            validate_file_upload("informe.pdf", 11 * 1024 * 1024, b"%PDF-")
+
+    def test_save_file_mueve_el_temporal(self, tmp_path):
+        storage = LocalFileStorage(base_path=str(tmp_path / "docs"))
+        staged = staged_from_bytes(XML, "f.xml", "application/xml", tmp_dir=tmp_path / "staging")
+        assert storage.save_file("blobs/aa/bb/f", staged.path) == "blobs/aa/bb/f"
+        assert storage.get("blobs/aa/bb/f") == XML and not staged.path.exists()
+
+    def test_documento_desde_temporal(self, db, tmp_path):
+        storage = LocalFileStorage(base_path=str(tmp_path / "docs"))
+        service = DocumentService(db, storage)
+
+        def subir(contenido, nombre="factura.xml", mime="application/xml"):
+            staged = staged_from_bytes(contenido, nombre, mime, tmp_dir=tmp_path / "staging")
+            try:
+                document, _ = service.upload_document(
+                    company_id=1, user_id=1, file_content=staged, filename=nombre, mime_type=mime,
+                    document_type="COMPROBANTE_COMPRA", enable_extraction=True,
+                )
+            finally:
+                staged.discard()
+            db.commit()
+            return document
+
+        a = subir(XML)
+        b = subir(XML, nombre="copia.xml")
+        assert (a.file_size, a.file_hash) == (len(XML), hashlib.sha256(XML).hexdigest())
+        assert a.blob_id == b.blob_id and storage.get(a.file_path) == XML
+        assert db.query(DocumentExtractedData).filter_by(document_id=b.id).one().extraction_success
+        assert list((tmp_path / "staging").iterdir()) == []
+
+        with pytest.raises(ValueError):
+            subir(b"MZ\x00\x90ejecutable", nombre="factura.pdf", mime="application/pdf")
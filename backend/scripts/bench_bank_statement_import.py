@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la importación de extractos bancarios.
+
+Genera un CSV sintético (por defecto 50k movimientos) y mide, en SQLite en
+memoria, la carga fila por fila con db.add() frente a import_bank_statement
+(parseo en streaming, huellas e INSERT por lotes); luego reimporta el mismo
+archivo para medir la detección de duplicados.
+
+Uso:
+  cd backend && python -m scripts.bench_bank_statement_import --movimientos 50000
+"""
+import argparse
+import io
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, _import_all_models
+from app.domain.models import Account, BankAccount, BankStatement, BankTransaction, Company, Period, User
+from app.application.bank_statement_import import import_bank_statement
+from app.infrastructure.bank_statement_parser import BankStatementReader
+
+
+def _csv(n: int) -> bytes:
+    rnd = random.Random(42)
+    lineas = ["Fecha;Descripción operación;Monto;Saldo;Operación - Número"]
+    saldo = Decimal("100000.00")
+    for i in range(n):
+        monto = Decimal(rnd.randint(-500000, 500000)) / 100
+        saldo += monto
+        fecha = date(2025, 1, 1) + timedelta(days=i % 31)
+        lineas.append(f"{fecha:%d/%m/%Y};OPERACION {i % 997};{monto:.2f};{saldo:.2f};{i:08d}")
+    return "\n".join(lineas).encode("utf-8")
+
+
+def _sesion():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.execute(insert(Company), [{"id": 1, "name": "Empresa"}])
+    db.execute(insert(User), [{"id": 1, "username": "u", "password_hash": "x"}])
+    db.execute(insert(Account), [{"id": 1, "company_id": 1, "code": "1041", "name": "Banco", "type": "A"}])
+    db.execute(insert(Period), [{"id": 1, "company_id": 1, "year": 2025, "month": 1}])
+    db.execute(insert(BankAccount), [{"id": 1, "company_id": 1, "account_id": 1, "bank_name": "BCP", "account_number": "1"}])
+    db.commit()
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de importación de extractos")
+    parser.add_argument("--movimientos", type=int, default=50_000)
+    args = parser.parse_args()
+
+    _import_all_models()
+    contenido = _csv(args.movimientos)
+    print(f"Archivo: {len(contenido) / 1e6:.1f} MB, {args.movimientos} movimientos")
+
+    with _sesion() as db:
+        t0 = time.perf_counter()
+        filas = list(BankStatementReader(io.BytesIO(contenido), "extracto.csv"))
+        statement = BankStatement(bank_account_id=1, period_id=1, statement_date=date(2025, 1, 31),
+                                  opening_balance=0, closing_balance=0, uploaded_by=1)
+        db.add(statement)
+        db.flush()
+        for tx in filas:
+            db.add(BankTransaction(statement_id=statement.id, reconciled=False, **tx))
+        db.commit()
+        print(f"Fila por fila (db.add): {time.perf_counter() - t0:.2f}s")
+
+    with _sesion() as db:
+        t0 = time.perf_counter()
+        resultado = import_bank_statement(db, 1, 1, 1, io.BytesIO(contenido), "extracto.csv")
+        db.commit()
+        print(f"Importación por lotes: {time.perf_counter() - t0:.2f}s ({resultado['imported']} nuevos)")
+
+        t0 = time.perf_counter()
+        resultado = import_bank_statement(db, 1, 1, 1, io.BytesIO(contenido), "extracto.csv")
+        db.commit()
+        print(f"Reimportación: {time.perf_counter() - t0:.2f}s ({resultado['duplicates']} duplicados omitidos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la importación de comprobantes XML de compra.
+
+Genera un ZIP sintético (por defecto 5000 facturas UBL 2.1 de 200 proveedores,
+con firma y 3 líneas cada una) y mide, en una base SQLite temporal, el parseo
+en streaming solo y la importación completa (compras, asientos por lotes y
+documentos). Objetivo: ~5000 comprobantes por minuto.
+
+Uso:
+  cd backend && python -m scripts.bench_cpe_import --comprobantes 5000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, _import_all_models
+from app.domain.models import Account, Company, User
+from app.domain.models_journal_engine import EventoContable, ReglaContable, TipoCuentaMapeo
+from app.application.cpe_ingestion import import_cpe_zip, iter_zip_comprobantes
+from app.infrastructure.storage import LocalFileStorage
+
+NS = (
+    'xmlns="urn:oasis:names:specification:ubl:schema:xsd:Invoice-2" '
+    'xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" '
+    'xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2" '
+    'xmlns:ext="urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2" '
+    'xmlns:ds="http://www.w3.org/2000/09/xmldsig#"'
+)
+
+
+def _factura(rnd: random.Random, i: int) -> bytes:
+    lineas, base = [], Decimal("0")
+    for n in range(1, 4):
+        valor = Decimal(rnd.randint(100, 500000)) / 100
+        base += valor
+        lineas.append(
+            f"<cac:InvoiceLine><cbc:ID>{n}</cbc:ID><cbc:InvoicedQuantity>1</cbc:InvoicedQuantity>"
+            f"<cbc:LineExtensionAmount>{valor}</cbc:LineExtensionAmount>"
+            f"<cac:TaxTotal><cac:TaxSubtotal><cbc:TaxAmount>{valor * Decimal('0.18'):.2f}</cbc:TaxAmount>"
+            f"<cac:TaxCategory><cac:TaxScheme><cbc:ID>1000</cbc:ID></cac:TaxScheme></cac:TaxCategory>"
+            f"</cac:TaxSubtotal></cac:TaxTotal>"
+            f"<cac:Item><cbc:Description>ITEM {i}-{n}</cbc:Description></cac:Item>"
+            f"<cac:Price><cbc:PriceAmount>{valor}</cbc:PriceAmount></cac:Price></cac:InvoiceLine>"
+        )
+    igv = (base * Decimal("0.18")).quantize(Decimal("0.01"))
+    ruc = f"20{rnd.randint(0, 199):09d}"
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?><Invoice {NS}>'
+        f"<ext:UBLExtensions><ext:UBLExtension><ext:ExtensionContent><ds:Signature>"
+        f"<ds:SignatureValue>{'Q' * 4000}</ds:SignatureValue></ds:Signature>"
+        f"</ext:ExtensionContent></ext:UBLExtension></ext:UBLExtensions>"
+        f"<cbc:ID>F{i % 7:03d}-{i}</cbc:ID><cbc:IssueDate>2025-01-{i % 28 + 1:02d}</cbc:IssueDate>"
+        f"<cbc:InvoiceTypeCode>01</cbc:InvoiceTypeCode><cbc:DocumentCurrencyCode>PEN</cbc:DocumentCurrencyCode>"
+        f"<cac:AccountingSupplierParty><cac:Party><cac:PartyIdentification><cbc:ID>{ruc}</cbc:ID>"
+        f"</cac:PartyIdentification><cac:PartyLegalEntity><cbc:RegistrationName>PROVEEDOR {ruc}"
+        f"</cbc:RegistrationName></cac:PartyLegalEntity></cac:Party></cac:AccountingSupplierParty>"
+        f"<cac:TaxTotal><cbc:TaxAmount>{igv}</cbc:TaxAmount><cac:TaxSubtotal><cbc:TaxAmount>{igv}</cbc:TaxAmount>"
+        f"<cac:TaxCategory><cac:TaxScheme><cbc:ID>1000</cbc:ID></cac:TaxScheme></cac:TaxCategory>"
+        f"</cac:TaxSubtotal></cac:TaxTotal>"
+        f"<cac:LegalMonetaryTotal><cbc:PayableAmount>{base + igv}</cbc:PayableAmount></cac:LegalMonetaryTotal>"
+        f"{''.join(lineas)}</Invoice>"
+    ).encode("utf-8")
+
+
+def _sesion(ruta_db: Path):
+    engine = create_engine(f"sqlite:///{ruta_db}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.execute(insert(Company), [{"id": 1, "name": "Empresa"}])
+    db.execute(insert(User), [{"id": 1, "username": "u", "password_hash": "x"}])
+    db.execute(insert(Account), [
+        {"id": 1, "company_id": 1, "code": "60.11", "name": "Compras", "type": "G"},
+        {"id": 2, "company_id": 1, "code": "40.11", "name": "IGV", "type": "A"},
+        {"id": 3, "company_id": 1, "code": "42.12", "name": "Proveedores", "type": "P"},
+    ])
+    db.execute(insert(EventoContable), [{"id": 1, "company_id": 1, "tipo": "COMPRA", "nombre": "Compra"}])
+    reglas = [("DEBE", "GASTO_COMPRAS", "BASE", 1), ("DEBE", "IGV_CREDITO", "IGV", 2), ("HABER", "PROVEEDORES", "TOTAL", 3)]
+    db.execute(insert(ReglaContable), [
+        {"evento_id": 1, "company_id": 1, "lado": lado, "tipo_cuenta": tipo, "tipo_monto": monto, "orden": i}
+        for i, (lado, tipo, monto, _) in enumerate(reglas, start=1)
+    ])
+    db.execute(insert(TipoCuentaMapeo), [
+        {"company_id": 1, "tipo_cuenta": tipo, "account_id": cuenta} for _, tipo, _, cuenta in reglas
+    ])
+    db.commit()
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de importación de comprobantes XML")
+    parser.add_argument("--comprobantes", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    _import_all_models()
+    rnd = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        ruta_zip = tmp / "compras.zip"
+        with zipfile.ZipFile(ruta_zip, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(args.comprobantes):
+                zf.writestr(f"F-{i}.xml", _factura(rnd, i))
+        print(f"ZIP: {ruta_zip.stat().st_size / 1e6:.1f} MB, {args.comprobantes} comprobantes")
+
+        t0 = time.perf_counter()
+        leidos = sum(1 for _, _, cpe, _ in iter_zip_comprobantes(ruta_zip) if cpe)
+        dt = time.perf_counter() - t0
+        print(f"Parseo (iterparse): {dt:.2f}s ({leidos / dt * 60:,.0f} XML/min)")
+
+        with _sesion(tmp / "bench.db") as db:
+            storage = LocalFileStorage(base_path=str(tmp / "documents"))
+            t0 = time.perf_counter()
+            resultado = import_cpe_zip(db, storage, ruta_zip, company_id=1, user_id=1, batch_size=args.batch)
+            dt = time.perf_counter() - t0
+            print(f"Importación completa: {dt:.2f}s ({resultado.created / dt * 60:,.0f} XML/min, "
+                  f"{resultado.created} compras, {resultado.suppliers_created} proveedores, "
+                  f"{len(resultado.errors)} errores)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la exportación del libro diario a Excel.
+
+Genera en un SQLite temporal un diario sintético (por defecto 500k líneas) y
+mide, cada uno en su propio proceso para aislar la memoria pico (ru_maxrss):
+
+- memoria: el exportador anterior (asientos con joinedload, Workbook normal,
+  estilo por celda y guardado en BytesIO)
+- streaming: export_entries_excel (consulta con yield_per, write_only con
+  estilos con nombre y archivo temporal)
+
+Uso:
+  cd backend && python -m scripts.bench_excel_export --lineas 500000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from app.db import Base, _import_all_models
+from app.domain.models import Account, Company, EntryLine, JournalEntry, Period
+
+
+def _poblar(url: str, lineas: int) -> None:
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Company), [{"id": 1, "name": "Empresa", "ruc": "20100070970"}])
+        conn.execute(insert(Account), [
+            {"id": i, "company_id": 1, "code": f"10{i:02d}", "name": f"Cuenta {i}", "type": "A"} for i in range(1, 41)
+        ])
+        conn.execute(insert(Period), [{"id": 1, "company_id": 1, "year": 2025, "month": 1}])
+        asientos = lineas // 2
+        for inicio in range(1, asientos + 1, 20_000):
+            ids = range(inicio, min(inicio + 20_000, asientos + 1))
+            conn.execute(insert(JournalEntry), [{
+                "id": i, "company_id": 1, "date": date(2025, 1, 1) + timedelta(days=i % 31), "period_id": 1,
+                "glosa": f"Operación {i}", "status": "POSTED",
+            } for i in ids])
+            conn.execute(insert(EntryLine), [
+                {"entry_id": i, "account_id": 1 + (i + k) % 40, "debit": (i % 9000) + 0.5 if k == 0 else 0,
+                 "credit": 0 if k == 0 else (i % 9000) + 0.5}
+                for i in ids for k in (0, 1)
+            ])
+
+
+def _exportar_en_memoria(db) -> int:
+    """Réplica del exportador anterior."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill
+
+    entries = (
+        db.query(JournalEntry).options(joinedload(JournalEntry.lines).joinedload(EntryLine.account))
+        .filter(JournalEntry.company_id == 1).order_by(JournalEntry.date, JournalEntry.id).all()
+    )
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Nro.", "Fecha", "Glosa", "Cuenta", "Nombre Cuenta", "Debe", "Haber"])
+    for cell in ws[1]:
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF", size=11)
+    n = 0
+    for entry in entries:
+        for line in entry.lines:
+            n += 1
+            ws.append([n, entry.date.strftime('%d/%m/%Y'), entry.glosa[:100], line.account.code,
+                       line.account.name[:50], float(line.debit), float(line.credit)])
+    for row in range(2, ws.max_row + 1):
+        ws[f'F{row}'].number_format = '#,##0.00'
+        ws[f'G{row}'].number_format = '#,##0.00'
+    buffer = BytesIO()
+    wb.save(buffer)
+    return len(buffer.getvalue())
+
+
+def _medir(url: str, modo: str) -> None:
+    _import_all_models()
+    db = sessionmaker(bind=create_engine(url))()
+    t0 = time.perf_counter()
+    if modo == "memoria":
+        bytes_ = _exportar_en_memoria(db)
+    else:
+        from app.api.routers.journal import export_entries_excel
+        response = export_entries_excel(company_id=1, period_id=None, date_from=None, date_to=None,
+                                        account_code=None, status=None, db=db)
+        bytes_ = os.path.getsize(response.path)
+        os.unlink(response.path)
+    segundos = time.perf_counter() - t0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{modo:>9}: {segundos:6.2f}s  memoria pico {pico:7.0f} MB  archivo {bytes_ / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exportación del libro diario a Excel")
+    parser.add_argument("--lineas", type=int, default=500_000)
+    parser.add_argument("--modo", choices=("memoria", "streaming"), help="Uso interno: medir un solo modo")
+    parser.add_argument("--db", help="Uso interno: SQLite ya poblado")
+    args = parser.parse_args()
+
+    if args.modo:
+        _medir(args.db, args.modo)
+        return
+
+    _import_all_models()
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'diario.db'}"
+        t0 = time.perf_counter()
+        _poblar(url, args.lineas)
+        print(f"Diario sintético: {args.lineas} líneas ({time.perf_counter() - t0:.1f}s)")
+        for modo in ("memoria", "streaming"):
+            subprocess.run(
+                [sys.executable, "-m", "scripts.bench_excel_export", "--modo", modo, "--db", url],
+                cwd=backend_dir, check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark del OCR de PDFs escaneados.
+
+Genera un PDF de facturas "escaneadas" (solo imagen, por defecto 50 páginas) y
+mide, cada uno en su propio proceso para aislar la memoria pico (ru_maxrss):
+
+- anterior: convert_from_bytes de todas las páginas en memoria a 200 DPI y
+  image_to_data página por página
+- paralelo: OCRService (rasterizado por página a temporales y pool de
+  procesos), cache vacío
+- cache: OCRService sobre el mismo archivo con el cache ya poblado
+
+Con --texto N las primeras N páginas llevan además capa de texto (se omiten
+del OCR en los modos nuevos).
+
+Requiere Tesseract (con el idioma spa) y poppler (pdftoppm) instalados.
+
+Uso:
+  cd backend && python -m scripts.bench_ocr --paginas 50 --workers 4
+"""
+import argparse
+import io
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+
+def _factura(numero: int):
+    """Imagen A4 a 200 DPI con el texto de una factura."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("L", (1654, 2339), color=255)
+    draw = ImageDraw.Draw(image)
+    titulo = ImageFont.load_default(size=48)
+    fuente = ImageFont.load_default(size=32)
+    draw.text((120, 120), "FACTURA ELECTRONICA", font=titulo, fill=0)
+    draw.text((120, 200), f"F001-{numero:08d}   RUC 20100070970", font=fuente, fill=0)
+    draw.text((120, 260), "Cliente: Comercial Andina S.A.C.   RUC 20512345678", font=fuente, fill=0)
+    y = 380
+    for item in range(1, 26):
+        draw.text((120, y), f"{item:3d}  Producto de prueba {numero}-{item}", font=fuente, fill=0)
+        draw.text((1200, y), f"{item * 12.5:10.2f}", font=fuente, fill=0)
+        y += 56
+    draw.text((900, y + 60), f"TOTAL S/ {numero * 118:,.2f}", font=titulo, fill=0)
+    return image
+
+
+def _generar_pdf(path: Path, paginas: int, con_texto: int) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(path), pagesize=A4)
+    for numero in range(1, paginas + 1):
+        buffer = io.BytesIO()
+        _factura(numero).save(buffer, format="PNG")
+        buffer.seek(0)
+        c.drawImage(ImageReader(buffer), 0, 0, width=A4[0], height=A4[1])
+        if numero <= con_texto:
+            c.drawString(60, 60, f"FACTURA ELECTRONICA F001-{numero:08d} RUC 20100070970")
+        c.showPage()
+    c.save()
+
+
+def _ocr_anterior(content: bytes) -> int:
+    """Réplica del OCRService anterior (todas las páginas en memoria, secuencial)."""
+    import pdf2image
+    import pytesseract
+
+    palabras = 0
+    for image in pdf2image.convert_from_bytes(content):
+        data = pytesseract.image_to_data(image, lang="spa", output_type=pytesseract.Output.DICT)
+        palabras += sum(1 for w in data["text"] if w.strip())
+    return palabras
+
+
+def _medir(pdf: Path, modo: str, workers: int, cache_dir: str) -> None:
+    content = pdf.read_bytes()
+    t0 = time.perf_counter()
+    if modo == "anterior":
+        detalle = f"{_ocr_anterior(content)} palabras"
+    else:
+        from app.infrastructure.ocr import OCRService
+        resultado = OCRService(max_workers=workers, cache_dir=Path(cache_dir)).extract_text(content, "application/pdf")
+        detalle = (f"{len((resultado or {}).get('text', '').split())} palabras, "
+                   f"ocr {resultado['pages_ocr']} / texto {resultado['pages_text_layer']} / "
+                   f"cache {resultado['pages_cached']}") if resultado else "sin texto"
+    segundos = time.perf_counter() - t0
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"{modo:>9}: {segundos:7.2f}s  memoria pico {propio:6.0f} MB (hijo mayor {hijos:5.0f} MB)  {detalle}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de OCR de PDFs escaneados")
+    parser.add_argument("--paginas", type=int, default=50)
+    parser.add_argument("--texto", type=int, default=0, help="Páginas iniciales con capa de texto")
+    parser.add_argument("--workers", type=int, default=0, help="Procesos de OCR (0 = núcleos disponibles)")
+    parser.add_argument("--modo", choices=("anterior", "paralelo", "cache"), help="Uso interno: medir un solo modo")
+    parser.add_argument("--pdf", help="Uso interno: PDF ya generado")
+    parser.add_argument("--cache-dir", help="Uso interno: directorio del cache")
+    args = parser.parse_args()
+
+    if args.modo:
+        _medir(Path(args.pdf), args.modo, args.workers, args.cache_dir)
+        return
+
+    from app.infrastructure.ocr import TESSERACT_AVAILABLE
+    if not TESSERACT_AVAILABLE or not shutil.which("tesseract") or not shutil.which("pdftoppm"):
+        sys.exit("Se requieren pytesseract/pdf2image y los binarios tesseract y pdftoppm")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "facturas.pdf"
+        t0 = time.perf_counter()
+        _generar_pdf(pdf, args.paginas, args.texto)
+        print(f"PDF escaneado: {args.paginas} páginas, {pdf.stat().st_size / 1e6:.1f} MB ({time.perf_counter() - t0:.1f}s)")
+        cache_dir = str(Path(tmp) / "cache")
+        for modo in ("anterior", "paralelo", "cache"):
+            subprocess.run(
+                [sys.executable, "-m", "scripts.bench_ocr", "--modo", modo, "--pdf", str(pdf),
+                 "--workers", str(args.workers), "--cache-dir", cache_dir],
+                cwd=backend_dir, check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parser de propuestas SIRE (memoria pico y tiempo).
+
+Genera una propuesta RCE sintética y compara:
+- Legado: json.load del archivo completo + SireProposalParser por comprobante
+- Incremental: iter_proposal_records (JSON con ijson si está instalado, y TXT)
+  con carga por lotes en SQLite en memoria
+
+Uso:
+  cd backend && python -m scripts.bench_sire_parser --registros 100000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, _import_all_models
+from app.domain.models_sire import SireProposalType
+from app.infrastructure import sire_parser
+from app.infrastructure.sire_parser import SireProposalParser, iter_proposal_records
+from app.application.services_sire import load_proposal_details
+
+
+def _generar(directorio: Path, n: int):
+    registros = [{
+        "codCar": f"20100070970010001{i:07d}",
+        "fecEmisionCDP": "2025-01-15",
+        "codTipoCDP": "01",
+        "numSerieCDP": f"F{i % 50:03d}",
+        "numCDP": str(i),
+        "codTipoDocIdentidad": "6",
+        "numDocIdentidad": "20100070970",
+        "nomRazonSocial": "PROVEEDOR DE PRUEBA SOCIEDAD ANONIMA CERRADA",
+        "mtoBIGravada": f"{100 + i % 997}.50",
+        "mtoIGV": "18.09",
+        "mtoTotalCP": f"{118 + i % 997}.59",
+        "codMoneda": "PEN",
+    } for i in range(n)]
+    json_path = directorio / "propuesta.json"
+    json_path.write_text(json.dumps({"perTributario": "202501", "registros": registros}), encoding="utf-8")
+
+    txt_path = directorio / "propuesta.txt"
+    with open(txt_path, "w", encoding="utf-8") as f:
+        for r in registros:
+            campos = [""] * 30
+            campos[0:14] = ["20100070970", "EMPRESA", "202501", r["codCar"], "15/01/2025", "", "01",
+                            r["numSerieCDP"], "", r["numCDP"], "", "6", r["numDocIdentidad"], r["nomRazonSocial"]]
+            campos[14], campos[15], campos[24], campos[25] = r["mtoBIGravada"], r["mtoIGV"], r["mtoTotalCP"], "PEN"
+            f.write("|".join(campos) + "\n")
+    return json_path, txt_path
+
+
+def _medir(nombre: str, fn):
+    # Tiempo y memoria en pasadas separadas: tracemalloc distorsiona los tiempos
+    t0 = time.perf_counter()
+    cantidad = fn()
+    segundos = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:<42} {cantidad:>8} registros  {segundos:6.2f}s  pico {pico / 1024 / 1024:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del parser SIRE")
+    parser.add_argument("--registros", type=int, default=100_000)
+    args = parser.parse_args()
+
+    _import_all_models()
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, txt_path = _generar(Path(tmp), args.registros)
+
+        def legado():
+            with open(json_path, encoding="utf-8") as f:
+                data = json.load(f)
+            parsed = [SireProposalParser.parse_rce_proposal(r) for r in data["registros"]]
+            return len(parsed)
+
+        def incremental(path):
+            def run():
+                engine = create_engine("sqlite:///:memory:")
+                Base.metadata.create_all(engine)
+                with sessionmaker(bind=engine)() as db:
+                    return load_proposal_details(db, 1, SireProposalType.RCE, "202501", str(path))
+            return run
+
+        print(f"ijson disponible: {sire_parser.IJSON_AVAILABLE}")
+        _medir("Legado (json.load + parser por registro)", legado)
+        _medir("Incremental JSON + carga por lotes", incremental(json_path))
+        _medir("Incremental TXT + carga por lotes", incremental(txt_path))
+        _medir("Incremental TXT (solo parseo)", lambda: sum(1 for _ in iter_proposal_records(str(txt_path), "RCE")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la conciliación propuesta SIRE vs. compras.
+
+Genera un período RCE sintético (por defecto 200k comprobantes en la propuesta
+y en compras, con ~1% de diferencias de montos, 0.5% de faltantes y 0.5% de
+sobrantes) en SQLite en memoria y mide reconcile_sire_period.
+
+Uso:
+  cd backend && python -m scripts.bench_sire_reconciliation --registros 200000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, _import_all_models
+from app.domain.models import Company, ThirdParty
+from app.domain.models_ext import Purchase
+from app.domain.models_sire import SireProposalDetail, SireProposalType
+from app.application.sire_reconciliation import reconcile_sire_period
+
+
+def _poblar(db, n: int, proveedores: int = 2000):
+    rnd = random.Random(42)
+    db.execute(insert(Company), [{"id": 1, "name": "Empresa", "ruc": "20100070970"}])
+    db.execute(insert(ThirdParty), [
+        {"id": i, "company_id": 1, "tax_id": f"20{i:09d}", "name": f"Proveedor {i}", "type": "PROVEEDOR"}
+        for i in range(1, proveedores + 1)
+    ])
+    compras, detalle = [], []
+    for i in range(n):
+        proveedor = i % proveedores + 1
+        serie, numero = f"F{i % 97:03d}", str(i)
+        fecha = date(2025, 1, i % 28 + 1)
+        base = Decimal(100 + i % 5000) + Decimal("0.25")
+        igv = (base * Decimal("0.18")).quantize(Decimal("0.01"))
+        r = rnd.random()
+        if r >= 0.005:  # 0.5% faltantes en libros
+            base_libro = base + Decimal("1.00") if r < 0.015 else base
+            compras.append({
+                "company_id": 1, "doc_type": "01", "series": serie, "number": numero, "issue_date": fecha,
+                "supplier_id": proveedor, "currency": "PEN", "base_amount": base_libro,
+                "igv_amount": igv, "total_amount": base_libro + igv,
+            })
+        if rnd.random() >= 0.005:  # 0.5% sobrantes en libros
+            detalle.append({
+                "company_id": 1, "proposal_type": SireProposalType.RCE, "period": "202501", "line_no": i + 1,
+                "doc_type": "01", "series": serie, "number": numero.zfill(8), "issue_date": fecha,
+                "counterparty_tax_id": f"20{proveedor:09d}", "base_amount": base, "igv_amount": igv,
+                "total_amount": base + igv, "currency": "PEN",
+            })
+    for i in range(0, len(compras), 20000):
+        db.execute(insert(Purchase), compras[i:i + 20000])
+    for i in range(0, len(detalle), 20000):
+        db.execute(insert(SireProposalDetail), detalle[i:i + 20000])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de conciliación SIRE")
+    parser.add_argument("--registros", type=int, default=200_000)
+    args = parser.parse_args()
+
+    _import_all_models()
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        t0 = time.perf_counter()
+        _poblar(db, args.registros)
+        print(f"Datos generados en {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        run = reconcile_sire_period(db, 1, SireProposalType.RCE, "202501")
+        db.commit()
+        segundos = time.perf_counter() - t0
+
+        print(f"Propuesta: {run.sunat_count}  Compras: {run.books_count}")
+        print(f"Conciliados: {run.matched_count}  Faltantes: {run.missing_in_books_count}  "
+              f"Sobrantes: {run.extra_in_books_count}  Montos: {run.amount_mismatch_count}  "
+              f"Fechas: {run.date_mismatch_count}")
+    print(f"Conciliación: {segundos:.2f}s (incluye lectura y grabación de diferencias)")
+
+
+if __name__ == "__main__":
+    main()
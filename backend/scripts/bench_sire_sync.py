@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark de descarga de propuestas SIRE contra el servidor simulado.
+
+Compara, para N períodos:
+- Secuencial con un cliente HTTP nuevo por petición (comportamiento anterior)
+- Concurrente (SIRE_SYNC_CONCURRENCY) con el cliente HTTP compartido con pool
+
+Uso:
+  cd backend && python -m scripts.bench_sire_sync --periodos 24 --latency 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _levantar_servidor(latency: float, port: int):
+    import uvicorn
+    from scripts.sire_fake_server import create_app
+
+    app = create_app(latency)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, app
+
+
+def _periodos(n: int):
+    return [f"{2023 + i // 12}{i % 12 + 1:02d}" for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de sincronización SIRE")
+    parser.add_argument("--periodos", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrencia", type=int, default=None)
+    args = parser.parse_args()
+
+    port = _puerto_libre()
+    # Las URLs se leen al importar sire_auth: configurar antes de importar el cliente
+    os.environ["SIRE_BASE_URL"] = f"http://127.0.0.1:{port}/v1/contribuyente/migeigv"
+    os.environ["SIRE_TOKEN_BASE_URL"] = f"http://127.0.0.1:{port}"
+    server, app = _levantar_servidor(args.latency, port)
+
+    import httpx
+    from app.application.services_sire import fetch_period_proposals
+    from app.domain.models_sire import SireProposalType
+    from app.infrastructure.sire_client import SIREClient, close_shared_http_clients
+
+    credenciales = dict(
+        company_id=1, oauth_client_id="bench", oauth_client_secret="secret",
+        ruc="20100070970", usuario_generador="USUARIO1", password_generador="clave",
+    )
+    periodos = _periodos(args.periodos)
+
+    async def secuencial():
+        token, expira = None, None
+        for per in periodos:
+            async with httpx.AsyncClient() as http:
+                client = SIREClient(**credenciales, access_token=token, token_expires_at=expira, http_client=http)
+                await client.get_rvie_proposal_by_period(per)
+                token, expira = client.access_token, client.token_expires_at
+
+    async def concurrente():
+        client = SIREClient(**credenciales)
+        await client.authenticate()
+        resultados = await fetch_period_proposals(
+            client, SireProposalType.RVIE, periodos, concurrency=args.concurrencia
+        )
+        await close_shared_http_clients()
+        return resultados
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        asyncio.run(secuencial())
+        t_sec = time.perf_counter() - t0
+
+        app.state.stats["max_concurrent"] = 0
+        t0 = time.perf_counter()
+        resultados = asyncio.run(concurrente())
+        t_conc = time.perf_counter() - t0
+
+    fallidos = [r for r in resultados if r[2] is not None]
+    print(f"Períodos: {len(periodos)}  latencia: {args.latency}s")
+    print(f"Secuencial (cliente por petición): {t_sec:.2f}s")
+    print(f"Concurrente (pool compartido):     {t_conc:.2f}s  "
+          f"(máx. simultáneas: {app.state.stats['max_concurrent']}, fallidos: {len(fallidos)})")
+    print(f"Mejora: x{t_sec / t_conc:.1f}")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Worker de la cola de procesamiento de documentos (extracción y OCR).
+
+Proceso separado de la API: toma los trabajos de document_processing_jobs por
+prioridad (XML, luego otras extracciones, luego OCR) con un pool acotado de
+hilos, cada uno con su propia sesión. Se pueden levantar varios workers; la
+reserva en BD evita que dos ejecuten el mismo trabajo.
+
+Uso:
+  cd backend && python -m scripts.document_worker
+  cd backend && python -m scripts.document_worker --concurrency 4
+  cd backend && python -m scripts.document_worker --once   # vacía la cola y termina
+  cd backend && python -m scripts.document_worker --purge-blobs   # elimina blobs sin referencias y termina
+"""
+import argparse
+import signal
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.application.document_jobs import DocumentWorker
+from app.db import _import_all_models, register_session_listeners
+from app.infrastructure.ocr import shutdown_ocr_pool
+from app.infrastructure.logging_config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de extracción/OCR de documentos")
+    parser.add_argument("--concurrency", type=int, help="Trabajos simultáneos (por defecto DOCUMENT_WORKER_CONCURRENCY)")
+    parser.add_argument("--once", action="store_true", help="Procesar los trabajos listos y terminar")
+    parser.add_argument("--purge-blobs", action="store_true",
+                        help="Eliminar blobs sin referencias pasado BLOB_GC_GRACE_HOURS y terminar")
+    args = parser.parse_args()
+
+    setup_logging()
+    _import_all_models()
+    register_session_listeners()
+
+    if args.purge_blobs:
+        from app.application.blob_store import purge_unreferenced_blobs
+        from app.db import SessionLocal
+        db = SessionLocal()
+        try:
+            print(f"Blobs eliminados: {purge_unreferenced_blobs(db)}")
+        finally:
+            db.close()
+        return
+
+    worker = DocumentWorker(concurrency=args.concurrency)
+    try:
+        if args.once:
+            total = 0
+            while (procesados := worker.run_once()):
+                total += procesados
+            print(f"Trabajos procesados: {total}")
+            return
+
+        # SIGTERM (docker stop) y Ctrl+C: terminar los trabajos en curso y salir
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        print(f"Worker de documentos {worker.worker_id} ({worker.concurrency} trabajos simultáneos)")
+        worker.run()
+    finally:
+        shutdown_ocr_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Recalcula el texto de búsqueda (search_text) de los documentos.
+
+La migración 20250222_01 lo completa con título, descripción, archivo y OCR;
+este script agrega los RUC/serie/número extraídos. También sirve tras cambiar
+qué se indexa (application/document_search.py). Recorre por lotes de id.
+
+Uso:
+  cd backend && python -m scripts.reindex_documents
+  cd backend && python -m scripts.reindex_documents --company-id 1 --batch 200
+"""
+import argparse
+import sys
+from pathlib import Path
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import select
+
+from app.application.document_search import refresh_search_text
+from app.db import SessionLocal, _import_all_models, register_session_listeners
+from app.domain.models_documents_v2 import Document
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcular el índice de búsqueda de documentos")
+    parser.add_argument("--company-id", type=int, help="Solo documentos de esta empresa")
+    parser.add_argument("--batch", type=int, default=500, help="Documentos por transacción")
+    args = parser.parse_args()
+
+    _import_all_models()
+    register_session_listeners()
+    db = SessionLocal()
+    ultimo_id, total = 0, 0
+    try:
+        while True:
+            stmt = select(Document).where(Document.id > ultimo_id).order_by(Document.id).limit(args.batch)
+            if args.company_id:
+                stmt = stmt.where(Document.company_id == args.company_id)
+            lote = list(db.execute(stmt).scalars())
+            if not lote:
+                break
+            for document in lote:
+                refresh_search_text(db, document)
+            db.commit()
+            ultimo_id = lote[-1].id
+            total += len(lote)
+            db.expunge_all()
+        print(f"Documentos reindexados: {total}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
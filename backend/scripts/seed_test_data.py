@@ -25,7 +25,7 @@ from decimal import Decimal
 backend_dir = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from app.db import SessionLocal, _import_all_models
+from app.db import SessionLocal, _import_all_models, register_session_listeners
 from app.application.seed_demo import seed_demo_data, DEMO_COMPANY_NAME
 from app.application.services_integration import registrar_compra_con_asiento, registrar_venta_con_asiento
 from app.domain.models import Company, ThirdParty, User
@@ -34,6 +34,7 @@ from app.infrastructure.unit_of_work import UnitOfWork
 
 # Cargar modelos
 _import_all_models()
+register_session_listeners()
 
 
 def ensure_admin_has_company(db):
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Servidor SUNAT SIRE simulado (solo para pruebas locales y benchmarks).
+
+Expone los endpoints que usa SIREClient con una latencia configurable y,
+opcionalmente, fallos inyectados (primeros intentos por período con 503/504)
+y un límite de peticiones por segundo que responde 429 con Retry-After:
+- POST /v1/clientessol/{client_id}/oauth2/token/
+- GET  /v1/contribuyente/migeigv/libros/rvierce/padron/web/omisos/{libro}/periodos
+- GET  /v1/contribuyente/migeigv/libros/rvie/propuesta/web/{periodo}
+- GET  /v1/contribuyente/migeigv/libros/rce/propuesta/web/{periodo}
+
+Uso:
+  cd backend && python -m scripts.sire_fake_server --port 8765 --latency 0.2
+  cd backend && python -m scripts.sire_fake_server --fallos-iniciales 2 --max-rps 20
+
+Luego apuntar el backend al servidor simulado:
+  SIRE_BASE_URL=http://127.0.0.1:8765/v1/contribuyente/migeigv
+  SIRE_TOKEN_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import secrets
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+SIRE_PATH = "/v1/contribuyente/migeigv"
+
+
+def create_app(
+    latency: float = 0.2,
+    comprobantes_por_periodo: int = 50,
+    fallos_iniciales: int = 0,
+    status_fallo: int = 503,
+    max_rps: Optional[float] = None,
+) -> FastAPI:
+    """
+    Crea la app simulada.
+
+    Args:
+        latency: Segundos de espera por respuesta (simula el RTT de SUNAT)
+        comprobantes_por_periodo: Registros devueltos en cada propuesta
+        fallos_iniciales: Intentos por período que fallan antes de responder bien
+        status_fallo: Código HTTP de esos fallos (503, 504, ...)
+        max_rps: Peticiones por segundo admitidas; el exceso recibe 429
+
+    Returns:
+        App FastAPI; app.state.stats lleva el conteo de peticiones y conexiones
+    """
+    app = FastAPI(title="SIRE simulado")
+    app.state.stats = {
+        "tokens": 0, "requests": 0, "max_concurrent": 0, "concurrent": 0, "failed": 0, "throttled": 0,
+    }
+    intentos = defaultdict(int)
+    ventana = deque()
+
+    def _fallo_inyectado(clave: str) -> Optional[JSONResponse]:
+        """Respuesta 429 si se excede max_rps, o de error si el período aún debe fallar."""
+        stats = app.state.stats
+        if max_rps:
+            ahora = time.monotonic()
+            while ventana and ahora - ventana[0] >= 1.0:
+                ventana.popleft()
+            if len(ventana) >= max_rps:
+                stats["throttled"] += 1
+                return JSONResponse({"msg": "Demasiadas solicitudes"}, status_code=429, headers={"Retry-After": "1"})
+            ventana.append(ahora)
+        intentos[clave] += 1
+        if intentos[clave] <= fallos_iniciales:
+            stats["failed"] += 1
+            return JSONResponse({"msg": "Servicio no disponible"}, status_code=status_fallo)
+        return None
+
+    async def _simular_latencia():
+        stats = app.state.stats
+        stats["requests"] += 1
+        stats["concurrent"] += 1
+        stats["max_concurrent"] = max(stats["max_concurrent"], stats["concurrent"])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stats["concurrent"] -= 1
+
+    def _validar_token(authorization: str):
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Token requerido")
+
+    def _propuesta(tipo: str, periodo: str) -> dict:
+        comprobantes = []
+        for i in range(comprobantes_por_periodo):
+            base = round(100 + i * 1.5, 2)
+            comprobantes.append({
+                "codTipoCDP": "01",
+                "numSerieCDP": "F001",
+                "numCDP": str(i + 1),
+                "fecEmisionCDP": f"{periodo[:4]}-{periodo[4:]}-01",
+                "numDocIdentidad": "20100070970",
+                "mtoBIGravada": base,
+                "mtoIGV": round(base * 0.18, 2),
+                "mtoTotalCP": round(base * 1.18, 2),
+            })
+        return {
+            "perTributario": periodo,
+            "numPropuesta": f"{tipo}-{periodo}",
+            "registros": comprobantes,
+        }
+
+    @app.post("/v1/clientessol/{client_id}/oauth2/token/")
+    async def token(client_id: str):
+        await _simular_latencia()
+        app.state.stats["tokens"] += 1
+        return {
+            "access_token": secrets.token_hex(32),
+            "token_type": "JWT",
+            "expires_in": 3600,
+        }
+
+    @app.get(SIRE_PATH + "/libros/rvierce/padron/web/omisos/{libro}/periodos")
+    async def periodos(libro: str, authorization: str = Header(default="")):
+        _validar_token(authorization)
+        await _simular_latencia()
+        return [{"numEjercicio": "2024", "lisPeriodos": [
+            {"perTributario": f"2024{m:02d}", "codEstado": "01"} for m in range(1, 13)
+        ]}]
+
+    @app.get(SIRE_PATH + "/libros/rvie/propuesta/web/{periodo}")
+    async def propuesta_rvie(periodo: str, authorization: str = Header(default="")):
+        _validar_token(authorization)
+        await _simular_latencia()
+        return _fallo_inyectado("RVIE" + periodo) or _propuesta("RVIE", periodo)
+
+    @app.get(SIRE_PATH + "/libros/rce/propuesta/web/{periodo}")
+    async def propuesta_rce(periodo: str, authorization: str = Header(default="")):
+        _validar_token(authorization)
+        await _simular_latencia()
+        return _fallo_inyectado("RCE" + periodo) or _propuesta("RCE", periodo)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor SIRE simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latencia por respuesta en segundos")
+    parser.add_argument("--registros", type=int, default=50, help="Comprobantes por propuesta")
+    parser.add_argument("--fallos-iniciales", type=int, default=0, help="Intentos fallidos por período")
+    parser.add_argument("--status-fallo", type=int, default=503, help="Código HTTP de los fallos inyectados")
+    parser.add_argument("--max-rps", type=float, default=None, help="Peticiones por segundo antes de responder 429")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.registros, args.fallos_iniciales, args.status_fallo, args.max_rps)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
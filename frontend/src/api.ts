@@ -1134,6 +1134,45 @@ export async function deleteCompra(compra_id: number): Promise<{ message: string
   return apiFetch(`/compras/${compra_id}`, { method: 'DELETE' })
 }
 
+export type ImportacionXmlOut = {
+  total: number
+  created: number
+  duplicates: number
+  suppliers_created: number
+  purchase_ids: number[]
+  errors: { file: string; error: string }[]
+}
+
+// ZIP de facturas/boletas XML (UBL 2.1) de proveedores: crea compras, asientos y documentos
+export async function importComprasXml(companyId: number, file: File, createSuppliers: boolean = true): Promise<ImportacionXmlOut> {
+  const formData = new FormData()
+  formData.append('file', file)
+  const params = new URLSearchParams()
+  params.append('company_id', companyId.toString())
+  params.append('create_suppliers', String(createSuppliers))
+
+  const token = getToken()
+  const res = await fetch(`${API_BASE}/compras/importar-xml?${params.toString()}`, {
+    method: 'POST',
+    headers: {
+      'Authorization': `Bearer ${token}`
+    },
+    body: formData
+  })
+
+  if (res.status === 401) {
+    handleAuthError()
+    throw new Error('Sesión expirada')
+  }
+
+  if (!res.ok) {
+    const text = await res.text()
+    throw new Error(`${res.status}: ${text}`)
+  }
+
+  return res.json()
+}
+
 // ===== VENTAS API =====
 export type VentaIn = {
   company_id: number
@@ -1647,6 +1686,10 @@ export type ReconciliationSummary = {
   pending_debits: number
   pending_credits: number
   reconciled_balance: number
+  book_lines?: number
+  unreconciled_lines?: number
+  bank_transactions?: number
+  unreconciled_transactions?: number
 }
 
 export type BankTransactionOut = {
@@ -1681,6 +1724,7 @@ export type EntryLineOut = {
 export type MatchSuggestion = {
   bank_transaction_id: number
   entry_line_id: number
+  entry_line_ids?: number[]
   confidence: number
   reason: string
 }
@@ -1688,6 +1732,7 @@ export type MatchSuggestion = {
 export type MatchRequest = {
   bank_transaction_id: number
   entry_line_id: number
+  entry_line_ids?: number[]
 }
 
 export type BulkMatchRequest = {
@@ -1718,6 +1763,39 @@ export async function uploadBankStatement(data: BankStatementIn): Promise<{ id:
   })
 }
 
+export type BankStatementImportResult = {
+  id: number | null
+  status: string
+  format: string
+  transaction_count: number
+  duplicates: number
+  skipped_rows: number
+}
+
+export async function importBankStatementFile(
+  params: { bank_account_id: number; period_id: number; statement_date?: string; opening_balance?: string; closing_balance?: string },
+  file: File
+): Promise<BankStatementImportResult> {
+  const token = getToken()
+  const form = new FormData()
+  form.append('bank_account_id', String(params.bank_account_id))
+  form.append('period_id', String(params.period_id))
+  if (params.statement_date) form.append('statement_date', params.statement_date)
+  if (params.opening_balance) form.append('opening_balance', params.opening_balance)
+  if (params.closing_balance) form.append('closing_balance', params.closing_balance)
+  form.append('file', file)
+  const res = await fetch(`${API_BASE}/bank-reconciliation/import-statement`, {
+    method: 'POST',
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+    body: form,
+  })
+  if (!res.ok) {
+    const text = await res.text()
+    throw new Error(text || 'Error al importar extracto')
+  }
+  return res.json()
+}
+
 export async function getReconciliationSummary(bank_account_id: number, period_id: number): Promise<ReconciliationSummary> {
   return apiFetch(`/bank-reconciliation/reconciliation-summary/${bank_account_id}?period_id=${period_id}`)
 }
@@ -2639,11 +2717,14 @@ export type DocumentSearchParams = {
   tags?: string
   limit?: number
   offset?: number
+  cursor?: string
 }
 
 export type DocumentSearchResponse = {
   items: Document[]
   total: number
+  total_is_estimate?: boolean
+  next_cursor?: string | null
   limit: number
   offset: number
 }
@@ -2715,6 +2796,31 @@ export async function downloadDocument(id: number): Promise<Blob> {
   return res.blob()
 }
 
+// Miniatura (256px) o vista previa (1200px) en JPEG de la primera página.
+// null mientras se genera en la cola (202): reintentar más tarde.
+export async function getDocumentThumbnail(id: number, size: 'thumbnail' | 'preview' = 'thumbnail'): Promise<string | null> {
+  const token = getToken()
+  const res = await fetch(`${API_BASE}/documents/${id}/thumbnail?size=${size}`, {
+    headers: {
+      'Authorization': `Bearer ${token}`
+    }
+  })
+  
+  if (res.status === 401) {
+    handleAuthError()
+    throw new Error('Sesión expirada')
+  }
+  
+  if (res.status === 202) return null
+  
+  if (!res.ok) {
+    const text = await res.text()
+    throw new Error(`${res.status}: ${text}`)
+  }
+  
+  return URL.createObjectURL(await res.blob())
+}
+
 export async function previewDocument(id: number): Promise<string> {
   const token = getToken()
   const blob = await downloadDocument(id)
@@ -2733,6 +2839,7 @@ export async function searchDocuments(params: DocumentSearchParams): Promise<Doc
   if (params.tags) queryParams.append('tags', params.tags)
   if (params.limit) queryParams.append('limit', params.limit.toString())
   if (params.offset) queryParams.append('offset', params.offset.toString())
+  if (params.cursor) queryParams.append('cursor', params.cursor)
   
   return apiFetch(`/documents/search?${queryParams.toString()}`)
 }
@@ -3688,9 +3795,13 @@ export type MailboxMessageItem = {
   created_by_name: string
   is_read: boolean
   read_at: string | null
+  message_status?: string | null
   has_response: boolean
+  attachments?: MailboxAttachmentMeta[]
 }
 
+export type MailboxAttachmentMeta = { id: number; file_name: string; file_type: string; file_size_bytes: number | null }
+
 export type MailboxMessageDetail = MailboxMessageItem & {
   body: string
   is_acknowledged?: boolean
@@ -3717,15 +3828,21 @@ export async function listMailboxMessages(params: {
   company_id: number
   message_type?: string
   is_read?: boolean
+  priority?: string
+  message_status?: string
   limit?: number
   offset?: number
-}): Promise<{ items: MailboxMessageItem[]; total: number; limit: number; offset: number }> {
+  cursor?: string
+}): Promise<{ items: MailboxMessageItem[]; total: number; next_cursor: string | null; limit: number; offset: number }> {
   const q = new URLSearchParams()
   q.set('company_id', params.company_id.toString())
   if (params.message_type) q.set('message_type', params.message_type)
   if (params.is_read !== undefined) q.set('is_read', String(params.is_read))
+  if (params.priority) q.set('priority', params.priority)
+  if (params.message_status) q.set('message_status', params.message_status)
   if (params.limit) q.set('limit', String(params.limit))
   if (params.offset) q.set('offset', String(params.offset))
+  if (params.cursor) q.set('cursor', params.cursor)
   return apiFetch(`/mailbox/messages?${q.toString()}`)
 }
 
@@ -3791,25 +3908,33 @@ export async function adminListAllMessages(params?: {
   company_id?: number
   message_type?: string
   is_read?: boolean
+  priority?: string
+  message_status?: string
   limit?: number
   offset?: number 
+  cursor?: string
 }): Promise<{ 
   items: Array<MailboxMessageItem & { company_id?: number; company_name?: string }>
   total: number 
+  next_cursor: string | null
 }> {
   const q = new URLSearchParams()
   if (params?.company_id) q.set('company_id', String(params.company_id))
   if (params?.message_type) q.set('message_type', params.message_type)
   if (params?.is_read !== undefined) q.set('is_read', String(params.is_read))
+  if (params?.priority) q.set('priority', params.priority)
+  if (params?.message_status) q.set('message_status', params.message_status)
   if (params?.limit) q.set('limit', String(params.limit))
   if (params?.offset) q.set('offset', String(params.offset))
+  if (params?.cursor) q.set('cursor', params.cursor)
   return apiFetch(`/mailbox/admin/messages?${q.toString()}`)
 }
 
-export async function adminListCompanyMessages(companyId: number, params?: { limit?: number; offset?: number }): Promise<{ items: MailboxMessageItem[]; total: number }> {
+export async function adminListCompanyMessages(companyId: number, params?: { limit?: number; offset?: number; cursor?: string }): Promise<{ items: MailboxMessageItem[]; total: number; next_cursor: string | null }> {
   const q = new URLSearchParams()
   if (params?.limit) q.set('limit', String(params.limit))
   if (params?.offset) q.set('offset', String(params.offset))
+  if (params?.cursor) q.set('cursor', params.cursor)
   return apiFetch(`/mailbox/admin/companies/${companyId}/messages?${q.toString()}`)
 }
 
@@ -3894,8 +4019,15 @@ export async function companyUploadOutgoingAttachment(messageId: number, company
   return res.json()
 }
 
-export async function companyListOutgoing(companyId: number): Promise<{ items: Array<{ id: number; subject: string; created_at: string; created_by_name: string }>; total: number }> {
-  return apiFetch(`/mailbox/company/outgoing?company_id=${companyId}`)
+export async function companyListOutgoing(companyId: number, cursor?: string): Promise<{
+  items: Array<{ id: number; subject: string; created_at: string; created_by_name: string; attachments?: MailboxAttachmentMeta[] }>
+  total: number
+  next_cursor: string | null
+}> {
+  const q = new URLSearchParams()
+  q.set('company_id', String(companyId))
+  if (cursor) q.set('cursor', cursor)
+  return apiFetch(`/mailbox/company/outgoing?${q.toString()}`)
 }
 
 export async function downloadCompanyOutgoingAttachment(
@@ -3935,15 +4067,17 @@ export async function companyGetOutgoing(messageId: number, companyId: number):
 }
 
 // Admin: mensajes recibidos de empresas
-export async function adminListIncoming(params?: { company_id?: number; is_read?: boolean; limit?: number; offset?: number }): Promise<{
-  items: Array<{ id: number; subject: string; company_id: number; company_name: string; created_at: string; created_by_name: string; is_read: boolean }>
+export async function adminListIncoming(params?: { company_id?: number; is_read?: boolean; limit?: number; offset?: number; cursor?: string }): Promise<{
+  items: Array<{ id: number; subject: string; company_id: number; company_name: string; created_at: string; created_by_name: string; is_read: boolean; attachments?: MailboxAttachmentMeta[] }>
   total: number
+  next_cursor: string | null
 }> {
   const q = new URLSearchParams()
   if (params?.company_id) q.set('company_id', String(params.company_id))
   if (params?.is_read !== undefined) q.set('is_read', String(params.is_read))
   if (params?.limit) q.set('limit', String(params.limit))
   if (params?.offset) q.set('offset', String(params.offset))
+  if (params?.cursor) q.set('cursor', params.cursor)
   return apiFetch(`/mailbox/admin/incoming?${q.toString()}`)
 }
 
@@ -14,6 +14,7 @@ import {
   listBankAccounts, 
   createBankAccount, 
   uploadBankStatement, 
+  importBankStatementFile,
   getReconciliationSummary,
   getUnreconciledTransactions,
   getUnreconciledEntryLines,
@@ -67,6 +68,7 @@ export default function ConciliacionBancaria() {
   const [finalizeData, setFinalizeData] = useState({ pending_debits: 0, pending_credits: 0, notes: '' })
   const [statementData, setStatementData] = useState({ statement_date: '', opening_balance: '', closing_balance: '', json_content: '' })
   const [uploadMode, setUploadMode] = useState<'json' | 'paste'>('json')
+  const [statementFile, setStatementFile] = useState<File | null>(null)
   const [reconciledMatches, setReconciledMatches] = useState<ReconciledMatch[]>([])
   const [selectedMatchDetail, setSelectedMatchDetail] = useState<ReconciledMatchDetail | null>(null)
   const [showMatchDetail, setShowMatchDetail] = useState(false)
@@ -249,7 +251,7 @@ export default function ConciliacionBancaria() {
     if (matchSuggestions.length === 0) return
     try {
       setLoadingMatching(true)
-      await createBulkMatches({ matches: matchSuggestions.map(s => ({ bank_transaction_id: s.bank_transaction_id, entry_line_id: s.entry_line_id })) })
+      await createBulkMatches({ matches: matchSuggestions.map(s => ({ bank_transaction_id: s.bank_transaction_id, entry_line_id: s.entry_line_id, entry_line_ids: s.entry_line_ids })) })
       await loadMatchingData()
       await loadReconciliation()
       await loadReconciledMatches()
@@ -1175,6 +1177,7 @@ export default function ConciliacionBancaria() {
                 onClick={() => {
                   setShowUploadStatement(false)
                   setStatementData({ statement_date: '', opening_balance: '', closing_balance: '', json_content: '' })
+                  setStatementFile(null)
                   setUploadMode('json')
                 }}
                 className="text-gray-400 hover:text-gray-600 dark:hover:text-gray-300"
@@ -1200,7 +1203,7 @@ export default function ConciliacionBancaria() {
                       : 'text-gray-600 dark:text-gray-400 hover:text-gray-900 dark:hover:text-gray-200'
                   }`}
                 >
-                  Subir Archivo JSON
+                  Subir Archivo
                 </button>
                 <button
                   onClick={() => setUploadMode('paste')}
@@ -1217,14 +1220,19 @@ export default function ConciliacionBancaria() {
               {uploadMode === 'json' ? (
                 <div>
                   <label className="text-sm font-medium text-gray-700 dark:text-gray-300 mb-2 block">
-                    Seleccionar archivo JSON
+                    Seleccionar archivo del banco o JSON
                   </label>
                   <input
                     type="file"
-                    accept=".json"
+                    accept=".json,.csv,.txt,.xlsx,.sta,.mt940,.ofx,.qfx"
                     onChange={async (e) => {
                       const file = e.target.files?.[0]
-                      if (file) {
+                      setStatementFile(null)
+                      if (file && !file.name.toLowerCase().endsWith('.json')) {
+                        // CSV/XLSX/MT940/OFX: se procesa en el servidor
+                        setStatementFile(file)
+                        setStatementData({ statement_date: '', opening_balance: '', closing_balance: '', json_content: '' })
+                      } else if (file) {
                         try {
                           const text = await file.text()
                           const data = JSON.parse(text)
@@ -1242,7 +1250,7 @@ export default function ConciliacionBancaria() {
                     className="w-full border border-gray-300 dark:border-gray-600 rounded-lg px-3 py-2 text-sm dark:bg-gray-700 dark:text-gray-100"
                   />
                   <p className="text-xs text-gray-500 mt-1">
-                    El archivo debe tener el formato JSON con los campos: bank_account_id, period_id, statement_date, opening_balance, closing_balance, transactions
+                    Extractos del banco en CSV, Excel (XLSX), MT940 u OFX (los movimientos ya cargados se omiten), o un JSON con los campos: bank_account_id, period_id, statement_date, opening_balance, closing_balance, transactions
                   </p>
                 </div>
               ) : (
@@ -1260,7 +1268,7 @@ export default function ConciliacionBancaria() {
                 </div>
               )}
 
-              {statementData.json_content && (
+              {(statementData.json_content || statementFile) && (
                 <div className="space-y-3">
                   <div>
                     <label className="text-sm font-medium text-gray-700 dark:text-gray-300 mb-1 block">
@@ -1336,6 +1344,31 @@ export default function ConciliacionBancaria() {
             <div className="flex items-center gap-3 mt-6">
               <Button
                 onClick={async () => {
+                  if (statementFile) {
+                    try {
+                      const result = await importBankStatementFile({
+                        bank_account_id: selectedBankAccount.id,
+                        period_id: selectedPeriod.id,
+                        statement_date: statementData.statement_date || undefined,
+                        opening_balance: statementData.opening_balance || undefined,
+                        closing_balance: statementData.closing_balance || undefined,
+                      }, statementFile)
+                      showMessage(
+                        result.id ? 'success' : 'info',
+                        'Extracto Importado',
+                        `Formato ${result.format}: ${result.transaction_count} movimiento(s) nuevo(s), ${result.duplicates} duplicado(s) omitido(s), ${result.skipped_rows} fila(s) ignorada(s).`
+                      )
+                      setShowUploadStatement(false)
+                      setStatementFile(null)
+                      setStatementData({ statement_date: '', opening_balance: '', closing_balance: '', json_content: '' })
+                      await loadReconciliation()
+                      await loadMatchingData()
+                      await loadReconciledMatches()
+                    } catch (err: any) {
+                      showMessage('error', 'Error', `Error al importar extracto: ${err.message || err}`)
+                    }
+                    return
+                  }
                   if (!statementData.json_content) {
                     showMessage('warning', 'Campo Requerido', 'Por favor, carga o pega el contenido JSON del extracto bancario.')
                     return
@@ -1360,7 +1393,7 @@ export default function ConciliacionBancaria() {
                     showMessage('error', 'Error', `Error al cargar extracto: ${err.message || err}`)
                   }
                 }}
-                disabled={!statementData.json_content}
+                disabled={!statementData.json_content && !statementFile}
                 className="bg-primary-600 hover:bg-primary-700 flex-1"
               >
                 Cargar Extracto
@@ -1369,6 +1402,7 @@ export default function ConciliacionBancaria() {
                 onClick={() => {
                   setShowUploadStatement(false)
                   setStatementData({ statement_date: '', opening_balance: '', closing_balance: '', json_content: '' })
+                  setStatementFile(null)
                   setUploadMode('json')
                 }}
                 variant="outline"